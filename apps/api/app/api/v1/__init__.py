@@ -3,6 +3,7 @@
 from fastapi import APIRouter
 
 from app.api.v1 import (
+    artifacts,
     chat,
     connections,
     export_import,
@@ -28,3 +29,4 @@ api_router.include_router(schema.router, tags=["表关系"])
 api_router.include_router(prompts.router, prefix="/prompts", tags=["提示词"])
 api_router.include_router(settings.router, tags=["工作区设置"])
 api_router.include_router(system.router, tags=["系统"])
+api_router.include_router(artifacts.router, tags=["分析产物"])
@@ -0,0 +1,32 @@
+"""分析产物 API"""
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+
+from app.services.artifact_store import artifact_store
+
+router = APIRouter(prefix="/artifacts", tags=["artifacts"])
+
+# 产物按内容寻址，同一 ID 的内容永远不变
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    """读取产物（分析图片）"""
+    artifact = artifact_store.get(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="产物不存在")
+
+    etag = f'"{artifact.artifact_id}"'
+    headers = {
+        "Cache-Control": CACHE_CONTROL,
+        "ETag": etag,
+        "X-Content-Type-Options": "nosniff",
+    }
+    if artifact.media_type == "image/svg+xml":
+        # SVG 可以内嵌脚本，直接打开时不允许执行
+        headers["Content-Security-Policy"] = "default-src 'none'; style-src 'unsafe-inline'"
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(artifact.path, media_type=artifact.media_type, headers=headers)
@@ -111,6 +111,7 @@ async def chat_stream(
                 conversation_id=current_conversation_id,
                 exclude_message_id=UUID(str(user_message.id)),
                 stop_checker=active_query_registry.stop_checker(query_key),
+                cancellation=active_query_registry.cancellation(query_key),
             ):
                 yield event.to_sse()
                 accumulator.consume(event)
@@ -178,8 +179,9 @@ async def chat_stream(
 async def stop_chat(request: ChatStopRequest) -> APIResponse[dict[str, Any]]:
     """停止正在执行的查询."""
     if active_query_registry.stop(request.conversation_id):
+        cancelled = await active_query_registry.cancel_statements(request.conversation_id)
         return APIResponse.ok(
-            data={"stopped": True},
+            data={"stopped": True, "cancelled_statements": cancelled},
             message="查询停止请求已发送",
         )
 
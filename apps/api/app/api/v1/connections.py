@@ -3,6 +3,7 @@
 from typing import Any
 from uuid import UUID
 
+import structlog
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,7 +12,16 @@ from app.core import encryptor
 from app.db import get_db
 from app.db.tables import Connection
 from app.models import APIResponse, ConnectionCreate, ConnectionResponse, ConnectionTest
-from app.services.database import DatabaseConfig, create_database_manager
+from app.services.database import (
+    DatabaseConfig,
+    create_database_manager,
+    invalidate_connection_pool,
+)
+from app.services.execution_context import connection_to_db_config
+from app.services.result_cache import result_cache
+from app.services.schema_cache import schema_cache
+
+logger = structlog.get_logger()
 
 router = APIRouter(prefix="/connections", tags=["connections"])
 
@@ -24,6 +34,23 @@ async def _get_connection_or_404(db: AsyncSession, connection_id: UUID) -> Conne
     return connection
 
 
+def _build_db_config(connection: Connection) -> DatabaseConfig:
+    # 与聊天执行路径使用同一份转换，连接池指纹才能对应
+    return DatabaseConfig.from_dict(connection_to_db_config(connection))
+
+
+def _invalidate_connection_resources(connection: Connection) -> None:
+    schema_cache.invalidate(str(connection.id))
+    result_cache.invalidate(str(connection.id))
+    try:
+        invalidate_connection_pool(_build_db_config(connection))
+    except Exception as exc:
+        # 旧连接池会随空闲回收自然关闭，但在此之前仍可能被使用
+        logger.warning(
+            "Failed to invalidate connection pool", connection_id=str(connection.id), error=str(exc)
+        )
+
+
 async def _clear_default_connections(db: AsyncSession, exclude_id: UUID | None = None) -> None:
     result = await db.execute(select(Connection).where(Connection.is_default.is_(True)))
     for connection in result.scalars():
@@ -77,20 +104,8 @@ async def test_connection(
 ) -> APIResponse[ConnectionTest]:
     """测试数据库连接"""
     connection = await _get_connection_or_404(db, connection_id)
-
-    password = (
-        encryptor.decrypt(connection.password_encrypted) if connection.password_encrypted else None
-    )
-    db_config = DatabaseConfig(
-        driver=connection.driver,
-        host=connection.host or "localhost",
-        port=connection.port,
-        user=connection.username or "",
-        password=password or "",
-        database=connection.database_name or "",
-    )
-    db_manager = create_database_manager(db_config)
-    test_result = db_manager.test_connection()
+    db_manager = create_database_manager(_build_db_config(connection))
+    test_result = await db_manager.test_connection_async()
 
     return APIResponse.ok(
         data=ConnectionTest(
@@ -114,6 +129,7 @@ async def update_connection(
     if conn_in.is_default and not connection.is_default:
         await _clear_default_connections(db, exclude_id=UUID(str(connection.id)))
 
+    _invalidate_connection_resources(connection)
     connection.name = conn_in.name
     connection.driver = conn_in.driver
     connection.host = conn_in.host
@@ -138,6 +154,7 @@ async def delete_connection(
 ) -> APIResponse[dict[str, Any]]:
     """删除数据库连接"""
     connection = await _get_connection_or_404(db, connection_id)
+    _invalidate_connection_resources(connection)
     await db.delete(connection)
     await db.commit()
     return APIResponse.ok(message="连接已删除")
@@ -14,6 +14,7 @@ from app.core.config import settings
 from app.db import get_db
 from app.db.tables import Model
 from app.models import APIResponse, ModelCreate, ModelResponse, ModelTest
+from app.services.llm_client_pool import llm_client_pool
 from app.services.model_runtime import categorize_model_error, resolve_model_runtime
 
 router = APIRouter(prefix="/models", tags=["models"])
@@ -143,6 +144,12 @@ async def test_model(
             messages=[{"role": "user", "content": "Hi"}],
             max_tokens=5,
             timeout=10,
+            client=llm_client_pool.get_client(
+                provider=resolved.litellm_provider,
+                base_url=resolved.base_url,
+                headers=resolved.headers,
+                api_key=resolved.api_key,
+            ),
             **resolved.completion_kwargs(),
         )
         elapsed_ms = int((time.time() - start_time) * 1000)
@@ -1,19 +1,19 @@
 """Schema 和表关系 API"""
 
-import re
 from uuid import UUID
 
+import structlog
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core import encryptor
 from app.db import get_db
 from app.db.metadata import LayoutRepository
 from app.db.tables import Connection, TableRelationship
 from app.models import (
     APIResponse,
     ColumnInfo,
+    IndexInfo,
     RelationshipSuggestion,
     SchemaInfo,
     SchemaLayoutCreate,
@@ -26,7 +26,11 @@ from app.models import (
     TableRelationshipResponse,
     TableRelationshipUpdate,
 )
-from app.services.database import create_database_manager
+from app.services.database_schema import SchemaSnapshot
+from app.services.execution_context import connection_to_db_config
+from app.services.schema_cache import schema_cache
+
+logger = structlog.get_logger()
 
 router = APIRouter(prefix="/schema", tags=["schema"])
 
@@ -40,30 +44,67 @@ async def _get_connection(connection_id: UUID, db: AsyncSession) -> Connection:
 
 
 def _get_db_config(connection: Connection) -> dict:
-    password = None
-    if connection.password_encrypted:
-        try:
-            password = encryptor.decrypt(connection.password_encrypted)
-        except Exception:
-            password = None
-    return {
-        "driver": connection.driver,
-        "host": connection.host,
-        "port": connection.port,
-        "user": connection.username,
-        "password": password,
-        "database": connection.database_name,
-    }
-
-
-def _detect_relationships(tables: list[TableInfo]) -> list[RelationshipSuggestion]:
+    return connection_to_db_config(connection)
+
+
+def _snapshot_to_tables(snapshot: SchemaSnapshot) -> list[TableInfo]:
+    tables: list[TableInfo] = []
+    for table in snapshot.tables:
+        fk_columns = table.foreign_key_columns
+        tables.append(
+            TableInfo(
+                name=table.name,
+                columns=[
+                    ColumnInfo(
+                        name=column.name,
+                        data_type=column.data_type,
+                        is_nullable=column.is_nullable,
+                        is_primary_key=column.is_primary_key,
+                        is_foreign_key=column.name in fk_columns,
+                        default_value=column.default_value,
+                    )
+                    for column in table.columns
+                ],
+                indexes=[
+                    IndexInfo(name=index.name, columns=index.columns, is_unique=index.is_unique)
+                    for index in table.indexes
+                ],
+                row_count=table.row_estimate,
+            )
+        )
+    return tables
+
+
+def _detect_relationships(snapshot: SchemaSnapshot) -> list[RelationshipSuggestion]:
     suggestions: list[RelationshipSuggestion] = []
-    table_names = {table.name.lower(): table.name for table in tables}
-    for table in tables:
+    seen: set[tuple[str, str]] = set()
+
+    # 已声明的单列外键约束
+    for table in snapshot.tables:
+        for fk in table.foreign_keys:
+            if len(fk.columns) != 1 or len(fk.referenced_columns) != 1:
+                continue
+            seen.add((table.name, fk.columns[0]))
+            suggestions.append(
+                RelationshipSuggestion(
+                    source_table=table.name,
+                    source_column=fk.columns[0],
+                    target_table=fk.referenced_table,
+                    target_column=fk.referenced_columns[0],
+                    confidence=1.0,
+                    reason=f"外键约束 {fk.columns[0]} 引用 {fk.referenced_table}",
+                )
+            )
+
+    # 未声明外键时按 xxx_id 命名约定推断
+    table_names = {table.name.lower(): table.name for table in snapshot.tables}
+    for table in snapshot.tables:
         for column in table.columns:
             col_lower = column.name.lower()
             if not col_lower.endswith("_id") or col_lower == "id":
                 continue
+            if (table.name, column.name) in seen:
+                continue
             potential_table = col_lower[:-3]
             matched_table = None
             for variant in (
@@ -77,48 +118,27 @@ def _detect_relationships(tables: list[TableInfo]) -> list[RelationshipSuggestio
                     break
             if not matched_table or matched_table == table.name:
                 continue
-            target_table_info = next((item for item in tables if item.name == matched_table), None)
-            if target_table_info and any(
-                col.name.lower() == "id" for col in target_table_info.columns
-            ):
-                suggestions.append(
-                    RelationshipSuggestion(
-                        source_table=table.name,
-                        source_column=column.name,
-                        target_table=matched_table,
-                        target_column="id",
-                        confidence=0.9,
-                        reason=f"列名 {column.name} 匹配表 {matched_table}",
-                    )
-                )
-    return suggestions
-
-
-def _parse_schema_info(schema_info: str) -> list[TableInfo]:
-    tables: list[TableInfo] = []
-    for line in schema_info.strip().split("\n"):
-        line = line.strip()
-        if not line.startswith("-"):
-            continue
-        match = re.match(r"-\s*(\w+):\s*(.+)", line)
-        if not match:
-            continue
-        table_name = match.group(1)
-        columns: list[ColumnInfo] = []
-        for col_match in re.finditer(r"(\w+)\s*\(([^)]+)\)", match.group(2)):
-            col_name = col_match.group(1)
-            col_type = col_match.group(2)
-            columns.append(
-                ColumnInfo(
-                    name=col_name,
-                    data_type=col_type,
-                    is_primary_key=col_name.lower() == "id",
-                    is_foreign_key=col_name.lower().endswith("_id") and col_name.lower() != "id",
+            target = snapshot.get_table(matched_table)
+            if target is None:
+                continue
+            target_column = next(
+                (col.name for col in target.columns if col.name.lower() == "id"), None
+            )
+            if target_column is None and len(target.primary_key) == 1:
+                target_column = target.primary_key[0]
+            if target_column is None:
+                continue
+            suggestions.append(
+                RelationshipSuggestion(
+                    source_table=table.name,
+                    source_column=column.name,
+                    target_table=matched_table,
+                    target_column=target_column,
+                    confidence=0.9,
+                    reason=f"列名 {column.name} 匹配表 {matched_table}",
                 )
             )
-        if columns:
-            tables.append(TableInfo(name=table_name, columns=columns))
-    return tables
+    return suggestions
 
 
 @router.get("/{connection_id}", response_model=APIResponse[SchemaInfo])
@@ -128,11 +148,34 @@ async def get_schema(
 ):
     """获取数据库 Schema 信息和关系建议"""
     connection = await _get_connection(connection_id, db)
-    db_manager = create_database_manager(_get_db_config(connection))
-    schema_info = db_manager.get_schema_info()
-    tables = _parse_schema_info(schema_info)
-    suggestions = _detect_relationships(tables)
-    return APIResponse.ok(data=SchemaInfo(tables=tables, suggestions=suggestions))
+    return APIResponse.ok(data=await _load_schema_info(connection))
+
+
+@router.post("/{connection_id}/refresh", response_model=APIResponse[SchemaInfo])
+async def refresh_schema(
+    connection_id: UUID,
+    db: AsyncSession = Depends(get_db),
+):
+    """跳过缓存重新读取数据库 Schema"""
+    connection = await _get_connection(connection_id, db)
+    return APIResponse.ok(
+        data=await _load_schema_info(connection, force_refresh=True),
+        message="Schema 已刷新",
+    )
+
+
+async def _load_schema_info(connection: Connection, *, force_refresh: bool = False) -> SchemaInfo:
+    try:
+        snapshot = await schema_cache.get_snapshot(
+            connection.id, _get_db_config(connection), force_refresh=force_refresh
+        )
+    except Exception as e:
+        logger.error("Failed to get schema info", error=str(e))
+        return SchemaInfo(tables=[], suggestions=[])
+    return SchemaInfo(
+        tables=_snapshot_to_tables(snapshot),
+        suggestions=_detect_relationships(snapshot),
+    )
 
 
 @router.get(
@@ -4,8 +4,20 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
-from app.models import APIResponse, SystemCapabilities
+from app.models import (
+    APIResponse,
+    DatabasePoolStats,
+    DatabaseReplicaStatus,
+    LLMClientPoolStats,
+    PythonKernelPoolStats,
+    QueryResultCacheStats,
+    SystemCapabilities,
+)
 from app.services.app_settings import detect_system_capabilities, get_or_create_app_settings
+from app.services.database import get_connection_pool_stats, get_replica_stats
+from app.services.kernel_pool import kernel_pool
+from app.services.llm_client_pool import llm_client_pool
+from app.services.result_cache import result_cache
 
 router = APIRouter(prefix="/system", tags=["system"])
 
@@ -15,3 +27,48 @@ async def get_capabilities(db: AsyncSession = Depends(get_db)):
     """获取当前运行时能力状态"""
     settings_record = await get_or_create_app_settings(db)
     return APIResponse.ok(data=detect_system_capabilities(settings_record))
+
+
+@router.get("/database-pools", response_model=APIResponse[list[DatabasePoolStats]])
+async def get_database_pools():
+    """获取目标数据库连接池统计"""
+    return APIResponse.ok(
+        data=[
+            DatabasePoolStats(**{**stats.to_dict(), "key": stats.key[:12]})
+            for stats in get_connection_pool_stats()
+        ]
+    )
+
+
+@router.get("/database-replicas", response_model=APIResponse[list[DatabaseReplicaStatus]])
+async def get_database_replicas():
+    """获取只读副本健康状态与复制延迟"""
+    return APIResponse.ok(
+        data=[
+            DatabaseReplicaStatus(**{**status.to_dict(), "key": status.key[:12]})
+            for status in get_replica_stats()
+        ]
+    )
+
+
+@router.get("/llm-clients", response_model=APIResponse[list[LLMClientPoolStats]])
+async def get_llm_clients():
+    """获取 LLM HTTP 连接池统计"""
+    return APIResponse.ok(
+        data=[
+            LLMClientPoolStats(**{**stats.to_dict(), "key": stats.key[:12]})
+            for stats in llm_client_pool.stats()
+        ]
+    )
+
+
+@router.get("/result-cache", response_model=APIResponse[QueryResultCacheStats])
+async def get_result_cache():
+    """获取查询结果缓存统计"""
+    return APIResponse.ok(data=QueryResultCacheStats(**result_cache.stats().to_dict()))
+
+
+@router.get("/python-kernels", response_model=APIResponse[PythonKernelPoolStats])
+async def get_python_kernels():
+    """获取 Python 分析内核池统计（借出等待时间、冷启动与回收次数）"""
+    return APIResponse.ok(data=PythonKernelPoolStats(**kernel_pool.stats().to_dict()))
@@ -74,6 +74,88 @@ class Settings(BaseSettings):
     # ===== gptme 配置 =====
     GPTME_MODEL: str = "gpt-4o"
     GPTME_TIMEOUT: int = 300  # 5 分钟超时
+    SQL_SPECULATIVE_EXECUTION: bool = True  # SQL 代码块闭合后即开始执行，与后续生成并行
+    SQL_MAX_BLOCKS: int = 5  # 一次回答中并行执行的 SQL 块上限，多出的块被忽略
+
+    # ===== Python 分析内核池 =====
+    # process: 在独立的沙箱进程中执行分析代码；thread: 在 API 进程的工作线程中执行
+    PYTHON_EXECUTION_BACKEND: Literal["thread", "process"] = "process"
+    PYTHON_KERNEL_POOL_SIZE: int = 4  # 同时借出的预热内核上限，0 表示每次请求单独创建
+    PYTHON_KERNEL_POOL_WARM: int = 2  # 启动时预热并保持空闲的内核数
+    PYTHON_KERNEL_MAX_EXECUTIONS: int = 100  # 内核执行多少次代码后回收重建，0 表示不限制
+    # 常驻内存（沙箱进程或 API 进程）超过该值时回收归还的内核，0 表示不检查
+    PYTHON_KERNEL_MAX_RSS_BYTES: int = 2 * 1024 * 1024 * 1024
+    PYTHON_SANDBOX_MEMORY_LIMIT: int = 4 * 1024 * 1024 * 1024  # 沙箱地址空间上限，0 表示不限制
+    PYTHON_SANDBOX_CPU_LIMIT: int = 60  # 沙箱中每次执行的 CPU 时间上限（秒），0 表示不限制
+
+    # ===== 分析图片 =====
+    PYTHON_IMAGE_FORMAT: Literal["png", "webp", "svg"] = "png"  # matplotlib 图片的输出格式
+    PYTHON_IMAGE_DPI: int = 150  # 位图（png / webp）的分辨率
+    ARTIFACT_DIR: str = ""  # 图片等产物的存储目录，留空时使用 data/artifacts
+
+    # ===== LLM HTTP 连接池 =====
+    LLM_HTTP_POOL_ENABLED: bool = True
+    LLM_HTTP_MAX_CONNECTIONS: int = 20  # 每个模型端点的最大连接数
+    LLM_HTTP_MAX_KEEPALIVE: int = 10  # 每个模型端点保留的空闲长连接数
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 60  # 空闲长连接保留时间（秒）
+    LLM_HTTP2: bool = True  # 安装 h2 时启用 HTTP/2
+
+    # ===== 目标数据库连接池 =====
+    DB_POOL_ENABLED: bool = True
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 5
+    DB_POOL_IDLE_TIMEOUT: int = 300  # 空闲连接回收时间（秒）
+    DB_POOL_ACQUIRE_TIMEOUT: int = 30  # 等待空闲连接的最长时间（秒）
+    DB_EXECUTOR_MAX_WORKERS: int = 16  # 执行同步数据库调用的线程数
+    DB_MAX_CONCURRENT_QUERIES_PER_CONNECTION: int = 4
+
+    # ===== SQLite 只读配置（连接 extra_options.read_only / immutable） =====
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 每个只读连接的内存映射大小，0 表示关闭
+    SQLITE_CACHE_SIZE: int = 64 * 1024 * 1024  # 每个只读连接的页缓存上限，0 使用 SQLite 默认值
+
+    # ===== DuckDB =====
+    DUCKDB_THREADS: int = 0  # 每个连接的执行线程数，0 表示使用全部 CPU 核
+    DUCKDB_MEMORY_LIMIT: str = ""  # 如 "4GB"，留空使用 DuckDB 默认值
+
+    # ===== 只读副本（连接 extra_options.replicas） =====
+    REPLICA_MAX_LAG: float = 30  # 默认允许的复制延迟（秒）
+    REPLICA_LAG_CHECK_INTERVAL: float = 10  # 同一副本两次延迟检测的最短间隔（秒）
+    REPLICA_RETRY_INTERVAL: float = 30  # 不健康副本被跳过的时间（秒）
+    REPLICA_FALLBACK_TO_PRIMARY: bool = True  # 没有可用副本时回退到主库
+
+    # ===== 查询结果限制 =====
+    QUERY_MAX_ROWS: int = 10000  # 单次查询最多返回的行数，0 表示不限制
+    QUERY_MAX_BYTES: int = 16 * 1024 * 1024  # 单次查询结果的估算字节上限，0 表示不限制
+    QUERY_FETCH_BATCH_SIZE: int = 1000  # 服务端游标每批读取的行数
+    QUERY_AUTO_LIMIT: bool = True  # SQL 没有 LIMIT 时自动追加
+    QUERY_STATEMENT_TIMEOUT: float | None = None  # 语句超时（秒），默认同 GPTME_TIMEOUT，0 不限制
+
+    # ===== 执行前代价检查（可被连接 extra_options.cost_guard 覆盖） =====
+    COST_GUARD_ENABLED: bool = False
+    COST_GUARD_MAX_ROWS: float = 10_000_000  # 预估结果或连接中间结果的行数上限，0 表示不检查
+    COST_GUARD_MAX_COST: float = 0  # 数据库估算的总代价上限（单位因方言而异），0 表示不检查
+    # 超出阈值时：reject 拒绝 / limit 加 LIMIT / repair 交给自动修复
+    COST_GUARD_ACTION: Literal["reject", "limit", "repair"] = "repair"
+    COST_GUARD_LIMIT_ROWS: int = 1000  # action=limit 时改写使用的行数
+
+    # ===== 查询结果缓存 =====
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_TTL: int = 300  # 结果缓存有效期（秒），0 表示关闭
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 内存层的估算字节上限
+    RESULT_CACHE_DIR: str = ""  # 磁盘层目录，留空表示只使用内存
+    RESULT_CACHE_DISK_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # ===== 表结构缓存 =====
+    SCHEMA_CACHE_PROBE_INTERVAL: int = 30  # 两次结构指纹探测的最短间隔（秒）
+    SCHEMA_CACHE_WARM_INTERVAL: int = 600  # 后台预热所有连接的间隔（秒），0 表示关闭
+    SCHEMA_CONTEXT_TOKEN_BUDGET: int = 8000  # 注入提示词的表结构 token 上限，0 表示不裁剪
+    SCHEMA_CONTEXT_TOP_K: int = 15  # 按相关性选取的表数（不含关联表）
+    SCHEMA_CONTEXT_MIN_SCORE: float = 2.0  # 最高相关分低于该值时回退到全量表结构
+    SCHEMA_PROFILE_ENABLED: bool = True  # 后台采样列统计（取值、范围、空值比例）并注入提示词
+    SCHEMA_PROFILE_SAMPLE_ROWS: int = 10000  # 每张表采样的行数
+    SCHEMA_PROFILE_TOP_VALUES: int = 10  # 低基数文本列最多列出的取值数
+    SCHEMA_PROFILE_MAX_TABLES: int = 200  # 每个连接最多采样的表数
+    SCHEMA_PROFILE_MAX_AGE: int = 86400  # 列统计的有效期（秒），0 表示只在结构变化时重新采样
 
     # ===== 速率限制 =====
     RATE_LIMIT_REQUESTS: int = 60
@@ -133,7 +133,8 @@ async def ensure_demo_connection(db: AsyncSession, demo_db_path: str) -> None:
         username=None,
         password_encrypted=None,
         database_name=demo_db_path,
-        extra_options={},
+        # 示例库只读取，使用 SQLite 只读优化配置
+        extra_options={"read_only": True},
         is_default=True,
     )
     db.add(connection)
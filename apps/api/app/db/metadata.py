@@ -92,6 +92,17 @@ def init_metadata_db() -> None:
             ON schema_layouts(id)
             """
         )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_cache (
+                connection_id TEXT PRIMARY KEY,
+                config_fingerprint TEXT NOT NULL,
+                schema_fingerprint TEXT,
+                snapshot TEXT NOT NULL,
+                refreshed_at TEXT
+            )
+            """
+        )
 
 
 class LayoutRepository:
@@ -336,4 +347,71 @@ class LayoutRepository:
             return cursor.fetchone() is not None
 
 
+class SchemaCacheRepository:
+    """表结构缓存仓库"""
+
+    @staticmethod
+    def get(connection_id: UUID) -> dict | None:
+        with get_metadata_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT * FROM schema_cache
+                WHERE connection_id = ?
+                """,
+                (str(connection_id),),
+            )
+            row = cursor.fetchone()
+        if not row:
+            return None
+        try:
+            row["snapshot"] = json.loads(row["snapshot"] or "{}")
+        except (json.JSONDecodeError, TypeError):
+            return None
+        return row
+
+    @staticmethod
+    def save(
+        connection_id: UUID,
+        *,
+        config_fingerprint: str,
+        schema_fingerprint: str | None,
+        snapshot: dict[str, Any],
+    ) -> None:
+        with get_metadata_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO schema_cache
+                (connection_id, config_fingerprint, schema_fingerprint, snapshot, refreshed_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(connection_id) DO UPDATE SET
+                    config_fingerprint = excluded.config_fingerprint,
+                    schema_fingerprint = excluded.schema_fingerprint,
+                    snapshot = excluded.snapshot,
+                    refreshed_at = excluded.refreshed_at
+                """,
+                (
+                    str(connection_id),
+                    config_fingerprint,
+                    schema_fingerprint,
+                    json.dumps(snapshot, ensure_ascii=False),
+                    datetime.utcnow().isoformat(),
+                ),
+            )
+
+    @staticmethod
+    def delete(connection_id: UUID) -> bool:
+        with get_metadata_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                DELETE FROM schema_cache
+                WHERE connection_id = ?
+                """,
+                (str(connection_id),),
+            )
+            return cursor.rowcount > 0
+
+
 init_metadata_db()
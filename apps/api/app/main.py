@@ -2,8 +2,9 @@
 QueryGPT API 主应用
 """
 
+import asyncio
 from collections.abc import AsyncGenerator
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from typing import Any
 
 import structlog
@@ -20,6 +21,10 @@ from app.core.config import settings
 from app.core.demo_db import ensure_demo_connection, init_demo_database
 from app.db import AsyncSessionLocal, engine
 from app.db.base import Base
+from app.services.database import close_connection_pools
+from app.services.kernel_pool import kernel_pool
+from app.services.llm_client_pool import llm_client_pool
+from app.services.schema_cache import run_schema_cache_warmer
 
 # 配置日志
 structlog.configure(
@@ -75,10 +80,27 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         await ensure_demo_connection(session, demo_db_path)
         await session.commit()
 
+    # 后台预热表结构缓存
+    warmer_task = None
+    if settings.SCHEMA_CACHE_WARM_INTERVAL > 0:
+        warmer_task = asyncio.create_task(
+            run_schema_cache_warmer(settings.SCHEMA_CACHE_WARM_INTERVAL)
+        )
+
+    # 后台预热 Python 分析内核，首个 Python 回答不必等待导入 pandas / matplotlib
+    kernel_pool.start_warming()
+
     yield
 
     # 关闭时
     logger.info("Shutting down QueryGPT API")
+    if warmer_task is not None:
+        warmer_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmer_task
+    close_connection_pools()
+    kernel_pool.close()
+    await llm_client_pool.aclose()
     await engine.dispose()
 
 
@@ -17,10 +17,15 @@ from app.models.config import (
     ConnectionCreate,
     ConnectionResponse,
     ConnectionTest,
+    DatabasePoolStats,
+    DatabaseReplicaStatus,
+    LLMClientPoolStats,
     ModelCreate,
     ModelExtraOptions,
     ModelResponse,
     ModelTest,
+    PythonKernelPoolStats,
+    QueryResultCacheStats,
     SystemCapabilities,
 )
 from app.models.history import (
@@ -32,6 +37,7 @@ from app.models.history import (
 )
 from app.models.schema import (
     ColumnInfo,
+    IndexInfo,
     RelationshipContext,
     RelationshipSuggestion,
     SchemaInfo,
@@ -70,6 +76,11 @@ __all__ = [
     "ConnectionCreate",
     "ConnectionResponse",
     "ConnectionTest",
+    "DatabasePoolStats",
+    "DatabaseReplicaStatus",
+    "LLMClientPoolStats",
+    "QueryResultCacheStats",
+    "PythonKernelPoolStats",
     "AppSettings",
     "AppSettingsUpdate",
     "SystemCapabilities",
@@ -86,6 +97,7 @@ __all__ = [
     "SemanticContext",
     # Schema
     "ColumnInfo",
+    "IndexInfo",
     "TableInfo",
     "SchemaInfo",
     "TableRelationshipCreate",
@@ -12,6 +12,8 @@ class SSEEventType(StrEnum):
 
     PROGRESS = "progress"
     THINKING = "thinking"  # 思考阶段
+    CONTENT_DELTA = "content_delta"  # 回答正文增量
+    SQL_RESULT = "sql_result"  # 多个 SQL 块时单个块的结果
     RESULT = "result"
     VISUALIZATION = "visualization"
     PYTHON_OUTPUT = "python_output"  # Python 输出
@@ -79,6 +81,29 @@ class SSEEvent(BaseModel):
             },
         )
 
+    @classmethod
+    def sql_result(
+        cls,
+        name: str,
+        sql: str,
+        data: list[dict] | None = None,
+        rows_count: int | None = None,
+        execution_time: float | None = None,
+        **extra: Any,
+    ) -> "SSEEvent":
+        """创建单个 SQL 块结果事件（执行完成即推送，最终以 result 事件为准）"""
+        return cls(
+            type=SSEEventType.SQL_RESULT,
+            data={
+                "name": name,
+                "sql": sql,
+                "data": data,
+                "rows_count": rows_count,
+                "execution_time": execution_time,
+                **extra,
+            },
+        )
+
     @classmethod
     def visualization(cls, chart_type: str, chart_data: dict[str, Any]) -> "SSEEvent":
         """创建可视化事件"""
@@ -127,19 +152,31 @@ class SSEEvent(BaseModel):
         )
 
     @classmethod
-    def python_output(cls, output: str, stream: str = "stdout") -> "SSEEvent":
+    def content_delta(cls, delta: str, **extra: Any) -> "SSEEvent":
+        """创建回答正文增量事件（已去除代码块与内部标记，仅用于实时展示）"""
+        return cls(
+            type=SSEEventType.CONTENT_DELTA,
+            data={"delta": delta, **extra},
+        )
+
+    @classmethod
+    def python_output(cls, output: str, stream: str = "stdout", **extra: Any) -> "SSEEvent":
         """创建 Python 输出事件"""
         return cls(
             type=SSEEventType.PYTHON_OUTPUT,
-            data={"output": output, "stream": stream},
+            data={"output": output, "stream": stream, **extra},
         )
 
     @classmethod
-    def python_image(cls, image: str, format: str = "png") -> "SSEEvent":
-        """创建 Python 图表事件 (base64 编码)"""
+    def python_image(cls, artifact_id: str, **extra: Any) -> "SSEEvent":
+        """创建 Python 图表事件（图片存入产物存储，事件只携带引用）"""
         return cls(
             type=SSEEventType.PYTHON_IMAGE,
-            data={"image": image, "format": format},
+            data={
+                "artifact_id": artifact_id,
+                "url": f"/api/v1/artifacts/{artifact_id}",
+                **extra,
+            },
         )
 
 
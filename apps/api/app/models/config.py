@@ -132,7 +132,9 @@ class ConnectionCreate(BaseModel):
     """创建数据库连接"""
 
     name: str = Field(..., min_length=1, max_length=100, description="连接名称")
-    driver: Literal["mysql", "postgresql", "sqlite"] = Field(..., description="数据库类型")
+    driver: Literal["mysql", "postgresql", "sqlite", "duckdb"] = Field(
+        ..., description="数据库类型"
+    )
     host: str | None = Field(default=None, description="主机地址")
     port: int | None = Field(default=None, description="端口")
     username: str | None = Field(default=None, description="用户名")
@@ -188,6 +190,93 @@ class ConnectionTest(BaseModel):
     message: str
 
 
+class DatabasePoolStats(BaseModel):
+    """目标数据库连接池统计"""
+
+    key: str = Field(..., description="连接配置指纹前缀")
+    driver: str
+    database: str
+    min_size: int
+    max_size: int
+    idle: int
+    in_use: int
+    created: int = 0
+    reused: int = 0
+    closed: int = 0
+    evicted: int = 0
+    failed_pings: int = 0
+    waits: int = 0
+
+
+class DatabaseReplicaStatus(BaseModel):
+    """只读副本健康状态"""
+
+    key: str = Field(..., description="副本连接配置指纹前缀")
+    host: str
+    port: int | None = None
+    database: str
+    weight: float
+    healthy: bool
+    lag: float | None = Field(default=None, description="最近一次检测到的复制延迟（秒）")
+    served: int = 0
+    failures: int = 0
+    last_error: str | None = None
+
+
+class LLMClientPoolStats(BaseModel):
+    """LLM HTTP 连接池统计"""
+
+    key: str = Field(..., description="端点配置指纹前缀")
+    provider: str
+    base_url: str | None = None
+    http2: bool
+    max_connections: int
+    max_keepalive_connections: int
+    connections: int = 0
+    idle: int = 0
+    requests: int = 0
+    created_at: float
+
+
+class QueryResultCacheStats(BaseModel):
+    """查询结果缓存统计"""
+
+    enabled: bool
+    ttl: float
+    max_bytes: int
+    disk_enabled: bool
+    entries: int = 0
+    bytes: int = 0
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expired: int = 0
+    invalidations: int = 0
+
+
+class PythonKernelPoolStats(BaseModel):
+    """Python 分析内核池统计"""
+
+    enabled: bool
+    backend: str = Field(..., description="process（沙箱进程）或 thread（API 进程内线程）")
+    max_size: int
+    warm_size: int
+    max_executions: int
+    max_rss_bytes: int
+    idle: int = 0
+    in_use: int = 0
+    created: int = 0
+    checkouts: int = 0
+    cold_starts: int = 0
+    waits: int = Field(0, description="因槽位已满而排队的借出次数")
+    wait_seconds_total: float = Field(0.0, description="借出内核的累计耗时（含排队与冷启动）")
+    wait_seconds_max: float = 0.0
+    recycled: int = 0
+    rss_bytes: int | None = Field(None, description="进程常驻内存")
+
+
 class ModelTest(BaseModel):
     """模型测试结果"""
 
@@ -10,7 +10,7 @@ class ExportConnectionInfo(BaseModel):
     """导出的连接信息（不含敏感数据）"""
 
     name: str
-    driver: Literal["mysql", "postgresql", "sqlite"]
+    driver: Literal["mysql", "postgresql", "sqlite", "duckdb"]
     host: str | None = None
     port: int | None = None
     database: str | None = None
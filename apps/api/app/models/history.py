@@ -51,8 +51,9 @@ class MessageMetadata(BaseModel):
     steps: list[dict[str, str]] | None = None
     visualization: dict[str, Any] | None = None
     data: list[dict[str, Any]] | None = None
+    datasets: list[dict[str, Any]] | None = None
     python_output: str | None = None
-    python_images: list[str] | None = None
+    python_images: list[str] | None = None  # 产物 ID（早期消息为 base64 PNG）
     error: str | None = None
     error_code: str | None = None
     error_category: str | None = None
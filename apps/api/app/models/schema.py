@@ -19,11 +19,20 @@ class ColumnInfo(BaseModel):
     default_value: str | None = None
 
 
+class IndexInfo(BaseModel):
+    """索引信息"""
+
+    name: str
+    columns: list[str]
+    is_unique: bool = False
+
+
 class TableInfo(BaseModel):
     """表信息"""
 
     name: str
     columns: list[ColumnInfo]
+    indexes: list[IndexInfo] = []
     row_count: int | None = None
 
 
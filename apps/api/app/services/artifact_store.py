@@ -0,0 +1,70 @@
+"""Content-addressed file store for analysis artifacts such as rendered charts."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.core.config import settings
+
+ARTIFACT_MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+DEFAULT_ARTIFACT_DIR = Path(__file__).resolve().parent.parent.parent.parent / "data" / "artifacts"
+
+_ARTIFACT_ID = re.compile(r"[0-9a-f]{64}")
+
+
+@dataclass(frozen=True)
+class StoredArtifact:
+    artifact_id: str
+    path: Path
+    media_type: str
+    size: int
+
+
+class ArtifactStore:
+    """按内容寻址的产物存储
+
+    产物 ID 是内容的 SHA-256，文件保存为 ``root/<ID 前两位>/<ID>.<格式>``。相同内容
+    只存一份；先写临时文件再原子替换，多个进程（包括沙箱进程）可以同时写入。
+    """
+
+    def __init__(self, root: str | os.PathLike[str]):
+        self.root = Path(root)
+
+    def put(self, data: bytes, format: str) -> str:
+        if format not in ARTIFACT_MEDIA_TYPES:
+            raise ValueError(f"不支持的产物格式: {format}")
+        artifact_id = hashlib.sha256(data).hexdigest()
+        path = self._path(artifact_id, format)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            temp.write_bytes(data)
+            temp.replace(path)
+        return artifact_id
+
+    def get(self, artifact_id: str) -> StoredArtifact | None:
+        if not _ARTIFACT_ID.fullmatch(artifact_id):
+            return None
+        for format, media_type in ARTIFACT_MEDIA_TYPES.items():
+            path = self._path(artifact_id, format)
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            return StoredArtifact(artifact_id, path, media_type, size)
+        return None
+
+    def _path(self, artifact_id: str, format: str) -> Path:
+        return self.root / artifact_id[:2] / f"{artifact_id}.{format}"
+
+
+artifact_store = ArtifactStore(settings.ARTIFACT_DIR or DEFAULT_ARTIFACT_DIR)
@@ -1,5 +1,6 @@
 """Helpers for chat SSE session state and persistence."""
 
+import asyncio
 from collections.abc import Callable
 from dataclasses import dataclass, field
 from typing import Any
@@ -9,33 +10,45 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.tables import Conversation, Message
 from app.models import SSEEvent
+from app.services.query_cancellation import QueryCancellation
 
 
 class ActiveQueryRegistry:
     """Track active chat runs for the local single-instance deployment mode."""
 
     def __init__(self) -> None:
-        self._queries: dict[str, bool] = {}
+        self._queries: dict[str, QueryCancellation] = {}
 
     def start(self, conversation_id: UUID | str) -> str:
         query_key = str(conversation_id)
-        self._queries[query_key] = True
+        self._queries[query_key] = QueryCancellation()
         return query_key
 
     def stop(self, conversation_id: UUID | str) -> bool:
-        query_key = str(conversation_id)
-        if query_key not in self._queries:
+        cancellation = self._queries.get(str(conversation_id))
+        if cancellation is None:
             return False
-        self._queries[query_key] = False
+        cancellation.request()
         return True
 
+    async def cancel_statements(self, conversation_id: UUID | str) -> int:
+        """在目标数据库上取消该执行中正在运行的 SQL"""
+        cancellation = self._queries.get(str(conversation_id))
+        if cancellation is None:
+            return 0
+        return await asyncio.to_thread(cancellation.cancel_statements)
+
     def is_active(self, conversation_id: UUID | str) -> bool:
-        return self._queries.get(str(conversation_id), False)
+        cancellation = self._queries.get(str(conversation_id))
+        return cancellation is not None and not cancellation.requested
 
     def stop_checker(self, conversation_id: UUID | str) -> Callable[[], bool]:
         query_key = str(conversation_id)
         return lambda: not self.is_active(query_key)
 
+    def cancellation(self, conversation_id: UUID | str) -> QueryCancellation | None:
+        return self._queries.get(str(conversation_id))
+
     def release(self, conversation_id: UUID | str) -> None:
         self._queries.pop(str(conversation_id), None)
 
@@ -82,6 +95,7 @@ class ChatEventAccumulator:
     assistant_content: str = ""
     python_output_parts: list[str] = field(default_factory=list)
     python_images: list[str] = field(default_factory=list)
+    python_attempt: int | None = None
     error_payload: dict[str, Any] | None = None
     metadata: dict[str, Any] = field(init=False)
 
@@ -106,6 +120,10 @@ class ChatEventAccumulator:
             )
             return
 
+        if event_type == "content_delta":
+            # 增量正文只用于实时展示，持久化以 result 事件中清理后的完整内容为准
+            return
+
         if event_type == "result":
             self.assistant_content = str(event.data.get("content", "") or self.assistant_content)
             self.metadata = merge_metadata(
@@ -114,7 +132,10 @@ class ChatEventAccumulator:
                     "sql": event.data.get("sql"),
                     "execution_time": event.data.get("execution_time"),
                     "rows_count": event.data.get("rows_count"),
+                    "truncated": event.data.get("truncated") or None,
+                    "cached": event.data.get("cached") or None,
                     "data": event.data.get("data"),
+                    "datasets": event.data.get("datasets"),
                     "execution_context": event.data.get("execution_context"),
                     "diagnostics": event.data.get("diagnostics"),
                 },
@@ -129,11 +150,13 @@ class ChatEventAccumulator:
             return
 
         if event_type == "python_output":
+            self._start_python_attempt(event.data.get("attempt"))
             self.python_output_parts.append(str(event.data.get("output", "")))
             return
 
         if event_type == "python_image":
-            self.python_images.append(str(event.data.get("image", "")))
+            self._start_python_attempt(event.data.get("attempt"))
+            self.python_images.append(str(event.data.get("artifact_id", "")))
             return
 
         if event_type == "error":
@@ -149,6 +172,13 @@ class ChatEventAccumulator:
                 },
             )
 
+    def _start_python_attempt(self, attempt: int | None) -> None:
+        # 自动修复会重新执行 Python，失败轮次的输出与图表不属于最终回答
+        if attempt != self.python_attempt:
+            self.python_output_parts = []
+            self.python_images = []
+            self.python_attempt = attempt
+
     def build_metadata(self) -> dict[str, Any]:
         metadata = dict(self.metadata)
         if self.python_output_parts:
@@ -0,0 +1,164 @@
+"""Sampled column statistics that enrich the schema prompt."""
+
+from __future__ import annotations
+
+import re
+import time
+from collections import Counter
+from collections.abc import Hashable
+from dataclasses import replace
+from datetime import date, datetime
+from datetime import time as time_of_day
+from decimal import Decimal
+from typing import Any
+
+import structlog
+
+from app.services.database import DatabaseManager
+from app.services.database_executor import database_executor
+from app.services.database_schema import ColumnSnapshot, ColumnStats, SchemaSnapshot, TableSnapshot
+
+logger = structlog.get_logger()
+
+MAX_VALUE_LENGTH = 40
+_DATE_TEXT_RE = re.compile(r"\d{4}[-/.]\d{1,2}[-/.]\d{1,2}")
+_TEMPORAL_TYPE_RE = re.compile(r"date|time", re.IGNORECASE)
+
+
+def quote_identifier(driver: str, name: str) -> str:
+    quote = "`" if driver == "mysql" else '"'
+    return quote + name.replace(quote, quote * 2) + quote
+
+
+def build_sample_sql(driver: str, table: TableSnapshot, sample_rows: int) -> str:
+    """取表的约 ``sample_rows`` 行样本
+
+    PostgreSQL 按目录行数估算用 ``TABLESAMPLE SYSTEM`` 随机抽取数据页（多抽一倍以抵消
+    页内行数的波动），DuckDB 用 ``USING SAMPLE`` 蓄水池抽样；MySQL 与 SQLite 没有
+    抽样语法，取存储顺序的前若干行，避免全表扫描。
+    """
+    columns = ", ".join(quote_identifier(driver, column.name) for column in table.columns)
+    source = quote_identifier(driver, table.name)
+    if driver == "duckdb":
+        return f"SELECT {columns} FROM {source} USING SAMPLE {sample_rows} ROWS"
+    if driver == "postgresql" and table.row_estimate and table.row_estimate > sample_rows:
+        percent = min(100.0, 200.0 * sample_rows / table.row_estimate)
+        source += f" TABLESAMPLE SYSTEM ({percent:.6f})"
+    return f"SELECT {columns} FROM {source} LIMIT {sample_rows}"
+
+
+def profile_column(column: ColumnSnapshot, values: list[Any], *, top_values: int) -> ColumnStats:
+    """由样本计算列统计
+
+    数值与日期列（包括按日期格式存储的文本列）记录最小、最大值；低基数的文本列记录
+    按频次排序的取值，提示模型真实的枚举写法。
+    """
+    present = [value for value in values if value is not None]
+    stats = ColumnStats(
+        null_ratio=round(1 - len(present) / len(values), 4) if values else 0.0,
+        sample_size=len(values),
+    )
+    if not present:
+        return stats
+    counts = Counter(value if isinstance(value, Hashable) else repr(value) for value in present)
+    stats.distinct_count = len(counts)
+
+    ordered = _orderable(column, present)
+    if ordered is not None:
+        stats.min_value = _format_value(min(ordered))
+        stats.max_value = _format_value(max(ordered))
+    elif (
+        all(isinstance(value, str) for value in present)
+        and stats.distinct_count <= top_values
+        and len(present) > stats.distinct_count
+    ):
+        stats.top_values = [_format_value(value) for value, _ in counts.most_common(top_values)]
+    return stats
+
+
+def _orderable(column: ColumnSnapshot, values: list[Any]) -> list[Any] | None:
+    if all(isinstance(value, int | float | Decimal) for value in values):
+        # 布尔列没有有意义的范围
+        return None if any(isinstance(value, bool) for value in values) else values
+    kinds = {type(value) for value in values}
+    if len(kinds) == 1 and kinds <= {datetime, date, time_of_day}:
+        return values
+    if all(isinstance(value, str) for value in values) and (
+        _TEMPORAL_TYPE_RE.search(column.data_type)
+        or all(_DATE_TEXT_RE.match(value) for value in values)
+    ):
+        return values
+    return None
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, datetime):
+        text = value.isoformat(sep=" ")
+    elif isinstance(value, float):
+        text = format(value, ".6g")
+    else:
+        text = str(value)
+    text = " ".join(text.split())
+    if len(text) > MAX_VALUE_LENGTH:
+        text = text[: MAX_VALUE_LENGTH - 1] + "…"
+    return text
+
+
+def profile_table(
+    db_manager: DatabaseManager,
+    table: TableSnapshot,
+    *,
+    sample_rows: int,
+    top_values: int,
+) -> TableSnapshot:
+    """采样一张表并返回带列统计的副本"""
+    sql = build_sample_sql(db_manager.config.driver, table, sample_rows)
+    result = db_manager.execute_query(sql, read_only=True, max_rows=sample_rows)
+    values = dict(zip(result.columns, result.values, strict=False))
+    columns = [
+        replace(
+            column,
+            stats=profile_column(column, values.get(column.name, []), top_values=top_values),
+        )
+        for column in table.columns
+    ]
+    row_estimate = table.row_estimate
+    if row_estimate is None and result.rows_count < sample_rows and not result.truncated:
+        # 样本没有读满时就是整张表
+        row_estimate = result.rows_count
+    return replace(table, columns=columns, row_estimate=row_estimate)
+
+
+async def profile_snapshot(
+    db_manager: DatabaseManager,
+    snapshot: SchemaSnapshot,
+    *,
+    sample_rows: int,
+    top_values: int,
+    max_tables: int,
+) -> SchemaSnapshot:
+    """逐表采样，返回带列统计的新快照
+
+    表按顺序采样，同一时间最多占用连接的一个执行槽位，用户查询仍能并行；
+    单张表失败（权限、超时等）只记录警告，保留原结构。
+    """
+    key = db_manager.config.fingerprint()
+    tables: list[TableSnapshot] = []
+    for index, table in enumerate(snapshot.tables):
+        if index >= max_tables or not table.columns:
+            tables.append(table)
+            continue
+        try:
+            profiled = await database_executor.run(
+                key,
+                profile_table,
+                db_manager,
+                table,
+                sample_rows=sample_rows,
+                top_values=top_values,
+            )
+        except Exception as exc:
+            logger.warning("Column profiling failed", table=table.name, error=str(exc))
+            profiled = table
+        tables.append(profiled)
+    return replace(snapshot, tables=tables, profiled_at=time.time())
@@ -0,0 +1,283 @@
+"""EXPLAIN-based cost guard for generated SQL."""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from dataclasses import dataclass, field, fields
+from typing import Any, Literal
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+CostGuardAction = Literal["reject", "limit", "repair"]
+COST_GUARD_ACTIONS: tuple[CostGuardAction, ...] = ("reject", "limit", "repair")
+
+_SQLITE_SCAN_RE = re.compile(r"^(SCAN|SEARCH)\s+(\S+)(.*)$")
+# 连接节点的输出是可能膨胀的中间结果；阻塞节点要读完输入，其下的 LIMIT 无法提前停止
+_POSTGRES_JOINS = frozenset({"Nested Loop", "Hash Join", "Merge Join"})
+_POSTGRES_BLOCKING = frozenset(
+    {"Sort", "Aggregate", "WindowAgg", "SetOp", "Hash", "Materialize", "Unique"}
+)
+_DUCKDB_BLOCKING = frozenset(
+    {"ORDER_BY", "TOP_N", "HASH_GROUP_BY", "PERFECT_HASH_GROUP_BY", "UNGROUPED_AGGREGATE", "WINDOW"}
+)
+_ALIAS_RE = re.compile(
+    r"(?:\bFROM|\bJOIN|,)\s*[`\"]?([\w.]+)[`\"]?\s+(?:AS\s+)?"
+    r"(?!(?:WHERE|JOIN|ON|USING|GROUP|ORDER|LIMIT|HAVING|UNION|FROM|NATURAL"
+    r"|LEFT|RIGHT|INNER|OUTER|CROSS|FULL)\b)(\w+)",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class QueryPlanEstimate:
+    """查询计划估算
+
+    ``rows`` 是预估的结果行数与连接中间结果中的较大者（能体现笛卡尔积等膨胀，
+    并考虑 LIMIT 的提前停止），
+    ``cost`` 是数据库给出的总代价（单位因方言而异，SQLite 没有）。
+    """
+
+    rows: float | None = None
+    cost: float | None = None
+    full_scans: list[str] = field(default_factory=list)
+    steps: list[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        parts = []
+        if self.rows is not None:
+            parts.append(f"预估 {self.rows:,.0f} 行")
+        if self.cost is not None:
+            parts.append(f"总代价 {self.cost:,.0f}")
+        if self.full_scans:
+            parts.append(f"全表扫描: {', '.join(dict.fromkeys(self.full_scans))}")
+        if self.steps:
+            parts.append(f"计划: {' -> '.join(self.steps[:8])}")
+        return "；".join(parts) or "无法获取执行计划估算"
+
+
+@dataclass
+class CostGuardPolicy:
+    """执行前代价检查的阈值（全局配置，可被连接的 ``extra_options.cost_guard`` 覆盖）"""
+
+    enabled: bool = False
+    max_rows: float = 0
+    max_cost: float = 0
+    action: CostGuardAction = "repair"
+    limit_rows: int = 1000
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any] | None = None) -> CostGuardPolicy:
+        policy = cls(
+            enabled=settings.COST_GUARD_ENABLED,
+            max_rows=settings.COST_GUARD_MAX_ROWS,
+            max_cost=settings.COST_GUARD_MAX_COST,
+            action=settings.COST_GUARD_ACTION,
+            limit_rows=settings.COST_GUARD_LIMIT_ROWS,
+        )
+        for item in fields(cls):
+            if not options or options.get(item.name) is None:
+                continue
+            value = options[item.name]
+            try:
+                if item.name == "action":
+                    policy.action = _parse_action(value)
+                elif item.name == "enabled":
+                    policy.enabled = bool(value)
+                elif item.name == "limit_rows":
+                    policy.limit_rows = int(value)
+                else:
+                    setattr(policy, item.name, float(value))
+            except (TypeError, ValueError) as exc:
+                # 连接上的错误配置不应让查询失败，保留全局值
+                logger.warning(
+                    "Ignoring invalid cost guard option", option=item.name, error=str(exc)
+                )
+        return policy
+
+    def violation(self, plan: QueryPlanEstimate) -> str | None:
+        """超出阈值时返回原因"""
+        if self.max_rows > 0 and plan.rows is not None and plan.rows > self.max_rows:
+            return f"预估行数 {plan.rows:,.0f} 超过上限 {self.max_rows:,.0f}"
+        if self.max_cost > 0 and plan.cost is not None and plan.cost > self.max_cost:
+            return f"预估代价 {plan.cost:,.0f} 超过上限 {self.max_cost:,.0f}"
+        return None
+
+
+class CostGuardError(ValueError):
+    """执行计划超出代价阈值"""
+
+    def __init__(self, message: str, *, action: CostGuardAction, plan: QueryPlanEstimate):
+        super().__init__(message)
+        self.action = action
+        self.plan = plan
+
+
+def _parse_action(value: Any) -> CostGuardAction:
+    action = str(value).lower()
+    for candidate in COST_GUARD_ACTIONS:
+        if candidate == action:
+            return candidate
+    raise ValueError(f"不支持的代价检查动作: {value}")
+
+
+def _capped(rows: float, limit: float | None) -> float:
+    return rows if limit is None else min(rows, limit)
+
+
+def parse_postgres_plan(document: Any) -> QueryPlanEstimate:
+    """解析 ``EXPLAIN (FORMAT JSON)`` 的输出
+
+    行数取根节点（即 Limit 节点）的输出与各连接节点的中间结果；Limit 之下的流式节点
+    会提前停止，按 Limit 行数封顶，排序、聚合等需要读完输入的节点之下不封顶。
+    """
+    root = document[0]["Plan"] if isinstance(document, list) else document["Plan"]
+    estimate = QueryPlanEstimate(cost=float(root.get("Total Cost", 0)))
+    max_rows = float(root.get("Plan Rows", 0))
+    pending: list[tuple[Mapping[str, Any], float | None]] = [(root, None)]
+    while pending:
+        node, limit = pending.pop(0)
+        rows = float(node.get("Plan Rows", 0))
+        node_type = str(node.get("Node Type", ""))
+        relation = node.get("Relation Name")
+        estimate.steps.append(f"{node_type} {relation}" if relation else node_type)
+        if node_type == "Seq Scan" and relation:
+            estimate.full_scans.append(str(relation))
+        if node_type in _POSTGRES_JOINS:
+            max_rows = max(max_rows, _capped(rows, limit))
+        if node_type == "Limit":
+            limit = _capped(rows, limit)
+        elif node_type in _POSTGRES_BLOCKING:
+            limit = None
+        pending.extend((child, limit) for child in node.get("Plans", []))
+    estimate.rows = max_rows
+    return estimate
+
+
+def parse_mysql_plan(document: Mapping[str, Any], limit: int | None = None) -> QueryPlanEstimate:
+    """解析 ``EXPLAIN FORMAT=JSON`` 的输出
+
+    行数取各表连接后产生的行数（``rows_produced_per_join``）；``limit`` 为语句末尾的
+    LIMIT，没有文件排序或临时表时按它封顶。
+    """
+    block = document.get("query_block", {})
+    cost = block.get("cost_info", {}).get("query_cost")
+    estimate = QueryPlanEstimate(cost=float(cost) if cost is not None else None)
+    max_rows = 0.0
+    for table in _find_mysql_tables(block):
+        name = str(table.get("table_name", "?"))
+        access_type = str(table.get("access_type", ""))
+        estimate.steps.append(f"{access_type} {name}".strip())
+        if access_type == "ALL":
+            estimate.full_scans.append(name)
+        for key in ("rows_produced_per_join", "rows_examined_per_scan"):
+            if table.get(key) is not None:
+                max_rows = max(max_rows, float(table[key]))
+                break
+    if _mysql_materializes(block):
+        limit = None
+    estimate.rows = _capped(max_rows, limit)
+    return estimate
+
+
+def _find_mysql_tables(node: Any) -> Iterable[Mapping[str, Any]]:
+    if isinstance(node, Mapping):
+        for key, value in node.items():
+            if key == "table" and isinstance(value, Mapping):
+                yield value
+            yield from _find_mysql_tables(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _find_mysql_tables(item)
+
+
+def _mysql_materializes(node: Any) -> bool:
+    """排序或分组需要读完全部连接结果时 LIMIT 不能提前停止"""
+    if isinstance(node, Mapping):
+        if node.get("using_filesort") or node.get("using_temporary_table"):
+            return True
+        return any(_mysql_materializes(value) for value in node.values())
+    if isinstance(node, list):
+        return any(_mysql_materializes(item) for item in node)
+    return False
+
+
+def parse_duckdb_plan(document: Any, limit: int | None = None) -> QueryPlanEstimate:
+    """解析 DuckDB ``EXPLAIN (FORMAT JSON)`` 的物理计划
+
+    DuckDB 没有代价，只有各算子的基数估计；交叉连接不给估计，按子节点乘积计算。
+    行数取根算子的输出与各连接算子的中间结果；LIMIT 算子不给估计，``limit`` 为语句
+    末尾的 LIMIT，排序、聚合等需要读完输入的算子之下不按它封顶。
+    """
+    estimate = QueryPlanEstimate()
+    max_rows = 0.0
+
+    def visit(node: Mapping[str, Any], limit: float | None) -> float:
+        nonlocal max_rows
+        name = str(node.get("name", ""))
+        info = node.get("extra_info") or {}
+        source = info.get("Table") or info.get("Function")
+        estimate.steps.append(f"{name} {source}" if source and source != name else name)
+        if name in {"SEQ_SCAN", "TABLE_SCAN"} or name.startswith("READ_"):
+            estimate.full_scans.append(str(source or name))
+        child_limit = None if name in _DUCKDB_BLOCKING else limit
+        children = [visit(child, child_limit) for child in node.get("children", [])]
+        try:
+            rows = float(info["Estimated Cardinality"])
+        except (KeyError, TypeError, ValueError):
+            if name == "CROSS_PRODUCT" and children:
+                rows = math.prod(children)
+            else:
+                rows = max(children, default=0.0)
+        if "JOIN" in name or name == "CROSS_PRODUCT":
+            max_rows = max(max_rows, _capped(rows, limit))
+        return rows
+
+    for root in document if isinstance(document, list) else [document]:
+        rows = visit(root, limit)
+        max_rows = max(max_rows, _capped(rows, limit))
+    estimate.rows = max_rows
+    return estimate
+
+
+def parse_sqlite_plan(
+    rows: Sequence[Sequence[Any]],
+    sql: str,
+    row_count: Callable[[str], int | None],
+    limit: int | None = None,
+) -> QueryPlanEstimate:
+    """由 ``EXPLAIN QUERY PLAN`` 估算
+
+    SQLite 不给出行数与代价：同一层循环中的全表扫描按表行数（``row_count``）相乘
+    （嵌套循环），索引查找按 1 行计，取各层的最大值。``limit`` 为语句末尾的 LIMIT，
+    嵌套循环会在取够行数后停止，没有临时 B 树排序或分组时按它封顶。
+    """
+    aliases = {alias.lower(): table for table, alias in _ALIAS_RE.findall(sql)}
+    estimate = QueryPlanEstimate()
+    loops: dict[Any, list[float]] = defaultdict(list)
+    for _, parent, _, detail in rows:
+        estimate.steps.append(str(detail))
+        match = _SQLITE_SCAN_RE.match(str(detail))
+        if not match:
+            continue
+        operation, name, rest = match.groups()
+        table = aliases.get(name.lower(), name)
+        if operation == "SEARCH":
+            loops[parent].append(1.0)
+            continue
+        if "COVERING INDEX" not in rest:
+            estimate.full_scans.append(table)
+        count = row_count(table)
+        if count is not None:
+            loops[parent].append(float(max(count, 1)))
+    if any("TEMP B-TREE" in step for step in estimate.steps):
+        limit = None
+    if loops:
+        estimate.rows = _capped(max(math.prod(factors) for factors in loops.values()), limit)
+    return estimate
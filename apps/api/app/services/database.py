@@ -1,26 +1,45 @@
 """
 数据库连接管理器
-统一管理 MySQL、PostgreSQL、SQLite 的连接和查询
+统一管理 MySQL、PostgreSQL、SQLite、DuckDB 的连接和查询
 """
 
 from __future__ import annotations
 
+import hashlib
+import json
 import re
 from collections.abc import Generator
-from contextlib import contextmanager
-from dataclasses import dataclass
+from contextlib import AbstractContextManager, ExitStack, contextmanager, nullcontext
+from dataclasses import dataclass, field, replace
 from typing import Any
 
 import structlog
 
-from app.services.database_adapters import build_database_adapter, is_valid_sqlite_identifier
+from app.core.config import settings
+from app.services.cost_guard import CostGuardError, CostGuardPolicy, QueryPlanEstimate
+from app.services.database_adapters import (
+    apply_row_limit,
+    build_database_adapter,
+    is_select_statement,
+    is_valid_sqlite_identifier,
+)
+from app.services.database_executor import database_executor
+from app.services.database_pool import ConnectionPool, PoolStats, pool_registry, pool_settings
+from app.services.database_schema import SchemaSnapshot
+from app.services.query_cancellation import QueryCancellation, QueryCancelledError
+from app.services.query_result import QueryResult
+from app.services.replica_routing import ReplicaEndpoint, ReplicaStatus, replica_router
 
 logger = structlog.get_logger()
 
 
 @dataclass
 class DatabaseConfig:
-    """数据库连接配置"""
+    """数据库连接配置
+
+    ``replicas`` 为只读副本端点，只读查询在其间路由；``read_only`` 表示以只读会话建立连接
+    （SQLite 使用只读优化配置）；``immutable`` 仅用于 SQLite，声明文件在连接期间不会被修改。
+    """
 
     driver: str
     host: str = "localhost"
@@ -28,22 +47,50 @@ class DatabaseConfig:
     user: str = ""
     password: str = ""
     database: str = ""
+    replicas: tuple[ReplicaEndpoint, ...] = field(default=(), compare=False)
+    read_only: bool = False
+    immutable: bool = False
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> DatabaseConfig:
+        # 连接记录中未填写的字段为 None，与缺省值一致，否则同一连接的指纹会不同
         return cls(
-            driver=data.get("driver", "mysql"),
-            host=data.get("host", "localhost"),
+            driver=data.get("driver") or "mysql",
+            host=data.get("host") or "localhost",
             port=data.get("port"),
-            user=data.get("user", data.get("username", "")),
-            password=data.get("password", ""),
-            database=data.get("database", data.get("database_name", "")),
+            user=data.get("user") or data.get("username") or "",
+            password=data.get("password") or "",
+            database=data.get("database") or data.get("database_name") or "",
+            replicas=ReplicaEndpoint.parse_list(data.get("replicas")),
+            read_only=bool(data.get("read_only") or data.get("immutable")),
+            immutable=bool(data.get("immutable")),
         )
 
     def get_port(self) -> int:
         if self.port:
             return self.port
-        return {"mysql": 3306, "postgresql": 5432, "sqlite": 0}.get(self.driver, 3306)
+        return {"mysql": 3306, "postgresql": 5432, "sqlite": 0, "duckdb": 0}.get(self.driver, 3306)
+
+    def fingerprint(self) -> str:
+        """连接配置指纹，用作连接池等进程级资源的键"""
+        fields = [self.driver, self.host, self.get_port(), self.user, self.password, self.database]
+        if self.read_only:
+            fields.append("read_only")
+        if self.immutable:
+            fields.append("immutable")
+        payload = json.dumps(fields)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def for_replica(self, endpoint: ReplicaEndpoint) -> DatabaseConfig:
+        """副本的连接配置：账号沿用主库，以只读会话连接"""
+        return replace(
+            self,
+            host=endpoint.host or self.host,
+            port=endpoint.port or self.port,
+            database=endpoint.database or self.database,
+            replicas=(),
+            read_only=True,
+        )
 
 
 @dataclass
@@ -56,34 +103,43 @@ class ConnectionTestResult:
     message: str = ""
 
 
-@dataclass
-class QueryResult:
-    """查询结果"""
-
-    data: list[dict[str, Any]]
-    rows_count: int
+def statement_timeout_seconds() -> float:
+    """SQL 语句超时：未单独配置时沿用 GPTME_TIMEOUT，0 表示不限制"""
+    if settings.QUERY_STATEMENT_TIMEOUT is None:
+        return float(settings.GPTME_TIMEOUT)
+    return float(settings.QUERY_STATEMENT_TIMEOUT)
 
 
 class DatabaseManager:
     """数据库连接管理器"""
 
-    SUPPORTED_DRIVERS = ("mysql", "postgresql", "sqlite")
+    SUPPORTED_DRIVERS = ("mysql", "postgresql", "sqlite", "duckdb")
     READ_ONLY_PREFIXES = ("SELECT", "SHOW", "DESCRIBE", "EXPLAIN", "WITH")
 
-    def __init__(self, config: DatabaseConfig):
+    def __init__(self, config: DatabaseConfig, *, use_pool: bool | None = None):
         self.config = config
         self._validate_driver()
-        self._adapter = build_database_adapter(config.driver)
+        self._adapter = build_database_adapter(
+            config.driver, statement_timeout=statement_timeout_seconds()
+        )
+        self._use_pool = settings.DB_POOL_ENABLED if use_pool is None else use_pool
 
     def _validate_driver(self) -> None:
         if self.config.driver not in self.SUPPORTED_DRIVERS:
             raise ValueError(f"不支持的数据库类型: {self.config.driver}")
 
     @contextmanager
-    def connect(self) -> Generator[Any, None, None]:
+    def connect(self, config: DatabaseConfig | None = None) -> Generator[Any, None, None]:
+        """借出主库（或指定副本配置）的连接"""
+        config = config or self.config
+        if self._use_pool:
+            with self._get_pool(config).connection() as conn:
+                yield conn
+            return
+
         conn = None
         try:
-            conn = self._create_connection()
+            conn = self._adapter.create_connection(config)
             yield conn
         finally:
             if conn:
@@ -92,6 +148,70 @@ class DatabaseManager:
     def _create_connection(self) -> Any:
         return self._adapter.create_connection(self.config)
 
+    @contextmanager
+    def connect_for_read(self) -> Generator[tuple[Any, DatabaseConfig], None, None]:
+        """为只读查询选择端点，返回 ``(连接, 端点配置)``
+
+        按权重在健康且复制延迟未超限的副本间选择，连接失败或延迟检测出错的副本会被暂时摘除，
+        依次尝试下一个；全部不可用时回退到主库（REPLICA_FALLBACK_TO_PRIMARY=false 时报错）。
+        """
+        candidates: dict[str, tuple[DatabaseConfig, ReplicaEndpoint]] = {}
+        for endpoint in self.config.replicas:
+            replica = self.config.for_replica(endpoint)
+            candidates[replica.fingerprint()] = (replica, endpoint)
+        ordered = replica_router.order(
+            [(key, endpoint, replica.database) for key, (replica, endpoint) in candidates.items()]
+        )
+        for key, endpoint in ordered:
+            replica = candidates[key][0]
+            with ExitStack() as stack:
+                try:
+                    conn = stack.enter_context(self.connect(replica))
+                    fresh = self._replica_is_fresh(conn, key, endpoint)
+                except Exception as exc:
+                    replica_router.mark_failed(key, exc)
+                    continue
+                if not fresh:
+                    continue
+                replica_router.mark_served(key)
+                held = stack.pop_all()
+            with held:
+                yield conn, replica
+            return
+
+        if candidates:
+            if not settings.REPLICA_FALLBACK_TO_PRIMARY:
+                raise ConnectionError("没有可用的只读副本")
+            logger.warning("No healthy replica, falling back to primary", replicas=len(candidates))
+        with self.connect() as conn:
+            yield conn, self.config
+
+    def _replica_is_fresh(self, conn: Any, key: str, endpoint: ReplicaEndpoint) -> bool:
+        if not replica_router.lag_check_due(key):
+            return True
+        return replica_router.record_lag(
+            key, self._adapter.replication_lag(conn), endpoint.allowed_lag()
+        )
+
+    def _get_pool(self, config: DatabaseConfig | None = None) -> ConnectionPool:
+        # 连接池生命周期长于当前 manager，持有配置副本避免外部修改
+        config = replace(config or self.config)
+        key = config.fingerprint()
+        adapter = self._adapter
+
+        def build_pool() -> ConnectionPool:
+            return ConnectionPool(
+                lambda: adapter.create_connection(config),
+                ping=adapter.ping,
+                reset=adapter.reset_connection,
+                key=key,
+                driver=config.driver,
+                database=config.database,
+                **pool_settings(),
+            )
+
+        return pool_registry.get_or_create(key, build_pool)
+
     def test_connection(self) -> ConnectionTestResult:
         try:
             with self.connect() as conn:
@@ -106,16 +226,136 @@ class DatabaseManager:
             logger.error("Database connection test failed", error=str(exc))
             return ConnectionTestResult(connected=False, message=f"连接失败: {exc}")
 
+    async def test_connection_async(self) -> ConnectionTestResult:
+        return await database_executor.run(self.config.fingerprint(), self.test_connection)
+
     def _get_db_info(self, conn: Any) -> tuple[str, int]:
         return self._adapter.get_db_info(conn)
 
-    def execute_query(self, sql: str, read_only: bool = True) -> QueryResult:
+    def execute_query(
+        self,
+        sql: str,
+        read_only: bool = True,
+        *,
+        max_rows: int | None = None,
+        max_bytes: int | None = None,
+        cancellation: QueryCancellation | None = None,
+        cost_guard: CostGuardPolicy | None = None,
+    ) -> QueryResult:
+        """执行查询并按预算读取结果
+
+        结果通过服务端游标分批读取，达到 ``max_rows`` 行或约 ``max_bytes`` 字节时停止，
+        并在返回值中标记 ``truncated``。未指定时使用 QUERY_MAX_ROWS / QUERY_MAX_BYTES，0 表示不限制。
+        传入 ``cancellation`` 时，停止请求会在目标数据库上中断正在执行的语句；
+        传入启用的 ``cost_guard`` 时，先用 EXPLAIN 估算代价，超出阈值按策略拒绝、加 LIMIT 或报错修复，
+        被加 LIMIT 的结果标记 ``cost_limited``。
+        """
         if read_only:
             self._validate_read_only(sql)
+        if max_rows is None:
+            max_rows = settings.QUERY_MAX_ROWS
+
+        connection = self.connect_for_read() if read_only else self._connect_primary()
+        try:
+            with (
+                connection as (conn, endpoint_config),
+                self._track_cancellation(conn, endpoint_config, cancellation),
+            ):
+                executed_sql = sql
+                if cost_guard is not None and cost_guard.enabled:
+                    executed_sql, max_rows = self._apply_cost_guard(conn, sql, cost_guard, max_rows)
+                with self._open_cursor(conn, executed_sql) as cursor:
+                    result = self._adapter.collect(
+                        cursor,
+                        max_rows=max_rows,
+                        max_bytes=settings.QUERY_MAX_BYTES if max_bytes is None else max_bytes,
+                        batch_size=settings.QUERY_FETCH_BATCH_SIZE,
+                    )
+                result.cost_limited = executed_sql != sql
+        except (QueryCancelledError, CostGuardError):
+            raise
+        except Exception as exc:
+            if cancellation is not None and cancellation.requested:
+                raise QueryCancelledError("查询已取消") from exc
+            raise
+        if result.truncated:
+            logger.info(
+                "Query result truncated",
+                rows=result.rows_count,
+                driver=self.config.driver,
+            )
+        return result
+
+    async def execute_query_async(
+        self,
+        sql: str,
+        read_only: bool = True,
+        *,
+        max_rows: int | None = None,
+        max_bytes: int | None = None,
+        cancellation: QueryCancellation | None = None,
+        cost_guard: CostGuardPolicy | None = None,
+    ) -> QueryResult:
+        """在数据库线程池中执行查询，不阻塞事件循环"""
+        return await database_executor.run(
+            self.config.fingerprint(),
+            self.execute_query,
+            sql,
+            read_only,
+            max_rows=max_rows,
+            max_bytes=max_bytes,
+            cancellation=cancellation,
+            cost_guard=cost_guard,
+        )
 
+    def explain_query(self, sql: str) -> QueryPlanEstimate:
+        """用方言自己的 EXPLAIN 估算查询的行数与代价（不执行查询）"""
         with self.connect() as conn:
-            data = self._execute_sql(conn, sql)
-            return QueryResult(data=data, rows_count=len(data))
+            return self._adapter.explain(conn, sql)
+
+    def _apply_cost_guard(
+        self, conn: Any, sql: str, policy: CostGuardPolicy, max_rows: int
+    ) -> tuple[str, int]:
+        if not is_select_statement(sql):
+            return sql, max_rows
+        try:
+            plan = self._adapter.explain(conn, sql)
+        except Exception as exc:
+            # EXPLAIN 失败时交给查询本身报错
+            logger.warning("Cost guard EXPLAIN failed", error=str(exc))
+            self._adapter.reset_connection(conn)
+            return sql, max_rows
+
+        reason = policy.violation(plan)
+        if reason is None:
+            return sql, max_rows
+        logger.info(
+            "Cost guard triggered",
+            action=policy.action,
+            reason=reason,
+            driver=self.config.driver,
+        )
+        if policy.action == "limit":
+            limit = policy.limit_rows if max_rows <= 0 else min(policy.limit_rows, max_rows)
+            return apply_row_limit(sql, limit + 1), limit
+        if policy.action == "reject":
+            raise CostGuardError(
+                f"查询预估代价超过连接限制，已拒绝执行：{reason}。{plan.summary()}",
+                action=policy.action,
+                plan=plan,
+            )
+        raise CostGuardError(
+            f"查询预估代价过高：{reason}。{plan.summary()}。"
+            "请避免笛卡尔积与不必要的全表扫描，补充连接条件、过滤条件或先聚合再连接。",
+            action=policy.action,
+            plan=plan,
+        )
+
+    def apply_row_limit(self, sql: str, max_rows: int) -> str:
+        """为没有 LIMIT 的查询追加 LIMIT（多取一行用于判断是否截断）"""
+        if max_rows <= 0:
+            return sql
+        return apply_row_limit(sql, max_rows + 1)
 
     def _validate_read_only(self, sql: str) -> None:
         sql_clean = sql.strip()
@@ -154,22 +394,61 @@ class DatabaseManager:
         if first_word not in self.READ_ONLY_PREFIXES:
             raise ValueError("只允许执行只读查询 (SELECT, SHOW, DESCRIBE, EXPLAIN, WITH)")
 
-    def _execute_sql(self, conn: Any, sql: str) -> list[dict[str, Any]]:
-        return self._adapter.execute_sql(conn, sql)
+    @contextmanager
+    def _connect_primary(self) -> Generator[tuple[Any, DatabaseConfig], None, None]:
+        with self.connect() as conn:
+            yield conn, self.config
+
+    def _track_cancellation(
+        self, conn: Any, config: DatabaseConfig, cancellation: QueryCancellation | None
+    ) -> AbstractContextManager[None]:
+        if cancellation is None:
+            return nullcontext()
+        return cancellation.track(self._adapter.cancel_handle(conn, config))
+
+    def _open_cursor(self, conn: Any, sql: str) -> AbstractContextManager[Any]:
+        return self._adapter.open_cursor(conn, sql, batch_size=settings.QUERY_FETCH_BATCH_SIZE)
+
+    def get_schema_snapshot(self) -> SchemaSnapshot:
+        """一次目录查询获取全部表和列，并附带结构指纹"""
+        with self.connect() as conn:
+            fingerprint = self._get_schema_fingerprint(conn)
+            return SchemaSnapshot(
+                driver=self.config.driver,
+                database=self.config.database,
+                tables=self._adapter.fetch_schema(conn),
+                fingerprint=fingerprint,
+            )
+
+    async def get_schema_snapshot_async(self) -> SchemaSnapshot:
+        return await database_executor.run(self.config.fingerprint(), self.get_schema_snapshot)
+
+    def get_schema_fingerprint(self) -> str | None:
+        """低成本探测表结构是否变化"""
+        with self.connect() as conn:
+            return self._get_schema_fingerprint(conn)
+
+    async def get_schema_fingerprint_async(self) -> str | None:
+        return await database_executor.run(self.config.fingerprint(), self.get_schema_fingerprint)
+
+    def _get_schema_fingerprint(self, conn: Any) -> str | None:
+        try:
+            return self._adapter.schema_fingerprint(conn)
+        except Exception as exc:
+            logger.warning("Schema fingerprint probe failed", error=str(exc))
+            self._adapter.reset_connection(conn)
+            return None
 
     def get_schema_info(self) -> str:
         try:
-            with self.connect() as conn:
-                schema_parts = []
-                for table_name in self._get_tables(conn):
-                    columns = self._get_table_columns(conn, table_name)
-                    col_info = ", ".join(f"{col['name']} ({col['type']})" for col in columns)
-                    schema_parts.append(f"- {table_name}: {col_info}")
-                return "\n".join(schema_parts) if schema_parts else "无表结构信息"
+            return self.get_schema_snapshot().to_prompt_text()
         except Exception as exc:
             logger.error("Failed to get schema info", error=str(exc))
             return f"无法获取表结构: {exc}"
 
+    async def get_schema_info_async(self) -> str:
+        return await database_executor.run(self.config.fingerprint(), self.get_schema_info)
+
     def _get_tables(self, conn: Any) -> list[str]:
         return self._adapter.get_tables(conn)
 
@@ -186,3 +465,31 @@ def create_database_manager(config: dict[str, Any] | DatabaseConfig) -> Database
     if isinstance(config, dict):
         config = DatabaseConfig.from_dict(config)
     return DatabaseManager(config)
+
+
+def invalidate_connection_pool(config: dict[str, Any] | DatabaseConfig) -> bool:
+    """关闭并移除某个连接配置（含只读副本）对应的连接池"""
+    if isinstance(config, dict):
+        config = DatabaseConfig.from_dict(config)
+    replica_keys = [config.for_replica(endpoint).fingerprint() for endpoint in config.replicas]
+    replica_router.forget(replica_keys)
+    invalidated = pool_registry.invalidate(config.fingerprint())
+    for key in replica_keys:
+        pool_registry.invalidate(key)
+    return invalidated
+
+
+def get_replica_stats() -> list[ReplicaStatus]:
+    """获取只读副本的健康状态与复制延迟"""
+    return replica_router.stats()
+
+
+def get_connection_pool_stats() -> list[PoolStats]:
+    """获取所有目标数据库连接池的统计信息"""
+    return pool_registry.stats()
+
+
+def close_connection_pools() -> None:
+    """关闭所有目标数据库连接池与执行线程（应用关闭时调用）"""
+    database_executor.shutdown()
+    pool_registry.close_all()
@@ -2,32 +2,91 @@
 
 from __future__ import annotations
 
+import json
 import re
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from itertools import count
+from pathlib import Path
 from typing import TYPE_CHECKING, Any, Protocol
 
+import structlog
+
+from app.core.config import settings
+from app.services.cost_guard import (
+    QueryPlanEstimate,
+    parse_duckdb_plan,
+    parse_mysql_plan,
+    parse_postgres_plan,
+    parse_sqlite_plan,
+)
+from app.services.database_schema import (
+    TableSnapshot,
+    attach_table_details,
+    group_schema_rows,
+)
+from app.services.query_result import QueryResult, collect_arrow_result, collect_result
+
 if TYPE_CHECKING:
     from app.services.database import DatabaseConfig
 
+logger = structlog.get_logger()
+
 
 class DatabaseAdapter(Protocol):
     """Interface implemented by each database driver adapter."""
 
     def create_connection(self, config: DatabaseConfig) -> Any: ...
 
+    def ping(self, conn: Any) -> None: ...
+
+    def reset_connection(self, conn: Any) -> None: ...
+
     def get_db_info(self, conn: Any) -> tuple[str, int]: ...
 
-    def execute_sql(self, conn: Any, sql: str) -> list[dict[str, Any]]: ...
+    def open_cursor(self, conn: Any, sql: str, *, batch_size: int) -> Iterator[Any]: ...
+
+    def describe(self, cursor: Any) -> list[tuple[str, str | None]]: ...
+
+    def collect(
+        self, cursor: Any, *, max_rows: int, max_bytes: int, batch_size: int
+    ) -> QueryResult: ...
+
+    def cancel_handle(self, conn: Any, config: DatabaseConfig) -> Callable[[], None]: ...
+
+    def explain(self, conn: Any, sql: str) -> QueryPlanEstimate: ...
+
+    def replication_lag(self, conn: Any) -> float | None: ...
 
     def get_tables(self, conn: Any) -> list[str]: ...
 
     def get_table_columns(self, conn: Any, table_name: str) -> list[dict[str, str]]: ...
 
+    def fetch_schema(self, conn: Any) -> list[TableSnapshot]: ...
+
+    def schema_fingerprint(self, conn: Any) -> str: ...
+
+
+# 复制状态的权限错误：1044 库访问被拒、1142 命令被拒、1227 缺少 REPLICATION CLIENT 等权限
+_MYSQL_ACCESS_DENIED = frozenset({1044, 1142, 1227})
+# 已记录过无法检测复制延迟的 MySQL 端点，每个端点只警告一次
+_lag_unknown_endpoints: set[str] = set()
+
+
+def _mysql_access_denied(exc: Exception) -> bool:
+    return bool(exc.args) and exc.args[0] in _MYSQL_ACCESS_DENIED
+
 
 class MySQLAdapter:
+    def __init__(self, statement_timeout: float = 0):
+        self.statement_timeout = statement_timeout
+
     def create_connection(self, config: DatabaseConfig) -> Any:
         import pymysql
 
-        return pymysql.connect(
+        conn = pymysql.connect(
             host=config.host,
             port=config.get_port(),
             user=config.user,
@@ -35,6 +94,84 @@ class MySQLAdapter:
             database=config.database,
             cursorclass=pymysql.cursors.DictCursor,
         )
+        if self.statement_timeout > 0:
+            self._set_statement_timeout(conn)
+        if config.read_only:
+            with conn.cursor() as cursor:
+                cursor.execute("SET SESSION TRANSACTION READ ONLY")
+        return conn
+
+    def _set_statement_timeout(self, conn: Any) -> None:
+        import pymysql
+
+        # MySQL 5.7+ 使用毫秒；MariaDB 没有 MAX_EXECUTION_TIME，使用秒级的 max_statement_time
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute(
+                    f"SET SESSION MAX_EXECUTION_TIME = {int(self.statement_timeout * 1000)}"
+                )
+            except pymysql.MySQLError:
+                cursor.execute(f"SET SESSION max_statement_time = {self.statement_timeout:g}")
+
+    def explain(self, conn: Any, sql: str) -> QueryPlanEstimate:
+        import pymysql.cursors
+
+        with conn.cursor(pymysql.cursors.Cursor) as cursor:
+            cursor.execute(f"EXPLAIN FORMAT=JSON {_strip_statement(sql)}")
+            document = cursor.fetchone()[0]
+        return parse_mysql_plan(json.loads(document), _streaming_limit(sql))
+
+    def replication_lag(self, conn: Any) -> float | None:
+        import pymysql
+
+        # 8.0.22 起改名为 SHOW REPLICA STATUS；不是副本时结果为空
+        try:
+            with conn.cursor() as cursor:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except pymysql.MySQLError as exc:
+                    if _mysql_access_denied(exc):
+                        raise
+                    cursor.execute("SHOW SLAVE STATUS")
+                row = cursor.fetchone()
+        except pymysql.MySQLError as exc:
+            if not _mysql_access_denied(exc):
+                raise
+            # 缺少 REPLICATION CLIENT 权限时无法检测，视为延迟未知，副本照常使用
+            endpoint = f"{getattr(conn, 'host', '?')}:{getattr(conn, 'port', '?')}"
+            if endpoint not in _lag_unknown_endpoints:
+                _lag_unknown_endpoints.add(endpoint)
+                logger.warning(
+                    "Replica lag unknown: missing REPLICATION CLIENT privilege",
+                    endpoint=endpoint,
+                    error=str(exc),
+                )
+            return None
+        if not row:
+            return None
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        # NULL 表示复制线程未运行，数据可能任意陈旧
+        return float("inf") if lag is None else float(lag)
+
+    def cancel_handle(self, conn: Any, config: DatabaseConfig) -> Callable[[], None]:
+        thread_id = int(conn.thread_id())
+
+        def cancel() -> None:
+            # KILL QUERY 只终止语句，原连接保持可用
+            killer = self.create_connection(config)
+            try:
+                with killer.cursor() as cursor:
+                    cursor.execute(f"KILL QUERY {thread_id}")
+            finally:
+                killer.close()
+
+        return cancel
+
+    def ping(self, conn: Any) -> None:
+        conn.ping(reconnect=False)
+
+    def reset_connection(self, conn: Any) -> None:
+        conn.rollback()
 
     def get_db_info(self, conn: Any) -> tuple[str, int]:
         with conn.cursor() as cursor:
@@ -44,10 +181,33 @@ class MySQLAdapter:
             tables_count = len(cursor.fetchall())
         return version, tables_count
 
-    def execute_sql(self, conn: Any, sql: str) -> list[dict[str, Any]]:
-        with conn.cursor() as cursor:
+    @contextmanager
+    def open_cursor(self, conn: Any, sql: str, *, batch_size: int) -> Iterator[Any]:
+        import pymysql.cursors
+
+        # 非缓冲元组游标：结果逐批从服务端读取，不会整体载入内存
+        with conn.cursor(pymysql.cursors.SSCursor) as cursor:
             cursor.execute(sql)
-            return list(cursor.fetchall())
+            yield cursor
+
+    def describe(self, cursor: Any) -> list[tuple[str, str | None]]:
+        from pymysql.constants import FIELD_TYPE
+
+        type_names = {
+            value: name.lower() for name, value in vars(FIELD_TYPE).items() if name.isupper()
+        }
+        return [(column[0], type_names.get(column[1])) for column in cursor.description or ()]
+
+    def collect(
+        self, cursor: Any, *, max_rows: int, max_bytes: int, batch_size: int
+    ) -> QueryResult:
+        return collect_rows(
+            cursor,
+            self.describe(cursor),
+            max_rows=max_rows,
+            max_bytes=max_bytes,
+            batch_size=batch_size,
+        )
 
     def get_tables(self, conn: Any) -> list[str]:
         with conn.cursor() as cursor:
@@ -65,19 +225,144 @@ class MySQLAdapter:
                 {"name": row["COLUMN_NAME"], "type": row["DATA_TYPE"]} for row in cursor.fetchall()
             ]
 
+    def fetch_schema(self, conn: Any) -> list[TableSnapshot]:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY, "
+                "COLUMN_DEFAULT, COLUMN_COMMENT "
+                "FROM information_schema.columns "
+                "WHERE table_schema = DATABASE() "
+                "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+            )
+            column_rows = cursor.fetchall()
+            tables = group_schema_rows(
+                (
+                    row["TABLE_NAME"],
+                    row["COLUMN_NAME"],
+                    row["COLUMN_TYPE"],
+                    row["IS_NULLABLE"] == "YES",
+                    row["COLUMN_KEY"] == "PRI",
+                    row["COLUMN_DEFAULT"],
+                )
+                for row in column_rows
+            )
+            comments = [
+                (row["TABLE_NAME"], row["COLUMN_NAME"], row["COLUMN_COMMENT"])
+                for row in column_rows
+            ]
+            cursor.execute(
+                "SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, "
+                "REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+                "FROM information_schema.key_column_usage "
+                "WHERE table_schema = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL "
+                "ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION"
+            )
+            foreign_keys = [
+                (
+                    row["TABLE_NAME"],
+                    row["CONSTRAINT_NAME"],
+                    row["COLUMN_NAME"],
+                    row["REFERENCED_TABLE_NAME"],
+                    row["REFERENCED_COLUMN_NAME"],
+                )
+                for row in cursor.fetchall()
+            ]
+            cursor.execute(
+                "SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE = 0 AS IS_UNIQUE, COLUMN_NAME "
+                "FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND INDEX_NAME <> 'PRIMARY' "
+                "ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"
+            )
+            indexes = [
+                (row["TABLE_NAME"], row["INDEX_NAME"], bool(row["IS_UNIQUE"]), row["COLUMN_NAME"])
+                for row in cursor.fetchall()
+            ]
+            # TABLE_ROWS 是存储引擎的估算值，读取它不会扫描表
+            cursor.execute(
+                "SELECT TABLE_NAME, TABLE_ROWS, TABLE_COMMENT FROM information_schema.tables "
+                "WHERE table_schema = DATABASE()"
+            )
+            table_rows = cursor.fetchall()
+            row_estimates = {row["TABLE_NAME"]: row["TABLE_ROWS"] for row in table_rows}
+            comments.extend((row["TABLE_NAME"], None, row["TABLE_COMMENT"]) for row in table_rows)
+        return attach_table_details(
+            tables,
+            foreign_keys=foreign_keys,
+            indexes=indexes,
+            row_estimates=row_estimates,
+            comments=comments,
+        )
+
+    def schema_fingerprint(self, conn: Any) -> str:
+        # CREATE_TIME 随 DDL 重建表而变化；UPDATE_TIME 只反映数据写入，不参与判断
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) AS tables_count, "
+                "COALESCE(MAX(CREATE_TIME), '') AS last_created, "
+                "(SELECT COUNT(*) FROM information_schema.columns "
+                "WHERE table_schema = DATABASE()) AS columns_count "
+                "FROM information_schema.tables WHERE table_schema = DATABASE()"
+            )
+            row = cursor.fetchone()
+        return f"{row['tables_count']}:{row['columns_count']}:{row['last_created']}"
+
 
 class PostgreSQLAdapter:
+    def __init__(self, statement_timeout: float = 0):
+        self.statement_timeout = statement_timeout
+
     def create_connection(self, config: DatabaseConfig) -> Any:
         import psycopg2
 
+        # 作为连接参数设置，连接池回滚事务时不会被撤销
+        options = []
+        if self.statement_timeout > 0:
+            options.append(f"-c statement_timeout={int(self.statement_timeout * 1000)}")
+        if config.read_only:
+            options.append("-c default_transaction_read_only=on")
         return psycopg2.connect(
             host=config.host,
             port=config.get_port(),
             user=config.user,
             password=config.password,
             database=config.database,
+            options=" ".join(options) or None,
         )
 
+    def replication_lag(self, conn: Any) -> float | None:
+        # 主库返回 0；备库已回放全部收到的 WAL 时也视为没有延迟（主库空闲时回放时间戳不会更新）
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+                END
+                """
+            )
+            lag = cursor.fetchone()[0]
+        return None if lag is None else float(lag)
+
+    def explain(self, conn: Any, sql: str) -> QueryPlanEstimate:
+        with conn.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {_strip_statement(sql)}")
+            document = cursor.fetchone()[0]
+        return parse_postgres_plan(json.loads(document) if isinstance(document, str) else document)
+
+    def cancel_handle(self, conn: Any, config: DatabaseConfig) -> Callable[[], None]:
+        # libpq 取消请求，效果与对该连接的后端执行 pg_cancel_backend 相同
+        return conn.cancel
+
+    def ping(self, conn: Any) -> None:
+        if conn.closed:
+            raise ConnectionError("connection already closed")
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    def reset_connection(self, conn: Any) -> None:
+        conn.rollback()
+
     def get_db_info(self, conn: Any) -> tuple[str, int]:
         with conn.cursor() as cursor:
             cursor.execute("SELECT version()")
@@ -88,12 +373,35 @@ class PostgreSQLAdapter:
             tables_count = cursor.fetchone()[0]
         return version, tables_count
 
-    def execute_sql(self, conn: Any, sql: str) -> list[dict[str, Any]]:
-        import psycopg2.extras
-
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+    @contextmanager
+    def open_cursor(self, conn: Any, sql: str, *, batch_size: int) -> Iterator[Any]:
+        # 命名游标在服务端保存结果集，只能用于 SELECT / WITH
+        name = f"querygpt_{next(_cursor_ids)}" if is_select_statement(sql) else None
+        with conn.cursor(name=name) as cursor:
+            if name:
+                cursor.itersize = batch_size
             cursor.execute(sql)
-            return [dict(row) for row in cursor.fetchall()]
+            yield cursor
+
+    def describe(self, cursor: Any) -> list[tuple[str, str | None]]:
+        import psycopg2.extensions
+
+        columns = []
+        for column in cursor.description or ():
+            type_caster = psycopg2.extensions.string_types.get(column.type_code)
+            columns.append((column.name, type_caster.name.lower() if type_caster else None))
+        return columns
+
+    def collect(
+        self, cursor: Any, *, max_rows: int, max_bytes: int, batch_size: int
+    ) -> QueryResult:
+        return collect_rows(
+            cursor,
+            self.describe(cursor),
+            max_rows=max_rows,
+            max_bytes=max_bytes,
+            batch_size=batch_size,
+        )
 
     def get_tables(self, conn: Any) -> list[str]:
         with conn.cursor() as cursor:
@@ -117,6 +425,207 @@ class PostgreSQLAdapter:
             )
             return [{"name": row[0], "type": row[1]} for row in cursor.fetchall()]
 
+    def fetch_schema(self, conn: Any) -> list[TableSnapshot]:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod),
+                       NOT a.attnotnull, COALESCE(a.attnum = ANY(pk.conkey), false),
+                       pg_get_expr(d.adbin, d.adrelid)
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                LEFT JOIN pg_constraint pk ON pk.conrelid = c.oid AND pk.contype = 'p'
+                LEFT JOIN pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+                WHERE n.nspname = 'public' AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+                ORDER BY c.relname, a.attnum
+                """
+            )
+            tables = group_schema_rows(cursor.fetchall())
+            cursor.execute(
+                """
+                SELECT c.relname, con.conname, a.attname, rc.relname, ra.attname
+                FROM pg_constraint con
+                JOIN pg_class c ON c.oid = con.conrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                JOIN pg_class rc ON rc.oid = con.confrelid
+                CROSS JOIN LATERAL unnest(con.conkey, con.confkey)
+                    WITH ORDINALITY AS k(attnum, ref_attnum, ord)
+                JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                JOIN pg_attribute ra ON ra.attrelid = con.confrelid AND ra.attnum = k.ref_attnum
+                WHERE con.contype = 'f' AND n.nspname = 'public'
+                ORDER BY c.relname, con.conname, k.ord
+                """
+            )
+            foreign_keys = cursor.fetchall()
+            cursor.execute(
+                """
+                SELECT t.relname, i.relname, ix.indisunique, a.attname
+                FROM pg_index ix
+                JOIN pg_class t ON t.oid = ix.indrelid
+                JOIN pg_class i ON i.oid = ix.indexrelid
+                JOIN pg_namespace n ON n.oid = t.relnamespace
+                CROSS JOIN LATERAL unnest(ix.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+                LEFT JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+                WHERE n.nspname = 'public' AND NOT ix.indisprimary
+                ORDER BY t.relname, i.relname, k.ord
+                """
+            )
+            indexes = cursor.fetchall()
+            # reltuples 是 ANALYZE/VACUUM 维护的估算值，从未分析过的表为 -1
+            cursor.execute(
+                """
+                SELECT c.relname, c.reltuples::bigint
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public' AND c.relkind IN ('r', 'm', 'p')
+                """
+            )
+            row_estimates = dict(cursor.fetchall())
+            # COMMENT ON TABLE / COLUMN；objsubid 为 0 的是表注释
+            cursor.execute(
+                """
+                SELECT c.relname, a.attname, d.description
+                FROM pg_description d
+                JOIN pg_class c ON c.oid = d.objoid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                LEFT JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = d.objsubid
+                WHERE d.classoid = 'pg_class'::regclass AND n.nspname = 'public'
+                  AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+                """
+            )
+            comments = cursor.fetchall()
+        return attach_table_details(
+            tables,
+            foreign_keys=foreign_keys,
+            indexes=indexes,
+            row_estimates=row_estimates,
+            comments=comments,
+        )
+
+    def schema_fingerprint(self, conn: Any) -> str:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT md5(COALESCE(string_agg(
+                    c.relname || '.' || a.attname || ':' || a.atttypid || ':' || a.attnotnull,
+                    ',' ORDER BY c.relname, a.attnum
+                ), ''))
+                FROM pg_attribute a
+                JOIN pg_class c ON c.oid = a.attrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public'
+                  AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+                  AND a.attnum > 0
+                  AND NOT a.attisdropped
+                """
+            )
+            return str(cursor.fetchone()[0])
+
+
+_cursor_ids = count(1)
+
+_STATEMENT_START_RE = re.compile(r"^[\s(]*([A-Za-z]+)")
+_QUOTED_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`")
+_TRAILING_LIMIT_RE = re.compile(
+    r"\bLIMIT\s+(?:(\d+)\s*,\s*)?(\d+)(\s+OFFSET\s+(\d+))?\s*$", re.IGNORECASE
+)
+_AGGREGATE_RE = re.compile(
+    r"\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(|\bGROUP\s+BY\b", re.IGNORECASE
+)
+_PAGING_RE = re.compile(r"\b(?:LIMIT|OFFSET|FETCH\s+(?:FIRST|NEXT))\b", re.IGNORECASE)
+
+
+def _strip_statement(sql: str) -> str:
+    return sql.strip().rstrip(";").strip()
+
+
+def collect_rows(
+    cursor: Any,
+    columns: Sequence[tuple[str, str | None]],
+    *,
+    max_rows: int,
+    max_bytes: int,
+    batch_size: int,
+) -> QueryResult:
+    """按预算分批读取 DB-API 游标（``fetchmany``）"""
+
+    def batches() -> Iterator[Sequence[Sequence[Any]]]:
+        # 不返回结果集的语句（如部分 SHOW / EXPLAIN 驱动实现）没有 description
+        if cursor.description is None:
+            return
+        while batch := cursor.fetchmany(batch_size):
+            yield batch
+
+    return collect_result(columns, batches(), max_rows=max_rows, max_bytes=max_bytes)
+
+
+def is_select_statement(sql: str) -> bool:
+    """Whether the statement is a query (SELECT or WITH ...)."""
+    match = _STATEMENT_START_RE.match(sql)
+    return bool(match) and match.group(1).upper() in {"SELECT", "WITH"}
+
+
+def _mask_nested(sql: str) -> str:
+    """Blank out string literals, quoted identifiers and parenthesized text, keeping offsets."""
+    masked = _QUOTED_RE.sub(lambda match: " " * len(match.group(0)), sql)
+    chars = list(masked)
+    depth = 0
+    for index, char in enumerate(chars):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+            chars[index] = " "
+            continue
+        if depth:
+            chars[index] = " "
+    return "".join(chars)
+
+
+def apply_row_limit(sql: str, limit: int) -> str:
+    """Cap a query at ``limit`` rows with a top-level LIMIT clause.
+
+    MySQL, PostgreSQL and SQLite share the ``LIMIT n [OFFSET m]`` syntax (MySQL also
+    accepts ``LIMIT m, n``). A query without paging gets ``LIMIT limit`` appended, a
+    larger trailing LIMIT is lowered to ``limit``, and anything else (non-SELECT
+    statements, OFFSET/FETCH without a trailing LIMIT) is returned unchanged.
+    """
+    statement = sql.strip().rstrip(";").rstrip()
+    if limit <= 0 or not is_select_statement(statement):
+        return sql
+
+    masked = _mask_nested(statement)
+    match = _TRAILING_LIMIT_RE.search(masked)
+    if match is None:
+        if _PAGING_RE.search(masked):
+            return sql
+        return f"{statement}\nLIMIT {limit}"
+
+    if int(match.group(2)) <= limit:
+        return sql
+    start, end = match.span(2)
+    return f"{statement[:start]}{limit}{statement[end:]}"
+
+
+def statement_limit(sql: str) -> int | None:
+    """Rows a SELECT reads at most because of its top-level LIMIT (offset included)."""
+    statement = sql.strip().rstrip(";").rstrip()
+    if not is_select_statement(statement):
+        return None
+    match = _TRAILING_LIMIT_RE.search(_mask_nested(statement))
+    if match is None:
+        return None
+    offset = match.group(1) or match.group(4) or 0
+    return int(match.group(2)) + int(offset)
+
+
+def _streaming_limit(sql: str) -> int | None:
+    """LIMIT that stops a plan without aggregate steps early (their EXPLAIN doesn't show them)."""
+    if _AGGREGATE_RE.search(sql):
+        return None
+    return statement_limit(sql)
+
 
 def is_valid_sqlite_identifier(identifier: str) -> bool:
     """Validate a SQLite identifier used in non-parameterized PRAGMA calls."""
@@ -263,13 +772,48 @@ def is_valid_sqlite_identifier(identifier: str) -> bool:
 
 
 class SQLiteAdapter:
+    def __init__(self, statement_timeout: float = 0, *, mmap_size: int = 0, cache_size: int = 0):
+        self.statement_timeout = statement_timeout
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+
     def create_connection(self, config: DatabaseConfig) -> Any:
         import sqlite3
 
-        conn = sqlite3.connect(config.database)
+        # 连接由连接池保证同一时刻只被一个线程使用
+        if config.read_only and config.database != ":memory:":
+            conn = sqlite3.connect(self._read_only_uri(config), uri=True, check_same_thread=False)
+            self._apply_read_only_profile(conn)
+        else:
+            conn = sqlite3.connect(config.database, check_same_thread=False)
         conn.row_factory = sqlite3.Row
         return conn
 
+    @staticmethod
+    def _read_only_uri(config: DatabaseConfig) -> str:
+        path = Path(config.database).expanduser().resolve()
+        if not path.is_file():
+            # mode=ro 不会创建文件，这里给出比 "unable to open database file" 更明确的错误
+            raise FileNotFoundError(f"数据库文件不存在: {path}")
+        # immutable=1 跳过文件锁与变更检测，只适用于连接期间不会被写入的文件
+        return f"{path.as_uri()}?mode=ro" + ("&immutable=1" if config.immutable else "")
+
+    def _apply_read_only_profile(self, conn: Any) -> None:
+        # 只读连接随连接池长期保留：内存映射读取页面，页缓存与临时表留在内存中
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if self.mmap_size > 0:
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        if self.cache_size > 0:
+            # 负数表示以 KiB 为单位的缓存上限
+            conn.execute(f"PRAGMA cache_size = -{max(int(self.cache_size) // 1024, 1)}")
+
+    def ping(self, conn: Any) -> None:
+        conn.execute("SELECT 1").fetchone()
+
+    def reset_connection(self, conn: Any) -> None:
+        conn.rollback()
+
     def get_db_info(self, conn: Any) -> tuple[str, int]:
         cursor = conn.cursor()
         cursor.execute("SELECT sqlite_version()")
@@ -278,10 +822,69 @@ class SQLiteAdapter:
         tables_count = cursor.fetchone()[0]
         return version, tables_count
 
-    def execute_sql(self, conn: Any, sql: str) -> list[dict[str, Any]]:
+    @contextmanager
+    def open_cursor(self, conn: Any, sql: str, *, batch_size: int) -> Iterator[Any]:
+        import sqlite3
+
+        deadline = time.monotonic() + self.statement_timeout
+        if self.statement_timeout > 0:
+            # 每执行一批虚拟机指令检查一次，超时返回非零值中断语句
+            conn.set_progress_handler(lambda: time.monotonic() > deadline, 10_000)
         cursor = conn.cursor()
-        cursor.execute(sql)
-        return [dict(row) for row in cursor.fetchall()]
+        try:
+            cursor.execute(sql)
+            yield cursor
+        except sqlite3.OperationalError as exc:
+            if self.statement_timeout > 0 and time.monotonic() > deadline:
+                raise sqlite3.OperationalError(
+                    f"SQL 执行超时（超过 {self.statement_timeout:g} 秒）"
+                ) from exc
+            raise
+        finally:
+            cursor.close()
+            if self.statement_timeout > 0:
+                conn.set_progress_handler(None, 0)
+
+    def cancel_handle(self, conn: Any, config: DatabaseConfig) -> Callable[[], None]:
+        return conn.interrupt
+
+    def replication_lag(self, conn: Any) -> float | None:
+        return None
+
+    def explain(self, conn: Any, sql: str) -> QueryPlanEstimate:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {_strip_statement(sql)}").fetchall()
+        estimates = self._row_estimates(conn)
+
+        def row_count(table: str) -> int | None:
+            if table in estimates:
+                return estimates[table]
+            if not is_valid_sqlite_identifier(table):
+                return None
+            # 没有 ANALYZE 统计时用 MAX(rowid) 近似行数（走主键，代价很低）
+            try:
+                row = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()
+            except Exception:
+                return None
+            return int(row[0] or 0)
+
+        return parse_sqlite_plan(
+            [tuple(row) for row in plan], sql, row_count, _streaming_limit(sql)
+        )
+
+    def describe(self, cursor: Any) -> list[tuple[str, str | None]]:
+        # SQLite 列没有固定类型，由结果中的值推断
+        return [(column[0], None) for column in cursor.description or ()]
+
+    def collect(
+        self, cursor: Any, *, max_rows: int, max_bytes: int, batch_size: int
+    ) -> QueryResult:
+        return collect_rows(
+            cursor,
+            self.describe(cursor),
+            max_rows=max_rows,
+            max_bytes=max_bytes,
+            batch_size=batch_size,
+        )
 
     def get_tables(self, conn: Any) -> list[str]:
         cursor = conn.cursor()
@@ -298,12 +901,357 @@ class SQLiteAdapter:
         cursor.execute(f"PRAGMA table_info({table_name})")
         return [{"name": row[1], "type": row[2]} for row in cursor.fetchall()]
 
+    def fetch_schema(self, conn: Any) -> list[TableSnapshot]:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT m.name, p.name, p.type, NOT p."notnull", p.pk > 0, p.dflt_value
+            FROM sqlite_master AS m
+            JOIN pragma_table_info(m.name) AS p
+            WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+            ORDER BY m.name, p.cid
+            """
+        )
+        tables = group_schema_rows(tuple(row) for row in cursor.fetchall())
+        cursor.execute(
+            """
+            SELECT m.name, f.id, f."from", f."table", f."to"
+            FROM sqlite_master AS m
+            JOIN pragma_foreign_key_list(m.name) AS f
+            WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+            ORDER BY m.name, f.id, f.seq
+            """
+        )
+        foreign_keys = [tuple(row) for row in cursor.fetchall()]
+        cursor.execute(
+            """
+            SELECT m.name, il.name, il."unique", ii.name
+            FROM sqlite_master AS m
+            JOIN pragma_index_list(m.name) AS il
+            JOIN pragma_index_info(il.name) AS ii
+            WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%' AND il.origin != 'pk'
+            ORDER BY m.name, il.name, ii.seqno
+            """
+        )
+        indexes = [tuple(row) for row in cursor.fetchall()]
+        return attach_table_details(
+            tables,
+            foreign_keys=foreign_keys,
+            indexes=indexes,
+            row_estimates=self._row_estimates(conn),
+        )
+
+    def _row_estimates(self, conn: Any) -> dict[str, int | None]:
+        # SQLite 只有执行过 ANALYZE 才有行数统计；统计串的第一个数字是表行数
+        has_stats = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        ).fetchone()
+        if not has_stats:
+            return {}
+        rows = conn.execute(
+            "SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl"
+        ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def schema_fingerprint(self, conn: Any) -> str:
+        return str(conn.execute("PRAGMA schema_version").fetchone()[0])
+
+
+_DUCKDB_FILE_READERS = {
+    ".parquet": "read_parquet",
+    ".csv": "read_csv_auto",
+    ".tsv": "read_csv_auto",
+    ".json": "read_json_auto",
+    ".jsonl": "read_json_auto",
+    ".ndjson": "read_json_auto",
+}
+_DUCKDB_COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+
+def _duckdb_reader(path: Path) -> tuple[str, str] | None:
+    """返回 (读取函数, 扩展名)，无法识别的文件返回 None"""
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    extension = ""
+    if suffixes and suffixes[-1] in _DUCKDB_COMPRESSED_SUFFIXES:
+        extension = suffixes.pop()
+    if not suffixes or suffixes[-1] not in _DUCKDB_FILE_READERS:
+        return None
+    return _DUCKDB_FILE_READERS[suffixes[-1]], suffixes[-1] + extension
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _view_name(path: Path) -> str:
+    stem = path.name.split(".", 1)[0] if path.is_file() else path.name
+    return re.sub(r"\W+", "_", stem).strip("_") or "data"
+
+
+def duckdb_file_views(source: Path) -> dict[str, str]:
+    """把文件或目录中的 Parquet/CSV/JSON 映射为视图定义 {视图名: FROM 子句}
+
+    目录下的每个文件对应一个视图；子目录作为一个数据集（如 Hive 分区的 Parquet），
+    按其中第一种可识别的文件格式整体读取。
+    """
+    candidates = [source] if source.is_file() else sorted(source.iterdir())
+    views: dict[str, str] = {}
+    for path in candidates:
+        if path.name.startswith("."):
+            continue
+        if path.is_dir():
+            files = (item for item in sorted(path.rglob("*")) if item.is_file())
+            detected = next((found for item in files if (found := _duckdb_reader(item))), None)
+            if detected is None:
+                continue
+            reader, extension = detected
+            pattern = _sql_literal(str(path / "**" / f"*{extension}"))
+            options = ", hive_partitioning = true" if reader == "read_parquet" else ""
+            clause = f"{reader}({pattern}{options})"
+        else:
+            detected = _duckdb_reader(path)
+            if detected is None:
+                continue
+            clause = f"{detected[0]}({_sql_literal(str(path))})"
+        name = _view_name(path)
+        if name in views:
+            logger.warning("Skipping DuckDB source with duplicate view name", path=str(path))
+            continue
+        views[name] = clause
+    return views
+
+
+class DuckDBAdapter:
+    """嵌入式 DuckDB：``database`` 可以是 DuckDB 数据库文件，也可以是 Parquet/CSV 文件或目录
+
+    数据库文件以只读方式打开；文件或目录在内存库中注册为视图，查询直接读取原文件。
+    连接只允许访问数据源所在目录，结果以 Arrow 批次读取（未安装 pyarrow 时按行读取）。
+    """
+
+    def __init__(self, statement_timeout: float = 0, *, threads: int = 0, memory_limit: str = ""):
+        self.statement_timeout = statement_timeout
+        self.threads = threads
+        self.memory_limit = memory_limit
+
+    def create_connection(self, config: DatabaseConfig) -> Any:
+        try:
+            import duckdb
+        except ImportError as exc:
+            raise RuntimeError(
+                "DuckDB 连接需要安装 duckdb：pip install 'querygpt-api[duckdb]'"
+            ) from exc
+
+        source = Path(config.database).expanduser().resolve()
+        if not source.exists():
+            raise FileNotFoundError(f"数据源不存在: {source}")
+        if source.is_file() and _duckdb_reader(source) is None:
+            # 同一文件的连接共享进程内的数据库实例，配置只能在实例启动时给出（之后已锁定）；
+            # 查询不需要读取其他文件，直接禁止外部访问
+            return duckdb.connect(
+                str(source),
+                read_only=True,
+                config={
+                    **self._instance_config(),
+                    "enable_external_access": False,
+                    "lock_configuration": True,
+                },
+            )
+
+        # 文件或目录注册为独立内存库中的视图
+        conn = duckdb.connect(":memory:")
+        allowed = source if source.is_dir() else source.parent
+        try:
+            for name, value in self._instance_config().items():
+                conn.execute(f"SET {name} = {_sql_literal(str(value))}")
+            # 查询只能读取数据源所在目录，之后锁定配置
+            conn.execute(f"SET allowed_directories = [{_sql_literal(str(allowed) + '/')}]")
+            conn.execute("SET enable_external_access = false")
+            for name, clause in duckdb_file_views(source).items():
+                conn.execute(f'CREATE VIEW "{name}" AS SELECT * FROM {clause}')
+            conn.execute("SET lock_configuration = true")
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _instance_config(self) -> dict[str, Any]:
+        config: dict[str, Any] = {}
+        if self.threads > 0:
+            config["threads"] = int(self.threads)
+        if self.memory_limit:
+            config["memory_limit"] = self.memory_limit
+        return config
+
+    def ping(self, conn: Any) -> None:
+        conn.execute("SELECT 1").fetchone()
 
-def build_database_adapter(driver: str) -> DatabaseAdapter:
+    def reset_connection(self, conn: Any) -> None:
+        # 自动提交模式，没有需要回滚的事务
+        pass
+
+    def get_db_info(self, conn: Any) -> tuple[str, int]:
+        version = f"DuckDB {conn.execute('SELECT version()').fetchone()[0]}"
+        return version, len(self.get_tables(conn))
+
+    @contextmanager
+    def open_cursor(self, conn: Any, sql: str, *, batch_size: int) -> Iterator[Any]:
+        import duckdb
+
+        # DuckDB 没有语句超时设置，到期后中断连接上正在执行的查询
+        expired = threading.Event()
+
+        def expire() -> None:
+            expired.set()
+            conn.interrupt()
+
+        timer = None
+        if self.statement_timeout > 0:
+            timer = threading.Timer(self.statement_timeout, expire)
+            timer.daemon = True
+            timer.start()
+        try:
+            yield conn.execute(sql)
+        except duckdb.InterruptException as exc:
+            if expired.is_set():
+                raise duckdb.InterruptException(
+                    f"SQL 执行超时（超过 {self.statement_timeout:g} 秒）"
+                ) from exc
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def describe(self, cursor: Any) -> list[tuple[str, str | None]]:
+        return [(column[0], str(column[1]).lower()) for column in cursor.description or ()]
+
+    def collect(
+        self, cursor: Any, *, max_rows: int, max_bytes: int, batch_size: int
+    ) -> QueryResult:
+        if cursor.description is None:
+            return QueryResult()
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return collect_rows(
+                cursor,
+                self.describe(cursor),
+                max_rows=max_rows,
+                max_bytes=max_bytes,
+                batch_size=batch_size,
+            )
+        # 新版本把 fetch_record_batch 改名为 to_arrow_reader
+        open_reader = getattr(cursor, "to_arrow_reader", None) or cursor.fetch_record_batch
+        reader = open_reader(batch_size)
+        return collect_arrow_result(reader, reader.schema, max_rows=max_rows, max_bytes=max_bytes)
+
+    def cancel_handle(self, conn: Any, config: DatabaseConfig) -> Callable[[], None]:
+        return conn.interrupt
+
+    def replication_lag(self, conn: Any) -> float | None:
+        return None
+
+    def explain(self, conn: Any, sql: str) -> QueryPlanEstimate:
+        rows = conn.execute(f"EXPLAIN (FORMAT JSON) {_strip_statement(sql)}").fetchall()
+        return parse_duckdb_plan(json.loads(rows[0][1]), statement_limit(sql))
+
+    def get_tables(self, conn: Any) -> list[str]:
+        rows = conn.execute(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_catalog = current_database() AND table_schema = current_schema() "
+            "ORDER BY table_name"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_table_columns(self, conn: Any, table_name: str) -> list[dict[str, str]]:
+        rows = conn.execute(
+            "SELECT column_name, data_type FROM duckdb_columns() "
+            "WHERE database_name = current_database() AND schema_name = current_schema() "
+            "AND table_name = ? ORDER BY column_index",
+            [table_name],
+        ).fetchall()
+        return [{"name": row[0], "type": row[1]} for row in rows]
+
+    def fetch_schema(self, conn: Any) -> list[TableSnapshot]:
+        scope = "database_name = current_database() AND schema_name = current_schema()"
+        primary_keys = {
+            (table_name, column)
+            for table_name, columns in conn.execute(
+                "SELECT table_name, constraint_column_names FROM duckdb_constraints() "
+                f"WHERE {scope} AND constraint_type = 'PRIMARY KEY'"
+            ).fetchall()
+            for column in columns
+        }
+        columns = conn.execute(
+            "SELECT table_name, column_name, data_type, is_nullable, column_default "
+            f"FROM duckdb_columns() WHERE {scope} ORDER BY table_name, column_index"
+        ).fetchall()
+        tables = group_schema_rows(
+            (table, column, data_type, nullable, (table, column) in primary_keys, default)
+            for table, column, data_type, nullable, default in columns
+        )
+        foreign_keys = [
+            (table_name, name, column, referenced_table, referenced_column)
+            for table_name, name, columns, referenced_table, referenced_columns in conn.execute(
+                "SELECT table_name, constraint_name, constraint_column_names, "
+                "referenced_table, referenced_column_names FROM duckdb_constraints() "
+                f"WHERE {scope} AND constraint_type = 'FOREIGN KEY' "
+                "ORDER BY table_name, constraint_index"
+            ).fetchall()
+            for column, referenced_column in zip(columns, referenced_columns, strict=False)
+        ]
+        # expressions 形如 "[col_a, col_b]"，表达式索引按原样保留
+        indexes = [
+            (table_name, index_name, is_unique, column.strip())
+            for table_name, index_name, is_unique, expressions in conn.execute(
+                "SELECT table_name, index_name, is_unique, expressions FROM duckdb_indexes() "
+                f"WHERE {scope} ORDER BY table_name, index_name"
+            ).fetchall()
+            for column in str(expressions or "").strip("[]").split(",")
+        ]
+        row_estimates = dict(
+            conn.execute(
+                f"SELECT table_name, estimated_size FROM duckdb_tables() WHERE {scope}"
+            ).fetchall()
+        )
+        comments = conn.execute(
+            f"SELECT table_name, NULL, comment FROM duckdb_tables() WHERE {scope} "
+            f"UNION ALL SELECT view_name, NULL, comment FROM duckdb_views() WHERE {scope} "
+            f"UNION ALL SELECT table_name, column_name, comment FROM duckdb_columns() WHERE {scope}"
+        ).fetchall()
+        return attach_table_details(
+            tables,
+            foreign_keys=foreign_keys,
+            indexes=indexes,
+            row_estimates=row_estimates,
+            comments=comments,
+        )
+
+    def schema_fingerprint(self, conn: Any) -> str:
+        row = conn.execute(
+            "SELECT md5(COALESCE(string_agg("
+            "table_name || '.' || column_name || ':' || data_type || ':' || is_nullable, "
+            "',' ORDER BY table_name, column_index), '')) "
+            "FROM duckdb_columns() "
+            "WHERE database_name = current_database() AND schema_name = current_schema()"
+        ).fetchone()
+        return str(row[0])
+
+
+def build_database_adapter(driver: str, *, statement_timeout: float = 0) -> DatabaseAdapter:
     if driver == "mysql":
-        return MySQLAdapter()
+        return MySQLAdapter(statement_timeout)
     if driver == "postgresql":
-        return PostgreSQLAdapter()
+        return PostgreSQLAdapter(statement_timeout)
     if driver == "sqlite":
-        return SQLiteAdapter()
+        return SQLiteAdapter(
+            statement_timeout,
+            mmap_size=settings.SQLITE_MMAP_SIZE,
+            cache_size=settings.SQLITE_CACHE_SIZE,
+        )
+    if driver == "duckdb":
+        return DuckDBAdapter(
+            statement_timeout,
+            threads=settings.DUCKDB_THREADS,
+            memory_limit=settings.DUCKDB_MEMORY_LIMIT,
+        )
     raise ValueError(f"不支持的数据库类型: {driver}")
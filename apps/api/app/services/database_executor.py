@@ -0,0 +1,87 @@
+"""Bounded thread executor for blocking target-database calls."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+import weakref
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class DatabaseExecutor:
+    """在独立线程池中执行同步数据库驱动调用，避免阻塞事件循环
+
+    每个连接配置（按指纹区分）同时运行的调用数受 ``per_connection_limit`` 限制，
+    排队发生在事件循环里，不会占用线程池的工作线程。
+    """
+
+    def __init__(self, *, max_workers: int, per_connection_limit: int):
+        self._max_workers = max(1, max_workers)
+        self._per_connection_limit = max(1, per_connection_limit)
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        self._limits: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]
+        ] = weakref.WeakKeyDictionary()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="querygpt-db",
+                )
+            return self._executor
+
+    def _semaphore(self, loop: asyncio.AbstractEventLoop, key: str) -> asyncio.Semaphore:
+        limits = self._limits.setdefault(loop, {})
+        semaphore = limits.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._per_connection_limit)
+            limits[key] = semaphore
+        return semaphore
+
+    async def run(self, key: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """在工作线程中执行 ``func``
+
+        调用方被取消时线程中的调用不会停止，并发名额一直占用到线程返回，
+        被放弃的语句仍计入该连接的并发上限。
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        semaphore = self._semaphore(loop, key)
+        await semaphore.acquire()
+        try:
+            future = loop.run_in_executor(self._get_executor(), call)
+        except BaseException:
+            semaphore.release()
+            raise
+        future.add_done_callback(functools.partial(_release_slot, semaphore))
+        return await asyncio.shield(future)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _release_slot(semaphore: asyncio.Semaphore, future: asyncio.Future[Any]) -> None:
+    semaphore.release()
+    # 调用方已经取消时没有人读取结果，避免 "exception was never retrieved" 警告
+    if not future.cancelled():
+        future.exception()
+
+
+database_executor = DatabaseExecutor(
+    max_workers=settings.DB_EXECUTOR_MAX_WORKERS,
+    per_connection_limit=settings.DB_MAX_CONCURRENT_QUERIES_PER_CONNECTION,
+)
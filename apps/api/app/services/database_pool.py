@@ -0,0 +1,274 @@
+"""Process-wide connection pools for target databases."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+class PoolExhaustedError(TimeoutError):
+    """连接池在等待时间内没有可用连接"""
+
+
+@dataclass
+class PoolStats:
+    """单个连接池的运行统计"""
+
+    key: str
+    driver: str
+    database: str
+    min_size: int
+    max_size: int
+    idle: int
+    in_use: int
+    created: int = 0
+    reused: int = 0
+    closed: int = 0
+    evicted: int = 0
+    failed_pings: int = 0
+    waits: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class _IdleConnection:
+    conn: Any
+    released_at: float
+
+
+class ConnectionPool:
+    """线程安全的阻塞式连接池
+
+    - 空闲连接按 LIFO 复用，超过 ``idle_timeout`` 的连接会被回收，但始终保留 ``min_size`` 个
+    - 每次借出前调用 ``ping`` 做存活检测，失败的连接直接丢弃并重新创建
+    - 同时借出的连接数不超过 ``max_size``，超出时等待 ``acquire_timeout`` 秒
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        *,
+        ping: Callable[[Any], None],
+        reset: Callable[[Any], None] | None = None,
+        key: str = "",
+        driver: str = "",
+        database: str = "",
+        min_size: int = 1,
+        max_size: int = 5,
+        idle_timeout: float = 300,
+        acquire_timeout: float = 30,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size 必须大于 0")
+        self._factory = factory
+        self._ping = ping
+        self._reset = reset
+        self._min_size = max(0, min(min_size, max_size))
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._acquire_timeout = acquire_timeout
+        self._idle: deque[_IdleConnection] = deque()
+        self._in_use = 0
+        self._closed = False
+        self._lock = threading.Condition()
+        self._stats = PoolStats(
+            key=key,
+            driver=driver,
+            database=database,
+            min_size=self._min_size,
+            max_size=max_size,
+            idle=0,
+            in_use=0,
+        )
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def acquire(self) -> Any:
+        deadline = time.monotonic() + self._acquire_timeout
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError("连接池已关闭")
+                expired = self._evict_expired_locked()
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self._max_size:
+                    entry = None
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhaustedError(
+                        f"数据库连接池已耗尽 (max_size={self._max_size})，请稍后重试"
+                    )
+                self._stats.waits += 1
+                self._lock.wait(remaining)
+
+        self._close_quietly(expired)
+
+        try:
+            if entry is not None:
+                try:
+                    self._ping(entry.conn)
+                except Exception as exc:
+                    logger.info("Discarding dead pooled connection", error=str(exc))
+                    with self._lock:
+                        self._stats.failed_pings += 1
+                    self._close_quietly([entry.conn])
+                else:
+                    with self._lock:
+                        self._stats.reused += 1
+                    return entry.conn
+
+            conn = self._factory()
+            with self._lock:
+                self._stats.created += 1
+            return conn
+        except BaseException:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+    def release(self, conn: Any, *, discard: bool = False) -> None:
+        if not discard and self._reset is not None:
+            try:
+                self._reset(conn)
+            except Exception as exc:
+                logger.info("Discarding pooled connection after failed reset", error=str(exc))
+                discard = True
+
+        with self._lock:
+            self._in_use -= 1
+            keep = not discard and not self._closed
+            if keep:
+                self._idle.append(_IdleConnection(conn=conn, released_at=time.monotonic()))
+            self._lock.notify()
+
+        if not keep:
+            self._close_quietly([conn])
+
+    @contextmanager
+    def connection(self) -> Generator[Any, None, None]:
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except BaseException:
+            discard = not self._is_reusable_after_error(conn)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def _is_reusable_after_error(self, conn: Any) -> bool:
+        try:
+            self._ping(conn)
+        except Exception:
+            return False
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle = [entry.conn for entry in self._idle]
+            self._idle.clear()
+            self._lock.notify_all()
+        self._close_quietly(idle)
+
+    def stats(self) -> PoolStats:
+        with self._lock:
+            snapshot = PoolStats(**asdict(self._stats))
+            snapshot.idle = len(self._idle)
+            snapshot.in_use = self._in_use
+            return snapshot
+
+    def _evict_expired_locked(self) -> list[Any]:
+        if self._idle_timeout <= 0:
+            return []
+        now = time.monotonic()
+        expired: list[Any] = []
+        # 最旧的空闲连接在队首
+        while len(self._idle) > self._min_size:
+            oldest = self._idle[0]
+            if now - oldest.released_at < self._idle_timeout:
+                break
+            self._idle.popleft()
+            expired.append(oldest.conn)
+        self._stats.evicted += len(expired)
+        return expired
+
+    def _close_quietly(self, connections: list[Any]) -> None:
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as exc:
+                logger.debug("Failed to close pooled connection", error=str(exc))
+            with self._lock:
+                self._stats.closed += 1
+
+
+class ConnectionPoolRegistry:
+    """按连接配置指纹维护的进程级连接池注册表"""
+
+    def __init__(self) -> None:
+        self._pools: dict[str, ConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: str, builder: Callable[[], ConnectionPool]) -> ConnectionPool:
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None or pool.closed:
+                pool = builder()
+                self._pools[key] = pool
+            return pool
+
+    def invalidate(self, key: str) -> bool:
+        with self._lock:
+            pool = self._pools.pop(key, None)
+        if pool is None:
+            return False
+        pool.close()
+        logger.info("Invalidated database connection pool", key=key[:12])
+        return True
+
+    def stats(self) -> list[PoolStats]:
+        with self._lock:
+            pools = list(self._pools.values())
+        return [pool.stats() for pool in pools]
+
+    def close_all(self) -> None:
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.close()
+
+
+pool_registry = ConnectionPoolRegistry()
+
+
+def pool_settings() -> dict[str, Any]:
+    """读取连接池配置"""
+    return {
+        "min_size": settings.DB_POOL_MIN_SIZE,
+        "max_size": settings.DB_POOL_MAX_SIZE,
+        "idle_timeout": settings.DB_POOL_IDLE_TIMEOUT,
+        "acquire_timeout": settings.DB_POOL_ACQUIRE_TIMEOUT,
+    }
@@ -0,0 +1,286 @@
+"""Structured schema snapshots produced by the database adapters."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass, field
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, ClassVar
+
+if TYPE_CHECKING:
+    from app.services.schema_retrieval import SchemaSearchIndex
+
+
+@dataclass(slots=True)
+class ColumnStats:
+    """采样得到的列统计（取值已转成字符串，便于持久化与渲染）
+
+    统计只反映 ``sample_size`` 行样本，不代表全表的完整取值与范围。
+    """
+
+    null_ratio: float = 0.0
+    distinct_count: int = 0
+    top_values: list[str] = field(default_factory=list)
+    min_value: str | None = None
+    max_value: str | None = None
+    sample_size: int = 0
+
+
+@dataclass(slots=True)
+class ColumnSnapshot:
+    """列结构"""
+
+    name: str
+    data_type: str
+    is_nullable: bool = True
+    is_primary_key: bool = False
+    default_value: str | None = None
+    stats: ColumnStats | None = None
+    comment: str | None = None
+
+
+@dataclass(slots=True)
+class ForeignKeySnapshot:
+    """外键约束（支持复合键）"""
+
+    columns: list[str]
+    referenced_table: str
+    referenced_columns: list[str]
+
+
+@dataclass(slots=True)
+class IndexSnapshot:
+    """索引（不含主键索引）"""
+
+    name: str
+    columns: list[str]
+    is_unique: bool = False
+
+
+@dataclass(slots=True)
+class TableSnapshot:
+    """表结构"""
+
+    name: str
+    columns: list[ColumnSnapshot] = field(default_factory=list)
+    foreign_keys: list[ForeignKeySnapshot] = field(default_factory=list)
+    indexes: list[IndexSnapshot] = field(default_factory=list)
+    row_estimate: int | None = None
+    comment: str | None = None
+
+    @property
+    def primary_key(self) -> list[str]:
+        return [column.name for column in self.columns if column.is_primary_key]
+
+    @property
+    def foreign_key_columns(self) -> set[str]:
+        return {column for fk in self.foreign_keys for column in fk.columns}
+
+
+@dataclass
+class SchemaSnapshot:
+    """一次目录读取得到的完整数据库结构
+
+    提示词文本在首次使用时渲染，之后随快照一起缓存复用。
+    """
+
+    VERSION: ClassVar[int] = 3
+
+    driver: str
+    database: str
+    tables: list[TableSnapshot] = field(default_factory=list)
+    fingerprint: str | None = None
+    profiled_at: float | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "version": self.VERSION}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> SchemaSnapshot:
+        return cls(
+            driver=data.get("driver", ""),
+            database=data.get("database", ""),
+            tables=[
+                TableSnapshot(
+                    name=table["name"],
+                    columns=[_column_from_dict(column) for column in table.get("columns", [])],
+                    foreign_keys=[ForeignKeySnapshot(**fk) for fk in table.get("foreign_keys", [])],
+                    indexes=[IndexSnapshot(**index) for index in table.get("indexes", [])],
+                    row_estimate=table.get("row_estimate"),
+                    comment=table.get("comment"),
+                )
+                for table in data.get("tables", [])
+            ],
+            fingerprint=data.get("fingerprint"),
+            profiled_at=data.get("profiled_at"),
+        )
+
+    def get_table(self, name: str) -> TableSnapshot | None:
+        return next((table for table in self.tables if table.name == name), None)
+
+    @cached_property
+    def prompt_text(self) -> str:
+        if not self.tables:
+            return "无表结构信息"
+        return "\n".join(render_table_text(table) for table in self.tables)
+
+    @cached_property
+    def search_index(self) -> SchemaSearchIndex:
+        from app.services.schema_retrieval import SchemaSearchIndex
+
+        return SchemaSearchIndex(self)
+
+    def to_prompt_text(self) -> str:
+        return self.prompt_text
+
+
+def _column_from_dict(data: dict[str, Any]) -> ColumnSnapshot:
+    stats = data.get("stats")
+    return ColumnSnapshot(
+        **{**data, "stats": ColumnStats(**stats) if isinstance(stats, dict) else None}
+    )
+
+
+def render_table_text(table: TableSnapshot) -> str:
+    """渲染单张表的提示词文本"""
+    col_info = ", ".join(
+        f"{col.name} ({col.data_type}, {col.comment})"
+        if col.comment
+        else f"{col.name} ({col.data_type})"
+        for col in table.columns
+    )
+    lines = [f"- {table.name}: {col_info}"]
+    if table.comment:
+        lines.append(f"  说明: {table.comment}")
+    for fk in table.foreign_keys:
+        lines.append(
+            f"  外键: {', '.join(fk.columns)} -> "
+            f"{fk.referenced_table}.{', '.join(fk.referenced_columns)}"
+        )
+    stats = render_column_stats(table)
+    if stats:
+        lines.append(f"  数据: {stats}")
+    return "\n".join(lines)
+
+
+def render_column_stats(table: TableSnapshot) -> str:
+    """紧凑的取值提示：枚举列的取值、日期与数值列的范围、明显的空值比例
+
+    统计来自样本，标注为样本取值与样本范围，避免模型当作完整的枚举或边界。
+    """
+    parts: list[str] = []
+    profiled = [column.stats for column in table.columns if column.stats]
+    if table.row_estimate is not None and profiled:
+        parts.append(f"约 {table.row_estimate:,} 行")
+    sample_size = max((stats.sample_size for stats in profiled), default=0)
+    if sample_size:
+        parts.append(f"样本 {sample_size:,} 行")
+    for column in table.columns:
+        stats = column.stats
+        if stats is None:
+            continue
+        notes: list[str] = []
+        if stats.top_values:
+            notes.append("样本取值 " + "|".join(stats.top_values))
+        elif stats.min_value is not None and stats.max_value is not None:
+            notes.append(f"样本范围 {stats.min_value} ~ {stats.max_value}")
+        if stats.null_ratio >= 0.01:
+            notes.append(f"空值 {stats.null_ratio:.0%}")
+        if notes:
+            parts.append(f"{column.name} {' '.join(notes)}")
+    return "; ".join(parts)
+
+
+# (表, 列, 类型, 可空, 主键, 默认值)
+SchemaRow = tuple[str, str, str, bool, bool, Any]
+# (表, 约束名, 列, 引用表, 引用列)，引用列为空时指向引用表的主键
+ForeignKeyRow = tuple[str, Any, str, str, str | None]
+# (表, 索引名, 唯一, 列)
+IndexRow = tuple[str, str, bool, str | None]
+# (表, 列, 注释)，列为空时是表注释
+CommentRow = tuple[str, str | None, str | None]
+
+
+def group_schema_rows(rows: Iterable[SchemaRow]) -> list[TableSnapshot]:
+    """把按表名、列序排序的列行聚合为表结构"""
+    tables: dict[str, TableSnapshot] = {}
+    for table_name, column_name, data_type, is_nullable, is_primary_key, default in rows:
+        table = tables.get(table_name)
+        if table is None:
+            table = tables[table_name] = TableSnapshot(name=table_name)
+        table.columns.append(
+            ColumnSnapshot(
+                name=column_name,
+                data_type=data_type or "",
+                is_nullable=bool(is_nullable),
+                is_primary_key=bool(is_primary_key),
+                default_value=None if default is None else str(default),
+            )
+        )
+    return list(tables.values())
+
+
+def attach_table_details(
+    tables: list[TableSnapshot],
+    *,
+    foreign_keys: Iterable[ForeignKeyRow] = (),
+    indexes: Iterable[IndexRow] = (),
+    row_estimates: dict[str, int | None] | None = None,
+    comments: Iterable[CommentRow] = (),
+) -> list[TableSnapshot]:
+    """把按表、约束/索引、列序排序的外键行和索引行，以及表和列的注释挂到表结构上"""
+    by_name = {table.name: table for table in tables}
+
+    grouped_fks: dict[tuple[str, Any], ForeignKeySnapshot] = {}
+    for table_name, constraint, column, referenced_table, referenced_column in foreign_keys:
+        table = by_name.get(table_name)
+        if table is None:
+            continue
+        fk = grouped_fks.get((table_name, constraint))
+        if fk is None:
+            fk = grouped_fks[(table_name, constraint)] = ForeignKeySnapshot(
+                columns=[], referenced_table=referenced_table, referenced_columns=[]
+            )
+            table.foreign_keys.append(fk)
+        fk.columns.append(column)
+        if referenced_column:
+            fk.referenced_columns.append(referenced_column)
+    for fk in grouped_fks.values():
+        if not fk.referenced_columns:
+            target = by_name.get(fk.referenced_table)
+            fk.referenced_columns = target.primary_key if target else []
+
+    grouped_indexes: dict[tuple[str, str], IndexSnapshot] = {}
+    for table_name, index_name, is_unique, column in indexes:
+        table = by_name.get(table_name)
+        if table is None:
+            continue
+        index = grouped_indexes.get((table_name, index_name))
+        if index is None:
+            index = grouped_indexes[(table_name, index_name)] = IndexSnapshot(
+                name=index_name, columns=[], is_unique=bool(is_unique)
+            )
+            table.indexes.append(index)
+        # 表达式索引没有列名
+        if column:
+            index.columns.append(column)
+
+    for table_name, estimate in (row_estimates or {}).items():
+        table = by_name.get(table_name)
+        if table is not None and estimate is not None and estimate >= 0:
+            table.row_estimate = int(estimate)
+
+    for table_name, column_name, text in comments:
+        table = by_name.get(table_name)
+        # 多行注释折成一行，保持每张表的提示词格式
+        comment = " ".join((text or "").split())
+        if table is None or not comment:
+            continue
+        if column_name is None:
+            table.comment = comment
+            continue
+        for column_snapshot in table.columns:
+            if column_snapshot.name == column_name:
+                column_snapshot.comment = comment
+
+    return tables
@@ -3,8 +3,10 @@
 from __future__ import annotations
 
 import json
+import keyword
 import re
-from typing import Any
+from dataclasses import dataclass, field
+from typing import Any, Literal
 
 import structlog
 
@@ -27,9 +29,9 @@ def extract_python_block(content: str) -> str | None:
 
 def extract_sql_block(content: str) -> str | None:
     """Extract SQL from a fenced block or a raw SELECT statement."""
-    sql_match = re.search(r"```sql\s*([\s\S]*?)```", content, re.IGNORECASE)
+    sql_match = re.search(r"```sql\b([\s\S]*?)```", content, re.IGNORECASE)
     if sql_match:
-        return sql_match.group(1).strip()
+        return split_sql_fence(sql_match.group(1))[1]
 
     select_match = re.search(r"(SELECT\s+[\s\S]*?(?:;|$))", content, re.IGNORECASE)
     if select_match:
@@ -38,20 +40,54 @@ def extract_sql_block(content: str) -> str | None:
     return None
 
 
+def extract_sql_blocks(content: str) -> list[SQLBlock]:
+    """Extract every SQL block with the DataFrame name its result is injected under."""
+    return parse_completion(content).sql_blocks
+
+
+def split_sql_fence(body: str) -> tuple[str | None, str]:
+    """Split an optional result name (```sql sales_2024) off a SQL block body."""
+    first, newline, rest = body.partition("\n")
+    hint = first.strip()
+    if newline and _SQL_NAME_RE.fullmatch(hint) and hint.lower() not in _SQL_LEADING_KEYWORDS:
+        return hint, rest.strip()
+    return None, body.strip()
+
+
+def sql_block_name(hint: str | None, index: int, taken: set[str]) -> str:
+    """Name for the ``index``-th (1-based) block: the model's hint when usable, else ``df{index}``."""
+    if (
+        hint
+        and hint.isidentifier()
+        and not keyword.iskeyword(hint)
+        and hint not in RESERVED_DATAFRAME_NAMES
+        and hint not in taken
+    ):
+        return hint
+    name = f"df{index}"
+    while name in taken:
+        name += "_"
+    return name
+
+
 def extract_chart_config(content: str) -> dict[str, Any] | None:
     """Extract a JSON chart config from a fenced chart block."""
     pattern = r"```chart\s*\n?([\s\S]*?)\n?```"
     match = re.search(pattern, content, re.IGNORECASE)
     if not match:
         return None
+    return parse_chart_config(match.group(1))
+
 
+def parse_chart_config(body: str) -> dict[str, Any] | None:
+    """Parse the body of a chart block; only configs with a ``type`` are accepted."""
     try:
-        config = json.loads(match.group(1).strip())
+        config = json.loads(body.strip())
     except json.JSONDecodeError as exc:
         logger.warning("Failed to parse chart config", error=str(exc))
         return None
 
-    if "type" in config:
+    if isinstance(config, dict) and "type" in config:
         logger.info("Extracted chart config", chart_type=config.get("type"))
         return config
     return None
@@ -70,3 +106,222 @@ def clean_content_for_display(content: str) -> str:
     content = re.sub(r"\[thinking:\s*[^\]]+\]", "", content)
     content = re.sub(r"\n{3,}", "\n\n", content)
     return content.strip()
+
+
+PYTHON_FENCE_LANGUAGES = frozenset({"python", "ipython", "py"})
+HIDDEN_FENCE_LANGUAGES = PYTHON_FENCE_LANGUAGES | {"sql", "chart"}
+# 运行时固定注入的变量名，不能用作 SQL 结果名
+RESERVED_DATAFRAME_NAMES = frozenset({"df", "query_result", "pd", "np", "plt"})
+_SQL_NAME_RE = re.compile(r"[A-Za-z_]\w{0,63}")
+# 单独成行的语句开头不是结果名
+_SQL_LEADING_KEYWORDS = frozenset(
+    {"select", "with", "show", "describe", "desc", "explain", "pragma", "values", "table"}
+)
+MAX_THINKING_LENGTH = 500
+_FENCE = "```"
+_THINKING_OPEN = "[thinking:"
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+@dataclass(slots=True)
+class ContentEvent:
+    """A construct that closed, or display-safe text, while streaming model output."""
+
+    kind: Literal["thinking", "block", "text"]
+    text: str
+    language: str | None = None
+
+
+@dataclass(slots=True)
+class SQLBlock:
+    """A SQL block and the DataFrame name its result is injected under."""
+
+    name: str
+    sql: str
+
+
+@dataclass(slots=True)
+class ParsedCompletion:
+    """Structured view of a finished completion.
+
+    ``sql`` is the first SQL block; ``sql_blocks`` holds every non-empty one in order.
+    """
+
+    content: str
+    thinking: list[str] = field(default_factory=list)
+    sql: str | None = None
+    sql_blocks: list[SQLBlock] = field(default_factory=list)
+    python: str | None = None
+    chart_config: dict[str, Any] | None = None
+
+
+class StreamingContentParser:
+    """Incremental tokenizer for thinking markers and fenced code blocks.
+
+    Each delta is scanned once. Only text that may still belong to an unfinished
+    construct (a partial ``` fence, a thinking marker without its closing bracket or
+    a fence language tag) is carried over to the next delta; fenced bodies are
+    collected as chunks. Closed constructs are returned from :meth:`feed`, and
+    :meth:`finish` keeps the first SQL, Python and chart blocks like the
+    ``extract_*`` helpers do, plus every SQL block in ``sql_blocks``.
+
+    Prose outside markers and executable blocks is also emitted as ``text`` events,
+    cleaned the same way as :func:`clean_content_for_display` (leading whitespace
+    dropped, blank-line runs collapsed), so it can be shown while the answer forms.
+    Unclosed constructs are only settled by :meth:`finish`; the cleaned final
+    content remains authoritative.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+        self._pending = ""
+        self._fence_language: str | None = None
+        self._body: list[str] = []
+        self._chart_seen = False
+        self._parsed = ParsedCompletion(content="")
+        self._text_started = False
+        self._newline_run = 0
+
+    def feed(self, delta: str) -> list[ContentEvent]:
+        if not delta:
+            return []
+        self._chunks.append(delta)
+        self._pending += delta
+        return self._drain(final=False)
+
+    def finish(self) -> ParsedCompletion:
+        self._drain(final=True)
+        parsed = self._parsed
+        parsed.content = "".join(self._chunks)
+        if parsed.sql is None:
+            # 没有 ```sql 代码块时沿用裸 SELECT 语句的兜底规则
+            parsed.sql = extract_sql_block(parsed.content)
+            if parsed.sql:
+                parsed.sql_blocks.append(SQLBlock(name="df1", sql=parsed.sql))
+        return parsed
+
+    def _drain(self, *, final: bool) -> list[ContentEvent]:
+        events: list[ContentEvent] = []
+        while self._pending:
+            pending = self._pending
+            if self._fence_language is not None:
+                end = pending.find(_FENCE)
+                display = self._fence_language not in HIDDEN_FENCE_LANGUAGES
+                if end < 0:
+                    keep = 0 if final else _partial_suffix(pending, (_FENCE,))
+                    self._body.append(pending[: len(pending) - keep])
+                    if display:
+                        self._emit_text(pending[: len(pending) - keep], events)
+                    self._pending = pending[len(pending) - keep :]
+                    break
+                self._body.append(pending[:end])
+                if display:
+                    self._emit_text(pending[: end + len(_FENCE)], events)
+                events.append(self._close_block(self._fence_language, "".join(self._body)))
+                self._fence_language = None
+                self._body = []
+                self._pending = pending[end + len(_FENCE) :]
+                continue
+
+            fence = pending.find(_FENCE)
+            marker = pending.find(_THINKING_OPEN)
+            if marker >= 0 and (fence < 0 or marker < fence):
+                body_start = marker + len(_THINKING_OPEN)
+                close = pending.find("]", body_start)
+                if close < 0:
+                    if final or len(pending) - body_start > MAX_THINKING_LENGTH:
+                        # 未闭合的标记按普通文本处理
+                        self._emit_text(pending[:body_start], events)
+                        self._pending = pending[body_start:]
+                        continue
+                    self._emit_text(pending[:marker], events)
+                    self._pending = pending[marker:]
+                    break
+                self._emit_text(pending[:marker], events)
+                thought = pending[body_start:close].strip()
+                if thought:
+                    self._parsed.thinking.append(thought)
+                    events.append(ContentEvent(kind="thinking", text=thought))
+                self._pending = pending[close + 1 :]
+                continue
+
+            if fence < 0:
+                keep = 0 if final else _partial_suffix(pending, (_FENCE, _THINKING_OPEN))
+                self._emit_text(pending[: len(pending) - keep], events)
+                self._pending = pending[len(pending) - keep :]
+                break
+
+            self._emit_text(pending[:fence], events)
+
+            tag_start = fence + len(_FENCE)
+            tag_end = tag_start
+            while tag_end < len(pending) and (
+                pending[tag_end].isalnum() or pending[tag_end] == "_"
+            ):
+                tag_end += 1
+            if tag_end == len(pending) and not final:
+                # 语言标记可能还没写完
+                self._pending = pending[fence:]
+                break
+            self._fence_language = pending[tag_start:tag_end].lower()
+            if self._fence_language not in HIDDEN_FENCE_LANGUAGES:
+                self._emit_text(pending[fence:tag_end], events)
+            self._pending = pending[tag_end:]
+
+        if final and self._fence_language is not None:
+            # 未闭合的代码块与正则提取一致，不计入结果
+            self._fence_language = None
+            self._body = []
+        return events
+
+    def _emit_text(self, text: str, events: list[ContentEvent]) -> None:
+        if not self._text_started:
+            text = text.lstrip()
+            if not text:
+                return
+            self._text_started = True
+        # 连续空行可能跨越多个增量，带上已输出的换行一起折叠
+        carried = min(self._newline_run, 2)
+        collapsed = _BLANK_LINES_RE.sub("\n\n", "\n" * carried + text)[carried:]
+        if not collapsed:
+            return
+        stripped = collapsed.rstrip("\n")
+        trailing = len(collapsed) - len(stripped)
+        self._newline_run = trailing if stripped else self._newline_run + trailing
+        events.append(ContentEvent(kind="text", text=collapsed))
+
+    def _close_block(self, language: str, body: str) -> ContentEvent:
+        code = body.strip()
+        parsed = self._parsed
+        if language == "sql":
+            hint, code = split_sql_fence(body)
+            if parsed.sql is None:
+                parsed.sql = code
+            if code:
+                taken = {block.name for block in parsed.sql_blocks}
+                name = sql_block_name(hint, len(parsed.sql_blocks) + 1, taken)
+                parsed.sql_blocks.append(SQLBlock(name=name, sql=code))
+        elif language in PYTHON_FENCE_LANGUAGES and parsed.python is None:
+            parsed.python = code
+        elif language == "chart" and not self._chart_seen:
+            self._chart_seen = True
+            parsed.chart_config = parse_chart_config(body)
+        return ContentEvent(kind="block", text=code, language=language)
+
+
+def parse_completion(content: str) -> ParsedCompletion:
+    """Parse a complete model response in one pass."""
+    parser = StreamingContentParser()
+    parser.feed(content)
+    return parser.finish()
+
+
+def _partial_suffix(text: str, tokens: tuple[str, ...]) -> int:
+    """Length of the longest suffix of ``text`` that is a proper prefix of a token."""
+    longest = 0
+    for token in tokens:
+        for size in range(min(len(token) - 1, len(text)), longest, -1):
+            if text.endswith(token[:size]):
+                longest = size
+                break
+    return longest
@@ -78,6 +78,20 @@ def categorize_sql_error(message: str) -> tuple[str, str, bool]:
         )
     ):
         return "DB_AUTH_ERROR", "connection", False
+    if any(
+        token in normalized
+        for token in (
+            "statement timeout",
+            "maximum statement execution time",
+            "max_statement_time",
+            "执行超时",
+        )
+    ):
+        return "SQL_TIMEOUT", "sql", True
+    if "已拒绝执行" in message:
+        return "SQL_COST_REJECTED", "safety", False
+    if "预估代价过高" in message:
+        return "SQL_COST_TOO_HIGH", "sql", True
     if any(
         token in normalized
         for token in (
@@ -122,7 +136,7 @@ def categorize_python_error(message: str) -> tuple[str, str, bool]:
         return "PYTHON_SECURITY_ERROR", "safety", False
     if "语法错误" in message or "syntaxerror" in normalized:
         return "PYTHON_SYNTAX_ERROR", "python", True
-    if "timed out" in normalized or "timeout" in normalized:
+    if "timed out" in normalized or "timeout" in normalized or "超时" in message:
         return "PYTHON_TIMEOUT", "python", True
     if any(
         token in normalized
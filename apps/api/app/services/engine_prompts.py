@@ -43,9 +43,9 @@ def build_sql_repair_prompt(query: str, failed_sql: str | None, error_message: s
 
 要求：
 1. 必须基于已提供的真实表结构和字段名修复。
-2. 返回完整答复，并且必须包含一个新的 ```sql 代码块。
+2. 返回完整答复，并且必须包含修复后的 ```sql 代码块；原先有多个相互独立的查询时全部保留，名称不变。
 3. 如果原先的分析、图表或 Python 思路仍有效，可以保留；否则一起修正。
-4. 只给最终版本，不要给多个候选 SQL。
+4. 只给最终版本，不要给同一查询的多个候选 SQL。
 """
 
 
@@ -133,7 +133,10 @@ def build_db_context(db_config: dict[str, Any], schema_info: str) -> str:
 请根据用户的问题生成合适的 SQL 查询语句。
 重要规则:
 1. 只生成只读 SQL (SELECT, SHOW, DESCRIBE)
-2. 使用 ```sql 代码块包裹 SQL 语句
+2. 使用 ```sql 代码块包裹 SQL 语句；需要多个相互独立的查询时可以写多个 ```sql 代码块，它们会并行执行。
+   在 ```sql 后写名称（如 ```sql sales_2024）即可在 Python 中使用同名 DataFrame，未命名时依次为 df1、df2…，
+   df 始终是第一个查询的结果。不要把同一查询的候选写法写成多个代码块
 3. 必须使用上面提供的真实表名和字段名，不要猜测
 4. 简洁明了地解释查询结果
+5. 表结构中的“数据”行来自采样（取值、范围与空值比例），筛选枚举值和日期时沿用其中的写法与格式
 """
@@ -4,13 +4,41 @@ from __future__ import annotations
 
 from typing import Any
 
+from app.services.query_result import QueryResult
+
+MAX_CHART_POINTS = 50
+
+
+def _is_numeric(value: Any) -> bool:
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _chart_points(result: QueryResult, x_key: str, y_keys: list[str]) -> list[dict[str, Any]]:
+    """Build chart points column by column from the first rows of the result."""
+    sample = result.head(MAX_CHART_POINTS)
+    x_values = sample.column(x_key)
+    chart_data: list[dict[str, Any]] = [{"name": str(value)} for value in x_values]
+    for y_key in y_keys:
+        # y keys that are not in the result are plotted as 0
+        y_values = sample.column(y_key) if y_key in sample.columns else [0] * len(chart_data)
+        for item, value in zip(chart_data, y_values, strict=True):
+            try:
+                item[y_key] = float(value)
+            except (TypeError, ValueError):
+                item[y_key] = 0
+    return chart_data
+
 
 def build_chart_from_config(
     config: dict[str, Any],
-    data: list[dict[str, Any]],
+    result: QueryResult,
 ) -> dict[str, Any] | None:
     """Build a chart payload from an explicit model-provided config."""
-    if not data:
+    if not result.rows_count:
         return None
 
     chart_type = config.get("type", "bar")
@@ -18,62 +46,43 @@ def build_chart_from_config(
     x_key = config.get("xKey")
     y_keys = list(config.get("yKeys", []))
 
-    columns = list(data[0].keys())
+    columns = result.columns
     if not x_key or x_key not in columns:
         x_key = columns[0]
 
     if not y_keys:
-        for column in columns:
-            if column == x_key:
-                continue
-            try:
-                float(data[0][column])
-            except (TypeError, ValueError):
-                continue
-            y_keys.append(column)
+        y_keys = [
+            column
+            for column in columns
+            if column != x_key and _is_numeric(result.column(column)[0])
+        ]
 
     if not y_keys:
         return None
 
-    chart_data = []
-    for row in data[:50]:
-        item = {"name": str(row.get(x_key, ""))}
-        for y_key in y_keys:
-            try:
-                item[y_key] = float(row.get(y_key, 0))
-            except (TypeError, ValueError):
-                item[y_key] = 0
-        chart_data.append(item)
-
     return {
         "type": chart_type,
         "title": title,
-        "data": chart_data,
+        "data": _chart_points(result, x_key, y_keys),
         "xKey": "name",
         "yKeys": y_keys,
     }
 
 
 def generate_visualization(
-    data: list[dict[str, Any]],
+    result: QueryResult,
     query: str,
 ) -> dict[str, Any] | None:
     """Generate a fallback chart config from query semantics and result data."""
-    if not data:
+    if not result.rows_count:
         return None
 
-    columns = list(data[0].keys())
+    columns = result.columns
     if len(columns) < 2:
         return None
 
     x_column = columns[0]
-    y_columns: list[str] = []
-    for column in columns[1:]:
-        try:
-            float(data[0][column])
-        except (TypeError, ValueError):
-            continue
-        y_columns.append(column)
+    y_columns = [column for column in columns[1:] if _is_numeric(result.column(column)[0])]
 
     if not y_columns:
         return None
@@ -86,19 +95,9 @@ def generate_visualization(
     else:
         chart_type = "bar"
 
-    chart_data = []
-    for row in data[:50]:
-        item = {"name": str(row[x_column])}
-        for y_column in y_columns:
-            try:
-                item[y_column] = float(row[y_column])
-            except (TypeError, ValueError):
-                item[y_column] = 0
-        chart_data.append(item)
-
     return {
         "type": chart_type,
-        "data": chart_data,
+        "data": _chart_points(result, x_column, y_columns),
         "xKey": "name",
         "yKeys": y_columns,
     }
@@ -2,19 +2,25 @@
 
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass, field
 from typing import Any, Literal
 
 from app.models import SSEEvent
-from app.services.engine_content import (
-    extract_chart_config,
-    extract_python_block,
-    extract_sql_block,
-)
+from app.services.database import QueryResult
+from app.services.engine_content import ParsedCompletion, SQLBlock, parse_completion
 from app.services.engine_diagnostics import DiagnosticEntry
+from app.services.query_cancellation import QueryCancellation
 
 WorkflowStatus = Literal["continue", "retry", "halt"]
 
+SQLRunResult = tuple[QueryResult, float]
+# 执行中的 SQL 任务与只属于它的取消信号
+SQLTask = tuple[asyncio.Task[SQLRunResult], QueryCancellation | None]
+
+# 后台执行的语句取消，保留引用直到完成
+_statement_cancels: set[asyncio.Task[int]] = set()
+
 
 @dataclass(slots=True)
 class WorkflowDecision:
@@ -24,6 +30,15 @@ class WorkflowDecision:
     events: list[SSEEvent] = field(default_factory=list)
 
 
+@dataclass(slots=True)
+class SQLBlockResult:
+    """Result of one SQL block of the current answer."""
+
+    block: SQLBlock
+    result: QueryResult
+    execution_time: float
+
+
 @dataclass(slots=True)
 class EngineRunState:
     """Mutable state carried across generation, repair and execution attempts."""
@@ -39,38 +54,105 @@ class EngineRunState:
     diagnostics: list[DiagnosticEntry] = field(default_factory=list)
     full_content: str = ""
     final_sql: str | None = None
+    sql_blocks: list[SQLBlock] = field(default_factory=list)
+    sql_results: list[SQLBlockResult] = field(default_factory=list)
     final_python: str | None = None
     chart_config: dict[str, Any] | None = None
-    final_data: list[dict[str, Any]] | None = None
-    final_rows_count: int | None = None
+    final_result: QueryResult | None = None
     final_execution_time: float | None = None
     python_output: str | None = None
     python_images: list[str] = field(default_factory=list)
+    speculative_tasks: dict[str, SQLTask] = field(default_factory=dict)
+    cancellation: QueryCancellation | None = None
 
     def can_retry(self) -> bool:
         return self.attempt < self.max_attempts
 
-    def load_completion(self, content: str) -> None:
-        self.full_content = content
-        self.final_sql = extract_sql_block(content)
-        self.final_python = extract_python_block(content)
-        self.chart_config = extract_chart_config(content)
-        self.final_data = None
-        self.final_rows_count = None
+    def statement_cancellation(self) -> QueryCancellation:
+        """单个 SQL 任务的取消信号：停止请求时一并取消，丢弃任务时也可以单独取消"""
+        if self.cancellation is not None:
+            return self.cancellation.child()
+        return QueryCancellation()
+
+    def start_speculation(
+        self,
+        sql: str,
+        task: asyncio.Task[SQLRunResult],
+        cancellation: QueryCancellation | None = None,
+    ) -> None:
+        previous = self.speculative_tasks.pop(sql, None)
+        if previous is not None:
+            discard_task(*previous)
+        self.speculative_tasks[sql] = (task, cancellation)
+
+    def take_speculation(self, sql: str) -> SQLTask | None:
+        """取出与该 SQL 一致的提前执行任务及其取消信号"""
+        return self.speculative_tasks.pop(sql, None)
+
+    def discard_speculation(self) -> None:
+        """丢弃没有被最终 SQL 取走的提前执行任务，并在数据库上取消其语句"""
+        tasks = list(self.speculative_tasks.values())
+        self.speculative_tasks.clear()
+        for task, cancellation in tasks:
+            discard_task(task, cancellation)
+
+    def load_query_result(self, result: QueryResult, execution_time: float) -> None:
+        self.final_result = result
+        self.final_execution_time = execution_time
+
+    def load_block_result(
+        self, block: SQLBlock, result: QueryResult, execution_time: float
+    ) -> None:
+        """记录一个 SQL 块的结果；第一个块同时作为最终结果"""
+        self.sql_results.append(SQLBlockResult(block, result, execution_time))
+        self.sql_results.sort(key=lambda item: self.sql_blocks.index(item.block))
+        if self.sql_blocks and block is self.sql_blocks[0]:
+            self.load_query_result(result, execution_time)
+
+    def load_completion(self, completion: ParsedCompletion | str) -> None:
+        if isinstance(completion, str):
+            completion = parse_completion(completion)
+        self.full_content = completion.content
+        self.final_sql = completion.sql
+        self.sql_blocks = list(completion.sql_blocks)
+        self.sql_results = []
+        self.final_python = completion.python
+        self.chart_config = completion.chart_config
+        self.final_result = None
         self.final_execution_time = None
         self.python_output = None
         self.python_images = []
 
     def schedule_retry(self, completion_messages: list[dict[str, str]]) -> int:
+        self.discard_speculation()
         self.completion_messages = completion_messages
         self.attempt += 1
         self.full_content = ""
         self.final_sql = None
+        self.sql_blocks = []
+        self.sql_results = []
         self.final_python = None
         self.chart_config = None
-        self.final_data = None
-        self.final_rows_count = None
+        self.final_result = None
         self.final_execution_time = None
         self.python_output = None
         self.python_images = []
         return self.attempt
+
+
+def discard_task(task: asyncio.Task[Any], cancellation: QueryCancellation | None = None) -> None:
+    """取消不再需要的任务
+
+    取消 asyncio 任务并不会停止数据库线程中的语句；传入只属于该任务的
+    ``cancellation`` 时，在后台线程中取消它在目标数据库上正在执行的语句。
+    """
+    task.cancel()
+    # 读取结果，避免 "exception was never retrieved" 警告
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    if cancellation is None:
+        return
+    cancel = asyncio.get_running_loop().create_task(
+        asyncio.to_thread(cancellation.cancel_statements)
+    )
+    _statement_cancels.add(cancel)
+    cancel.add_done_callback(_statement_cancels.discard)
@@ -15,6 +15,8 @@ from app.db.tables import Connection, Model
 from app.models import RelationshipContext, SemanticContext, SSEEvent, SystemCapabilities
 from app.services.app_settings import detect_system_capabilities
 from app.services.execution_context import ExecutionContextResolver
+from app.services.query_cancellation import QueryCancellation
+from app.services.schema_retrieval import SchemaHints
 from app.services.system_prompt_builder import build_system_prompt
 
 logger = structlog.get_logger()
@@ -209,6 +211,7 @@ class ExecutionService:
         conversation_id: UUID,
         exclude_message_id: UUID | None = None,
         stop_checker: Callable[[], bool] | None = None,
+        cancellation: QueryCancellation | None = None,
     ) -> AsyncGenerator[SSEEvent, None]:
         """流式执行查询"""
         try:
@@ -235,6 +238,10 @@ class ExecutionService:
                 db_config=inputs.db_config,
                 history=inputs.history,
                 stop_checker=stop_checker,
+                cancellation=cancellation,
+                schema_hints=SchemaHints.from_contexts(
+                    inputs.semantic_context, inputs.relationship_context
+                ),
             ):
                 yield event
         except Exception as exc:
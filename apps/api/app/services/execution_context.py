@@ -18,6 +18,31 @@ from app.models import (
 from app.services.model_runtime import resolve_model_runtime
 
 
+def connection_to_db_config(connection: Connection) -> dict[str, Any]:
+    """把连接记录转换为目标数据库配置（附带 connection_id 与 extra_options 中的连接选项）"""
+    password = None
+    if connection.password_encrypted:
+        try:
+            password = encryptor.decrypt(connection.password_encrypted)
+        except Exception:
+            password = None
+
+    extra_options = connection.extra_options or {}
+    return {
+        "connection_id": str(connection.id),
+        "driver": connection.driver,
+        "host": connection.host,
+        "port": connection.port,
+        "user": connection.username,
+        "password": password,
+        "database": connection.database_name,
+        "read_only": extra_options.get("read_only"),
+        "immutable": extra_options.get("immutable"),
+        "replicas": extra_options.get("replicas"),
+        "cost_guard": extra_options.get("cost_guard"),
+    }
+
+
 class ExecutionContextResolver:
     def __init__(
         self,
@@ -166,21 +191,7 @@ class ExecutionContextResolver:
         if not connection:
             return None
 
-        password = None
-        if connection.password_encrypted:
-            try:
-                password = encryptor.decrypt(connection.password_encrypted)
-            except Exception:
-                password = None
-
-        self._resolved_connection_config = {
-            "driver": connection.driver,
-            "host": connection.host,
-            "port": connection.port,
-            "user": connection.username,
-            "password": password,
-            "database": connection.database_name,
-        }
+        self._resolved_connection_config = connection_to_db_config(connection)
         return self._resolved_connection_config
 
     async def get_semantic_context(self) -> SemanticContext:
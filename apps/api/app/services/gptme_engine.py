@@ -5,17 +5,22 @@ gptme 执行引擎封装
 
 from __future__ import annotations
 
+import asyncio
+import functools
 import time
 from collections.abc import AsyncGenerator, Callable
-from pathlib import Path
 from typing import Any
 
 import structlog
 
 from app.core.config import settings
 from app.models import SSEEvent
-from app.services.database import create_database_manager
+from app.services.cost_guard import CostGuardPolicy
+from app.services.database import QueryResult, create_database_manager
 from app.services.engine_content import (
+    ParsedCompletion,
+    SQLBlock,
+    StreamingContentParser,
     clean_content_for_display,
     extract_chart_config,
     extract_python_block,
@@ -38,12 +43,23 @@ from app.services.engine_prompts import (
     build_sql_repair_prompt,
 )
 from app.services.engine_visualization import build_chart_from_config, generate_visualization
-from app.services.engine_workflow import EngineRunState, WorkflowDecision
+from app.services.engine_workflow import (
+    EngineRunState,
+    SQLRunResult,
+    WorkflowDecision,
+    discard_task,
+)
+from app.services.kernel_pool import DEFAULT_FONT_PATH, OutputListener, kernel_pool
+from app.services.llm_client_pool import llm_client_pool
 from app.services.python_runtime import (
     PythonExecutionRuntime,
     PythonSecurityAnalyzer,
     validate_python_code,
 )
+from app.services.query_cancellation import QueryCancellation, QueryCancelledError
+from app.services.result_cache import result_cache
+from app.services.schema_cache import schema_cache
+from app.services.schema_retrieval import SchemaHints, select_schema_context
 
 logger = structlog.get_logger()
 
@@ -93,12 +109,8 @@ class GptmeEngine:
         self._python_runtime = PythonExecutionRuntime(
             available_python_libraries=self.available_python_libraries,
             analytics_installed=self.analytics_installed,
-            font_path=str(
-                Path(__file__).resolve().parent.parent
-                / "assets"
-                / "fonts"
-                / "NotoSansSC-Regular.ttf"
-            ),
+            font_path=DEFAULT_FONT_PATH,
+            pool=kernel_pool,
         )
         self._ipython = None
         self._sql_data: dict[str, Any] = {}
@@ -118,9 +130,9 @@ class GptmeEngine:
             self._ipython = self._python_runtime.get_ipython()
         return self._ipython
 
-    def _inject_sql_data(self, name: str, data: list[dict[str, Any]]) -> None:
+    async def _inject_sql_data(self, name: str, data: QueryResult | list[dict[str, Any]]) -> None:
         """将 SQL 结果注入 Python 环境"""
-        self._python_runtime.inject_sql_data(name, data)
+        await self._python_runtime.inject_sql_data(name, data)
         self._ipython = self._python_runtime.ipython
         self._sql_data = self._python_runtime.sql_data
 
@@ -141,14 +153,14 @@ class GptmeEngine:
     def _clean_content_for_display(self, content: str) -> str:
         return clean_content_for_display(content)
 
-    def _build_initial_messages(
+    async def _build_initial_messages(
         self,
         query: str,
         system_prompt: str,
         db_config: dict[str, Any] | None = None,
         history: list[dict[str, str]] | None = None,
     ) -> list[dict[str, str]]:
-        db_context = self._build_db_context(db_config) if db_config else None
+        db_context = await self._build_db_context(db_config, query=query) if db_config else None
         return build_initial_messages(
             query=query,
             system_prompt=system_prompt,
@@ -182,7 +194,7 @@ class GptmeEngine:
             available_python_libraries=self.available_python_libraries,
         )
 
-    def _build_repair_messages(
+    async def _build_repair_messages(
         self,
         query: str,
         system_prompt: str,
@@ -191,7 +203,7 @@ class GptmeEngine:
         db_config: dict[str, Any] | None = None,
         history: list[dict[str, str]] | None = None,
     ) -> list[dict[str, str]]:
-        db_context = self._build_db_context(db_config) if db_config else None
+        db_context = await self._build_db_context(db_config, query=query) if db_config else None
         return build_repair_messages(
             query=query,
             system_prompt=system_prompt,
@@ -207,8 +219,9 @@ class GptmeEngine:
         *,
         phase: str,
         attempt: int,
-        content_holder: list[str],
+        content_holder: list[ParsedCompletion],
         stop_checker: Callable[[], bool] | None = None,
+        on_sql_block: Callable[[str], None] | None = None,
     ) -> AsyncGenerator[SSEEvent, None]:
         import litellm
 
@@ -221,10 +234,17 @@ class GptmeEngine:
             base_url=self.base_url,
             extra_headers=self.headers or None,
             extra_query=self.query_params or None,
+            client=llm_client_pool.get_client(
+                provider=self.provider,
+                base_url=self.base_url,
+                headers=self.headers,
+                api_key=self.api_key,
+            ),
         )
 
-        full_content = ""
+        parser = StreamingContentParser()
         sent_thinking: set[str] = set()
+        sql_blocks_seen = 0
 
         async for chunk in response:
             if stop_checker and stop_checker():
@@ -234,13 +254,27 @@ class GptmeEngine:
             if not delta.content:
                 continue
 
-            full_content += delta.content
-            for thinking in parse_thinking_markers(full_content):
-                if thinking not in sent_thinking:
-                    yield SSEEvent.thinking(thinking, detail=f"{phase}:{attempt}")
-                    sent_thinking.add(thinking)
+            for content_event in parser.feed(delta.content):
+                if content_event.kind == "text":
+                    yield SSEEvent.content_delta(content_event.text, phase=phase, attempt=attempt)
+                    continue
+                if content_event.kind == "block":
+                    # 每个 SQL 代码块闭合后都可以提前执行，数量与执行阶段的上限一致
+                    if (
+                        content_event.language == "sql"
+                        and content_event.text
+                        and sql_blocks_seen < settings.SQL_MAX_BLOCKS
+                    ):
+                        sql_blocks_seen += 1
+                        if on_sql_block is not None:
+                            on_sql_block(content_event.text)
+                    continue
+                if content_event.text in sent_thinking:
+                    continue
+                yield SSEEvent.thinking(content_event.text, detail=f"{phase}:{attempt}")
+                sent_thinking.add(content_event.text)
 
-        content_holder.append(full_content)
+        content_holder.append(parser.finish())
 
     def _build_diagnostic_entry(
         self,
@@ -276,15 +310,20 @@ class GptmeEngine:
     def _categorize_python_error(self, message: str) -> tuple[str, str, bool]:
         return categorize_python_error(message)
 
-    def _new_run_state(
+    async def _new_run_state(
         self,
         *,
         query: str,
         system_prompt: str,
         db_config: dict[str, Any] | None,
         history: list[dict[str, str]] | None,
+        schema_hints: SchemaHints | None = None,
     ) -> EngineRunState:
-        db_context = self._build_db_context(db_config) if db_config else None
+        db_context = (
+            await self._build_db_context(db_config, query=query, schema_hints=schema_hints)
+            if db_config
+            else None
+        )
         max_attempts = MAX_AUTO_REPAIR_ATTEMPTS if self.auto_repair_enabled else 1
         return EngineRunState(
             query=query,
@@ -512,101 +551,199 @@ class GptmeEngine:
         events.extend(retry.events)
         return WorkflowDecision(status="retry", events=events)
 
-    async def _run_sql_phase(self, state: EngineRunState) -> WorkflowDecision:
+    async def _stream_sql_phase(
+        self,
+        state: EngineRunState,
+        decision_holder: list[WorkflowDecision],
+    ) -> AsyncGenerator[SSEEvent, None]:
+        """并行执行回答中的全部 SQL 块，每个块完成即推送；任一块失败时取消其余块"""
         if not state.final_sql or not state.db_config:
-            return WorkflowDecision()
-
-        events = [
-            SSEEvent.progress(
-                "executing_sql",
-                "正在执行 SQL 查询...",
-                attempt=state.attempt,
-                phase="sql",
+            return
+        db_config = state.db_config
+
+        if not state.sql_blocks:
+            state.sql_blocks = [SQLBlock(name="df1", sql=state.final_sql)]
+        if len(state.sql_blocks) > settings.SQL_MAX_BLOCKS:
+            logger.warning(
+                "Ignoring extra SQL blocks",
+                blocks=len(state.sql_blocks),
+                limit=settings.SQL_MAX_BLOCKS,
             )
-        ]
-        start_time = time.time()
+            state.sql_blocks = state.sql_blocks[: settings.SQL_MAX_BLOCKS]
+        blocks = state.sql_blocks
+        multiple = len(blocks) > 1
+
+        yield SSEEvent.progress(
+            "executing_sql",
+            f"正在并行执行 {len(blocks)} 个 SQL 查询..." if multiple else "正在执行 SQL 查询...",
+            attempt=state.attempt,
+            phase="sql",
+        )
+
+        # 每个连接的并发上限由 database_executor 控制
+        # 每个任务有自己的取消信号，某个块失败时只在数据库上取消其余块的语句
+        pending: dict[asyncio.Task[SQLRunResult], SQLBlock] = {}
+        cancellations: dict[asyncio.Task[SQLRunResult], QueryCancellation | None] = {}
+        for block in blocks:
+            speculation = state.take_speculation(block.sql)
+            if speculation is not None:
+                task, cancellation = speculation
+                logger.info("Using speculative SQL result", attempt=state.attempt, name=block.name)
+            else:
+                cancellation = state.statement_cancellation()
+                task = asyncio.create_task(self._run_sql_timed(block.sql, db_config, cancellation))
+            pending[task] = block
+            cancellations[task] = cancellation
+        state.discard_speculation()
 
         try:
-            state.final_data, state.final_rows_count = await self._execute_sql(
-                state.final_sql,
-                state.db_config,
-            )
-            state.final_execution_time = time.time() - start_time
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda item: blocks.index(pending[item])):
+                    block = pending.pop(task)
+                    try:
+                        query_result, execution_time = task.result()
+                    except QueryCancelledError as exc:
+                        raise StopRequestedError(str(exc)) from exc
+                    except Exception as exc:
+                        decision_holder.append(self._handle_sql_failure(state, block, exc))
+                        return
+                    for event in await self._load_sql_block(
+                        state, block, query_result, execution_time, multiple=multiple
+                    ):
+                        yield event
+        finally:
+            for task in pending:
+                discard_task(task, cancellations[task])
+
+    async def _load_sql_block(
+        self,
+        state: EngineRunState,
+        block: SQLBlock,
+        query_result: QueryResult,
+        execution_time: float,
+        *,
+        multiple: bool,
+    ) -> list[SSEEvent]:
+        state.load_block_result(block, query_result, execution_time)
 
-            if state.final_data:
-                self._inject_sql_data("df", state.final_data)
-                self._inject_sql_data("query_result", state.final_data)
+        # DataFrame 只由列式结果构建一次，各变量名共享底层数据
+        if query_result.rows_count or multiple:
+            await self._inject_sql_data(block.name, query_result)
+        if block is state.sql_blocks[0] and query_result.rows_count:
+            await self._inject_sql_data("df", query_result)
+            await self._inject_sql_data("query_result", query_result)
 
-            diagnostic = self._record_diagnostic(
-                state,
+        diagnostic = self._record_diagnostic(
+            state,
+            phase="sql",
+            status="success",
+            message=(f"{block.name}: " if multiple else "")
+            + f"SQL 执行成功，返回 {query_result.rows_count} 行"
+            + ("（来自结果缓存）" if query_result.cached else "")
+            + ("（已达到行数上限，结果已截断）。" if query_result.truncated else "。"),
+            sql=block.sql,
+        )
+        events = [
+            self._diagnostic_progress(
+                stage="executing_sql",
                 phase="sql",
-                status="success",
-                message=f"SQL 执行成功，返回 {state.final_rows_count or 0} 行。",
-                sql=state.final_sql,
+                attempt=state.attempt,
+                diagnostic=diagnostic,
             )
+        ]
+        if multiple:
             events.append(
-                self._diagnostic_progress(
-                    stage="executing_sql",
-                    phase="sql",
+                SSEEvent.sql_result(
                     attempt=state.attempt,
-                    diagnostic=diagnostic,
+                    index=state.sql_blocks.index(block),
+                    **self._dataset_payload(block, query_result, execution_time),
                 )
             )
-            return WorkflowDecision(events=events)
-        except Exception as exc:
-            code, category, recoverable = self._categorize_sql_error(str(exc))
-            diagnostic = self._record_diagnostic(
+        return events
+
+    @staticmethod
+    def _dataset_payload(
+        block: SQLBlock,
+        result: QueryResult,
+        execution_time: float,
+    ) -> dict[str, Any]:
+        return {
+            "name": block.name,
+            "sql": block.sql,
+            "data": result.rows,
+            "rows_count": result.rows_count,
+            "execution_time": execution_time,
+            "truncated": result.truncated,
+            "total_rows": result.total_rows,
+            "cached": result.cached,
+        }
+
+    def _handle_sql_failure(
+        self,
+        state: EngineRunState,
+        block: SQLBlock,
+        error: Exception,
+    ) -> WorkflowDecision:
+        label = f"（{block.name}）" if len(state.sql_blocks) > 1 else ""
+        code, category, recoverable = self._categorize_sql_error(str(error))
+        diagnostic = self._record_diagnostic(
+            state,
+            phase="sql",
+            status="error",
+            message=f"SQL 执行失败{label}: {error}",
+            error_code=code,
+            error_category=category,
+            recoverable=recoverable,
+            sql=block.sql,
+        )
+        events = [
+            self._diagnostic_progress(
+                stage="executing_sql",
+                phase="sql",
+                attempt=state.attempt,
+                diagnostic=diagnostic,
+            )
+        ]
+
+        if recoverable and state.can_retry():
+            retry = self._queue_repair(
                 state,
                 phase="sql",
-                status="error",
-                message=f"SQL 执行失败: {exc}",
+                stage="executing_sql",
+                repair_message="SQL 失败可恢复，正在自动修复并重试。",
                 error_code=code,
                 error_category=category,
-                recoverable=recoverable,
-                sql=state.final_sql,
-            )
-            events.append(
-                self._diagnostic_progress(
-                    stage="executing_sql",
-                    phase="sql",
-                    attempt=state.attempt,
-                    diagnostic=diagnostic,
-                )
+                repair_prompt=self._build_sql_repair_prompt(
+                    query=state.query,
+                    failed_sql=block.sql,
+                    error_message=str(error),
+                ),
+                sql=block.sql,
             )
+            events.extend(retry.events)
+            return WorkflowDecision(status="retry", events=events)
 
-            if recoverable and state.can_retry():
-                retry = self._queue_repair(
-                    state,
-                    phase="sql",
-                    stage="executing_sql",
-                    repair_message="SQL 失败可恢复，正在自动修复并重试。",
-                    error_code=code,
-                    error_category=category,
-                    repair_prompt=self._build_sql_repair_prompt(
-                        query=state.query,
-                        failed_sql=state.final_sql,
-                        error_message=str(exc),
-                    ),
-                    sql=state.final_sql,
-                )
-                events.extend(retry.events)
-                return WorkflowDecision(status="retry", events=events)
-
-            events.append(
-                SSEEvent.error(
-                    code,
-                    f"SQL 执行失败: {exc}",
-                    error_category=category,
-                    failed_stage="sql",
-                    attempt=state.attempt,
-                    diagnostics=self._diagnostics_payload(state.diagnostics),
-                )
+        events.append(
+            SSEEvent.error(
+                code,
+                f"SQL 执行失败{label}: {error}",
+                error_category=category,
+                failed_stage="sql",
+                attempt=state.attempt,
+                diagnostics=self._diagnostics_payload(state.diagnostics),
             )
-            return WorkflowDecision(status="halt", events=events)
+        )
+        return WorkflowDecision(status="halt", events=events)
 
-    async def _run_python_phase(self, state: EngineRunState) -> WorkflowDecision:
+    async def _stream_python_phase(
+        self,
+        state: EngineRunState,
+        decision_holder: list[WorkflowDecision],
+    ) -> AsyncGenerator[SSEEvent, None]:
+        """执行 Python 分析，输出与图片在执行过程中逐步推送"""
         if not state.final_python:
-            return WorkflowDecision()
+            return
 
         if not self.python_enabled:
             diagnostic = self._record_diagnostic(
@@ -620,31 +757,53 @@ class GptmeEngine:
                 python=state.final_python,
             )
             state.final_python = None
-            return WorkflowDecision(
-                events=[
-                    self._diagnostic_progress(
-                        stage="executing_python",
-                        phase="python",
-                        attempt=state.attempt,
-                        diagnostic=diagnostic,
-                    )
-                ]
-            )
-
-        events = [
-            SSEEvent.progress(
-                "executing_python",
-                "正在执行 Python 分析...",
-                attempt=state.attempt,
+            yield self._diagnostic_progress(
+                stage="executing_python",
                 phase="python",
+                attempt=state.attempt,
+                diagnostic=diagnostic,
             )
-        ]
+            return
+
+        yield SSEEvent.progress(
+            "executing_python",
+            "正在执行 Python 分析...",
+            attempt=state.attempt,
+            phase="python",
+        )
         logger.debug("Executing Python code", attempt=state.attempt)
 
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue[tuple[str, str] | None] = asyncio.Queue()
+        streaming = True
+
+        def listener(kind: str, payload: str) -> None:
+            # 在执行线程中调用；超时后仍在运行的代码的输出直接丢弃
+            if streaming:
+                loop.call_soon_threadsafe(chunks.put_nowait, (kind, payload))
+
+        task = asyncio.create_task(self._execute_python(state.final_python, listener=listener))
+        task.add_done_callback(lambda _: chunks.put_nowait(None))
         try:
-            state.python_output, state.python_images = await self._execute_python(
-                state.final_python
-            )
+            while (chunk := await chunks.get()) is not None:
+                kind, payload = chunk
+                if kind == "image":
+                    yield SSEEvent.python_image(payload, attempt=state.attempt)
+                else:
+                    yield SSEEvent.python_output(payload, kind, attempt=state.attempt)
+        finally:
+            streaming = False
+            if not task.done():
+                discard_task(task)
+
+        decision_holder.append(self._finish_python_phase(state, task))
+
+    def _finish_python_phase(
+        self, state: EngineRunState, task: asyncio.Task[tuple[str | None, list[str]]]
+    ) -> WorkflowDecision:
+        events: list[SSEEvent] = []
+        try:
+            state.python_output, state.python_images = task.result()
             diagnostic = self._record_diagnostic(
                 state,
                 phase="python",
@@ -660,10 +819,6 @@ class GptmeEngine:
                     diagnostic=diagnostic,
                 )
             )
-            if state.python_output:
-                events.append(SSEEvent.python_output(state.python_output, "stdout"))
-            for image in state.python_images:
-                events.append(SSEEvent.python_image(image, "png"))
             return WorkflowDecision(events=events)
         except Exception as exc:
             code, category, recoverable = self._categorize_python_error(str(exc))
@@ -736,12 +891,13 @@ class GptmeEngine:
         state: EngineRunState,
         query: str,
     ) -> list[SSEEvent]:
-        if not state.final_data:
+        result = state.final_result
+        if result is None or not result.rows_count:
             return []
 
         events: list[SSEEvent] = []
         if state.chart_config:
-            visualization = build_chart_from_config(state.chart_config, state.final_data)
+            visualization = build_chart_from_config(state.chart_config, result)
             if visualization:
                 diagnostic = self._record_diagnostic(
                     state,
@@ -778,7 +934,7 @@ class GptmeEngine:
                 )
             )
 
-        visualization = generate_visualization(state.final_data, query)
+        visualization = generate_visualization(result, query)
         if visualization:
             events.append(self._visualization_event(visualization))
         return events
@@ -790,6 +946,8 @@ class GptmeEngine:
         db_config: dict[str, Any] | None = None,
         history: list[dict[str, str]] | None = None,
         stop_checker: Callable[[], bool] | None = None,
+        schema_hints: SchemaHints | None = None,
+        cancellation: QueryCancellation | None = None,
     ) -> AsyncGenerator[SSEEvent, None]:
         """执行查询并流式返回结果。"""
         logger.info("GptmeEngine.execute called", model=self.model, query_preview=query[:50])
@@ -807,6 +965,8 @@ class GptmeEngine:
                 db_config=db_config,
                 history=history,
                 stop_checker=stop_checker,
+                schema_hints=schema_hints,
+                cancellation=cancellation,
             ):
                 yield event
         except StopRequestedError as exc:
@@ -834,105 +994,171 @@ class GptmeEngine:
         db_config: dict[str, Any] | None = None,
         history: list[dict[str, str]] | None = None,
         stop_checker: Callable[[], bool] | None = None,
+        schema_hints: SchemaHints | None = None,
+        cancellation: QueryCancellation | None = None,
     ) -> AsyncGenerator[SSEEvent, None]:
         """使用 LiteLLM 执行查询。"""
-        state = self._new_run_state(
+        state = await self._new_run_state(
             query=query,
             system_prompt=system_prompt,
             db_config=db_config,
             history=history,
+            schema_hints=schema_hints,
         )
+        state.cancellation = cancellation
 
-        while state.attempt <= state.max_attempts:
-            yield SSEEvent.progress(
-                "generating",
-                "正在生成响应..."
-                if state.attempt == 1
-                else f"正在进行第 {state.attempt} 次自动修复...",
-                attempt=state.attempt,
-                phase="generate",
-            )
-
-            content_holder: list[str] = []
-            try:
-                async for event in self._stream_completion(
-                    state.completion_messages,
-                    phase="generate",
+        on_sql_block = (
+            functools.partial(self._start_speculative_sql, state)
+            if settings.SQL_SPECULATIVE_EXECUTION and state.db_config
+            else None
+        )
+        try:
+            while state.attempt <= state.max_attempts:
+                yield SSEEvent.progress(
+                    "generating",
+                    "正在生成响应..."
+                    if state.attempt == 1
+                    else f"正在进行第 {state.attempt} 次自动修复...",
                     attempt=state.attempt,
-                    content_holder=content_holder,
-                    stop_checker=stop_checker,
-                ):
-                    yield event
-            except StopRequestedError:
-                raise
-            except Exception as exc:
-                decision = self._handle_generation_failure(state, exc)
+                    phase="generate",
+                )
+
+                content_holder: list[ParsedCompletion] = []
+                try:
+                    async for event in self._stream_completion(
+                        state.completion_messages,
+                        phase="generate",
+                        attempt=state.attempt,
+                        content_holder=content_holder,
+                        stop_checker=stop_checker,
+                        on_sql_block=on_sql_block,
+                    ):
+                        yield event
+                except StopRequestedError:
+                    raise
+                except Exception as exc:
+                    decision = self._handle_generation_failure(state, exc)
+                    for event in decision.events:
+                        yield event
+                    if decision.status == "retry":
+                        continue
+                    return
+
+                state.load_completion(content_holder[0] if content_holder else "")
+                logger.debug(
+                    "AI content extracted",
+                    content_length=len(state.full_content),
+                    has_sql=bool(state.final_sql),
+                    has_python=bool(state.final_python),
+                )
+
+                decision = self._handle_missing_sql(state)
                 for event in decision.events:
                     yield event
                 if decision.status == "retry":
                     continue
-                return
+                if decision.status == "halt":
+                    return
 
-            state.load_completion(content_holder[0] if content_holder else "")
-            logger.debug(
-                "AI content extracted",
-                content_length=len(state.full_content),
-                has_sql=bool(state.final_sql),
-                has_python=bool(state.final_python),
-            )
-
-            decision = self._handle_missing_sql(state)
-            for event in decision.events:
-                yield event
-            if decision.status == "retry":
-                continue
-            if decision.status == "halt":
-                return
+                decision_holder: list[WorkflowDecision] = []
+                async for event in self._stream_sql_phase(state, decision_holder):
+                    yield event
+                decision = decision_holder[0] if decision_holder else WorkflowDecision()
+                for event in decision.events:
+                    yield event
+                if decision.status == "retry":
+                    continue
+                if decision.status == "halt":
+                    return
 
-            decision = await self._run_sql_phase(state)
-            for event in decision.events:
-                yield event
-            if decision.status == "retry":
-                continue
-            if decision.status == "halt":
-                return
+                decision_holder = []
+                async for event in self._stream_python_phase(state, decision_holder):
+                    yield event
+                decision = decision_holder[0] if decision_holder else WorkflowDecision()
+                for event in decision.events:
+                    yield event
+                if decision.status == "retry":
+                    continue
+                if decision.status == "halt":
+                    return
+
+                result = state.final_result
+                extra: dict[str, Any] = {}
+                if len(state.sql_results) > 1:
+                    # 多个 SQL 块时 data 仍是第一个块，全部结果放在 datasets 中
+                    extra["datasets"] = [
+                        self._dataset_payload(item.block, item.result, item.execution_time)
+                        for item in state.sql_results
+                    ]
+                yield SSEEvent.result(
+                    content=clean_content_for_display(state.full_content) or "分析完成",
+                    sql=state.final_sql,
+                    # 前端与历史记录仍使用行格式
+                    data=result.rows if result is not None else None,
+                    rows_count=result.rows_count if result is not None else None,
+                    execution_time=state.final_execution_time,
+                    truncated=result.truncated if result is not None else False,
+                    total_rows=result.total_rows if result is not None else None,
+                    cached=result.cached if result is not None else False,
+                    diagnostics=self._diagnostics_payload(state.diagnostics),
+                    **extra,
+                )
 
-            decision = await self._run_python_phase(state)
-            for event in decision.events:
-                yield event
-            if decision.status == "retry":
-                continue
-            if decision.status == "halt":
-                return
+                if state.python_images:
+                    return
 
-            yield SSEEvent.result(
-                content=clean_content_for_display(state.full_content) or "分析完成",
-                sql=state.final_sql,
-                data=state.final_data,
-                rows_count=state.final_rows_count,
-                execution_time=state.final_execution_time,
-                diagnostics=self._diagnostics_payload(state.diagnostics),
-            )
-
-            if state.python_images:
+                for event in self._emit_visualization_events(state, query):
+                    yield event
                 return
+        finally:
+            state.discard_speculation()
+            await self._python_runtime.release()
 
-            for event in self._emit_visualization_events(state, query):
-                yield event
+    def _start_speculative_sql(self, state: EngineRunState, sql: str) -> None:
+        """SQL 代码块一闭合就开始执行，与后续文本生成并行"""
+        if not state.db_config or not sql or sql in state.speculative_tasks:
             return
+        cancellation = state.statement_cancellation()
+        task = asyncio.create_task(self._run_sql_timed(sql, state.db_config, cancellation))
+        state.start_speculation(sql, task, cancellation)
+        logger.info("Started speculative SQL execution", attempt=state.attempt)
+
+    async def _run_sql_timed(
+        self,
+        sql: str,
+        db_config: dict[str, Any],
+        cancellation: QueryCancellation | None = None,
+    ) -> SQLRunResult:
+        start_time = time.time()
+        result = await self._execute_sql(sql, db_config, cancellation=cancellation)
+        return result, time.time() - start_time
 
     async def _execute_sql(
         self,
         sql: str,
         db_config: dict[str, Any],
-    ) -> tuple[list[dict[str, Any]] | None, int | None]:
-        """执行 SQL 查询"""
+        *,
+        cancellation: QueryCancellation | None = None,
+    ) -> QueryResult:
+        """执行 SQL 查询（先查结果缓存）；没有 LIMIT 时按行数上限自动追加"""
         db_manager = create_database_manager(db_config)
-        result = db_manager.execute_query(sql, read_only=True)
-        return result.data, result.rows_count
+        if settings.QUERY_AUTO_LIMIT:
+            sql = db_manager.apply_row_limit(sql, settings.QUERY_MAX_ROWS)
+        return await result_cache.execute(
+            db_config.get("connection_id"),
+            db_manager,
+            sql,
+            cancellation=cancellation,
+            cost_guard=CostGuardPolicy.from_options(db_config.get("cost_guard")),
+        )
 
-    async def _execute_python(self, code: str, timeout: int = 30) -> tuple[str | None, list[str]]:
-        output = await self._python_runtime.execute(code, timeout=timeout)
+    async def _execute_python(
+        self,
+        code: str,
+        timeout: int = 30,
+        listener: OutputListener | None = None,
+    ) -> tuple[str | None, list[str]]:
+        output = await self._python_runtime.execute(code, timeout=timeout, listener=listener)
         self._ipython = self._python_runtime.ipython
         self._sql_data = self._python_runtime.sql_data
         return output
@@ -946,23 +1172,56 @@ class GptmeEngine:
     def _build_chart_from_config(
         self,
         config: dict[str, Any],
-        data: list[dict[str, Any]],
+        data: QueryResult | list[dict[str, Any]],
     ) -> dict[str, Any] | None:
+        if isinstance(data, list):
+            data = QueryResult.from_rows(data)
         return build_chart_from_config(config, data)
 
     def _generate_visualization(
         self,
-        data: list[dict[str, Any]],
+        data: QueryResult | list[dict[str, Any]],
         query: str,
     ) -> dict[str, Any] | None:
+        if isinstance(data, list):
+            data = QueryResult.from_rows(data)
         return generate_visualization(data, query)
 
-    def _build_db_context(self, db_config: dict[str, Any]) -> str:
-        return build_db_context(db_config, self._get_schema_info(db_config))
+    async def _build_db_context(
+        self,
+        db_config: dict[str, Any],
+        *,
+        query: str = "",
+        schema_hints: SchemaHints | None = None,
+    ) -> str:
+        return build_db_context(
+            db_config, await self._get_schema_info(db_config, query, schema_hints)
+        )
 
-    def _get_schema_info(self, db_config: dict[str, Any]) -> str:
-        db_manager = create_database_manager(db_config)
-        return db_manager.get_schema_info()
+    async def _get_schema_info(
+        self,
+        db_config: dict[str, Any],
+        query: str = "",
+        schema_hints: SchemaHints | None = None,
+    ) -> str:
+        try:
+            connection_id = db_config.get("connection_id")
+            if connection_id:
+                snapshot = await schema_cache.get_snapshot(connection_id, db_config)
+            else:
+                snapshot = await create_database_manager(db_config).get_schema_snapshot_async()
+        except Exception as e:
+            logger.error("Failed to get schema info", error=str(e))
+            return f"无法获取表结构: {e}"
+        selection = select_schema_context(
+            snapshot,
+            query,
+            hints=schema_hints,
+            top_k=settings.SCHEMA_CONTEXT_TOP_K,
+            token_budget=settings.SCHEMA_CONTEXT_TOKEN_BUDGET,
+            min_score=settings.SCHEMA_CONTEXT_MIN_SCORE,
+        )
+        return selection.text
 
     def _extract_sql(self, content: str) -> str | None:
         return extract_sql_block(content)
@@ -0,0 +1,496 @@
+"""Warm pool of pre-initialized IPython kernels for Python analysis."""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import io
+import os
+import threading
+import time
+import traceback
+import weakref
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Literal, Protocol
+
+import structlog
+
+from app.core.config import settings
+from app.services.artifact_store import artifact_store
+from app.services.output_capture import OutputStreamer, capture_output
+
+logger = structlog.get_logger()
+
+DEFAULT_FONT_PATH = str(
+    Path(__file__).resolve().parent.parent / "assets" / "fonts" / "NotoSansSC-Regular.ttf"
+)
+
+
+KernelBackend = Literal["thread", "process"]
+# 执行中推送输出：("stdout" | "stderr", 文本) 或 ("image", 产物 ID)
+OutputListener = Callable[[str, str], None]
+
+
+def current_rss_bytes(pid: int | None = None) -> int | None:
+    """进程（默认当前进程）的常驻内存（读取 /proc，其他平台返回 None）"""
+    try:
+        pages = int(Path(f"/proc/{pid or 'self'}/statm").read_bytes().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass
+class CellOutcome:
+    """一次代码执行的输出、图片（产物 ID）与错误（可以通过管道在进程间传递）"""
+
+    output: str = ""
+    images: list[str] = field(default_factory=list)
+    error: str | None = None
+    syntax_error: bool = False
+
+
+class PooledKernel(Protocol):
+    """内核池管理的内核：进程内的 ``AnalysisKernel`` 或沙箱进程中的 ``SandboxKernel``"""
+
+    executions: int
+    running: bool
+
+    @property
+    def alive(self) -> bool: ...
+
+    def push(self, variables: dict[str, Any]) -> None: ...
+
+    def execute_cell(self, code: str, listener: OutputListener | None = None) -> CellOutcome: ...
+
+    async def execute(
+        self, code: str, timeout: float, listener: OutputListener | None = None
+    ) -> CellOutcome: ...
+
+    def reset(self) -> None: ...
+
+    def rss_bytes(self) -> int | None: ...
+
+    def close(self) -> None: ...
+
+
+def _render_figure(fig: Any) -> str:
+    """按配置的格式渲染图片并存入产物存储，返回产物 ID"""
+    format = settings.PYTHON_IMAGE_FORMAT
+    buf = io.BytesIO()
+    # SVG 默认写入生成时间，去掉后相同的图内容哈希相同
+    metadata = {"Date": None} if format == "svg" else None
+    fig.savefig(
+        buf,
+        format=format,
+        dpi=settings.PYTHON_IMAGE_DPI,
+        bbox_inches="tight",
+        metadata=metadata,
+    )
+    return artifact_store.put(buf.getvalue(), format)
+
+
+class AnalysisKernel:
+    """已导入 pandas / numpy / matplotlib 并注册字体的 IPython 内核"""
+
+    def __init__(self, shell: Any, *, font_path: str):
+        self.shell = shell
+        self.font_path = font_path
+        self.created_at = time.time()
+        self.executions = 0
+        self.running = False
+        # 预热后的命名空间，归还时恢复到这里
+        self._baseline = dict(shell.user_ns)
+
+    @classmethod
+    def create(cls, font_path: str = DEFAULT_FONT_PATH) -> AnalysisKernel:
+        from IPython.core.interactiveshell import InteractiveShell
+        from traitlets.config import Config
+
+        config = Config()
+        # 代码都以 store_history=False 执行，不需要历史数据库及其后台写线程
+        config.HistoryManager.enabled = False
+        shell = InteractiveShell(config=config)
+        font_loaded = os.path.exists(font_path)
+        if font_loaded:
+            logger.info("Loading bundled font", path=font_path)
+        else:
+            logger.warning("Bundled font not found, falling back to system fonts", path=font_path)
+
+        shell.run_cell(
+            f"""
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.font_manager as fm
+import os
+
+font_path = r'{font_path}'
+if os.path.exists(font_path):
+    fm.fontManager.addfont(font_path)
+    plt.rcParams['font.family'] = 'Noto Sans SC'
+else:
+    import platform
+    system = platform.system()
+    if system == 'Darwin':
+        plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'PingFang SC', 'Heiti SC']
+    elif system == 'Windows':
+        plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei']
+    else:
+        plt.rcParams['font.sans-serif'] = ['WenQuanYi Micro Hei', 'Noto Sans CJK SC', 'DejaVu Sans']
+
+plt.rcParams['axes.unicode_minus'] = False
+plt.rcParams['font.size'] = 12
+""",
+            silent=True,
+        )
+        return cls(shell, font_path=font_path)
+
+    def push(self, variables: dict[str, Any]) -> None:
+        self.shell.push(variables)
+
+    @property
+    def alive(self) -> bool:
+        return True
+
+    def execute_cell(self, code: str, listener: OutputListener | None = None) -> CellOutcome:
+        """执行代码，收集标准输出与本次创建的 matplotlib 图片
+
+        输出与 pyplot 图都按上下文捕获，同一进程中的多个内核可以并行执行。传入
+        ``listener`` 时输出按间隔合并后边执行边推送，图片在 ``plt.show()`` /
+        ``savefig`` 时立即推送；执行结束时仍打开的图也会推送（内容没变的不重复）。
+        """
+        import matplotlib.pyplot as plt
+
+        self.executions += 1
+        self.running = True
+        streamer = OutputStreamer(listener) if listener is not None else None
+        images: list[str] = []
+        rendered: list[tuple[Any, str]] = []
+        capture = None
+
+        def add_figure(fig: Any) -> None:
+            image = _render_figure(fig)
+            last = next((item for figure, item in reversed(rendered) if figure is fig), None)
+            if image == last:
+                return
+            rendered.append((fig, image))
+            images.append(image)
+            if streamer is not None:
+                streamer.emit("image", image)
+
+        try:
+            with capture_output(
+                figures=True,
+                on_write=streamer.write if streamer is not None else None,
+                on_figure=add_figure,
+            ) as capture:
+                result = self.shell.run_cell(code, silent=False, store_history=False)
+            stdout_output = capture.stdout.getvalue()
+            stderr_output = capture.stderr.getvalue()
+
+            output = stdout_output
+            if stderr_output:
+                output += f"\n[stderr]: {stderr_output}"
+
+            for fig in capture.figures:
+                if plt.fignum_exists(fig.number):
+                    add_figure(fig)
+
+            if result.error_in_exec:
+                error_msg = "".join(
+                    traceback.format_exception(
+                        type(result.error_in_exec),
+                        result.error_in_exec,
+                        result.error_in_exec.__traceback__,
+                    )
+                )
+                combined_output = output.strip()
+                if combined_output:
+                    error_msg = f"{combined_output}\n\n执行错误:\n{error_msg}"
+                return CellOutcome(output=output, images=images, error=error_msg)
+            if result.error_before_exec:
+                combined_output = output.strip()
+                syntax_error = f"语法错误: {result.error_before_exec}"
+                if combined_output:
+                    syntax_error = f"{combined_output}\n\n{syntax_error}"
+                return CellOutcome(
+                    output=output, images=images, error=syntax_error, syntax_error=True
+                )
+
+            return CellOutcome(output=output, images=images)
+        finally:
+            if streamer is not None:
+                streamer.close()
+            for fig in capture.figures if capture is not None else []:
+                plt.close(fig)
+            self.running = False
+
+    async def execute(
+        self, code: str, timeout: float, listener: OutputListener | None = None
+    ) -> CellOutcome:
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(self.execute_cell, code, listener), timeout
+            )
+        except TimeoutError:
+            # 线程无法被中止，代码仍在后台运行；归还时内核会被回收
+            raise TimeoutError(f"Python 执行超时（{timeout:g} 秒）") from None
+
+    def reset(self) -> None:
+        """删除本次使用新建的变量，还原被覆盖的预热变量（已导入的模块保持不变）"""
+        namespace = self.shell.user_ns
+        for name in [name for name in namespace if name not in self._baseline]:
+            del namespace[name]
+        for name, value in self._baseline.items():
+            if namespace.get(name, self) is not value:
+                namespace[name] = value
+        outputs = namespace.get("_oh")
+        if isinstance(outputs, dict):
+            outputs.clear()
+
+    def rss_bytes(self) -> int | None:
+        return current_rss_bytes()
+
+    def close(self) -> None:
+        # InteractiveShell 在 atexit 中注册了自身，不注销就永远不会被回收
+        atexit.unregister(self.shell.atexit_operations)
+
+
+@dataclass
+class KernelPoolStats:
+    """Python 内核池统计"""
+
+    enabled: bool
+    backend: str
+    max_size: int
+    warm_size: int
+    max_executions: int
+    max_rss_bytes: int
+    idle: int = 0
+    in_use: int = 0
+    created: int = 0
+    checkouts: int = 0
+    cold_starts: int = 0
+    waits: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    recycled: int = 0
+    rss_bytes: int | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class KernelPool:
+    """进程级的预热内核池
+
+    - 启动时在后台线程中预热 ``warm_size`` 个内核；请求执行 Python 时借出内核，
+      结束后归还，归还时清空命名空间
+    - 每个事件循环同时借出的内核不超过 ``max_size``，其余请求排队；
+      没有空闲内核时就地创建（冷启动）
+    - ``backend`` 为 ``process`` 时内核运行在独立的沙箱进程中（见 ``python_sandbox``），
+      为 ``thread`` 时运行在 API 进程的工作线程中
+    - 执行次数达到 ``max_executions``、常驻内存（沙箱进程或 API 进程）超过
+      ``max_rss_bytes``、沙箱进程已退出，或归还时代码仍在运行（执行超时）的内核不再复用，
+      并在后台补足预热数量
+    """
+
+    def __init__(
+        self,
+        *,
+        max_size: int,
+        warm_size: int,
+        max_executions: int = 0,
+        max_rss_bytes: int = 0,
+        backend: KernelBackend = "thread",
+        font_path: str = DEFAULT_FONT_PATH,
+    ):
+        self._backend = backend
+        self._max_size = max(0, max_size)
+        self._warm_size = min(max(0, warm_size), self._max_size)
+        self._max_executions = max(0, max_executions)
+        self._max_rss_bytes = max(0, max_rss_bytes)
+        self._font_path = font_path
+        self._idle: list[PooledKernel] = []
+        self._leases: dict[int, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+        self._limits: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._warm_task: asyncio.Task[None] | None = None
+        self._stats = KernelPoolStats(
+            enabled=self.enabled,
+            backend=backend,
+            max_size=self._max_size,
+            warm_size=self._warm_size,
+            max_executions=self._max_executions,
+            max_rss_bytes=self._max_rss_bytes,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_size > 0
+
+    async def warm(self) -> None:
+        """补足空闲内核到 ``warm_size``（在线程中创建，不阻塞事件循环）"""
+        while True:
+            with self._lock:
+                if (
+                    len(self._idle) >= self._warm_size
+                    or len(self._idle) + len(self._leases) >= self._max_size
+                ):
+                    return
+            kernel = await asyncio.to_thread(self._create)
+            with self._lock:
+                if len(self._idle) + len(self._leases) < self._max_size:
+                    self._idle.append(kernel)
+                    continue
+            await asyncio.to_thread(kernel.close)
+            return
+
+    async def checkout(self) -> PooledKernel:
+        """借出一个内核，没有空闲槽位时等待"""
+        if not self.enabled:
+            raise RuntimeError("Python 内核池未启用")
+        slot = self._slot(asyncio.get_running_loop())
+        started = time.perf_counter()
+        waited = slot.locked()
+        await slot.acquire()
+        try:
+            with self._lock:
+                kernel = self._idle.pop() if self._idle else None
+            cold = kernel is None
+            if kernel is None:
+                kernel = await asyncio.to_thread(self._create)
+        except BaseException:
+            slot.release()
+            raise
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._leases[id(kernel)] = slot
+            self._stats.checkouts += 1
+            self._stats.cold_starts += int(cold)
+            self._stats.waits += int(waited)
+            self._stats.wait_seconds_total += elapsed
+            self._stats.wait_seconds_max = max(self._stats.wait_seconds_max, elapsed)
+        if waited or cold:
+            logger.info("Python kernel checked out", waited=waited, cold=cold, seconds=elapsed)
+        return kernel
+
+    async def checkin(self, kernel: PooledKernel) -> None:
+        """归还内核：重置命名空间后放回空闲列表，需要回收时丢弃
+
+        沙箱内核的重置与关闭要经过管道并等待进程，在线程中进行，不阻塞事件循环；
+        调用方被取消时归还仍会完成，槽位与沙箱进程不会泄漏。
+        """
+        await asyncio.shield(self._checkin(kernel))
+
+    async def _checkin(self, kernel: PooledKernel) -> None:
+        with self._lock:
+            slot = self._leases.pop(id(kernel), None)
+        if slot is None:
+            return
+
+        reason = self._recycle_reason(kernel)
+        if reason is None:
+            try:
+                await asyncio.to_thread(kernel.reset)
+            except Exception as exc:
+                reason = f"reset failed: {exc}"
+        with self._lock:
+            keep = reason is None and len(self._idle) + len(self._leases) < self._max_size
+            if keep:
+                self._idle.append(kernel)
+            else:
+                self._stats.recycled += 1
+        slot.release()
+
+        if not keep:
+            logger.info(
+                "Recycling Python kernel",
+                reason=reason or "pool full",
+                executions=kernel.executions,
+            )
+            await asyncio.to_thread(kernel.close)
+            self._schedule_warm()
+
+    def create_kernel(self) -> PooledKernel:
+        """按配置的后端创建一个不归池管理的内核（内核池未启用时使用）"""
+        if self._backend == "process":
+            from app.services.python_sandbox import SandboxKernel
+
+            return SandboxKernel.start(self._font_path)
+        return AnalysisKernel.create(self._font_path)
+
+    def start_warming(self) -> None:
+        """在后台预热内核（应用启动时调用）"""
+        self._schedule_warm()
+
+    def stats(self) -> KernelPoolStats:
+        with self._lock:
+            self._stats.idle = len(self._idle)
+            self._stats.in_use = len(self._leases)
+            stats = replace(self._stats)
+        stats.rss_bytes = current_rss_bytes()
+        return stats
+
+    def close(self) -> None:
+        """停止预热并丢弃空闲内核（进程关闭时使用）"""
+        if self._warm_task is not None:
+            self._warm_task.cancel()
+            self._warm_task = None
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for kernel in idle:
+            kernel.close()
+
+    def _create(self) -> PooledKernel:
+        kernel = self.create_kernel()
+        with self._lock:
+            self._stats.created += 1
+        return kernel
+
+    def _slot(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        slot = self._limits.get(loop)
+        if slot is None:
+            slot = self._limits[loop] = asyncio.Semaphore(self._max_size)
+        return slot
+
+    def _recycle_reason(self, kernel: PooledKernel) -> str | None:
+        if not kernel.alive:
+            return "exited"
+        if kernel.running:
+            # 超时后线程仍在执行代码，内核不能交给其他请求
+            return "busy"
+        if self._max_executions and kernel.executions >= self._max_executions:
+            return "executions"
+        if self._max_rss_bytes:
+            rss = kernel.rss_bytes()
+            if rss is not None and rss > self._max_rss_bytes:
+                return "memory"
+        return None
+
+    def _schedule_warm(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = self._warm_task
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        self._warm_task = loop.create_task(self.warm())
+
+
+kernel_pool = KernelPool(
+    max_size=settings.PYTHON_KERNEL_POOL_SIZE,
+    warm_size=settings.PYTHON_KERNEL_POOL_WARM,
+    max_executions=settings.PYTHON_KERNEL_MAX_EXECUTIONS,
+    max_rss_bytes=settings.PYTHON_KERNEL_MAX_RSS_BYTES,
+    backend=settings.PYTHON_EXECUTION_BACKEND,
+)
@@ -0,0 +1,196 @@
+"""Shared keep-alive HTTP clients for LLM calls."""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import json
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+import httpx
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# 通过 AsyncOpenAI 客户端发请求的 LiteLLM provider
+OPENAI_COMPATIBLE_PROVIDERS = frozenset({"openai", "deepseek"})
+# 通过 LiteLLM 自带 AsyncHTTPHandler 发请求的 provider
+HTTP_HANDLER_PROVIDERS = frozenset({"anthropic", "ollama"})
+
+TransportFactory = Callable[[httpx.Limits, bool], httpx.AsyncBaseTransport]
+
+
+@dataclass
+class LLMClientStats:
+    """单个 LLM 端点的连接统计"""
+
+    key: str
+    provider: str
+    base_url: str | None
+    http2: bool
+    max_connections: int
+    max_keepalive_connections: int
+    connections: int = 0
+    idle: int = 0
+    requests: int = 0
+    created_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class _PoolEntry:
+    transport: httpx.AsyncBaseTransport
+    stats: LLMClientStats
+    http_client: httpx.AsyncClient | None = None
+    openai_clients: dict[str, Any] = field(default_factory=dict)
+    http_handler: Any = None
+
+
+def _default_transport(limits: httpx.Limits, http2: bool) -> httpx.AsyncBaseTransport:
+    return httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+
+
+class LLMClientPool:
+    """按 (provider, base_url, headers) 复用的 LLM HTTP 连接池
+
+    - 每个端点一个带长连接的 transport，流式生成、修复重试和模型测试共享同一组 TLS 连接
+    - 安装了 ``h2`` 时启用 HTTP/2，同一连接上可以并发多个请求
+    - 返回的客户端直接作为 ``litellm.acompletion(client=...)`` 传入；不支持的 provider
+      返回 ``None``，由 LiteLLM 自行创建客户端
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60,
+        http2: bool = True,
+        timeout: float = 300,
+        transport_factory: TransportFactory | None = None,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.info("h2 is not installed, LLM clients fall back to HTTP/1.1")
+            http2 = False
+        self._enabled = enabled
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._http2 = http2
+        self._timeout = timeout
+        self._transport_factory = transport_factory or _default_transport
+        self._entries: dict[str, _PoolEntry] = {}
+
+    def get_client(
+        self,
+        *,
+        provider: str | None,
+        base_url: str | None,
+        headers: dict[str, str] | None = None,
+        api_key: str | None = None,
+    ) -> Any | None:
+        if not self._enabled or not provider:
+            return None
+        if provider in OPENAI_COMPATIBLE_PROVIDERS:
+            # 非 OpenAI 的兼容网关没有显式地址时交给 LiteLLM 解析默认地址；
+            # AsyncOpenAI 也要求必须有 API Key
+            if (provider != "openai" and not base_url) or not api_key:
+                return None
+            entry = self._get_entry(provider, base_url, headers)
+            client = entry.openai_clients.get(api_key)
+            if client is None:
+                from openai import AsyncOpenAI
+
+                client = entry.openai_clients[api_key] = AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    http_client=self._http_client(entry),
+                )
+        elif provider in HTTP_HANDLER_PROVIDERS:
+            entry = self._get_entry(provider, base_url, headers)
+            if entry.http_handler is None:
+                from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+
+                entry.http_handler = AsyncHTTPHandler(
+                    timeout=self._timeout, transport=entry.transport
+                )
+            client = entry.http_handler
+        else:
+            return None
+        entry.stats.requests += 1
+        return client
+
+    def stats(self) -> list[LLMClientStats]:
+        result = []
+        for entry in self._entries.values():
+            connections = getattr(getattr(entry.transport, "_pool", None), "connections", [])
+            entry.stats.connections = len(connections)
+            entry.stats.idle = sum(1 for connection in connections if connection.is_idle())
+            result.append(entry.stats)
+        return result
+
+    async def aclose(self) -> None:
+        """关闭所有端点的连接（应用关闭时调用）"""
+        entries = list(self._entries.values())
+        self._entries.clear()
+        for entry in entries:
+            try:
+                await entry.transport.aclose()
+            except Exception as exc:
+                logger.warning(
+                    "Failed to close LLM client transport",
+                    key=entry.stats.key,
+                    error=str(exc),
+                )
+        if entries:
+            logger.info("LLM client pool closed", endpoints=len(entries))
+
+    def _get_entry(
+        self, provider: str, base_url: str | None, headers: dict[str, str] | None
+    ) -> _PoolEntry:
+        key = hashlib.sha256(
+            json.dumps([provider, base_url or "", sorted((headers or {}).items())]).encode()
+        ).hexdigest()
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _PoolEntry(
+                transport=self._transport_factory(self._limits, self._http2),
+                stats=LLMClientStats(
+                    key=key,
+                    provider=provider,
+                    base_url=base_url,
+                    http2=self._http2,
+                    max_connections=self._limits.max_connections or 0,
+                    max_keepalive_connections=self._limits.max_keepalive_connections or 0,
+                ),
+            )
+            logger.info("LLM client created", provider=provider, base_url=base_url)
+        return entry
+
+    def _http_client(self, entry: _PoolEntry) -> httpx.AsyncClient:
+        if entry.http_client is None:
+            entry.http_client = httpx.AsyncClient(
+                transport=entry.transport,
+                timeout=httpx.Timeout(self._timeout, connect=10),
+            )
+        return entry.http_client
+
+
+llm_client_pool = LLMClientPool(
+    enabled=settings.LLM_HTTP_POOL_ENABLED,
+    max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    http2=settings.LLM_HTTP2,
+    timeout=settings.GPTME_TIMEOUT,
+)
@@ -0,0 +1,249 @@
+"""Per-context capture of stdout/stderr and pyplot figures for concurrent analysis code."""
+
+from __future__ import annotations
+
+import functools
+import io
+import sys
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, TextIO
+
+# 执行中的输出合并后推送的间隔（秒）
+OUTPUT_FLUSH_INTERVAL = 0.2
+
+_install_lock = threading.Lock()
+_figure_lock = threading.RLock()
+
+
+@dataclass
+class OutputCapture:
+    """一次执行捕获到的标准输出、标准错误与本次创建的 pyplot 图
+
+    ``on_write`` 收到每次写入的 ``(stream, text)``；``on_figure`` 在本次创建的图被
+    ``plt.show()`` 或 ``savefig`` 时调用（调用期间不在捕获中）。
+    """
+
+    stdout: io.StringIO = field(default_factory=io.StringIO)
+    stderr: io.StringIO = field(default_factory=io.StringIO)
+    figures: list[Any] = field(default_factory=list)
+    on_write: Callable[[str, str], None] | None = None
+    on_figure: Callable[[Any], None] | None = None
+
+
+_captures: ContextVar[OutputCapture | None] = ContextVar("python_output_capture", default=None)
+
+
+class ContextStream:
+    """替代 ``sys.stdout`` / ``sys.stderr`` 的分发流
+
+    当前上下文（线程或任务）正在捕获输出时写入它自己的缓冲区，否则写入原来的流。
+    与直接替换 ``sys.stdout`` 不同，并行的分析代码各自收集输出，其他请求的日志
+    也不会被吞掉。
+    """
+
+    def __init__(self, name: str, fallback: TextIO):
+        self._name = name
+        self.fallback = fallback
+
+    def _target(self) -> TextIO:
+        capture = _captures.get()
+        return getattr(capture, self._name) if capture is not None else self.fallback
+
+    def write(self, text: str) -> int:
+        capture = _captures.get()
+        if capture is None:
+            return self.fallback.write(text)
+        if capture.on_write is not None:
+            capture.on_write(self._name, text)
+        return getattr(capture, self._name).write(text)
+
+    def writelines(self, lines: Any) -> None:
+        for line in lines:
+            self.write(line)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def __getattr__(self, name: str) -> Any:
+        # encoding、isatty、fileno 等属性跟随当前的目标流
+        return getattr(self._target(), name)
+
+
+def install_context_streams() -> None:
+    """把 ``sys.stdout`` / ``sys.stderr`` 换成分发流（已经是分发流时不变）"""
+    with _install_lock:
+        if not isinstance(sys.stdout, ContextStream):
+            sys.stdout = ContextStream("stdout", sys.stdout)  # type: ignore[assignment]
+        if not isinstance(sys.stderr, ContextStream):
+            sys.stderr = ContextStream("stderr", sys.stderr)  # type: ignore[assignment]
+
+
+def install_figure_tracking() -> None:
+    """让 pyplot 的“当前图”按上下文区分
+
+    pyplot 用进程级的 ``Gcf`` 记录所有图和当前图。捕获中的上下文只能看到（``gcf``、
+    ``close("all")`` 等）自己创建的图，新建的图记录在 ``OutputCapture.figures`` 中；
+    不在捕获中的代码行为不变。``pyplot.figure`` 分配图编号不是原子的，创建图时加锁。
+    ``plt.show()`` 与 ``savefig`` 通知捕获的 ``on_figure``。
+    """
+    from matplotlib import _pylab_helpers, pyplot
+    from matplotlib.figure import Figure
+
+    gcf = _pylab_helpers.Gcf
+    with _install_lock:
+        if getattr(gcf, "_context_local", False):
+            return
+        create_figure = pyplot.figure
+        show = pyplot.show
+        savefig = Figure.savefig
+        set_new_active = gcf._set_new_active_manager.__func__  # type: ignore[attr-defined]
+        get_active = gcf.get_active.__func__  # type: ignore[attr-defined]
+        destroy_all = gcf.destroy_all.__func__  # type: ignore[attr-defined]
+
+        def _owned(cls: Any) -> tuple[OutputCapture | None, list[Any]]:
+            capture = _captures.get()
+            if capture is None:
+                return None, []
+            return capture, [
+                manager
+                for manager in list(cls.figs.values())
+                if any(manager.canvas.figure is figure for figure in capture.figures)
+            ]
+
+        def _context_set_new_active(cls: Any, manager: Any) -> None:
+            set_new_active(cls, manager)
+            capture = _captures.get()
+            if capture is not None:
+                capture.figures.append(manager.canvas.figure)
+
+        def _context_get_active(cls: Any) -> Any:
+            capture, owned = _owned(cls)
+            if capture is None:
+                return get_active(cls)
+            return owned[-1] if owned else None
+
+        def _context_destroy_all(cls: Any) -> None:
+            capture, owned = _owned(cls)
+            if capture is None:
+                destroy_all(cls)
+                return
+            for manager in owned:
+                cls.destroy(manager)
+
+        def _notify(capture: OutputCapture, figures: list[Any]) -> None:
+            if capture.on_figure is None:
+                return
+            # 回调中渲染图片时不再触发通知
+            token = _captures.set(None)
+            try:
+                for figure in figures:
+                    capture.on_figure(figure)
+            finally:
+                _captures.reset(token)
+
+        @functools.wraps(show)
+        def _context_show(*args: Any, **kwargs: Any) -> Any:
+            capture, owned = _owned(gcf)
+            if capture is not None:
+                _notify(capture, [manager.canvas.figure for manager in owned])
+            return show(*args, **kwargs)
+
+        @functools.wraps(savefig)
+        def _context_savefig(figure: Any, *args: Any, **kwargs: Any) -> Any:
+            result = savefig(figure, *args, **kwargs)
+            capture = _captures.get()
+            if capture is not None and any(figure is item for item in capture.figures):
+                _notify(capture, [figure])
+            return result
+
+        @functools.wraps(create_figure)
+        def _locked_figure(*args: Any, **kwargs: Any) -> Any:
+            with _figure_lock:
+                return create_figure(*args, **kwargs)
+
+        pyplot.figure = _locked_figure
+        pyplot.show = _context_show
+        Figure.savefig = _context_savefig  # type: ignore[method-assign]
+        gcf._set_new_active_manager = classmethod(_context_set_new_active)  # type: ignore[assignment]
+        gcf.get_active = classmethod(_context_get_active)  # type: ignore[assignment]
+        gcf.destroy_all = classmethod(_context_destroy_all)  # type: ignore[assignment]
+        gcf._context_local = True  # type: ignore[attr-defined]
+
+
+@contextmanager
+def capture_output(
+    *,
+    figures: bool = False,
+    on_write: Callable[[str, str], None] | None = None,
+    on_figure: Callable[[Any], None] | None = None,
+) -> Iterator[OutputCapture]:
+    """在当前上下文中捕获标准输出、标准错误（以及 ``figures`` 时新建的 pyplot 图）"""
+    install_context_streams()
+    if figures:
+        install_figure_tracking()
+    capture = OutputCapture(on_write=on_write, on_figure=on_figure)
+    token = _captures.set(capture)
+    try:
+        yield capture
+    finally:
+        _captures.reset(token)
+
+
+class OutputStreamer:
+    """把执行中的输出合并后交给 ``emit``
+
+    写入的文本先放在缓冲区，由后台线程每 ``interval`` 秒推送一次，相邻的同一流的
+    写入合并成一条；图片等其他事件先推送已缓冲的文本再立即发出，保持先后顺序。
+    ``close`` 推送剩余的文本，之后不再调用 ``emit``。
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[str, str], None],
+        interval: float = OUTPUT_FLUSH_INTERVAL,
+    ):
+        self._emit = emit
+        self._interval = interval
+        self._pending: list[tuple[str, list[str]]] = []
+        self._pending_lock = threading.Lock()
+        self._emit_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="python-output-flush", daemon=True)
+        self._thread.start()
+
+    def write(self, stream: str, text: str) -> None:
+        if not text:
+            return
+        with self._pending_lock:
+            if self._pending and self._pending[-1][0] == stream:
+                self._pending[-1][1].append(text)
+            else:
+                self._pending.append((stream, [text]))
+
+    def emit(self, kind: str, payload: str) -> None:
+        with self._emit_lock:
+            self._flush()
+            self._emit(kind, payload)
+
+    def flush(self) -> None:
+        with self._emit_lock:
+            self._flush()
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+        self.flush()
+
+    def _flush(self) -> None:
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        for stream, parts in pending:
+            self._emit(stream, "".join(parts))
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            self.flush()
@@ -2,16 +2,20 @@
 
 import ast
 import asyncio
-import base64
-import io
-import os
-import sys
-import traceback
 from importlib.util import find_spec
 from typing import Any
 
 import structlog
 
+from app.services.kernel_pool import (
+    AnalysisKernel,
+    CellOutcome,
+    KernelPool,
+    OutputListener,
+    PooledKernel,
+)
+from app.services.query_result import QueryResult
+
 logger = structlog.get_logger()
 
 BLOCKED_MODULES = frozenset(
@@ -151,12 +155,20 @@ def validate_python_code(code: str) -> tuple[bool, str | None]:
 
 
 class PythonExecutionRuntime:
+    """一次请求的 Python 执行环境
+
+    内核在第一次执行代码时从 ``pool`` 借出（未启用内核池时单独创建），请求结束时
+    由 ``release`` 归还；借出之前注入的 SQL 结果在借出时一并放入命名空间。
+    内核可能运行在沙箱进程中，执行结果与错误都以 ``CellOutcome`` 返回。
+    """
+
     def __init__(
         self,
         *,
         available_python_libraries: list[str] | None = None,
         analytics_installed: bool = False,
         font_path: str,
+        pool: KernelPool | None = None,
     ):
         self.available_python_libraries = available_python_libraries or [
             "pandas",
@@ -165,68 +177,72 @@ class PythonExecutionRuntime:
         ]
         self.analytics_installed = analytics_installed
         self.font_path = font_path
-        self._ipython = None
+        self.pool = pool
+        self._kernel: PooledKernel | None = None
+        self._pooled = False
         self._sql_data: dict[str, Any] = {}
 
     @property
     def ipython(self):
-        return self._ipython
+        # 沙箱进程中的内核没有本地的 InteractiveShell
+        return getattr(self._kernel, "shell", None)
 
     @property
     def sql_data(self) -> dict[str, Any]:
         return self._sql_data
 
     def get_ipython(self):
-        if self._ipython is None:
-            from IPython.core.interactiveshell import InteractiveShell
-
-            self._ipython = InteractiveShell()
-            font_loaded = os.path.exists(self.font_path)
-            if font_loaded:
-                logger.info("Loading bundled font", path=self.font_path)
-            else:
-                logger.warning(
-                    "Bundled font not found, falling back to system fonts", path=self.font_path
-                )
-
-            self._ipython.run_cell(
-                f"""
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-import os
-
-font_path = r'{self.font_path}'
-if os.path.exists(font_path):
-    fm.fontManager.addfont(font_path)
-    plt.rcParams['font.family'] = 'Noto Sans SC'
-else:
-    import platform
-    system = platform.system()
-    if system == 'Darwin':
-        plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'PingFang SC', 'Heiti SC']
-    elif system == 'Windows':
-        plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei']
-    else:
-        plt.rcParams['font.sans-serif'] = ['WenQuanYi Micro Hei', 'Noto Sans CJK SC', 'DejaVu Sans']
-
-plt.rcParams['axes.unicode_minus'] = False
-plt.rcParams['font.size'] = 12
-""",
-                silent=True,
+        return getattr(self._get_kernel(), "shell", None)
+
+    def _get_kernel(self) -> PooledKernel:
+        if self._kernel is None:
+            self._kernel = (
+                self.pool.create_kernel()
+                if self.pool is not None
+                else AnalysisKernel.create(self.font_path)
             )
-        return self._ipython
-
-    def inject_sql_data(self, name: str, data: list[dict[str, Any]]) -> None:
+            self._kernel.push(self._sql_data)
+        return self._kernel
+
+    async def acquire(self) -> None:
+        """借出（或创建）内核并放入已注入的 SQL 结果"""
+        if self._kernel is not None:
+            return
+        if self.pool is None or not self.pool.enabled:
+            await asyncio.to_thread(self._get_kernel)
+            return
+        kernel = await self.pool.checkout()
+        if self._kernel is not None:
+            await self.pool.checkin(kernel)
+            return
+        self._kernel = kernel
+        self._pooled = True
+        # 沙箱内核需要把 DataFrame 序列化后写入管道，不在事件循环中进行
+        await asyncio.to_thread(kernel.push, dict(self._sql_data))
+
+    async def release(self) -> None:
+        """归还内核，之后再执行代码会重新借出"""
+        kernel, self._kernel = self._kernel, None
+        pooled, self._pooled = self._pooled, False
+        if kernel is None:
+            return
+        if pooled and self.pool is not None:
+            await self.pool.checkin(kernel)
+        else:
+            await asyncio.shield(asyncio.to_thread(kernel.close))
+
+    async def inject_sql_data(self, name: str, data: QueryResult | list[dict[str, Any]]) -> None:
         import pandas as pd
 
-        df = pd.DataFrame(data)
-        self.get_ipython().push({name: df})
+        if isinstance(data, QueryResult):
+            # 浅拷贝：共享结果缓存的列数据，但增删列不会影响其他变量
+            df = data.to_pandas().copy(deep=False)
+        else:
+            df = pd.DataFrame(data)
         self._sql_data[name] = df
-        logger.info("Injected SQL data into Python runtime", name=name, rows=len(data))
+        if self._kernel is not None:
+            await asyncio.to_thread(self._kernel.push, {name: df})
+        logger.info("Injected SQL data into Python runtime", name=name, rows=len(df))
 
     def validate_dependencies(self, code: str) -> tuple[bool, str | None]:
         try:
@@ -256,7 +272,13 @@ plt.rcParams['font.size'] = 12
         package_names = ", ".join(sorted(set(missing)))
         return False, f"未安装所需 Python 库: {package_names}"
 
-    async def execute(self, code: str, timeout: int = 30) -> tuple[str | None, list[str]]:
+    async def execute(
+        self,
+        code: str,
+        timeout: int = 30,
+        listener: OutputListener | None = None,
+    ) -> tuple[str | None, list[str]]:
+        """执行代码并返回输出与图片；``listener`` 在执行过程中收到输出与图片"""
         is_valid, error = validate_python_code(code)
         if not is_valid:
             raise ValueError(error)
@@ -265,63 +287,17 @@ plt.rcParams['font.size'] = 12
         if not deps_ok:
             raise RuntimeError(deps_error)
 
-        return await asyncio.wait_for(
-            asyncio.to_thread(self.execute_sync, code),
-            timeout=timeout,
-        )
+        await self.acquire()
+        assert self._kernel is not None
+        return self._unpack(await self._kernel.execute(code, timeout, listener))
 
     def execute_sync(self, code: str) -> tuple[str | None, list[str]]:
-        import matplotlib.pyplot as plt
-
-        ipython = self.get_ipython()
-        stdout_capture = io.StringIO()
-        stderr_capture = io.StringIO()
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-        sys.stdout = stdout_capture
-        sys.stderr = stderr_capture
-
-        images: list[str] = []
-
-        try:
-            result = ipython.run_cell(code, silent=False, store_history=False)
-            stdout_output = stdout_capture.getvalue()
-            stderr_output = stderr_capture.getvalue()
-
-            output = stdout_output
-            if stderr_output:
-                output += f"\n[stderr]: {stderr_output}"
-
-            if plt.get_fignums():
-                for fig_num in plt.get_fignums():
-                    fig = plt.figure(fig_num)
-                    buf = io.BytesIO()
-                    fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
-                    buf.seek(0)
-                    images.append(base64.b64encode(buf.read()).decode("utf-8"))
-                plt.close("all")
-
-            if result.error_in_exec:
-                error_msg = "".join(
-                    traceback.format_exception(
-                        type(result.error_in_exec),
-                        result.error_in_exec,
-                        result.error_in_exec.__traceback__,
-                    )
-                )
-                combined_output = output.strip()
-                if combined_output:
-                    error_msg = f"{combined_output}\n\n执行错误:\n{error_msg}"
-                raise RuntimeError(error_msg)
-            if result.error_before_exec:
-                combined_output = output.strip()
-                syntax_error = f"语法错误: {result.error_before_exec}"
-                if combined_output:
-                    syntax_error = f"{combined_output}\n\n{syntax_error}"
-                raise SyntaxError(syntax_error)
-
-            return output if output else None, images
-        finally:
-            plt.close("all")
-            sys.stdout = old_stdout
-            sys.stderr = old_stderr
+        return self._unpack(self._get_kernel().execute_cell(code))
+
+    @staticmethod
+    def _unpack(outcome: CellOutcome) -> tuple[str | None, list[str]]:
+        if outcome.error is not None:
+            if outcome.syntax_error:
+                raise SyntaxError(outcome.error)
+            raise RuntimeError(outcome.error)
+        return outcome.output or None, outcome.images
@@ -0,0 +1,295 @@
+"""Python analysis kernels running in isolated, resource-limited worker processes."""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import signal
+import threading
+import time
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any
+
+import structlog
+
+from app.core.config import settings
+from app.services.artifact_store import artifact_store
+from app.services.kernel_pool import (
+    DEFAULT_FONT_PATH,
+    AnalysisKernel,
+    CellOutcome,
+    OutputListener,
+    current_rss_bytes,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+logger = structlog.get_logger()
+
+# forkserver 预先导入这些模块，新的沙箱进程由它 fork 出来，不必重复导入
+PRELOAD_MODULES = [
+    "pandas",
+    "numpy",
+    "matplotlib.pyplot",
+    "IPython.core.interactiveshell",
+    "app.services.python_sandbox",
+]
+START_TIMEOUT = 60
+CONTROL_TIMEOUT = 10
+
+
+class SandboxError(RuntimeError):
+    """沙箱进程退出或无响应"""
+
+
+def _context() -> Any:
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    if context.get_start_method() == "forkserver":
+        context.set_forkserver_preload(PRELOAD_MODULES)
+    return context
+
+
+def _limit_memory(limit: int) -> None:
+    if resource is None or limit <= 0:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _limit_cpu(seconds: int) -> None:
+    """本次执行最多再使用 ``seconds`` 秒 CPU，超出时内核发送 SIGXCPU 结束进程"""
+    if resource is None or seconds <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + seconds
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _serve(
+    conn: Connection,
+    font_path: str,
+    memory_limit: int,
+    cpu_limit: int,
+    artifact_dir: str,
+) -> None:
+    """沙箱进程主循环：逐条处理父进程发来的 ``(command, payload)``"""
+    # 终端的 Ctrl+C 由父进程处理，沙箱进程随父进程关闭
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # 图片直接写入父进程使用的产物目录，管道中只传递产物 ID
+    artifact_store.root = Path(artifact_dir)
+    _limit_memory(memory_limit)
+    kernel = AnalysisKernel.create(font_path)
+    conn.send(("ok", None))
+    while True:
+        try:
+            command, payload = conn.recv()
+        except (EOFError, OSError):
+            return
+        if command == "close":
+            return
+        try:
+            result: CellOutcome | None = None
+            if command == "run":
+                code, stream = payload
+                _limit_cpu(cpu_limit)
+                result = kernel.execute_cell(
+                    code,
+                    (lambda kind, data: conn.send(("stream", (kind, data)))) if stream else None,
+                )
+            elif command == "push":
+                kernel.push(payload)
+            elif command == "reset":
+                kernel.reset()
+            else:
+                raise ValueError(f"未知的沙箱命令: {command}")
+        except Exception as exc:
+            conn.send(("error", f"{type(exc).__name__}: {exc}"))
+        else:
+            conn.send(("ok", result))
+
+
+class SandboxKernel:
+    """运行在独立进程中的分析内核
+
+    - 进程由预先导入分析库的 forkserver 创建，启动时设置 ``RLIMIT_AS`` 内存上限
+    - 每次执行前设置 ``RLIMIT_CPU``，死循环等 CPU 超限时进程被系统结束；
+      超过墙钟超时或请求被取消时父进程直接杀掉进程
+    - 代码、注入的 DataFrame 与执行结果（输出、图片的产物 ID）都通过管道传递，执行中
+      的输出以 ``stream`` 消息边执行边发回
+    - 进程退出后内核不可再用，由内核池丢弃并重新创建
+    """
+
+    def __init__(self, process: Any, conn: Connection, *, cpu_limit: int):
+        self._process = process
+        self._conn = conn
+        self._cpu_limit = cpu_limit
+        self._lock = threading.Lock()
+        self._killed = False
+        self.created_at = time.time()
+        self.executions = 0
+        self.running = False
+
+    @classmethod
+    def start(
+        cls,
+        font_path: str = DEFAULT_FONT_PATH,
+        *,
+        memory_limit: int | None = None,
+        cpu_limit: int | None = None,
+    ) -> SandboxKernel:
+        memory_limit = (
+            settings.PYTHON_SANDBOX_MEMORY_LIMIT if memory_limit is None else memory_limit
+        )
+        cpu_limit = settings.PYTHON_SANDBOX_CPU_LIMIT if cpu_limit is None else cpu_limit
+        context = _context()
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_serve,
+            args=(child_conn, font_path, memory_limit, cpu_limit, str(artifact_store.root)),
+            name="querygpt-python-sandbox",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        kernel = cls(process, parent_conn, cpu_limit=cpu_limit)
+        try:
+            kernel._call("start", timeout=START_TIMEOUT, send=False)
+        except BaseException:
+            kernel.close()
+            raise
+        logger.info("Started Python sandbox process", pid=process.pid)
+        return kernel
+
+    @property
+    def pid(self) -> int | None:
+        return self._process.pid
+
+    @property
+    def alive(self) -> bool:
+        return not self._killed and self._process.is_alive()
+
+    def push(self, variables: dict[str, Any]) -> None:
+        if variables:
+            self._call("push", variables, timeout=CONTROL_TIMEOUT)
+
+    def execute_cell(
+        self,
+        code: str,
+        listener: OutputListener | None = None,
+        timeout: float | None = None,
+    ) -> CellOutcome:
+        self.executions += 1
+        self.running = True
+        try:
+            outcome = self._call(
+                "run", (code, listener is not None), timeout=timeout, listener=listener
+            )
+        finally:
+            self.running = False
+        if not isinstance(outcome, CellOutcome):
+            raise SandboxError("沙箱进程返回了无法识别的结果")
+        return outcome
+
+    async def execute(
+        self, code: str, timeout: float, listener: OutputListener | None = None
+    ) -> CellOutcome:
+        try:
+            return await asyncio.to_thread(self.execute_cell, code, listener, timeout)
+        except asyncio.CancelledError:
+            # 请求被取消时不再等待结果，直接结束进程（等待进程退出不阻塞事件循环）
+            await asyncio.shield(asyncio.to_thread(self.kill))
+            raise
+
+    def reset(self) -> None:
+        self._call("reset", timeout=CONTROL_TIMEOUT)
+
+    def rss_bytes(self) -> int | None:
+        return current_rss_bytes(self._process.pid) if self.alive else None
+
+    def kill(self) -> None:
+        self._killed = True
+        if self._process.is_alive():
+            self._process.kill()
+        self._process.join(timeout=1)
+
+    def close(self) -> None:
+        if not self._killed and self._process.is_alive():
+            try:
+                self._conn.send(("close", None))
+            except OSError:
+                pass
+            self._process.join(timeout=1)
+        self.kill()
+        self._conn.close()
+
+    def _call(
+        self,
+        command: str,
+        payload: Any = None,
+        *,
+        timeout: float | None,
+        send: bool = True,
+        listener: OutputListener | None = None,
+    ) -> Any:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            if self._killed:
+                raise SandboxError("Python 沙箱进程已终止")
+            if send:
+                self._send((command, payload))
+            while True:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                message = self._receive(remaining)
+                if message is None:
+                    self.kill()
+                    if command == "run":
+                        raise TimeoutError(f"Python 执行超时（{timeout:g} 秒），沙箱进程已终止")
+                    raise SandboxError(f"Python 沙箱进程无响应（{command}）")
+                if message[0] != "stream":
+                    break
+                if listener is not None:
+                    listener(*message[1])
+        status, result = message
+        if status == "error":
+            raise SandboxError(result)
+        return result
+
+    def _send(self, message: Any) -> None:
+        try:
+            self._conn.send(message)
+        except OSError as exc:
+            raise self._lost() from exc
+
+    def _receive(self, timeout: float | None) -> Any:
+        try:
+            return self._conn.recv() if self._conn.poll(timeout) else None
+        except (EOFError, OSError) as exc:
+            raise self._lost() from exc
+
+    def _lost(self) -> Exception:
+        killed = self._killed
+        self.kill()
+        return self._exit_error(killed)
+
+    def _exit_error(self, killed: bool) -> Exception:
+        exitcode = self._process.exitcode
+        if killed:
+            return SandboxError("Python 执行已取消，沙箱进程已终止")
+        if exitcode is not None and -exitcode == getattr(signal, "SIGXCPU", None):
+            return TimeoutError(
+                f"Python 执行超时：CPU 时间超过 {self._cpu_limit} 秒，沙箱进程已终止"
+            )
+        if exitcode is not None and -exitcode == getattr(signal, "SIGKILL", None):
+            # 通常是系统内存不足时被 OOM killer 结束
+            return SandboxError("Python 沙箱进程被系统终止（可能是内存不足）")
+        return SandboxError(f"Python 沙箱进程异常退出（exit code {exitcode}）")
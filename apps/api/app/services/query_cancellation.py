@@ -0,0 +1,102 @@
+"""Cancellation of in-flight database statements."""
+
+from __future__ import annotations
+
+import threading
+import weakref
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from itertools import count
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class QueryCancelledError(RuntimeError):
+    """语句因停止请求被取消"""
+
+
+class QueryCancellation:
+    """一次聊天执行的取消信号
+
+    数据库语句执行期间通过 :meth:`track` 登记驱动层的取消函数（PostgreSQL 取消请求、
+    MySQL ``KILL QUERY``、SQLite ``interrupt``）。:meth:`request` 只设置标记，
+    :meth:`cancel_statements` 才真正调用这些函数；后者可能建立新连接，应在线程中执行。
+    :meth:`child` 创建的子信号可以单独取消（例如丢弃提前执行的 SQL），父信号取消时
+    子信号的语句也一并取消。
+    """
+
+    def __init__(self, parent: QueryCancellation | None = None) -> None:
+        self._lock = threading.Lock()
+        self._requested = False
+        self._ids = count(1)
+        self._handles: dict[int, _CancelHandle] = {}
+        self._parent = parent
+        self._children: weakref.WeakSet[QueryCancellation] = weakref.WeakSet()
+
+    @property
+    def requested(self) -> bool:
+        return self._requested or (self._parent is not None and self._parent.requested)
+
+    def child(self) -> QueryCancellation:
+        child = QueryCancellation(parent=self)
+        with self._lock:
+            self._children.add(child)
+        return child
+
+    def request(self) -> None:
+        with self._lock:
+            self._requested = True
+
+    def cancel_statements(self) -> int:
+        """取消所有正在执行的语句，返回发出的取消数"""
+        with self._lock:
+            self._requested = True
+            handles = list(self._handles.values())
+            children = list(self._children)
+        cancelled = sum(child.cancel_statements() for child in children)
+        for handle in handles:
+            # 取消期间持有句柄锁，语句结束后连接要等取消完成才能归还连接池
+            with handle.lock:
+                if handle.finished:
+                    continue
+                cancelled += 1
+                try:
+                    handle.cancel()
+                except Exception as exc:
+                    logger.warning("Failed to cancel database statement", error=str(exc))
+        if cancelled:
+            logger.info("Database statements cancelled", statements=cancelled)
+        return cancelled
+
+    @contextmanager
+    def track(self, cancel: Callable[[], None]) -> Iterator[None]:
+        """在语句执行期间登记取消函数；已请求停止时直接拒绝执行
+
+        退出时等待正在进行的取消完成，取消请求不会落到连接归还后执行的其他语句上。
+        """
+        handle = _CancelHandle(cancel)
+        with self._lock:
+            if self.requested:
+                raise QueryCancelledError("查询已取消")
+            handle_id = next(self._ids)
+            self._handles[handle_id] = handle
+        try:
+            yield
+        finally:
+            with handle.lock:
+                handle.finished = True
+            with self._lock:
+                self._handles.pop(handle_id, None)
+
+
+class _CancelHandle:
+    """一条正在执行的语句的取消函数"""
+
+    __slots__ = ("cancel", "finished", "lock")
+
+    def __init__(self, cancel: Callable[[], None]):
+        self.cancel = cancel
+        self.finished = False
+        self.lock = threading.Lock()
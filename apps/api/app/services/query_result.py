@@ -0,0 +1,206 @@
+"""Columnar query results."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+
+@dataclass
+class QueryResult:
+    """列式查询结果
+
+    列名和类型只保存一次，值按列存放在 ``values`` 中。行字典（``rows``）与 DataFrame
+    （``to_pandas()``）都在第一次使用时才生成，并随结果缓存复用。
+
+    ``rows_fetched`` 是从游标读取的行数（可能比返回的多一行探测行）；
+    ``total_rows`` 只在结果集被完整读取时给出；``cached`` 表示结果来自结果缓存；
+    ``cost_limited`` 表示代价检查为查询追加了 LIMIT，结果不完整；
+    ``arrow`` 是驱动直接返回的 Arrow 表（DuckDB），存在时 ``to_arrow()`` / ``to_pandas()`` 不再转换。
+    """
+
+    columns: list[str] = field(default_factory=list)
+    column_types: list[str | None] = field(default_factory=list)
+    values: list[list[Any]] = field(default_factory=list)
+    truncated: bool = False
+    rows_fetched: int = 0
+    total_rows: int | None = None
+    cached: bool = False
+    cost_limited: bool = False
+    arrow: pa.Table | None = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if not self.values:
+            self.values = [[] for _ in self.columns]
+        if len(self.column_types) != len(self.columns):
+            self.column_types = [None] * len(self.columns)
+        self.column_types = [
+            declared or _infer_type(column_values)
+            for declared, column_values in zip(self.column_types, self.values, strict=True)
+        ]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict[str, Any]], **kwargs: Any) -> QueryResult:
+        """由行字典构建（列顺序取首次出现的顺序）"""
+        rows = list(rows)
+        columns: dict[str, None] = {}
+        for row in rows:
+            columns.update(dict.fromkeys(row))
+        names = list(columns)
+        return cls(
+            columns=names,
+            values=[[row.get(name) for row in rows] for name in names],
+            **kwargs,
+        )
+
+    @property
+    def rows_count(self) -> int:
+        return len(self.values[0]) if self.values else 0
+
+    def column(self, name: str) -> list[Any]:
+        return self.values[self.columns.index(name)]
+
+    def head(self, n: int) -> QueryResult:
+        return QueryResult(
+            columns=self.columns,
+            column_types=self.column_types,
+            values=[column_values[:n] for column_values in self.values],
+            arrow=None if self.arrow is None else self.arrow.slice(0, n),
+        )
+
+    @cached_property
+    def rows(self) -> list[dict[str, Any]]:
+        """行字典视图（同名列以最后一列为准，与原先的字典游标一致）"""
+        return [dict(zip(self.columns, row, strict=True)) for row in zip(*self.values)]
+
+    def to_pandas(self) -> pd.DataFrame:
+        """转换为 DataFrame；只转换一次，后续调用返回同一对象"""
+        return self._frame
+
+    @cached_property
+    def _frame(self) -> pd.DataFrame:
+        import pandas as pd
+
+        if self.arrow is not None:
+            return self.arrow.to_pandas()
+        # 用位置作为临时列名，保留 SQL 中的同名列
+        frame = pd.DataFrame(dict(enumerate(self.values)), columns=range(len(self.columns)))
+        frame.columns = pd.Index(self.columns)
+        return frame
+
+    def to_arrow(self) -> pa.Table:
+        """转换为 Arrow 表（需要安装 pyarrow）"""
+        import pyarrow as pa
+
+        if self.arrow is not None:
+            return self.arrow
+
+        return pa.Table.from_arrays(
+            [pa.array(column_values) for column_values in self.values],
+            names=self.columns,
+        )
+
+
+def estimate_row_bytes(row: Sequence[Any]) -> int:
+    """粗略估算一行结果序列化后的大小"""
+    return sum(len(value) if isinstance(value, str | bytes) else 8 for value in row)
+
+
+def collect_result(
+    columns: Sequence[tuple[str, str | None]],
+    batches: Iterable[Sequence[Sequence[Any]]],
+    *,
+    max_rows: int,
+    max_bytes: int,
+) -> QueryResult:
+    """按行数与字节预算读取游标批次并转为列式结果，超出预算即停止（至少保留一行）"""
+    values: list[list[Any]] = [[] for _ in columns]
+    kept = 0
+    size = 0
+    fetched = 0
+    truncated = False
+    for batch in batches:
+        end = 0
+        for row in batch:
+            fetched += 1
+            if max_rows > 0 and kept + end >= max_rows:
+                truncated = True
+                break
+            size += estimate_row_bytes(row)
+            if max_bytes > 0 and kept + end > 0 and size > max_bytes:
+                truncated = True
+                break
+            end += 1
+        for column_values, batch_values in zip(values, zip(*batch[:end]), strict=False):
+            column_values.extend(batch_values)
+        kept += end
+        if truncated:
+            break
+
+    return QueryResult(
+        columns=[name for name, _ in columns],
+        column_types=[type_name for _, type_name in columns],
+        values=values,
+        truncated=truncated,
+        rows_fetched=fetched,
+        total_rows=None if truncated else kept,
+    )
+
+
+def collect_arrow_result(
+    batches: Iterable[pa.RecordBatch],
+    schema: pa.Schema,
+    *,
+    max_rows: int,
+    max_bytes: int,
+) -> QueryResult:
+    """按与 :func:`collect_result` 相同的预算读取 Arrow 批次，批次内按平均行宽截取"""
+    import pyarrow as pa
+
+    kept_batches: list[pa.RecordBatch] = []
+    kept = 0
+    size = 0
+    fetched = 0
+    truncated = False
+    for batch in batches:
+        fetched += batch.num_rows
+        if not batch.num_rows:
+            continue
+        take = batch.num_rows
+        if max_rows > 0:
+            take = min(take, max_rows - kept)
+        if max_bytes > 0:
+            row_bytes = max(batch.nbytes / batch.num_rows, 1)
+            fits = int((max_bytes - size) / row_bytes)
+            take = min(take, max(fits, 0 if kept else 1))
+        if take < batch.num_rows:
+            truncated = True
+            batch = batch.slice(0, take)
+        if take:
+            kept_batches.append(batch)
+            kept += take
+            size += batch.nbytes
+        if truncated:
+            break
+
+    table = pa.Table.from_batches(kept_batches, schema=schema)
+    return QueryResult(
+        columns=list(table.column_names),
+        column_types=[str(item.type) for item in table.schema],
+        values=[column.to_pylist() for column in table.columns],
+        truncated=truncated,
+        rows_fetched=fetched,
+        total_rows=None if truncated else kept,
+        arrow=table,
+    )
+
+
+def _infer_type(column_values: list[Any]) -> str | None:
+    value = next((item for item in column_values if item is not None), None)
+    return None if value is None else type(value).__name__
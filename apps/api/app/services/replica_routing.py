@@ -0,0 +1,220 @@
+"""Weighted routing of read-only queries across replica endpoints."""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+@dataclass(frozen=True)
+class ReplicaEndpoint:
+    """只读副本端点（来自连接的 ``extra_options.replicas``）
+
+    未填写的 ``port`` / ``database`` 沿用主库配置，账号密码始终与主库相同；
+    ``weight`` 为 0 的副本不接收查询，``max_lag`` 为空时使用 REPLICA_MAX_LAG。
+    """
+
+    host: str
+    port: int | None = None
+    database: str | None = None
+    weight: float = 1.0
+    max_lag: float | None = None
+
+    @classmethod
+    def parse_list(cls, options: Any) -> tuple[ReplicaEndpoint, ...]:
+        """解析副本列表，格式错误的条目记录警告后跳过"""
+        if not options:
+            return ()
+        if not isinstance(options, list | tuple):
+            logger.warning("Ignoring invalid replica options", options=str(options)[:200])
+            return ()
+        endpoints = []
+        for item in options:
+            try:
+                if isinstance(item, ReplicaEndpoint):
+                    endpoint = item
+                elif isinstance(item, str):
+                    endpoint = cls(host=item)
+                else:
+                    endpoint = cls(
+                        host=str(item.get("host") or ""),
+                        port=int(item["port"]) if item.get("port") else None,
+                        database=item.get("database") or None,
+                        weight=float(item.get("weight", 1.0)),
+                        max_lag=(
+                            float(item["max_lag"]) if item.get("max_lag") is not None else None
+                        ),
+                    )
+                if not endpoint.host and not endpoint.database:
+                    raise ValueError("副本需要 host 或 database")
+                if endpoint.weight < 0:
+                    raise ValueError("weight 不能为负数")
+            except (AttributeError, KeyError, TypeError, ValueError) as exc:
+                logger.warning("Ignoring invalid replica endpoint", error=str(exc))
+                continue
+            endpoints.append(endpoint)
+        return tuple(endpoints)
+
+    def allowed_lag(self) -> float:
+        return settings.REPLICA_MAX_LAG if self.max_lag is None else self.max_lag
+
+
+@dataclass
+class ReplicaStatus:
+    """副本运行状态"""
+
+    key: str
+    host: str
+    port: int | None
+    database: str
+    weight: float
+    healthy: bool = True
+    lag: float | None = None
+    served: int = 0
+    failures: int = 0
+    last_error: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class _ReplicaState:
+    status: ReplicaStatus
+    unhealthy_until: float = 0
+    lag_checked_at: float | None = None
+    lagging: bool = False
+
+
+class ReplicaRouter:
+    """进程级副本健康状态与加权选择
+
+    - 连接失败或复制延迟检测出错的副本在 ``retry_interval`` 秒内不再被选择，之后重新尝试
+    - 复制延迟每 ``lag_check_interval`` 秒在借出的连接上检测一次，超出 ``max_lag`` 的副本
+      在下次检测前被跳过
+    - 健康副本按权重随机排序（加权无放回抽样），依次尝试直到拿到可用连接
+    """
+
+    def __init__(
+        self,
+        *,
+        retry_interval: float = 30,
+        lag_check_interval: float = 10,
+        rng: random.Random | None = None,
+    ):
+        self._retry_interval = retry_interval
+        self._lag_check_interval = lag_check_interval
+        self._rng = rng or random.Random()
+        self._states: dict[str, _ReplicaState] = {}
+        self._lock = threading.Lock()
+
+    def order(
+        self, candidates: Sequence[tuple[str, ReplicaEndpoint, str]]
+    ) -> list[tuple[str, ReplicaEndpoint]]:
+        """返回本次应依次尝试的副本 ``(key, endpoint)``；candidates 为 ``(key, endpoint, database)``"""
+        now = time.monotonic()
+        ranked: list[tuple[float, str, ReplicaEndpoint]] = []
+        with self._lock:
+            for key, endpoint, database in candidates:
+                state = self._state_locked(key, endpoint, database)
+                if endpoint.weight <= 0 or state.unhealthy_until > now:
+                    continue
+                if state.lagging and not self._lag_check_due_locked(state, now):
+                    continue
+                # Efraimidis–Spirakis：u^(1/w) 越大越靠前
+                ranked.append((self._rng.random() ** (1 / endpoint.weight), key, endpoint))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return [(key, endpoint) for _, key, endpoint in ranked]
+
+    def lag_check_due(self, key: str) -> bool:
+        with self._lock:
+            state = self._states.get(key)
+            return state is None or self._lag_check_due_locked(state, time.monotonic())
+
+    def record_lag(self, key: str, lag: float | None, max_lag: float) -> bool:
+        """记录复制延迟，返回副本是否足够新（``None`` 表示无法判断，视为可用）"""
+        fresh = lag is None or lag <= max_lag
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return fresh
+            state.lag_checked_at = time.monotonic()
+            state.lagging = not fresh
+            state.status.lag = lag
+        if not fresh:
+            logger.warning("Replica lag above tolerance", key=key[:12], lag=lag, max_lag=max_lag)
+        return fresh
+
+    def mark_failed(self, key: str, error: BaseException) -> None:
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            state.unhealthy_until = time.monotonic() + self._retry_interval
+            state.status.healthy = False
+            state.status.failures += 1
+            state.status.last_error = str(error)[:500]
+        logger.warning("Replica marked unhealthy", key=key[:12], error=str(error))
+
+    def mark_served(self, key: str) -> None:
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            state.unhealthy_until = 0
+            state.status.healthy = True
+            state.status.served += 1
+
+    def forget(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._states.pop(key, None)
+
+    def stats(self) -> list[ReplicaStatus]:
+        now = time.monotonic()
+        with self._lock:
+            snapshots = []
+            for state in self._states.values():
+                snapshot = ReplicaStatus(**asdict(state.status))
+                snapshot.healthy = state.unhealthy_until <= now and not state.lagging
+                snapshots.append(snapshot)
+            return snapshots
+
+    def clear(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+    def _state_locked(self, key: str, endpoint: ReplicaEndpoint, database: str) -> _ReplicaState:
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _ReplicaState(
+                status=ReplicaStatus(
+                    key=key,
+                    host=endpoint.host,
+                    port=endpoint.port,
+                    database=database,
+                    weight=endpoint.weight,
+                )
+            )
+        return state
+
+    def _lag_check_due_locked(self, state: _ReplicaState, now: float) -> bool:
+        return (
+            state.lag_checked_at is None or now - state.lag_checked_at >= self._lag_check_interval
+        )
+
+
+replica_router = ReplicaRouter(
+    retry_interval=settings.REPLICA_RETRY_INTERVAL,
+    lag_check_interval=settings.REPLICA_LAG_CHECK_INTERVAL,
+)
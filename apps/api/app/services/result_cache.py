@@ -0,0 +1,353 @@
+"""TTL cache for SQL query results keyed by connection and SQL fingerprint."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import pickle
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any
+
+import structlog
+
+from app.core.config import settings
+from app.services.cost_guard import CostGuardPolicy
+from app.services.database import DatabaseManager
+from app.services.query_cancellation import QueryCancellation
+from app.services.query_result import QueryResult, estimate_row_bytes
+
+logger = structlog.get_logger()
+
+_TOKEN_RE = re.compile(
+    r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`"""  # 字符串与带引号的标识符
+    r"|\b\d+(?:\.\d*)?(?:[eE][+-]?\d+)?\b"  # 数字
+    r"|[A-Za-z_][A-Za-z0-9_$]*"  # 关键字与标识符
+    r"|\s+"
+    r"|."
+)
+_KEYWORDS = frozenset(
+    """
+    select from where and or not in is null like between group by order having limit offset
+    as on join left right inner outer full cross union all distinct case when then else end
+    with asc desc exists count sum avg min max cast interval date true false fetch first next
+    rows only over partition
+    """.split()
+)
+# 每次执行结果都可能不同的函数，不缓存
+_VOLATILE_RE = re.compile(
+    r"\b(?:rand|random|uuid|gen_random_uuid|newid|nextval|sleep|pg_sleep)\s*\(",
+    re.IGNORECASE,
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """规范化 SQL 文本：折叠空白、统一关键字大小写与数字写法，去掉结尾分号
+
+    字符串字面量和带引号的标识符保持原样，字面量的值仍是缓存键的一部分。
+    """
+    parts: list[str] = []
+    for token in _TOKEN_RE.findall(sql.strip().rstrip(";").strip()):
+        if token.isspace():
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        elif token[0].isdigit():
+            parts.append(_normalize_number(token))
+        elif token.lower() in _KEYWORDS:
+            parts.append(token.lower())
+        else:
+            parts.append(token)
+    return "".join(parts).strip()
+
+
+def _normalize_number(token: str) -> str:
+    # 只做不改变类型与精度的规范化：整数去掉前导零，指数统一小写
+    if token.isdigit():
+        return str(int(token))
+    return token.lower()
+
+
+def sql_fingerprint(sql: str) -> str:
+    return hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()
+
+
+def is_cacheable_sql(sql: str) -> bool:
+    return _VOLATILE_RE.search(sql) is None
+
+
+def estimate_result_bytes(result: QueryResult) -> int:
+    header = sum(len(name) for name in result.columns)
+    return header + sum(estimate_row_bytes(row) for row in zip(*result.values))
+
+
+@dataclass
+class ResultCacheStats:
+    """结果缓存统计"""
+
+    enabled: bool
+    ttl: float
+    max_bytes: int
+    disk_enabled: bool
+    entries: int = 0
+    bytes: int = 0
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expired: int = 0
+    invalidations: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class _CacheEntry:
+    connection_key: str
+    result: QueryResult
+    size: int
+    expires_at: float
+
+
+class ResultCache:
+    """SQL 查询结果缓存
+
+    - 键为连接 ID、连接配置指纹、规范化 SQL 指纹、结果预算与生效的代价检查策略，
+      策略收紧后不会再命中旧结果；被代价检查加了 LIMIT 的结果不缓存
+    - 内存层按估算字节数做 LRU 淘汰；配置 ``disk_dir`` 时过期前的结果同时写入磁盘，
+      重启后仍可命中
+    - 命中时返回结果副本并标记 ``cached``，DataFrame 等派生数据不会在请求之间共享
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        ttl: float = 300,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: str | os.PathLike[str] | None = None,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+    ):
+        self._enabled = enabled and ttl > 0 and max_bytes > 0
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._disk_dir = Path(disk_dir) if disk_dir else None
+        self._disk_max_bytes = disk_max_bytes
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = ResultCacheStats(
+            enabled=self._enabled,
+            ttl=ttl,
+            max_bytes=max_bytes,
+            disk_enabled=self._disk_dir is not None,
+        )
+
+    async def execute(
+        self,
+        connection_id: str | None,
+        db_manager: DatabaseManager,
+        sql: str,
+        *,
+        cancellation: QueryCancellation | None = None,
+        cost_guard: CostGuardPolicy | None = None,
+    ) -> QueryResult:
+        """先查缓存，未命中时执行查询并写入缓存
+
+        命中的结果不再做代价检查：键中包含策略，只有在同一策略下完整执行过的查询才会被缓存。
+        """
+        if not self._enabled or not is_cacheable_sql(sql):
+            return await db_manager.execute_query_async(
+                sql, read_only=True, cancellation=cancellation, cost_guard=cost_guard
+            )
+
+        connection_key = connection_id or db_manager.config.fingerprint()
+        key = self._key(connection_key, db_manager, sql, cost_guard)
+        cached = await self.get(connection_key, key)
+        if cached is not None:
+            logger.info("Query result cache hit", connection_id=connection_key)
+            return cached
+
+        result = await db_manager.execute_query_async(
+            sql, read_only=True, cancellation=cancellation, cost_guard=cost_guard
+        )
+        if not result.cost_limited:
+            await self.put(connection_key, key, result)
+        return result
+
+    async def get(self, connection_key: str, key: str) -> QueryResult | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._drop(key)
+                self._stats.expired += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                return replace(entry.result, cached=True)
+
+        if self._disk_dir is not None:
+            loaded = await asyncio.to_thread(self._disk_load, connection_key, key, now)
+            if loaded is not None:
+                result, expires_at = loaded
+                with self._lock:
+                    self._stats.hits += 1
+                    self._stats.disk_hits += 1
+                self._remember(connection_key, key, result, expires_at)
+                return replace(result, cached=True)
+
+        with self._lock:
+            self._stats.misses += 1
+        return None
+
+    async def put(self, connection_key: str, key: str, result: QueryResult) -> None:
+        expires_at = time.time() + self._ttl
+        # 只保存列数据，行字典与 DataFrame 由各次命中按需重建
+        result = replace(result, cached=False, arrow=None)
+        if not self._remember(connection_key, key, result, expires_at):
+            return
+        if self._disk_dir is not None:
+            try:
+                await asyncio.to_thread(self._disk_store, connection_key, key, result, expires_at)
+            except Exception as exc:
+                logger.warning("Failed to write query result cache", error=str(exc))
+
+    def invalidate(self, connection_id: str) -> int:
+        """删除某个连接的全部缓存结果，返回删除的内存条目数"""
+        with self._lock:
+            keys = [
+                key for key, entry in self._entries.items() if entry.connection_key == connection_id
+            ]
+            for key in keys:
+                self._drop(key)
+            self._stats.invalidations += 1
+        if self._disk_dir is not None:
+            shutil.rmtree(self._disk_dir / _digest(connection_id), ignore_errors=True)
+        if keys:
+            logger.info("Query result cache invalidated", connection_id=connection_id)
+        return len(keys)
+
+    def clear(self) -> None:
+        """只清空内存层（测试与进程关闭时使用）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> ResultCacheStats:
+        with self._lock:
+            self._stats.entries = len(self._entries)
+            self._stats.bytes = self._bytes
+            return replace(self._stats)
+
+    def _key(
+        self,
+        connection_key: str,
+        db_manager: DatabaseManager,
+        sql: str,
+        cost_guard: CostGuardPolicy | None = None,
+    ) -> str:
+        material = "\0".join(
+            [
+                connection_key,
+                db_manager.config.fingerprint(),
+                sql_fingerprint(sql),
+                str(settings.QUERY_MAX_ROWS),
+                str(settings.QUERY_MAX_BYTES),
+                repr(cost_guard) if cost_guard is not None and cost_guard.enabled else "",
+            ]
+        )
+        return _digest(material)
+
+    def _remember(
+        self, connection_key: str, key: str, result: QueryResult, expires_at: float
+    ) -> bool:
+        size = estimate_result_bytes(result)
+        if size > self._max_bytes:
+            return False
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = _CacheEntry(connection_key, result, size, expires_at)
+            self._bytes += size
+            self._stats.stores += 1
+            while self._bytes > self._max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats.evictions += 1
+        return True
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _disk_path(self, connection_key: str, key: str) -> Path:
+        assert self._disk_dir is not None
+        return self._disk_dir / _digest(connection_key) / f"{key}.pickle"
+
+    def _disk_load(
+        self, connection_key: str, key: str, now: float
+    ) -> tuple[QueryResult, float] | None:
+        path = self._disk_path(connection_key, key)
+        try:
+            with path.open("rb") as file:
+                expires_at, result = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:
+            logger.warning("Discarding unreadable query result cache", error=str(exc))
+            path.unlink(missing_ok=True)
+            return None
+        if expires_at <= now or not isinstance(result, QueryResult):
+            path.unlink(missing_ok=True)
+            return None
+        return result, expires_at
+
+    def _disk_store(
+        self, connection_key: str, key: str, result: QueryResult, expires_at: float
+    ) -> None:
+        path = self._disk_path(connection_key, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with temp.open("wb") as file:
+            pickle.dump((expires_at, result), file, protocol=pickle.HIGHEST_PROTOCOL)
+        temp.replace(path)
+        self._trim_disk()
+
+    def _trim_disk(self) -> None:
+        assert self._disk_dir is not None
+        files = []
+        for path in self._disk_dir.glob("*/*.pickle"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self._disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+result_cache = ResultCache(
+    enabled=settings.RESULT_CACHE_ENABLED,
+    ttl=settings.RESULT_CACHE_TTL,
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    disk_dir=settings.RESULT_CACHE_DIR or None,
+    disk_max_bytes=settings.RESULT_CACHE_DISK_MAX_BYTES,
+)
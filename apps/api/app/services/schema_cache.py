@@ -0,0 +1,220 @@
+"""Persistent schema snapshot cache keyed by connection ID."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+
+import structlog
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db import AsyncSessionLocal
+from app.db.metadata import SchemaCacheRepository
+from app.db.tables import Connection
+from app.services.column_profiler import profile_snapshot
+from app.services.database import DatabaseConfig, DatabaseManager, create_database_manager
+from app.services.database_schema import SchemaSnapshot
+from app.services.execution_context import connection_to_db_config
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class _CacheEntry:
+    config_fingerprint: str
+    snapshot: SchemaSnapshot
+    probed_at: float
+
+
+class SchemaCache:
+    """表结构快照缓存
+
+    - 内存中保存最近使用的快照，同时持久化到元数据库，重启后无需重新读取目录
+    - 命中后每隔 ``probe_interval`` 秒用结构指纹做一次低成本探测，指纹变化才重新读取
+    - 连接配置（主机、库名、账号等）变化时缓存自动失效
+    - 快照没有列统计或统计已过期时在后台采样，完成后替换缓存中的快照
+    """
+
+    def __init__(self, *, probe_interval: float):
+        self._probe_interval = probe_interval
+        self._entries: dict[str, _CacheEntry] = {}
+        self._lock = threading.Lock()
+        self._profile_tasks: dict[str, asyncio.Task[None]] = {}
+
+    async def get_snapshot(
+        self,
+        connection_id: UUID | str,
+        db_config: dict[str, Any],
+        *,
+        force_refresh: bool = False,
+    ) -> SchemaSnapshot:
+        key = str(connection_id)
+        config = DatabaseConfig.from_dict(db_config)
+        config_fingerprint = config.fingerprint()
+        db_manager = create_database_manager(config)
+
+        entry = None if force_refresh else self._load(key, config_fingerprint)
+        if entry is not None:
+            if time.monotonic() - entry.probed_at < self._probe_interval:
+                return self._with_profile(key, db_manager, entry.snapshot)
+            try:
+                fingerprint = await db_manager.get_schema_fingerprint_async()
+            except Exception as exc:
+                logger.warning("Schema probe failed, using cached schema", error=str(exc))
+                return entry.snapshot
+            if fingerprint is not None and fingerprint == entry.snapshot.fingerprint:
+                entry.probed_at = time.monotonic()
+                return self._with_profile(key, db_manager, entry.snapshot)
+
+        snapshot = await db_manager.get_schema_snapshot_async()
+        self._store(key, config_fingerprint, snapshot)
+        logger.info(
+            "Schema cache refreshed",
+            connection_id=key,
+            tables=len(snapshot.tables),
+        )
+        return self._with_profile(key, db_manager, snapshot)
+
+    async def wait_for_profiles(self) -> None:
+        """等待正在进行的列统计采样完成（测试与预热时使用）"""
+        tasks = [task for task in self._profile_tasks.values() if not task.done()]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def invalidate(self, connection_id: UUID | str) -> None:
+        key = str(connection_id)
+        with self._lock:
+            self._entries.pop(key, None)
+        task = self._profile_tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+        SchemaCacheRepository.delete(UUID(key))
+
+    def clear(self) -> None:
+        """只清空内存层并取消后台采样（测试与进程关闭时使用）"""
+        with self._lock:
+            self._entries.clear()
+        for task in self._profile_tasks.values():
+            task.cancel()
+        self._profile_tasks.clear()
+
+    def _with_profile(
+        self, key: str, db_manager: DatabaseManager, snapshot: SchemaSnapshot
+    ) -> SchemaSnapshot:
+        """返回快照；缺少列统计（或已过期）时安排一次后台采样"""
+        if not settings.SCHEMA_PROFILE_ENABLED or not snapshot.tables:
+            return snapshot
+        profiled_at = snapshot.profiled_at
+        max_age = settings.SCHEMA_PROFILE_MAX_AGE
+        if profiled_at is not None and (max_age <= 0 or time.time() - profiled_at < max_age):
+            return snapshot
+        task = self._profile_tasks.get(key)
+        if task is None or task.done():
+            self._profile_tasks[key] = asyncio.create_task(self._profile(key, db_manager, snapshot))
+        return snapshot
+
+    async def _profile(
+        self, key: str, db_manager: DatabaseManager, snapshot: SchemaSnapshot
+    ) -> None:
+        try:
+            profiled = await profile_snapshot(
+                db_manager,
+                snapshot,
+                sample_rows=settings.SCHEMA_PROFILE_SAMPLE_ROWS,
+                top_values=settings.SCHEMA_PROFILE_TOP_VALUES,
+                max_tables=settings.SCHEMA_PROFILE_MAX_TABLES,
+            )
+        except Exception as exc:
+            logger.warning("Schema profiling failed", connection_id=key, error=str(exc))
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            # 采样期间结构已刷新或缓存已失效时丢弃结果
+            if entry is None or entry.snapshot is not snapshot:
+                return
+            entry.snapshot = profiled
+        SchemaCacheRepository.save(
+            UUID(key),
+            config_fingerprint=entry.config_fingerprint,
+            schema_fingerprint=profiled.fingerprint,
+            snapshot=profiled.to_dict(),
+        )
+        logger.info("Schema columns profiled", connection_id=key, tables=len(profiled.tables))
+
+    def _load(self, key: str, config_fingerprint: str) -> _CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            row = SchemaCacheRepository.get(UUID(key))
+            # 快照结构升级后旧格式的缓存直接作废
+            if row is None or row["snapshot"].get("version") != SchemaSnapshot.VERSION:
+                return None
+            # 持久化的快照来自上次运行，先视为已过探测间隔，下一次读取时重新探测
+            entry = _CacheEntry(
+                config_fingerprint=row["config_fingerprint"],
+                snapshot=SchemaSnapshot.from_dict(row["snapshot"]),
+                probed_at=float("-inf"),
+            )
+            with self._lock:
+                self._entries[key] = entry
+        if entry.config_fingerprint != config_fingerprint:
+            return None
+        return entry
+
+    def _store(self, key: str, config_fingerprint: str, snapshot: SchemaSnapshot) -> None:
+        with self._lock:
+            self._entries[key] = _CacheEntry(
+                config_fingerprint=config_fingerprint,
+                snapshot=snapshot,
+                probed_at=time.monotonic(),
+            )
+        SchemaCacheRepository.save(
+            UUID(key),
+            config_fingerprint=config_fingerprint,
+            schema_fingerprint=snapshot.fingerprint,
+            snapshot=snapshot.to_dict(),
+        )
+
+
+schema_cache = SchemaCache(probe_interval=settings.SCHEMA_CACHE_PROBE_INTERVAL)
+
+
+async def warm_schema_cache() -> int:
+    """为所有已配置的连接预热表结构缓存，返回成功的连接数"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Connection))
+        configs = [connection_to_db_config(connection) for connection in result.scalars()]
+
+    warmed = 0
+    for db_config in configs:
+        try:
+            await schema_cache.get_snapshot(db_config["connection_id"], db_config)
+        except Exception as exc:
+            logger.warning(
+                "Schema cache warm-up failed",
+                connection_id=db_config["connection_id"],
+                error=str(exc),
+            )
+            continue
+        warmed += 1
+    # 等本轮的列统计采样结束，避免与下一轮预热重叠
+    await schema_cache.wait_for_profiles()
+    return warmed
+
+
+async def run_schema_cache_warmer(interval: float) -> None:
+    """后台循环：定期预热表结构缓存，直到任务被取消"""
+    while True:
+        try:
+            warmed = await warm_schema_cache()
+            logger.info("Schema cache warmed", connections=warmed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Schema cache warmer iteration failed", error=str(exc))
+        await asyncio.sleep(interval)
@@ -0,0 +1,235 @@
+"""Relevance-pruned schema context for large databases."""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+import structlog
+
+from app.models import RelationshipContext, SemanticContext
+from app.services.database_schema import SchemaSnapshot, TableSnapshot, render_table_text
+
+logger = structlog.get_logger()
+
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+# 中日韩统一表意文字（含扩展 A 区与兼容区）
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+TABLE_NAME_WEIGHT = 4.0
+TABLE_TOKEN_WEIGHT = 3.0
+COLUMN_TOKEN_WEIGHT = 1.0
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数（标识符密集的文本约 3 个字符一个 token）"""
+    return len(text) // 3 + 1
+
+
+def tokenize(text: str) -> set[str]:
+    """把自然语言或标识符拆成小写词元，兼容 snake_case、camelCase 与简单复数
+
+    中文没有分词边界，按相邻两字切成二元词元（"订单总额" -> 订单、单总、总额），
+    问题与表、列注释共享的词语即可命中；单个汉字区分度太低，不作为词元。
+    """
+    tokens: set[str] = set()
+    for run in _CJK_RE.findall(text):
+        tokens.update(run[i : i + 2] for i in range(len(run) - 1))
+    for word in _WORD_RE.findall(text):
+        parts = {word.lower(), *(part.lower() for part in _CAMEL_RE.findall(word))}
+        for part in parts:
+            if len(part) < 2:
+                continue
+            tokens.add(part)
+            if part.endswith("ies") and len(part) > 4:
+                tokens.add(part[:-3] + "y")
+            elif part.endswith("s") and len(part) > 3:
+                tokens.add(part[:-1])
+    return tokens
+
+
+@dataclass
+class SemanticHint:
+    """命中后会把表达式中的表名、列名并入检索词的业务术语"""
+
+    term: str
+    expression: str
+    examples: list[str] = field(default_factory=list)
+
+    def matches(self, query: str) -> bool:
+        lowered = query.lower()
+        return any(phrase and phrase.lower() in lowered for phrase in (self.term, *self.examples))
+
+
+@dataclass
+class SchemaHints:
+    """检索时参考的语义术语与已定义表关系"""
+
+    terms: list[SemanticHint] = field(default_factory=list)
+    relationships: list[tuple[str, str]] = field(default_factory=list)
+
+    @classmethod
+    def from_contexts(
+        cls,
+        semantic_context: SemanticContext | None,
+        relationship_context: RelationshipContext | None,
+    ) -> SchemaHints:
+        return cls(
+            terms=[
+                SemanticHint(term=term.term, expression=term.expression, examples=term.examples)
+                for term in (semantic_context.terms if semantic_context else [])
+            ],
+            relationships=[
+                (rel.source_table, rel.target_table)
+                for rel in (relationship_context.relationships if relationship_context else [])
+            ],
+        )
+
+
+class SchemaSearchIndex:
+    """表名、列名及其注释上的本地词法倒排索引（带 IDF 权重）"""
+
+    def __init__(self, snapshot: SchemaSnapshot):
+        self._tables = {table.name: table for table in snapshot.tables}
+        self._postings: dict[str, dict[str, float]] = defaultdict(dict)
+        self._neighbours: dict[str, set[str]] = defaultdict(set)
+
+        postings = self._postings
+        for table in snapshot.tables:
+            postings[table.name.lower()][table.name] = TABLE_NAME_WEIGHT
+            for token in tokenize(f"{table.name} {table.comment or ''}"):
+                postings[token][table.name] = max(
+                    postings[token].get(table.name, 0.0), TABLE_TOKEN_WEIGHT
+                )
+            for column in table.columns:
+                for token in tokenize(f"{column.name} {column.comment or ''}"):
+                    postings[token].setdefault(table.name, COLUMN_TOKEN_WEIGHT)
+            for fk in table.foreign_keys:
+                self._add_edge(table.name, fk.referenced_table)
+
+        total = max(len(self._tables), 1)
+        self._idf = {
+            token: math.log(1 + total / len(tables)) for token, tables in self._postings.items()
+        }
+
+    def _add_edge(self, source: str, target: str) -> None:
+        if source == target:
+            return
+        self._neighbours[source].add(target)
+        self._neighbours[target].add(source)
+
+    def get_table(self, name: str) -> TableSnapshot | None:
+        return self._tables.get(name)
+
+    def neighbours(self, name: str, extra_edges: Iterable[tuple[str, str]] = ()) -> list[str]:
+        result = set(self._neighbours.get(name, ()))
+        for source, target in extra_edges:
+            if source == name and target in self._tables:
+                result.add(target)
+            elif target == name and source in self._tables:
+                result.add(source)
+        result.discard(name)
+        return sorted(result)
+
+    def score(self, tokens: Iterable[str]) -> dict[str, float]:
+        scores: dict[str, float] = defaultdict(float)
+        for token in set(tokens):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = self._idf[token]
+            for table_name, weight in postings.items():
+                scores[table_name] += weight * idf
+        return dict(scores)
+
+
+@dataclass
+class SchemaSelection:
+    """检索结果"""
+
+    text: str
+    tables: list[str]
+    total_tables: int
+    pruned: bool
+    top_score: float = 0.0
+
+
+def select_schema_context(
+    snapshot: SchemaSnapshot,
+    query: str,
+    *,
+    hints: SchemaHints | None = None,
+    top_k: int,
+    token_budget: int,
+    min_score: float,
+) -> SchemaSelection:
+    """按问题相关性挑选注入提示词的表
+
+    全量表结构没有超出预算时原样返回；置信度不足（最高分低于 ``min_score``）时也回退到全量。
+    否则按得分取前 ``top_k`` 张表，再补充它们的外键与已定义关系邻居，直到用完 token 预算。
+    """
+    full = SchemaSelection(
+        text=snapshot.prompt_text,
+        tables=[table.name for table in snapshot.tables],
+        total_tables=len(snapshot.tables),
+        pruned=False,
+    )
+    if token_budget <= 0 or estimate_tokens(snapshot.prompt_text) <= token_budget:
+        return full
+
+    hints = hints or SchemaHints()
+    tokens = tokenize(query)
+    for hint in hints.terms:
+        if hint.matches(query):
+            tokens |= tokenize(hint.expression)
+
+    index = snapshot.search_index
+    scores = index.score(tokens)
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    top_score = ranked[0][1] if ranked else 0.0
+    if top_score < min_score:
+        full.top_score = top_score
+        return full
+
+    seeds = [name for name, _ in ranked[: max(top_k, 1)]]
+    candidates = list(seeds)
+    for name in seeds:
+        candidates.extend(index.neighbours(name, hints.relationships))
+
+    selected: list[str] = []
+    blocks: list[str] = []
+    used = 0
+    for name in candidates:
+        table = index.get_table(name)
+        if table is None or name in selected:
+            continue
+        block = render_table_text(table)
+        cost = estimate_tokens(block)
+        if selected and used + cost > token_budget:
+            continue
+        selected.append(name)
+        blocks.append(block)
+        used += cost
+
+    blocks.append(
+        f"（数据库共 {len(snapshot.tables)} 张表，以上是按问题相关性筛选出的 "
+        f"{len(selected)} 张表及其关联表；如需其他表请在回答中说明）"
+    )
+    logger.info(
+        "Schema context pruned",
+        total_tables=len(snapshot.tables),
+        selected_tables=len(selected),
+        estimated_tokens=used,
+        top_score=round(top_score, 2),
+    )
+    return SchemaSelection(
+        text="\n".join(blocks),
+        tables=selected,
+        total_tables=len(snapshot.tables),
+        pruned=True,
+        top_score=top_score,
+    )
@@ -15,6 +15,11 @@ from app.db import get_db
 from app.db import metadata as metadata_db
 from app.db.tables import Base
 from app.main import app, limiter
+from app.services.artifact_store import artifact_store
+from app.services.database import close_connection_pools
+from app.services.replica_routing import replica_router
+from app.services.result_cache import result_cache
+from app.services.schema_cache import schema_cache
 
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
@@ -33,9 +38,28 @@ def isolate_metadata_db(tmp_path: Path) -> Generator[None, None, None]:
     try:
         yield
     finally:
+        schema_cache.clear()
+        result_cache.clear()
+        replica_router.clear()
         metadata_db.METADATA_DB_PATH = original_path
 
 
+@pytest.fixture(autouse=True)
+def isolate_artifact_store(tmp_path: Path) -> Generator[None, None, None]:
+    original_root = artifact_store.root
+    artifact_store.root = tmp_path / "artifacts"
+    try:
+        yield
+    finally:
+        artifact_store.root = original_root
+
+
+@pytest.fixture(autouse=True)
+def reset_connection_pools() -> Generator[None, None, None]:
+    yield
+    close_connection_pools()
+
+
 @pytest.fixture(scope="session")
 def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
     loop = asyncio.get_event_loop_policy().new_event_loop()
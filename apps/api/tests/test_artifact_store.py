@@ -0,0 +1,61 @@
+"""Tests for artifact_store.py"""
+
+import pytest
+
+from app.core.config import settings
+from app.services.artifact_store import artifact_store
+from app.services.kernel_pool import AnalysisKernel
+
+
+def test_artifacts_are_content_addressed():
+    artifact_id = artifact_store.put(b"chart", "png")
+    assert artifact_store.put(b"chart", "png") == artifact_id
+    assert len(list(artifact_store.root.rglob("*.png"))) == 1
+
+    artifact = artifact_store.get(artifact_id)
+    assert artifact is not None
+    assert (artifact.media_type, artifact.size) == ("image/png", 5)
+    assert artifact.path.read_bytes() == b"chart"
+
+    assert artifact_store.get("0" * 64) is None
+    assert artifact_store.get("../metadata.db") is None
+    with pytest.raises(ValueError):
+        artifact_store.put(b"chart", "gif")
+
+
+@pytest.mark.parametrize(
+    ("format", "media_type", "magic"),
+    [("svg", "image/svg+xml", b"<?xml"), ("webp", "image/webp", b"RIFF")],
+)
+def test_kernel_renders_configured_format(monkeypatch, format, media_type, magic):
+    monkeypatch.setattr(settings, "PYTHON_IMAGE_FORMAT", format)
+    monkeypatch.setattr(settings, "PYTHON_IMAGE_DPI", 72)
+    kernel = AnalysisKernel.create()
+    try:
+        outcome = kernel.execute_cell("_ = plt.plot([1, 2, 3])")
+    finally:
+        kernel.close()
+
+    assert outcome.error is None and len(outcome.images) == 1
+    artifact = artifact_store.get(outcome.images[0])
+    assert artifact is not None and artifact.media_type == media_type
+    assert artifact.path.read_bytes().startswith(magic)
+
+
+async def test_artifact_endpoint_streams_with_cache_headers(client):
+    artifact_id = artifact_store.put(b"<svg/>", "svg")
+
+    response = await client.get(f"/api/v1/artifacts/{artifact_id}")
+    assert response.status_code == 200
+    assert response.content == b"<svg/>"
+    assert response.headers["content-type"].startswith("image/svg+xml")
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["etag"] == f'"{artifact_id}"'
+    assert "default-src 'none'" in response.headers["content-security-policy"]
+
+    cached = await client.get(
+        f"/api/v1/artifacts/{artifact_id}", headers={"If-None-Match": f'"{artifact_id}"'}
+    )
+    assert cached.status_code == 304 and cached.content == b""
+
+    assert (await client.get(f"/api/v1/artifacts/{'0' * 64}")).status_code == 404
@@ -32,6 +32,23 @@ def test_active_query_registry_lifecycle():
     assert registry.stop(conversation_id) is False
 
 
+async def test_active_query_registry_cancels_tracked_statements():
+    registry = ActiveQueryRegistry()
+    conversation_id = uuid4()
+    registry.start(conversation_id)
+    cancellation = registry.cancellation(conversation_id)
+    assert cancellation is not None
+    cancelled: list[str] = []
+
+    with cancellation.track(lambda: cancelled.append("sql")):
+        assert registry.stop(conversation_id) is True
+        assert cancelled == []
+        assert await registry.cancel_statements(conversation_id) == 1
+
+    assert cancelled == ["sql"]
+    assert await registry.cancel_statements(uuid4()) == 0
+
+
 def test_merge_metadata_dedupes_diagnostics_and_merges_execution_context():
     base = {
         "execution_context": {"model_id": "model-a"},
@@ -76,9 +93,10 @@ def test_chat_event_accumulator_collects_stream_output():
         diagnostics=[{"attempt": 1, "phase": "sql", "status": "success", "message": "ok"}],
     )
     python_output = SSEEvent.python_output("stdout")
-    python_image = SSEEvent.python_image("image-data")
+    python_image = SSEEvent.python_image("a" * 64)
 
     accumulator.consume(progress)
+    accumulator.consume(SSEEvent.content_delta("分析中…", phase="generate", attempt=1))
     accumulator.consume(result)
     accumulator.consume(python_output)
     accumulator.consume(python_image)
@@ -90,10 +108,28 @@ def test_chat_event_accumulator_collects_stream_output():
     assert metadata["execution_context"]["connection_name"] == "Analytics DB"
     assert metadata["sql"] == "SELECT 1"
     assert metadata["python_output"] == "stdout"
-    assert metadata["python_images"] == ["image-data"]
+    assert metadata["python_images"] == ["a" * 64]
     assert len(metadata["diagnostics"]) == 1
 
 
+def test_chat_event_accumulator_drops_python_output_from_failed_attempts():
+    accumulator = ChatEventAccumulator(
+        original_query="show sales",
+        runtime_snapshot={"model_id": "model-a"},
+    )
+
+    accumulator.consume(SSEEvent.python_output("Traceback", "stderr", attempt=1))
+    accumulator.consume(SSEEvent.python_image("a" * 64, attempt=1))
+    accumulator.consume(SSEEvent.python_output("ok\n", attempt=2))
+    accumulator.consume(SSEEvent.python_image("b" * 64, attempt=2))
+    accumulator.consume(SSEEvent.python_output("done\n", attempt=2))
+
+    metadata = accumulator.build_metadata()
+
+    assert metadata["python_output"] == "ok\ndone\n"
+    assert metadata["python_images"] == ["b" * 64]
+
+
 def test_chat_event_accumulator_prefers_error_message_when_no_summary():
     accumulator = ChatEventAccumulator(
         original_query="show sales",
@@ -0,0 +1,149 @@
+"""Tests for column_profiler.py"""
+
+import sqlite3
+from dataclasses import replace
+from datetime import date
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.services.column_profiler import build_sample_sql, profile_column, profile_snapshot
+from app.services.database import create_database_manager
+from app.services.database_schema import ColumnSnapshot, SchemaSnapshot, render_table_text
+from app.services.schema_cache import schema_cache
+from app.services.schema_retrieval import select_schema_context
+
+
+@pytest.fixture
+def shop_db(tmp_path):
+    path = tmp_path / "shop.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE orders (id INTEGER PRIMARY KEY, status TEXT, amount REAL, "
+            'created_at TEXT, note TEXT, "select" TEXT)'
+        )
+        conn.executemany(
+            "INSERT INTO orders (status, amount, created_at, note) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    ["paid", "paid", "refunded", "pending"][i % 4],
+                    10.5 * i,
+                    f"2024-0{i % 9 + 1}-1{i % 10} 08:00:00",
+                    None if i % 2 else f"note {i}",
+                )
+                for i in range(40)
+            ],
+        )
+    return str(path)
+
+
+def test_profile_column_kinds():
+    text = ColumnSnapshot(name="status", data_type="TEXT")
+    stats = profile_column(text, ["paid", "paid", "pending", None], top_values=5)
+    assert stats.top_values == ["paid", "pending"]
+    assert (stats.null_ratio, stats.distinct_count) == (0.25, 2)
+
+    # 取值都不重复的文本列不是枚举
+    assert profile_column(text, ["a", "b", "c"], top_values=5).top_values == []
+    assert profile_column(text, list("aabbccdd"), top_values=3).top_values == []
+
+    number = ColumnSnapshot(name="amount", data_type="REAL")
+    stats = profile_column(number, [3, 1.25, 2], top_values=5)
+    assert (stats.min_value, stats.max_value) == ("1.25", "3")
+    assert profile_column(number, [True, False], top_values=5).min_value is None
+
+    day = ColumnSnapshot(name="day", data_type="DATE")
+    stats = profile_column(day, [date(2024, 3, 1), date(2023, 1, 5)], top_values=5)
+    assert (stats.min_value, stats.max_value) == ("2023-01-05", "2024-03-01")
+
+    # 按日期格式存储的文本列给出范围，模型可以照抄格式
+    stored = ColumnSnapshot(name="created", data_type="TEXT")
+    stats = profile_column(stored, ["2024/02/01", "2023/12/31"], top_values=5)
+    assert (stats.min_value, stats.max_value) == ("2023/12/31", "2024/02/01")
+
+    assert profile_column(text, [None, None], top_values=5).null_ratio == 1.0
+
+
+def test_sample_sql_quotes_identifiers(shop_db):
+    manager = create_database_manager({"driver": "sqlite", "database": shop_db})
+    orders = manager.get_schema_snapshot().get_table("orders")
+    assert orders is not None
+    assert build_sample_sql("mysql", orders, 5).endswith("`select` FROM `orders` LIMIT 5")
+    assert build_sample_sql("postgresql", orders, 5).endswith('"select" FROM "orders" LIMIT 5')
+
+
+def test_sample_sql_uses_table_sampling(shop_db):
+    manager = create_database_manager({"driver": "sqlite", "database": shop_db})
+    orders = manager.get_schema_snapshot().get_table("orders")
+    assert orders is not None
+    assert build_sample_sql("duckdb", orders, 5).endswith('FROM "orders" USING SAMPLE 5 ROWS')
+
+    # 按目录行数抽取数据页，多抽一倍再截取
+    large = replace(orders, row_estimate=1_000_000)
+    assert build_sample_sql("postgresql", large, 1000).endswith(
+        'FROM "orders" TABLESAMPLE SYSTEM (0.200000) LIMIT 1000'
+    )
+    # 小表或没有统计时读取前若干行即可
+    assert "TABLESAMPLE" not in build_sample_sql("postgresql", orders, 1000)
+    assert "TABLESAMPLE" not in build_sample_sql("mysql", large, 1000)
+
+
+async def test_profile_snapshot_renders_compact_stats(shop_db):
+    manager = create_database_manager({"driver": "sqlite", "database": shop_db})
+    snapshot = manager.get_schema_snapshot()
+    profiled = await profile_snapshot(
+        manager, snapshot, sample_rows=1000, top_values=5, max_tables=10
+    )
+
+    assert snapshot.profiled_at is None
+    assert profiled.profiled_at is not None
+    orders = profiled.get_table("orders")
+    assert orders is not None
+    assert orders.row_estimate == 40
+    text = render_table_text(orders)
+    assert "约 40 行; 样本 40 行" in text
+    # 按频次排序，同频次保持出现顺序；统计标注为样本，不是完整取值
+    assert "status 样本取值 paid|refunded|pending" in text
+    assert "amount 样本范围 0 ~ 409.5" in text
+    assert "created_at 样本范围 2024-01-10 08:00:00 ~ 2024-09-18 08:00:00" in text
+    assert "note 空值 50%" in text
+    # 未采样的快照提示词保持不变
+    assert "数据:" not in render_table_text(snapshot.get_table("orders"))
+
+    restored = SchemaSnapshot.from_dict(profiled.to_dict())
+    assert restored.get_table("orders").columns[1].stats.top_values == [
+        "paid",
+        "refunded",
+        "pending",
+    ]
+    selection = select_schema_context(restored, "退款订单", top_k=5, token_budget=0, min_score=0)
+    assert "status 样本取值 paid|refunded|pending" in selection.text
+
+
+async def test_sample_limit_keeps_catalog_estimate(shop_db):
+    manager = create_database_manager({"driver": "sqlite", "database": shop_db})
+    profiled = await profile_snapshot(
+        manager, manager.get_schema_snapshot(), sample_rows=10, top_values=5, max_tables=10
+    )
+    # 样本读满时不知道总行数
+    assert profiled.get_table("orders").row_estimate is None
+
+
+async def test_schema_cache_profiles_in_background(shop_db, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEMA_PROFILE_ENABLED", True)
+    connection_id = str(uuid4())
+    db_config = {"driver": "sqlite", "database": shop_db}
+
+    first = await schema_cache.get_snapshot(connection_id, db_config)
+    assert first.profiled_at is None
+    await schema_cache.wait_for_profiles()
+
+    cached = await schema_cache.get_snapshot(connection_id, db_config)
+    assert cached.profiled_at is not None
+    assert "status 样本取值" in cached.prompt_text
+
+    # 持久化的快照带着列统计，重启后不必重新采样
+    schema_cache.clear()
+    reloaded = await schema_cache.get_snapshot(connection_id, db_config)
+    assert reloaded.profiled_at == cached.profiled_at
@@ -1,8 +1,14 @@
 """Database connection API tests"""
 
+from uuid import UUID
+
 import pytest
 from httpx import AsyncClient
 
+from app.db.tables import Connection
+from app.services.database import create_database_manager
+from app.services.execution_context import connection_to_db_config
+
 
 async def create_sqlite_connection(client: AsyncClient, name: str = "Test SQLite DB") -> dict:
     response = await client.post(
@@ -118,3 +124,37 @@ async def test_connection_not_found(client: AsyncClient):
         },
     )
     assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_update_connection_invalidates_pool(client: AsyncClient, tmp_path):
+    response = await client.post(
+        "/api/v1/config/connections",
+        json={"name": "Pooled", "driver": "sqlite", "database": str(tmp_path / "pool.db")},
+    )
+    conn = response.json()["data"]
+
+    tested = await client.post(f"/api/v1/config/connections/{conn['id']}/test")
+    assert tested.json()["data"]["connected"] is True
+    # 聊天执行路径由连接记录构建配置（未填写的字段为 None），应复用同一个连接池
+    record = Connection(
+        id=UUID(conn["id"]),
+        driver="sqlite",
+        host=None,
+        port=None,
+        username=None,
+        password_encrypted=None,
+        database_name=str(tmp_path / "pool.db"),
+        extra_options={},
+    )
+    create_database_manager(connection_to_db_config(record)).execute_query("SELECT 1")
+    pools = (await client.get("/api/v1/system/database-pools")).json()["data"]
+    assert len(pools) == 1
+    assert pools[0]["driver"] == "sqlite"
+
+    await client.put(
+        f"/api/v1/config/connections/{conn['id']}",
+        json={"name": "Pooled", "driver": "sqlite", "database": str(tmp_path / "other.db")},
+    )
+    pools = (await client.get("/api/v1/system/database-pools")).json()["data"]
+    assert pools == []
@@ -0,0 +1,206 @@
+"""Tests for cost_guard.py"""
+
+import sqlite3
+
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings, settings
+from app.services.cost_guard import (
+    CostGuardError,
+    CostGuardPolicy,
+    parse_mysql_plan,
+    parse_postgres_plan,
+)
+from app.services.database import DatabaseConfig, DatabaseManager
+from app.services.engine_diagnostics import categorize_sql_error
+
+CROSS_JOIN_SQL = "SELECT o.id, i.id FROM orders o, items i"
+
+
+@pytest.fixture
+def guarded_manager(tmp_path):
+    path = tmp_path / "guard.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, amount REAL);"
+        "CREATE TABLE items (id INTEGER PRIMARY KEY, order_id INTEGER);"
+    )
+    conn.executemany("INSERT INTO orders (amount) VALUES (?)", [(i,) for i in range(200)])
+    conn.executemany("INSERT INTO items (order_id) VALUES (?)", [(i,) for i in range(300)])
+    conn.commit()
+    conn.close()
+    return DatabaseManager(DatabaseConfig(driver="sqlite", database=str(path)))
+
+
+class TestPlanParsing:
+    def test_parse_postgres_plan(self):
+        plan = parse_postgres_plan(
+            [
+                {
+                    "Plan": {
+                        "Node Type": "Nested Loop",
+                        "Total Cost": 1200.5,
+                        "Plan Rows": 60000,
+                        "Plans": [
+                            {"Node Type": "Seq Scan", "Relation Name": "orders", "Plan Rows": 200},
+                            {"Node Type": "Index Scan", "Relation Name": "items", "Plan Rows": 3},
+                        ],
+                    }
+                }
+            ]
+        )
+        assert plan.cost == 1200.5
+        assert plan.rows == 60000
+        assert plan.full_scans == ["orders"]
+        assert plan.steps == ["Nested Loop", "Seq Scan orders", "Index Scan items"]
+
+    def test_parse_mysql_plan(self):
+        plan = parse_mysql_plan(
+            {
+                "query_block": {
+                    "cost_info": {"query_cost": "6021.00"},
+                    "nested_loop": [
+                        {
+                            "table": {
+                                "table_name": "o",
+                                "access_type": "ALL",
+                                "rows_examined_per_scan": 200,
+                            }
+                        },
+                        {
+                            "table": {
+                                "table_name": "i",
+                                "access_type": "ALL",
+                                "rows_examined_per_scan": 300,
+                                "rows_produced_per_join": 60000,
+                            }
+                        },
+                    ],
+                }
+            }
+        )
+        assert plan.cost == 6021
+        assert plan.rows == 60000
+        assert plan.full_scans == ["o", "i"]
+
+    def test_sqlite_plan_multiplies_nested_scans(self, guarded_manager):
+        plan = guarded_manager.explain_query(CROSS_JOIN_SQL)
+        assert plan.rows == 200 * 300
+        assert plan.full_scans == ["orders", "items"]
+
+        plan = guarded_manager.explain_query("SELECT * FROM orders o JOIN items i ON i.id = o.id")
+        assert plan.rows == 200
+        assert plan.full_scans == ["orders"]
+
+    def test_sqlite_plan_caps_streaming_scans_at_limit(self, guarded_manager):
+        assert guarded_manager.explain_query(f"{CROSS_JOIN_SQL} LIMIT 10").rows == 10
+        assert guarded_manager.explain_query(f"{CROSS_JOIN_SQL} LIMIT 10 OFFSET 5").rows == 15
+        # 排序要先读完整个连接结果，LIMIT 不能减少中间结果
+        plan = guarded_manager.explain_query(f"{CROSS_JOIN_SQL} ORDER BY o.amount LIMIT 10")
+        assert plan.rows == 200 * 300
+        plan = guarded_manager.explain_query("SELECT COUNT(*) FROM orders o, items i LIMIT 10")
+        assert plan.rows == 200 * 300
+
+    def test_postgres_limit_caps_scans_and_streaming_joins(self):
+        def limit_over(*nodes):
+            plan = {"Node Type": "Limit", "Total Cost": 1.5, "Plan Rows": 10, "Plans": []}
+            parent = plan
+            for node in nodes:
+                child = {**node, "Plans": []}
+                parent["Plans"].append(child)
+                parent = child
+            return [{"Plan": plan}]
+
+        scan = {"Node Type": "Seq Scan", "Relation Name": "big", "Plan Rows": 50000}
+        join = {"Node Type": "Nested Loop", "Plan Rows": 60000}
+        sort = {"Node Type": "Sort", "Plan Rows": 60000}
+
+        assert parse_postgres_plan(limit_over(scan)).rows == 10
+        assert parse_postgres_plan(limit_over(join, scan)).rows == 10
+        assert parse_postgres_plan(limit_over(sort, join, scan)).rows == 60000
+
+    def test_mysql_limit_caps_unless_sorted(self):
+        table = {"table_name": "big", "access_type": "ALL", "rows_examined_per_scan": 50000}
+        document = {"query_block": {"table": table}}
+        assert parse_mysql_plan(document).rows == 50000
+        assert parse_mysql_plan(document, 10).rows == 10
+
+        sorted_document = {
+            "query_block": {"ordering_operation": {"using_filesort": True, "table": table}}
+        }
+        assert parse_mysql_plan(sorted_document, 10).rows == 50000
+
+
+class TestCostGuardPolicy:
+    def test_from_options_overrides_settings(self, monkeypatch):
+        monkeypatch.setattr(settings, "COST_GUARD_ENABLED", False)
+        monkeypatch.setattr(settings, "COST_GUARD_ACTION", "repair")
+        policy = CostGuardPolicy.from_options(
+            {"enabled": True, "max_rows": "5000", "action": "LIMIT"}
+        )
+        assert policy.enabled is True
+        assert policy.max_rows == 5000
+        assert policy.action == "limit"
+        assert policy.limit_rows == settings.COST_GUARD_LIMIT_ROWS
+
+    def test_invalid_action_setting_fails_at_startup(self):
+        with pytest.raises(ValidationError):
+            Settings(COST_GUARD_ACTION="rejct")
+
+    def test_invalid_option_keeps_global_value(self):
+        policy = CostGuardPolicy.from_options({"action": "explode", "max_cost": "lots"})
+        assert policy.action == settings.COST_GUARD_ACTION
+        assert policy.max_cost == settings.COST_GUARD_MAX_COST
+
+
+class TestGuardedExecution:
+    def test_within_threshold_runs_unchanged(self, guarded_manager):
+        policy = CostGuardPolicy(enabled=True, max_rows=100_000, action="reject")
+        result = guarded_manager.execute_query(
+            "SELECT COUNT(*) AS n FROM orders o, items i", cost_guard=policy
+        )
+        assert result.rows == [{"n": 60000}]
+        assert result.cost_limited is False
+
+    def test_reject(self, guarded_manager):
+        policy = CostGuardPolicy(enabled=True, max_rows=10_000, action="reject")
+        with pytest.raises(CostGuardError, match="已拒绝执行") as exc_info:
+            guarded_manager.execute_query(CROSS_JOIN_SQL, cost_guard=policy)
+        assert exc_info.value.plan.rows == 60000
+        assert categorize_sql_error(str(exc_info.value))[0] == "SQL_COST_REJECTED"
+
+    def test_limited_scan_of_large_table_passes(self, tmp_path):
+        path = tmp_path / "big.db"
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE big (id INTEGER PRIMARY KEY, value INTEGER)")
+            conn.executemany("INSERT INTO big (value) VALUES (?)", [(i,) for i in range(50_000)])
+        manager = DatabaseManager(DatabaseConfig(driver="sqlite", database=str(path)))
+        policy = CostGuardPolicy(enabled=True, max_rows=10_000, action="reject")
+
+        result = manager.execute_query("SELECT * FROM big LIMIT 10", cost_guard=policy)
+        assert result.rows_count == 10
+        with pytest.raises(CostGuardError):
+            manager.execute_query("SELECT * FROM big", cost_guard=policy)
+
+    def test_limit(self, guarded_manager):
+        policy = CostGuardPolicy(enabled=True, max_rows=10_000, action="limit", limit_rows=50)
+        result = guarded_manager.execute_query(CROSS_JOIN_SQL, cost_guard=policy)
+        assert result.rows_count == 50
+        assert (result.truncated, result.cost_limited) == (True, True)
+
+    def test_repair(self, guarded_manager):
+        policy = CostGuardPolicy(enabled=True, max_rows=10_000, action="repair")
+        with pytest.raises(CostGuardError, match="预估代价过高") as exc_info:
+            guarded_manager.execute_query(CROSS_JOIN_SQL, cost_guard=policy)
+        assert categorize_sql_error(str(exc_info.value)) == ("SQL_COST_TOO_HIGH", "sql", True)
+
+    def test_disabled_policy_skips_explain(self, guarded_manager, monkeypatch):
+        def fail_explain(*_args):
+            raise AssertionError("EXPLAIN should not run")
+
+        monkeypatch.setattr(guarded_manager._adapter, "explain", fail_explain)
+        result = guarded_manager.execute_query(
+            "SELECT COUNT(*) AS n FROM orders", cost_guard=CostGuardPolicy(enabled=False)
+        )
+        assert result.rows == [{"n": 200}]
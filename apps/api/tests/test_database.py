@@ -1,14 +1,30 @@
 """Tests for database.py"""
 
+import asyncio
+import sqlite3
+import threading
+import time
+from uuid import uuid4
+
 import pytest
 
+from app.core.config import settings
 from app.services.database import (
     ConnectionTestResult,
     DatabaseConfig,
     DatabaseManager,
     QueryResult,
     create_database_manager,
+    get_connection_pool_stats,
+    invalidate_connection_pool,
 )
+from app.services.database_executor import DatabaseExecutor
+from app.services.database_pool import ConnectionPool, PoolExhaustedError
+from app.services.database_schema import SchemaSnapshot
+from app.services.query_cancellation import QueryCancellation, QueryCancelledError
+from app.services.schema_cache import SchemaCache
+
+ENDLESS_SQL = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT MAX(x) FROM c"
 
 
 class TestDatabaseConfig:
@@ -114,6 +130,30 @@ class TestDatabaseManager:
         assert "EXPLAIN" in DatabaseManager.READ_ONLY_PREFIXES
 
 
+class TestRowLimit:
+    """Test LIMIT injection for bounded queries"""
+
+    @pytest.mark.parametrize(
+        ("sql", "expected"),
+        [
+            ("SELECT * FROM t;", "SELECT * FROM t\nLIMIT 101"),
+            ("SELECT * FROM t LIMIT 5", "SELECT * FROM t LIMIT 5"),
+            ("SELECT * FROM t LIMIT 5000 OFFSET 10", "SELECT * FROM t LIMIT 101 OFFSET 10"),
+            ("SELECT * FROM t LIMIT 10, 5000", "SELECT * FROM t LIMIT 10, 101"),
+            (
+                "SELECT * FROM (SELECT * FROM t LIMIT 3) AS s WHERE name = 'limit 1'",
+                "SELECT * FROM (SELECT * FROM t LIMIT 3) AS s WHERE name = 'limit 1'\nLIMIT 101",
+            ),
+            ("SELECT * FROM t OFFSET 5", "SELECT * FROM t OFFSET 5"),
+            ("SELECT * FROM t FETCH FIRST 5 ROWS ONLY", "SELECT * FROM t FETCH FIRST 5 ROWS ONLY"),
+            ("SHOW TABLES", "SHOW TABLES"),
+        ],
+    )
+    def test_apply_row_limit(self, sql, expected):
+        manager = DatabaseManager(DatabaseConfig(driver="sqlite", database=":memory:"))
+        assert manager.apply_row_limit(sql, 100) == expected
+
+
 class TestSQLiteManager:
     """Test SQLite specific functionality"""
 
@@ -148,7 +188,114 @@ class TestSQLiteManager:
         # Query the table
         result = sqlite_manager.execute_query("SELECT * FROM test")
         assert result.rows_count == 2
-        assert len(result.data) == 2
+        assert result.columns == ["id", "name"]
+        assert result.rows == [{"id": 1, "name": "Alice"}, {"id": 2, "name": "Bob"}]
+
+    def test_execute_query_row_and_byte_budget(self, sqlite_manager):
+        """Test bounded fetch stops at max_rows / max_bytes"""
+        with sqlite_manager.connect() as conn:
+            conn.execute("CREATE TABLE big (id INTEGER, payload TEXT)")
+            conn.executemany("INSERT INTO big VALUES (?, ?)", [(i, "x" * 100) for i in range(50)])
+            conn.commit()
+
+        result = sqlite_manager.execute_query("SELECT * FROM big", max_rows=10)
+        assert (result.rows_count, result.rows_fetched) == (10, 11)
+        assert result.truncated is True
+        assert result.total_rows is None
+
+        result = sqlite_manager.execute_query("SELECT * FROM big", max_rows=0, max_bytes=1000)
+        assert result.truncated is True
+        assert 1 <= result.rows_count < 10
+
+        result = sqlite_manager.execute_query("SELECT * FROM big", max_rows=100)
+        assert result.truncated is False
+        assert result.total_rows == 50
+
+    def test_statement_timeout_interrupts_query(self, tmp_path, monkeypatch):
+        """Test SQLite progress handler enforces the statement timeout"""
+        monkeypatch.setattr(settings, "QUERY_STATEMENT_TIMEOUT", 0.2)
+        manager = DatabaseManager(DatabaseConfig(driver="sqlite", database=str(tmp_path / "t.db")))
+
+        with pytest.raises(sqlite3.OperationalError, match="执行超时"):
+            manager.execute_query(ENDLESS_SQL)
+        assert manager.execute_query("SELECT 1 AS n").rows == [{"n": 1}]
+
+    def test_cancellation_interrupts_running_query(self, tmp_path, monkeypatch):
+        """Test a stop request interrupts the in-flight statement"""
+        monkeypatch.setattr(settings, "QUERY_STATEMENT_TIMEOUT", 0)
+        manager = DatabaseManager(DatabaseConfig(driver="sqlite", database=str(tmp_path / "t.db")))
+        cancellation = QueryCancellation()
+        errors: list[Exception] = []
+
+        def run():
+            try:
+                manager.execute_query(ENDLESS_SQL, cancellation=cancellation)
+            except Exception as exc:
+                errors.append(exc)
+
+        worker = threading.Thread(target=run)
+        worker.start()
+        time.sleep(0.2)
+        deadline = time.monotonic() + 5
+        # interrupt() 只作用于已开始的语句，重复发送直到线程退出
+        while worker.is_alive() and time.monotonic() < deadline:
+            cancellation.cancel_statements()
+            worker.join(0.05)
+
+        assert not worker.is_alive()
+        assert [type(exc) for exc in errors] == [QueryCancelledError]
+        with pytest.raises(QueryCancelledError):
+            manager.execute_query("SELECT 1", cancellation=cancellation)
+
+    def test_statement_end_waits_for_inflight_cancel(self):
+        """Test a connection is not released while a cancel against it is running"""
+        cancellation = QueryCancellation()
+        registered = threading.Event()
+        cancel_started = threading.Event()
+        release_cancel = threading.Event()
+        statement_done = threading.Event()
+
+        def slow_cancel():
+            cancel_started.set()
+            release_cancel.wait(5)
+
+        def statement():
+            with cancellation.track(slow_cancel):
+                registered.set()
+                cancel_started.wait(5)
+            statement_done.set()
+
+        worker = threading.Thread(target=statement)
+        worker.start()
+        assert registered.wait(5)
+        canceller = threading.Thread(target=cancellation.cancel_statements)
+        canceller.start()
+        assert cancel_started.wait(5)
+        # 取消还在进行，语句结束后也不能退出 track（连接不能归还连接池）
+        assert not statement_done.wait(0.2)
+        release_cancel.set()
+        worker.join(5)
+        canceller.join(5)
+        assert statement_done.is_set()
+        assert cancellation.cancel_statements() == 0
+
+    def test_child_cancellation(self):
+        """Test a child signal cancels alone and follows its parent"""
+        parent = QueryCancellation()
+        first, second = parent.child(), parent.child()
+        calls: list[str] = []
+        with (
+            first.track(lambda: calls.append("first")),
+            second.track(lambda: calls.append("second")),
+        ):
+            assert first.cancel_statements() == 1
+            assert not parent.requested and not second.requested
+            assert parent.cancel_statements() == 2
+        # 子信号的取消顺序不固定
+        assert sorted(calls) == ["first", "first", "second"]
+        with pytest.raises(QueryCancelledError):
+            with second.track(lambda: None):
+                pass
 
     def test_execute_query_read_only(self, sqlite_manager):
         """Test read-only mode blocks writes"""
@@ -156,6 +303,51 @@ class TestSQLiteManager:
         with pytest.raises(ValueError):
             sqlite_manager.execute_query("DROP TABLE test", read_only=True)
 
+    def test_read_only_profile(self, sqlite_manager, monkeypatch):
+        """Test the read-only profile opens a mode=ro URI with tuned pragmas"""
+        with sqlite_manager.connect() as conn:
+            conn.execute("CREATE TABLE test (id INTEGER)")
+            conn.execute("INSERT INTO test VALUES (1)")
+            conn.commit()
+        monkeypatch.setattr(settings, "SQLITE_MMAP_SIZE", 8 * 1024 * 1024)
+        monkeypatch.setattr(settings, "SQLITE_CACHE_SIZE", 4 * 1024 * 1024)
+        config = DatabaseConfig.from_dict(
+            {"driver": "sqlite", "database": sqlite_manager.config.database, "read_only": True}
+        )
+        manager = DatabaseManager(config)
+
+        with manager.connect() as conn:
+            pragmas = {
+                name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ("query_only", "temp_store", "mmap_size", "cache_size")
+            }
+            assert pragmas == {
+                "query_only": 1,
+                "temp_store": 2,
+                "mmap_size": 8 * 1024 * 1024,
+                "cache_size": -4096,
+            }
+        assert manager.execute_query("SELECT id FROM test").rows == [{"id": 1}]
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            manager.execute_query("INSERT INTO test VALUES (2)", read_only=False)
+
+    def test_immutable_profile(self, sqlite_manager, tmp_path):
+        """Test immutable implies read-only and a missing file is reported clearly"""
+        sqlite_manager.test_connection()
+        config = DatabaseConfig.from_dict(
+            {"driver": "sqlite", "database": sqlite_manager.config.database, "immutable": True}
+        )
+        assert config.read_only is True
+        assert DatabaseManager(config).test_connection().connected is True
+
+        missing = DatabaseConfig(
+            driver="sqlite", database=str(tmp_path / "missing.db"), read_only=True
+        )
+        result = DatabaseManager(missing, use_pool=False).test_connection()
+        assert result.connected is False
+        assert "数据库文件不存在" in result.message
+        assert not (tmp_path / "missing.db").exists()
+
     def test_get_schema_info(self, sqlite_manager):
         """Test schema info retrieval"""
         # Create a table
@@ -167,18 +359,306 @@ class TestSQLiteManager:
         schema = sqlite_manager.get_schema_info()
         assert "users" in schema
 
+    def _count_catalog_queries(self, sqlite_manager) -> int:
+        with sqlite_manager.connect() as conn:
+            statements: list[str] = []
+            conn.set_trace_callback(statements.append)
+            try:
+                sqlite_manager._adapter.fetch_schema(conn)
+            finally:
+                conn.set_trace_callback(None)
+        # 表值函数内部的 PRAGMA 以 "--" 注释形式出现在 trace 中，不是额外的往返
+        return len([sql for sql in statements if not sql.startswith("--")])
+
+    def test_get_schema_snapshot_constant_catalog_queries(self, sqlite_manager):
+        """Test bulk introspection issues one query per catalog, not per table"""
+        with sqlite_manager.connect() as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+            conn.commit()
+        baseline = self._count_catalog_queries(sqlite_manager)
+
+        with sqlite_manager.connect() as conn:
+            conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, amount DECIMAL(10,2))")
+            conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, sku TEXT UNIQUE)")
+            conn.commit()
+        assert self._count_catalog_queries(sqlite_manager) == baseline
+
+    def test_get_schema_snapshot_structure(self, sqlite_manager):
+        """Test snapshot carries types, nullability, keys, indexes and row estimates"""
+        with sqlite_manager.connect() as conn:
+            conn.execute(
+                "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+                "status TEXT DEFAULT 'active')"
+            )
+            conn.execute(
+                "CREATE TABLE orders (id INTEGER PRIMARY KEY, amount DECIMAL(10,2), "
+                "user_id INTEGER REFERENCES users)"
+            )
+            conn.execute("CREATE UNIQUE INDEX idx_users_name ON users(name)")
+            conn.executemany("INSERT INTO users (name) VALUES (?)", [("a",), ("b",), ("c",)])
+            conn.execute("ANALYZE")
+            conn.commit()
+
+        snapshot = sqlite_manager.get_schema_snapshot()
+        assert [table.name for table in snapshot.tables] == ["orders", "users"]
+        users = snapshot.get_table("users")
+        assert users is not None
+        assert [column.name for column in users.columns] == ["id", "name", "status"]
+        assert users.primary_key == ["id"]
+        assert users.columns[1].is_nullable is False
+        assert users.columns[2].default_value == "'active'"
+        assert [(index.name, index.columns, index.is_unique) for index in users.indexes] == [
+            ("idx_users_name", ["name"], True)
+        ]
+        assert users.row_estimate == 3
+
+        orders = snapshot.get_table("orders")
+        assert orders is not None
+        assert orders.columns[1].data_type == "DECIMAL(10,2)"
+        assert len(orders.foreign_keys) == 1
+        assert orders.foreign_keys[0].columns == ["user_id"]
+        assert orders.foreign_keys[0].referenced_table == "users"
+        assert orders.foreign_keys[0].referenced_columns == ["id"]
+
+        prompt = snapshot.to_prompt_text()
+        assert "- users: id (INTEGER), name (TEXT), status (TEXT)" in prompt
+        assert "外键: user_id -> users.id" in prompt
+        assert snapshot.to_prompt_text() is prompt
+
+        restored = SchemaSnapshot.from_dict(snapshot.to_dict())
+        assert restored == snapshot
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool:
+    """Test ConnectionPool behaviour"""
+
+    @staticmethod
+    def _ping(conn):
+        if not conn.alive:
+            raise ConnectionError("gone")
+
+    def test_reuses_released_connection(self):
+        pool = ConnectionPool(FakeConnection, ping=self._ping, max_size=2)
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+        assert second is first
+        stats = pool.stats()
+        assert stats.created == 1
+        assert stats.reused == 1
+        assert stats.in_use == 1
+
+    def test_exhausted_pool_times_out(self):
+        pool = ConnectionPool(FakeConnection, ping=self._ping, max_size=1, acquire_timeout=0.05)
+        pool.acquire()
+        with pytest.raises(PoolExhaustedError):
+            pool.acquire()
+
+    def test_dead_connection_is_replaced(self):
+        pool = ConnectionPool(FakeConnection, ping=self._ping, max_size=1)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.alive = False
+        replacement = pool.acquire()
+        assert replacement is not conn
+        assert conn.closed is True
+        assert pool.stats().failed_pings == 1
+
+    def test_idle_connections_are_evicted_above_min_size(self):
+        pool = ConnectionPool(
+            FakeConnection,
+            ping=self._ping,
+            min_size=1,
+            max_size=3,
+            idle_timeout=0.01,
+        )
+        connections = [pool.acquire() for _ in range(3)]
+        for conn in connections:
+            pool.release(conn)
+        time.sleep(0.02)
+        pool.acquire()
+        stats = pool.stats()
+        assert stats.evicted == 2
+        assert stats.idle == 0
+
+    def test_close_closes_idle_connections(self):
+        pool = ConnectionPool(FakeConnection, ping=self._ping)
+        conn = pool.acquire()
+        pool.release(conn)
+        pool.close()
+        assert conn.closed is True
+        with pytest.raises(RuntimeError):
+            pool.acquire()
+
+
+class TestPooledDatabaseManager:
+    """Test DatabaseManager pooling integration"""
+
+    def test_queries_share_pooled_connection(self, tmp_path):
+        config = DatabaseConfig(driver="sqlite", database=str(tmp_path / "pooled.db"))
+        manager = DatabaseManager(config, use_pool=True)
+        with manager.connect() as conn:
+            conn.execute("CREATE TABLE items (id INTEGER)")
+            conn.commit()
+
+        manager.execute_query("SELECT * FROM items")
+        DatabaseManager(config, use_pool=True).test_connection()
+
+        stats = next(s for s in get_connection_pool_stats() if s.key == config.fingerprint())
+        assert stats.created == 1
+        assert stats.reused == 2
+
+    def test_invalidate_drops_pool(self, tmp_path):
+        config = DatabaseConfig(driver="sqlite", database=str(tmp_path / "invalidate.db"))
+        DatabaseManager(config, use_pool=True).test_connection()
+        assert invalidate_connection_pool(config) is True
+        assert all(s.key != config.fingerprint() for s in get_connection_pool_stats())
+        assert invalidate_connection_pool(config) is False
+
+    def test_fingerprint_changes_with_credentials(self):
+        base = DatabaseConfig(driver="mysql", user="root", password="a", database="db")
+        changed = DatabaseConfig(driver="mysql", user="root", password="b", database="db")
+        assert base.fingerprint() == DatabaseConfig(**vars(base)).fingerprint()
+        assert base.fingerprint() != changed.fingerprint()
+
+
+class TestDatabaseExecutor:
+    """Test non-blocking database execution"""
+
+    async def test_execute_query_async_runs_off_event_loop(self, tmp_path):
+        config = DatabaseConfig(driver="sqlite", database=str(tmp_path / "async.db"))
+        manager = DatabaseManager(config)
+        with manager.connect() as conn:
+            conn.execute("CREATE TABLE t (id INTEGER)")
+            conn.execute("INSERT INTO t VALUES (1)")
+            conn.commit()
+
+        result = await manager.execute_query_async("SELECT * FROM t")
+        assert result.rows_count == 1
+        assert (await manager.test_connection_async()).connected is True
+        assert "t" in await manager.get_schema_info_async()
+
+    async def test_execute_query_async_validates_read_only(self, tmp_path):
+        manager = DatabaseManager(DatabaseConfig(driver="sqlite", database=":memory:"))
+        with pytest.raises(ValueError):
+            await manager.execute_query_async("DELETE FROM t")
+
+    async def test_per_connection_limit(self):
+        executor = DatabaseExecutor(max_workers=4, per_connection_limit=1)
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+        try:
+            await asyncio.gather(*(executor.run("same", work) for _ in range(3)))
+            assert peak == 1
+            peak = 0
+            await asyncio.gather(executor.run("a", work), executor.run("b", work))
+            assert peak == 2
+        finally:
+            executor.shutdown()
+
+    async def test_cancelled_call_keeps_its_slot_until_thread_returns(self):
+        executor = DatabaseExecutor(max_workers=4, per_connection_limit=1)
+        release = threading.Event()
+        started: list[str] = []
+
+        def slow():
+            started.append("slow")
+            release.wait(5)
+
+        def fast():
+            started.append("fast")
+
+        try:
+            abandoned = asyncio.create_task(executor.run("same", slow))
+            await asyncio.sleep(0.05)
+            abandoned.cancel()
+            follower = asyncio.create_task(executor.run("same", fast))
+            await asyncio.sleep(0.1)
+            # 被放弃的调用仍在线程中运行，下一条语句不能越过并发上限
+            assert started == ["slow"]
+            release.set()
+            await asyncio.wait_for(follower, timeout=5)
+            assert started == ["slow", "fast"]
+            assert abandoned.cancelled()
+        finally:
+            release.set()
+            executor.shutdown()
+
+
+class TestSchemaCache:
+    """Test fingerprint-invalidated schema cache"""
+
+    async def test_probe_detects_ddl_and_survives_restart(self, tmp_path, monkeypatch):
+        db_path = tmp_path / "cached.db"
+        db_config = {"driver": "sqlite", "database": str(db_path)}
+        connection_id = uuid4()
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY)")
+
+        fetches = 0
+        original = DatabaseManager.get_schema_snapshot
+
+        def counting_snapshot(self):
+            nonlocal fetches
+            fetches += 1
+            return original(self)
+
+        monkeypatch.setattr(DatabaseManager, "get_schema_snapshot", counting_snapshot)
+
+        cache = SchemaCache(probe_interval=0)
+        first = await cache.get_snapshot(connection_id, db_config)
+        assert [table.name for table in first.tables] == ["users"]
+        assert first.fingerprint is not None
+
+        await cache.get_snapshot(connection_id, db_config)
+        assert fetches == 1
+
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY)")
+
+        changed = await cache.get_snapshot(connection_id, db_config)
+        assert [table.name for table in changed.tables] == ["orders", "users"]
+        assert fetches == 2
+
+        restarted = SchemaCache(probe_interval=0)
+        persisted = await restarted.get_snapshot(connection_id, db_config)
+        assert [table.name for table in persisted.tables] == ["orders", "users"]
+        assert fetches == 2
+
+        restarted.invalidate(connection_id)
+        await SchemaCache(probe_interval=0).get_snapshot(connection_id, db_config)
+        assert fetches == 3
+
 
 class TestQueryResult:
     """Test QueryResult class"""
 
     def test_query_result(self):
         """Test QueryResult creation"""
-        result = QueryResult(
-            data=[{"id": 1, "name": "test"}],
-            rows_count=1,
-        )
+        result = QueryResult(columns=["id", "name"], values=[[1], ["test"]])
         assert result.rows_count == 1
-        assert len(result.data) == 1
+        assert result.column_types == ["int", "str"]
+        assert result.rows == [{"id": 1, "name": "test"}]
 
 
 class TestConnectionTestResult:
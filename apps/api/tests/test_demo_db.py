@@ -22,6 +22,7 @@ async def test_seed_demo_connection_when_workspace_is_empty(db_session: AsyncSes
     assert connections[0].driver == "sqlite"
     assert connections[0].database_name == demo_path
     assert connections[0].is_default is True
+    assert connections[0].extra_options == {"read_only": True}
 
     settings_record = await get_or_create_app_settings(db_session)
     assert settings_record.default_connection_id == connections[0].id
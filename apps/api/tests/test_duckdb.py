@@ -0,0 +1,184 @@
+"""Tests for the DuckDB adapter"""
+
+import pytest
+
+from app.core.config import settings
+from app.services.cost_guard import CostGuardError, CostGuardPolicy
+from app.services.database import DatabaseConfig, DatabaseManager
+from app.services.database_adapters import duckdb_file_views
+from app.services.query_cancellation import QueryCancellation, QueryCancelledError
+
+duckdb = pytest.importorskip("duckdb")
+
+ENDLESS_SQL = "SELECT COUNT(*) FROM range(1000000000000) a, range(1000000) b"
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    root = tmp_path / "extracts"
+    root.mkdir()
+    conn = duckdb.connect()
+    conn.execute(
+        f"COPY (SELECT range AS id, range % 7 AS region FROM range(1000)) "
+        f"TO '{root / 'orders.parquet'}'"
+    )
+    conn.execute(
+        f"COPY (SELECT range AS id, 'user_' || range AS name FROM range(50)) "
+        f"TO '{root / 'users.csv'}'"
+    )
+    conn.execute(
+        f"COPY (SELECT range AS id, range % 3 AS part FROM range(30)) "
+        f"TO '{root / 'events'}' (FORMAT parquet, PARTITION_BY (part))"
+    )
+    conn.close()
+    (root / "notes.txt").write_text("ignored")
+    return root
+
+
+@pytest.fixture
+def directory_manager(data_dir):
+    return DatabaseManager(DatabaseConfig(driver="duckdb", database=str(data_dir)))
+
+
+@pytest.fixture
+def database_file(tmp_path):
+    path = tmp_path / "warehouse.duckdb"
+    conn = duckdb.connect(str(path))
+    conn.execute(
+        "CREATE TABLE customers (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL);"
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, "
+        "customer_id INTEGER REFERENCES customers(id), amount DOUBLE);"
+        "INSERT INTO customers VALUES (1, 'alice'), (2, 'bob');"
+        "INSERT INTO orders VALUES (1, 1, 9.5), (2, 1, 3.0), (3, 2, 7.25);"
+        "COMMENT ON TABLE orders IS '客户订单';"
+        "COMMENT ON COLUMN orders.amount IS '订单金额';"
+    )
+    conn.close()
+    return path
+
+
+def test_directory_sources_become_views(data_dir, directory_manager):
+    assert set(duckdb_file_views(data_dir)) == {"events", "orders", "users"}
+
+    result = directory_manager.execute_query(
+        "SELECT region, COUNT(*) AS n FROM orders GROUP BY region ORDER BY region"
+    )
+    assert result.columns == ["region", "n"]
+    assert result.rows_count == 7
+    assert result.rows[0] == {"region": 0, "n": 143}
+
+    result = directory_manager.execute_query(
+        "SELECT part, COUNT(*) AS n FROM events GROUP BY part ORDER BY part"
+    )
+    assert result.rows == [{"part": 0, "n": 10}, {"part": 1, "n": 10}, {"part": 2, "n": 10}]
+
+
+def test_results_are_arrow_backed(directory_manager):
+    pytest.importorskip("pyarrow")
+    result = directory_manager.execute_query("SELECT id, name FROM users ORDER BY id")
+    assert result.arrow is not None
+    assert result.to_arrow() is result.arrow
+    assert result.column_types == ["int64", "string"]
+    assert result.column("name")[:2] == ["user_0", "user_1"]
+    assert list(result.to_pandas().columns) == ["id", "name"]
+
+
+def test_row_budget_truncates(directory_manager, monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_FETCH_BATCH_SIZE", 64)
+    result = directory_manager.execute_query("SELECT * FROM orders", max_rows=100)
+    assert result.rows_count == 100
+    assert result.truncated is True
+    assert result.total_rows is None
+
+    result = directory_manager.execute_query("SELECT * FROM orders", max_rows=1000)
+    assert result.rows_count == 1000
+    assert result.truncated is False
+    assert result.total_rows == 1000
+
+
+def test_files_outside_source_are_not_readable(directory_manager, tmp_path):
+    (tmp_path / "secret.csv").write_text("token\nabc\n")
+    with pytest.raises(duckdb.Error):
+        directory_manager.execute_query(f"SELECT * FROM read_csv('{tmp_path / 'secret.csv'}')")
+
+
+def test_database_file_schema(database_file):
+    manager = DatabaseManager(DatabaseConfig(driver="duckdb", database=str(database_file)))
+    assert manager.test_connection().tables_count == 2
+
+    snapshot = manager.get_schema_snapshot()
+    tables = {table.name: table for table in snapshot.tables}
+    assert tables["orders"].primary_key == ["id"]
+    assert tables["orders"].foreign_keys[0].referenced_table == "customers"
+    assert tables["orders"].foreign_keys[0].columns == ["customer_id"]
+    assert tables["customers"].columns[1].is_nullable is False
+    assert tables["orders"].comment == "客户订单"
+    assert [column.comment for column in tables["orders"].columns] == [None, None, "订单金额"]
+    assert "amount (DOUBLE, 订单金额)" in snapshot.prompt_text
+    assert snapshot.fingerprint == manager.get_schema_fingerprint()
+
+    result = manager.execute_query(
+        "SELECT c.name, SUM(o.amount) AS total FROM orders o JOIN customers c "
+        "ON c.id = o.customer_id GROUP BY c.name ORDER BY c.name"
+    )
+    assert result.rows == [{"name": "alice", "total": 12.5}, {"name": "bob", "total": 7.25}]
+
+
+@pytest.mark.parametrize("source", ["database_file", "data_dir"])
+def test_concurrent_connections_to_one_source(source, request, monkeypatch):
+    monkeypatch.setattr(settings, "DUCKDB_THREADS", 2)
+    monkeypatch.setattr(settings, "DUCKDB_MEMORY_LIMIT", "512MB")
+    path = request.getfixturevalue(source)
+    manager = DatabaseManager(DatabaseConfig(driver="duckdb", database=str(path)))
+
+    # 同一文件的连接共享数据库实例，第一个连接锁定配置后仍能打开第二个连接
+    with manager.connect() as first, manager.connect() as second:
+        assert first is not second
+        result = manager.execute_query("SELECT COUNT(*) AS n FROM orders")
+        assert result.rows[0]["n"] > 0
+        setting = "SELECT current_setting('threads')"
+        assert second.execute(setting).fetchone()[0] == 2
+        with pytest.raises(duckdb.Error):
+            second.execute("SET threads = 4")
+        with pytest.raises(duckdb.Error):
+            second.execute("SELECT * FROM read_csv('/etc/passwd')")
+
+
+def test_missing_source(tmp_path):
+    manager = DatabaseManager(
+        DatabaseConfig(driver="duckdb", database=str(tmp_path / "missing")), use_pool=False
+    )
+    result = manager.test_connection()
+    assert result.connected is False
+    assert "数据源不存在" in result.message
+
+
+def test_cost_guard_uses_cardinality_estimates(directory_manager):
+    plan = directory_manager.explain_query("SELECT * FROM orders o, users u")
+    # CSV 的行数是按文件大小估算的
+    assert plan.rows is not None and plan.rows > 10_000
+    assert plan.steps[0] == "CROSS_PRODUCT"
+
+    policy = CostGuardPolicy(enabled=True, max_rows=10_000, action="reject")
+    with pytest.raises(CostGuardError):
+        directory_manager.execute_query("SELECT * FROM orders o, users u", cost_guard=policy)
+
+
+def test_statement_timeout_interrupts_query(data_dir, monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_STATEMENT_TIMEOUT", 0.2)
+    manager = DatabaseManager(DatabaseConfig(driver="duckdb", database=str(data_dir)))
+    with pytest.raises(duckdb.InterruptException, match="执行超时"):
+        manager.execute_query(ENDLESS_SQL)
+
+
+def test_cancellation_interrupts_query(directory_manager):
+    import threading
+
+    cancellation = QueryCancellation()
+    timer = threading.Timer(0.2, cancellation.cancel_statements)
+    timer.start()
+    try:
+        with pytest.raises(QueryCancelledError):
+            directory_manager.execute_query(ENDLESS_SQL, cancellation=cancellation)
+    finally:
+        timer.cancel()
@@ -1,6 +1,51 @@
 """Tests for gptme_engine.py"""
 
+import asyncio
+import sqlite3
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.models.chat import SSEEventType
+from app.services.database import QueryResult
+from app.services.engine_content import (
+    ContentEvent,
+    StreamingContentParser,
+    clean_content_for_display,
+    extract_chart_config,
+    extract_python_block,
+    extract_sql_block,
+    extract_sql_blocks,
+    parse_thinking_markers,
+)
+from app.services.engine_workflow import EngineRunState
 from app.services.gptme_engine import GptmeEngine, PythonSecurityAnalyzer
+from app.services.query_cancellation import QueryCancellation
+
+STREAMED_COMPLETION = """[thinking: 分析问题] 先查询销售数据。
+
+```SQL
+SELECT region, SUM(amount) AS total
+FROM sales GROUP BY region;
+```
+
+[thinking: 生成图表]
+```python
+import pandas as pd
+print(df.head())
+```
+
+```chart
+{"type": "bar", "xKey": "region", "yKeys": ["total"]}
+```
+
+```sql
+SELECT 1;
+```
+完成。"""
 
 
 class TestGptmeEngine:
@@ -335,6 +380,11 @@ class TestGptmeEngine:
         assert engine._categorize_sql_error("unknown column 'email'")[0] == "SQL_COLUMN_ERROR"
         assert engine._categorize_sql_error("Access denied for user")[0] == "DB_AUTH_ERROR"
         assert engine._categorize_sql_error("只允许执行只读查询")[0] == "SQL_SAFETY_ERROR"
+        assert engine._categorize_sql_error("canceling statement due to statement timeout") == (
+            "SQL_TIMEOUT",
+            "sql",
+            True,
+        )
 
     def test_categorize_python_error(self):
         """Test Python error categorization for auto repair"""
@@ -376,6 +426,420 @@ class TestGptmeEngine:
         assert "SELECT * FROM users" in entry["sql"]
 
 
+class TestStreamingContentParser:
+    """Test incremental parsing of streamed model output"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, len(STREAMED_COMPLETION)])
+    def test_matches_regex_extraction_for_any_chunking(self, chunk_size):
+        parser = StreamingContentParser()
+        events = []
+        for start in range(0, len(STREAMED_COMPLETION), chunk_size):
+            events.extend(parser.feed(STREAMED_COMPLETION[start : start + chunk_size]))
+        parsed = parser.finish()
+
+        assert parsed.content == STREAMED_COMPLETION
+        assert parsed.thinking == parse_thinking_markers(STREAMED_COMPLETION)
+        assert parsed.sql == extract_sql_block(STREAMED_COMPLETION)
+        assert parsed.python == extract_python_block(STREAMED_COMPLETION)
+        assert parsed.chart_config == extract_chart_config(STREAMED_COMPLETION)
+        text = "".join(event.text for event in events if event.kind == "text")
+        assert text.strip() == clean_content_for_display(STREAMED_COMPLETION)
+        assert [(event.kind, event.language) for event in events if event.kind != "text"] == [
+            ("thinking", None),
+            ("block", "sql"),
+            ("thinking", None),
+            ("block", "python"),
+            ("block", "chart"),
+            ("block", "sql"),
+        ]
+
+    def test_events_emitted_when_constructs_close(self):
+        parser = StreamingContentParser()
+        assert parser.feed("[thinking: 正在") == []
+        assert [event.text for event in parser.feed("分析] ```sql\nSELECT 1")] == ["正在分析"]
+        assert parser.feed(";\n``") == []
+        events = parser.feed("`\n说明")
+        assert [(event.kind, event.language, event.text) for event in events] == [
+            ("block", "sql", "SELECT 1;"),
+            ("text", None, "说明"),
+        ]
+
+    def test_text_events_hold_back_partial_constructs(self):
+        parser = StreamingContentParser()
+        assert [event.text for event in parser.feed("\n\n结果如下`")] == ["结果如下"]
+        assert parser.feed("``sql\nSELECT 1;\n```\n\n\n\n") == [
+            ContentEvent(kind="block", text="SELECT 1;", language="sql"),
+            ContentEvent(kind="text", text="\n\n"),
+        ]
+        events = parser.feed("\n```text\nkeep```")
+        text = "".join(event.text for event in events if event.kind == "text")
+        assert text == "```text\nkeep```"
+
+    def test_raw_select_fallback_and_unclosed_block(self):
+        parser = StreamingContentParser()
+        parser.feed("直接查询 SELECT * FROM users\n```python\nprint(1)")
+        parsed = parser.finish()
+        assert parsed.sql == extract_sql_block(parsed.content)
+        assert parsed.python is None
+
+
+def stream_chunks(*parts: str):
+    return [
+        SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+        for part in parts
+    ]
+
+
+class TestSpeculativeSQL:
+    """Test SQL execution overlapping with generation"""
+
+    async def test_sql_starts_before_stream_finishes(self, tmp_path):
+        db_path = tmp_path / "spec.db"
+        engine = GptmeEngine(python_enabled=False)
+        db_config = {"driver": "sqlite", "database": str(db_path)}
+        executed: list[str] = []
+        observed_during_stream: list[bool] = []
+
+        async def fake_execute_sql(sql, config, **_):
+            executed.append(sql)
+            return QueryResult.from_rows([{"n": 1}])
+
+        async def fake_stream():
+            for chunk in stream_chunks("说明\n```sql\nSELECT 1 AS n;\n", "```\n"):
+                yield chunk
+            await asyncio.sleep(0.01)
+            observed_during_stream.append(bool(executed))
+            for chunk in stream_chunks("结果解释。"):
+                yield chunk
+
+        async def fake_acompletion(**_):
+            return fake_stream()
+
+        with (
+            patch("litellm.acompletion", fake_acompletion),
+            patch.object(engine, "_execute_sql", fake_execute_sql),
+            patch.object(engine, "_get_schema_info", return_value="- t: n (INTEGER)"),
+        ):
+            events = [event async for event in engine.execute("q", "system", db_config=db_config)]
+
+        assert observed_during_stream == [True]
+        assert executed == ["SELECT 1 AS n;"]
+        deltas = [event.data for event in events if event.type == SSEEventType.CONTENT_DELTA]
+        assert "".join(delta["delta"] for delta in deltas) == "说明\n\n结果解释。"
+        assert {(delta["phase"], delta["attempt"]) for delta in deltas} == {("generate", 1)}
+        result = next(event for event in events if event.type == SSEEventType.RESULT)
+        assert result.data["data"] == [{"n": 1}]
+        assert result.data["execution_time"] is not None
+
+    async def test_execute_sql_injects_row_limit(self, tmp_path, monkeypatch):
+        db_path = tmp_path / "rows.db"
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE t (n INTEGER)")
+            conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(20)])
+        monkeypatch.setattr(settings, "QUERY_MAX_ROWS", 5)
+        engine = GptmeEngine(python_enabled=False)
+        db_config = {"driver": "sqlite", "database": str(db_path)}
+
+        result = await engine._execute_sql("SELECT n FROM t ORDER BY n", db_config)
+        assert result.column("n") == [0, 1, 2, 3, 4]
+        assert (result.truncated, result.rows_fetched, result.total_rows) == (True, 6, None)
+
+        result = await engine._execute_sql("SELECT n FROM t WHERE n < 3", db_config)
+        assert (result.truncated, result.total_rows) == (False, 3)
+
+    async def test_unclaimed_speculation_is_discarded(self):
+        state = EngineRunState(
+            query="q",
+            system_prompt="s",
+            db_config={},
+            db_context=None,
+            history=None,
+            completion_messages=[],
+            max_attempts=1,
+        )
+        blocker = asyncio.Event()
+
+        async def run():
+            await blocker.wait()
+            return QueryResult(), 0.0
+
+        task = asyncio.create_task(run())
+        state.start_speculation("SELECT 1;", task)
+        assert state.take_speculation("SELECT 2;") is None
+        state.discard_speculation()
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        assert state.speculative_tasks == {}
+
+    async def test_discarded_speculation_cancels_its_statement(self, tmp_path):
+        db_path = tmp_path / "spec.db"
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE t (n INTEGER)")
+        parent = QueryCancellation()
+        state = EngineRunState(
+            query="q",
+            system_prompt="s",
+            db_config={"driver": "sqlite", "database": str(db_path)},
+            db_context=None,
+            history=None,
+            completion_messages=[],
+            max_attempts=1,
+            cancellation=parent,
+        )
+        engine = GptmeEngine(python_enabled=False)
+        started = threading.Event()
+        cancelled = threading.Event()
+
+        def statement(cancellation):
+            with cancellation.track(cancelled.set):
+                started.set()
+                # 模拟数据库上运行中的语句，直到收到取消
+                if not cancelled.wait(5):
+                    raise AssertionError("statement was not cancelled")
+
+        async def fake_execute_sql(sql, config, *, cancellation=None):
+            await asyncio.to_thread(statement, cancellation)
+            return QueryResult(), 0.0
+
+        with patch.object(engine, "_execute_sql", fake_execute_sql):
+            engine._start_speculative_sql(state, "SELECT n FROM t;")
+            assert await asyncio.to_thread(started.wait, 5)
+            state.discard_speculation()
+            assert await asyncio.to_thread(cancelled.wait, 5)
+
+        # 只取消被丢弃的语句，整个执行并没有停止
+        assert not parent.requested
+
+
+MULTI_SQL_COMPLETION = """对比两年的收入。
+
+```sql revenue_2024
+SELECT region, SUM(amount) AS total FROM sales WHERE year = 2024 GROUP BY region;
+```
+
+```sql
+SELECT region, SUM(amount) AS total FROM sales WHERE year = 2023 GROUP BY region;
+```
+
+```python
+print(revenue_2024.merge(df2, on="region"))
+```
+"""
+
+
+class TestMultipleSQLBlocks:
+    """Test answers with several independent SQL blocks"""
+
+    def test_block_names(self):
+        content = (
+            "```sql sales_2024\nSELECT 1;\n```\n"
+            "```sql\nSELECT 2;\n```\n"
+            "```sql df\nSELECT 3;\n```\n"
+            "```sql sales_2024\nSELECT 4;\n```\n"
+            "```sql\n```\n"
+            "```sql select\n* FROM t;\n```"
+        )
+        blocks = extract_sql_blocks(content)
+        assert [(block.name, block.sql) for block in blocks] == [
+            ("sales_2024", "SELECT 1;"),
+            ("df2", "SELECT 2;"),
+            ("df3", "SELECT 3;"),
+            ("df4", "SELECT 4;"),
+            ("df5", "select\n* FROM t;"),
+        ]
+        assert extract_sql_block(content) == "SELECT 1;"
+        assert extract_sql_block("```sql SELECT 1;```") == "SELECT 1;"
+        assert [block.name for block in extract_sql_blocks(STREAMED_COMPLETION)] == ["df1", "df2"]
+
+    async def test_blocks_run_concurrently_and_stream(self):
+        engine = GptmeEngine(python_enabled=False)
+        db_config = {"driver": "sqlite", "database": ":memory:"}
+        second_done = asyncio.Event()
+
+        async def fake_execute_sql(sql, config, **_):
+            if "2024" in sql:
+                # 第一个块要等第二个块完成，串行执行会超时
+                await asyncio.wait_for(second_done.wait(), timeout=5)
+                return QueryResult.from_rows([{"region": "east", "total": 10}])
+            second_done.set()
+            return QueryResult.from_rows([{"region": "east", "total": 8}])
+
+        async def fake_acompletion(**_):
+            async def stream():
+                for chunk in stream_chunks(MULTI_SQL_COMPLETION):
+                    yield chunk
+
+            return stream()
+
+        with (
+            patch("litellm.acompletion", fake_acompletion),
+            patch.object(engine, "_execute_sql", fake_execute_sql),
+            patch.object(engine, "_get_schema_info", return_value="- sales: region, amount"),
+        ):
+            events = [event async for event in engine.execute("q", "system", db_config=db_config)]
+
+        streamed = [event.data for event in events if event.type == SSEEventType.SQL_RESULT]
+        assert [(item["name"], item["index"]) for item in streamed] == [
+            ("df2", 1),
+            ("revenue_2024", 0),
+        ]
+        result = next(event for event in events if event.type == SSEEventType.RESULT)
+        assert result.data["data"] == [{"region": "east", "total": 10}]
+        assert [item["name"] for item in result.data["datasets"]] == ["revenue_2024", "df2"]
+        assert result.data["datasets"][1]["data"] == [{"region": "east", "total": 8}]
+        assert {"df", "query_result", "revenue_2024", "df2"} <= set(engine._sql_data)
+        assert engine._sql_data["df"] is not engine._sql_data["df2"]
+
+    async def test_failed_block_cancels_the_others(self):
+        engine = GptmeEngine(python_enabled=False, auto_repair_enabled=False)
+        db_config = {"driver": "sqlite", "database": ":memory:"}
+        slow_cancelled = asyncio.Event()
+
+        async def fake_execute_sql(sql, config, **_):
+            if "2024" in sql:
+                try:
+                    await asyncio.sleep(30)
+                except asyncio.CancelledError:
+                    slow_cancelled.set()
+                    raise
+            raise RuntimeError("no such column: amount")
+
+        async def fake_acompletion(**_):
+            async def stream():
+                for chunk in stream_chunks(MULTI_SQL_COMPLETION):
+                    yield chunk
+
+            return stream()
+
+        with (
+            patch("litellm.acompletion", fake_acompletion),
+            patch.object(engine, "_execute_sql", fake_execute_sql),
+            patch.object(engine, "_get_schema_info", return_value="- sales: region, amount"),
+        ):
+            events = [event async for event in engine.execute("q", "system", db_config=db_config)]
+
+        error = events[-1]
+        assert error.type == SSEEventType.ERROR
+        assert error.data["failed_stage"] == "sql"
+        assert "（df2）" in error.data["message"]
+        assert error.data["diagnostics"][-1]["sql"].endswith("year = 2023 GROUP BY region;")
+        await asyncio.wait_for(slow_cancelled.wait(), timeout=1)
+
+    async def test_failed_block_cancels_running_statements(self):
+        engine = GptmeEngine(python_enabled=False, auto_repair_enabled=False)
+        db_config = {"driver": "sqlite", "database": ":memory:"}
+        parent = QueryCancellation()
+        started = threading.Event()
+        cancelled = threading.Event()
+
+        def statement(cancellation):
+            with cancellation.track(cancelled.set):
+                started.set()
+                # 模拟数据库上运行中的语句，直到收到取消
+                if not cancelled.wait(5):
+                    raise AssertionError("statement was not cancelled")
+
+        async def fake_execute_sql(sql, config, *, cancellation=None):
+            if "2024" in sql:
+                await asyncio.to_thread(statement, cancellation)
+                return QueryResult()
+            await asyncio.to_thread(started.wait, 5)
+            raise RuntimeError("no such column: amount")
+
+        async def fake_acompletion(**_):
+            async def stream():
+                for chunk in stream_chunks(MULTI_SQL_COMPLETION):
+                    yield chunk
+
+            return stream()
+
+        with (
+            patch("litellm.acompletion", fake_acompletion),
+            patch.object(engine, "_execute_sql", fake_execute_sql),
+            patch.object(engine, "_get_schema_info", return_value="- sales: region, amount"),
+        ):
+            events = [
+                event
+                async for event in engine.execute(
+                    "q", "system", db_config=db_config, cancellation=parent
+                )
+            ]
+            assert await asyncio.to_thread(cancelled.wait, 5)
+
+        assert events[-1].type == SSEEventType.ERROR
+        # 只取消了失败块之外的语句，请求本身没有被停止
+        assert not parent.requested
+
+
+class TestPythonStreaming:
+    """Test Python output streamed while the analysis runs"""
+
+    async def test_output_is_streamed_before_execution_finishes(self):
+        engine = GptmeEngine()
+        db_config = {"driver": "sqlite", "database": ":memory:"}
+        output_seen = asyncio.Event()
+
+        async def fake_execute_sql(sql, config, **_):
+            return QueryResult.from_rows([{"region": "east", "total": 10}])
+
+        async def fake_execute_python(code, timeout=30, listener=None):
+            listener("stdout", "loading\n")
+            # 没有推送输出时这里会超时
+            await asyncio.wait_for(output_seen.wait(), timeout=5)
+            listener("image", "f" * 64)
+            listener("stderr", "warning\n")
+            return "loading\n\n[stderr]: warning\n", ["f" * 64]
+
+        async def fake_acompletion(**_):
+            async def stream():
+                for chunk in stream_chunks(MULTI_SQL_COMPLETION):
+                    yield chunk
+
+            return stream()
+
+        events = []
+        with (
+            patch("litellm.acompletion", fake_acompletion),
+            patch.object(engine, "_execute_sql", fake_execute_sql),
+            patch.object(engine, "_execute_python", fake_execute_python),
+            patch.object(engine, "_get_schema_info", return_value="- sales: region, amount"),
+        ):
+            async for event in engine.execute("q", "system", db_config=db_config):
+                events.append(event)
+                if event.type == SSEEventType.PYTHON_OUTPUT:
+                    output_seen.set()
+
+        streamed = [
+            (event.type, event.data)
+            for event in events
+            if event.type in (SSEEventType.PYTHON_OUTPUT, SSEEventType.PYTHON_IMAGE)
+        ]
+        assert streamed == [
+            (
+                SSEEventType.PYTHON_OUTPUT,
+                {"output": "loading\n", "stream": "stdout", "attempt": 1},
+            ),
+            (
+                SSEEventType.PYTHON_IMAGE,
+                {"artifact_id": "f" * 64, "url": f"/api/v1/artifacts/{'f' * 64}", "attempt": 1},
+            ),
+            (
+                SSEEventType.PYTHON_OUTPUT,
+                {"output": "warning\n", "stream": "stderr", "attempt": 1},
+            ),
+        ]
+        # 输出在执行完成的诊断之前推送，结束时不再重复
+        kinds = [event.type for event in events]
+        success = next(
+            position
+            for position, event in enumerate(events)
+            if event.data.get("message") == "Python 分析执行完成。"
+        )
+        assert SSEEventType.PYTHON_OUTPUT not in kinds[success:]
+        assert SSEEventType.PYTHON_IMAGE not in kinds[success:]
+        assert kinds[-1] == SSEEventType.RESULT
+
+
 class TestPythonSecurityAnalyzer:
     """Test PythonSecurityAnalyzer"""
 
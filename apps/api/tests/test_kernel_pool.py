@@ -0,0 +1,136 @@
+"""Tests for kernel_pool.py"""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.services import kernel_pool as kernel_pool_module
+from app.services.kernel_pool import KernelPool
+from app.services.python_runtime import PythonExecutionRuntime
+from app.services.query_result import QueryResult
+
+
+@pytest.fixture
+def pool():
+    pool = KernelPool(max_size=1, warm_size=1, max_executions=3)
+    yield pool
+    pool.close()
+
+
+async def test_warm_kernel_is_reused_with_clean_namespace(pool):
+    await pool.warm()
+    assert pool.stats().idle == 1
+
+    kernel = await pool.checkout()
+    kernel.push({"secret": 42})
+    kernel.execute_cell("pd = None\nx = secret + 1\nx")
+    assert kernel.shell.user_ns["x"] == 43
+    await pool.checkin(kernel)
+
+    again = await pool.checkout()
+    assert again is kernel
+    namespace = again.shell.user_ns
+    assert "secret" not in namespace and "x" not in namespace
+    # 预热导入的模块恢复可用
+    assert namespace["pd"].__name__ == "pandas"
+    assert not namespace["_oh"]
+    await pool.checkin(again)
+
+    stats = pool.stats()
+    assert (stats.created, stats.checkouts, stats.cold_starts, stats.recycled) == (1, 2, 0, 0)
+
+
+async def test_checkout_waits_for_free_slot(pool):
+    kernel = await pool.checkout()
+    waiter = asyncio.create_task(pool.checkout())
+    await asyncio.sleep(0.05)
+    assert not waiter.done()
+
+    await pool.checkin(kernel)
+    assert await waiter is kernel
+    await pool.checkin(kernel)
+
+    stats = pool.stats()
+    assert stats.waits == 1 and stats.cold_starts == 1
+    assert stats.wait_seconds_max >= 0.05
+    assert stats.in_use == 0
+
+
+async def test_kernels_are_recycled(pool, monkeypatch):
+    kernel = await pool.checkout()
+    for _ in range(3):
+        kernel.execute_cell("1")
+    await pool.checkin(kernel)
+    # 执行次数达到上限的内核被丢弃，后台补足预热数量
+    await asyncio.sleep(0)
+    await pool._warm_task
+    replacement = await pool.checkout()
+    assert replacement is not kernel
+
+    # 超时后仍在运行的内核不能交给下一个请求
+    replacement.running = True
+    await pool.checkin(replacement)
+    assert pool.stats().recycled == 2
+
+    monkeypatch.setattr(kernel_pool_module, "current_rss_bytes", lambda: 8 * 1024**3)
+    high_water = KernelPool(max_size=1, warm_size=0, max_rss_bytes=1024**3)
+    kernel = await high_water.checkout()
+    await high_water.checkin(kernel)
+    assert high_water.stats().recycled == 1
+
+
+async def test_checkin_resets_off_the_event_loop(pool):
+    kernel = await pool.checkout()
+    reset = kernel.reset
+    started = threading.Event()
+    proceed = threading.Event()
+    threads: list[int] = []
+
+    def slow_reset():
+        # 沙箱内核的重置要等待管道往返
+        threads.append(threading.get_ident())
+        started.set()
+        proceed.wait(5)
+        reset()
+
+    kernel.reset = slow_reset
+    checkin = asyncio.create_task(pool.checkin(kernel))
+    assert await asyncio.to_thread(started.wait, 5)
+    assert threads[0] != threading.get_ident()
+
+    # 调用方被取消时归还照常完成，内核与槽位都不会泄漏
+    checkin.cancel()
+    proceed.set()
+    with pytest.raises(asyncio.CancelledError):
+        await checkin
+    while pool.stats().idle != 1:
+        await asyncio.sleep(0.01)
+    assert pool.stats().in_use == 0
+    assert await pool.checkout() is kernel
+    await pool.checkin(kernel)
+
+
+async def test_runtime_leases_kernel_only_for_python(pool):
+    runtime = PythonExecutionRuntime(font_path="/missing.ttf", pool=pool)
+    await runtime.inject_sql_data("df", QueryResult(columns=["n"], values=[[1, 2, 3]]))
+    assert runtime.ipython is None
+
+    output, images = await runtime.execute("print(int(df['n'].sum()))")
+    assert output is not None and output.strip() == "6"
+    assert images == []
+    assert pool.stats().in_use == 1
+
+    await runtime.release()
+    assert pool.stats().in_use == 0
+    kernel = await pool.checkout()
+    assert "df" not in kernel.shell.user_ns
+    await pool.checkin(kernel)
+
+
+async def test_python_kernel_stats_endpoint(client):
+    response = await client.get("/api/v1/system/python-kernels")
+    assert response.status_code == 200
+    assert {"backend", "idle", "in_use", "waits", "wait_seconds_total"} <= response.json()[
+        "data"
+    ].keys()
@@ -0,0 +1,115 @@
+"""LLM client pool tests"""
+
+import json
+
+import httpx
+import litellm
+import pytest
+
+from app.services.llm_client_pool import LLMClientPool
+
+
+def completion_stream(request: httpx.Request) -> httpx.Response:
+    chunk = {
+        "id": "chunk",
+        "object": "chat.completion.chunk",
+        "created": 1,
+        "model": "gpt-test",
+        "choices": [{"index": 0, "delta": {"content": "hi"}, "finish_reason": None}],
+    }
+    return httpx.Response(
+        200,
+        text=f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n",
+        headers={"content-type": "text/event-stream"},
+    )
+
+
+class RecordingTransports:
+    def __init__(self):
+        self.created: list[httpx.MockTransport] = []
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, limits: httpx.Limits, http2: bool) -> httpx.MockTransport:
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return completion_stream(request)
+
+        transport = httpx.MockTransport(handler)
+        self.created.append(transport)
+        return transport
+
+
+def build_pool(transports: RecordingTransports, **kwargs) -> LLMClientPool:
+    return LLMClientPool(http2=False, transport_factory=transports, **kwargs)
+
+
+def test_clients_are_shared_per_endpoint():
+    transports = RecordingTransports()
+    pool = build_pool(transports)
+    endpoint = {"provider": "openai", "base_url": "https://gw.example/v1", "api_key": "k"}
+
+    first = pool.get_client(**endpoint, headers={"X-Team": "a"})
+    second = pool.get_client(**endpoint, headers={"X-Team": "a"})
+    other = pool.get_client(**endpoint, headers={"X-Team": "b"})
+    handler = pool.get_client(provider="anthropic", base_url=None)
+
+    assert first is second
+    assert other is not first
+    assert handler is not None
+    assert len(transports.created) == 3
+    assert sorted(stats.requests for stats in pool.stats()) == [1, 1, 2]
+
+
+@pytest.mark.parametrize(
+    "endpoint",
+    [
+        {"provider": None, "base_url": "https://gw.example/v1", "api_key": "k"},
+        {"provider": "bedrock", "base_url": None, "api_key": "k"},
+        {"provider": "deepseek", "base_url": None, "api_key": "k"},
+        {"provider": "openai", "base_url": "https://gw.example/v1", "api_key": None},
+    ],
+)
+def test_unsupported_endpoints_fall_back_to_litellm(endpoint):
+    pool = build_pool(RecordingTransports())
+    assert pool.get_client(**endpoint) is None
+    assert pool.stats() == []
+
+
+def test_disabled_pool_returns_no_client():
+    pool = build_pool(RecordingTransports(), enabled=False)
+    assert pool.get_client(provider="openai", base_url=None, api_key="k") is None
+
+
+async def test_litellm_requests_go_through_pooled_transport():
+    transports = RecordingTransports()
+    pool = build_pool(transports)
+    kwargs = {
+        "model": "gpt-test",
+        "custom_llm_provider": "openai",
+        "base_url": "https://gw.example/v1",
+        "api_key": "k",
+        "messages": [{"role": "user", "content": "Hi"}],
+        "stream": True,
+    }
+
+    for _ in range(2):
+        response = await litellm.acompletion(
+            **kwargs,
+            client=pool.get_client(provider="openai", base_url=kwargs["base_url"], api_key="k"),
+        )
+        content = [chunk.choices[0].delta.content async for chunk in response]
+        assert "hi" in content
+
+    assert len(transports.created) == 1
+    assert [str(request.url) for request in transports.requests] == [
+        "https://gw.example/v1/chat/completions"
+    ] * 2
+
+    await pool.aclose()
+    assert pool.stats() == []
+
+
+async def test_llm_client_stats_endpoint(client):
+    response = await client.get("/api/v1/system/llm-clients")
+    assert response.status_code == 200
+    assert isinstance(response.json()["data"], list)
@@ -0,0 +1,126 @@
+"""Tests for output_capture.py"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from app.services.kernel_pool import AnalysisKernel
+from app.services.output_capture import OutputStreamer, capture_output
+
+
+def test_capture_is_local_to_each_thread(capsys):
+    barrier = threading.Barrier(2)
+    outputs: dict[str, str] = {}
+
+    def run(name: str) -> None:
+        with capture_output() as capture:
+            print(f"{name}-1")
+            barrier.wait()
+            print(f"{name}-2")
+            print(f"{name}-err", file=sys.stderr)
+            barrier.wait()
+        outputs[name] = capture.stdout.getvalue() + capture.stderr.getvalue()
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    print("request log")
+    for thread in threads:
+        thread.join()
+
+    assert outputs == {"a": "a-1\na-2\na-err\n", "b": "b-1\nb-2\nb-err\n"}
+    # 未在捕获中的写入仍到达原来的流
+    assert capsys.readouterr().out == "request log\n"
+
+
+async def test_concurrent_kernels_keep_their_own_output_and_figures():
+    kernels = [AnalysisKernel.create(), AnalysisKernel.create()]
+    barrier = threading.Barrier(2)
+    for index, kernel in enumerate(kernels):
+        kernel.push({"barrier": barrier, "name": f"k{index}"})
+    # 两个内核交替执行：各自的 plt.plot 画在自己的图上，close("all") 也只关闭自己的图
+    code = (
+        "print(name, 'start')\n"
+        "plt.close('all')\n"
+        "barrier.wait()\n"
+        "_ = plt.plot([1, 2, 3])\n"
+        "barrier.wait()\n"
+        "_ = plt.title(name)\n"
+        "print(name, 'done')\n"
+    )
+    try:
+        first, second = await asyncio.gather(
+            *(kernel.execute(code, timeout=30) for kernel in kernels)
+        )
+    finally:
+        for kernel in kernels:
+            kernel.close()
+
+    assert first.output == "k0 start\nk0 done\n"
+    assert second.output == "k1 start\nk1 done\n"
+    assert len(first.images) == 1 and len(second.images) == 1
+    assert first.images != second.images
+
+
+def test_figures_outside_capture_are_untouched():
+    import matplotlib.pyplot as plt
+
+    outside = plt.figure()
+    try:
+        with capture_output(figures=True) as capture:
+            plt.close("all")
+            assert plt.gcf() is not outside
+        assert capture.figures and capture.figures[0] is not outside
+        assert plt.fignum_exists(outside.number)
+        plt.close(capture.figures[0])
+        assert plt.gcf() is outside
+    finally:
+        plt.close(outside)
+
+
+def test_streamer_coalesces_writes_in_order():
+    events: list[tuple[str, str]] = []
+    streamer = OutputStreamer(lambda kind, payload: events.append((kind, payload)), interval=60)
+    streamer.write("stdout", "a")
+    streamer.write("stdout", "b\n")
+    streamer.write("stderr", "warn\n")
+    assert events == []
+    # 图片先推送已缓冲的文本，保持先后顺序
+    streamer.emit("image", "png")
+    streamer.write("stdout", "c\n")
+    streamer.close()
+    assert events == [("stdout", "ab\n"), ("stderr", "warn\n"), ("image", "png"), ("stdout", "c\n")]
+
+
+def test_kernel_streams_output_and_figures_while_running():
+    kernel = AnalysisKernel.create()
+    events: list[tuple[str, str, float]] = []
+
+    def listener(kind: str, payload: str) -> None:
+        events.append((kind, payload, time.monotonic()))
+
+    code = (
+        "import time\n"
+        "print('loading')\n"
+        "time.sleep(0.6)\n"
+        "_ = plt.plot([1, 2, 3])\n"
+        "plt.show()\n"
+        "print('done')\n"
+    )
+    try:
+        outcome = kernel.execute_cell(code, listener)
+        finished = time.monotonic()
+        # 显示后又修改的图在结束时再输出一次
+        changed = kernel.execute_cell(
+            "_ = plt.plot([1, 2])\nplt.show()\n_ = plt.title('x')", listener
+        )
+    finally:
+        kernel.close()
+
+    first = [(kind, payload) for kind, payload, _ in events[:3]]
+    assert first == [("stdout", "loading\n"), ("image", outcome.images[0]), ("stdout", "done\n")]
+    assert events[0][2] < finished - 0.4
+    assert outcome.output == "loading\ndone\n" and len(outcome.images) == 1
+    assert len(changed.images) == 2
+    assert [payload for kind, payload, _ in events[3:] if kind == "image"] == changed.images
@@ -0,0 +1,106 @@
+"""Tests for python_sandbox.py"""
+
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+
+from app.services.artifact_store import artifact_store
+from app.services.kernel_pool import KernelPool
+from app.services.python_runtime import PythonExecutionRuntime
+from app.services.python_sandbox import SandboxError, SandboxKernel
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(__import__("os"), "fork"), reason="沙箱进程的资源限制依赖 POSIX"
+)
+
+
+@pytest.fixture
+def sandbox():
+    kernel = SandboxKernel.start(memory_limit=2 * 1024**3, cpu_limit=2)
+    yield kernel
+    kernel.close()
+
+
+async def test_sandbox_runs_code_and_returns_images(sandbox):
+    sandbox.push({"df": pd.DataFrame({"n": [1, 2, 3]})})
+    outcome = await sandbox.execute(
+        "print(int(df['n'].sum()))\n_ = plt.plot(df['n'])",
+        timeout=30,
+    )
+    assert outcome.error is None
+    assert outcome.output.strip() == "6"
+    assert len(outcome.images) == 1
+    # 沙箱进程把图片写入父进程的产物目录
+    assert artifact_store.get(outcome.images[0]) is not None
+
+    failed = await sandbox.execute("df['missing']", timeout=30)
+    assert failed.error is not None and "KeyError" in failed.error
+
+    sandbox.reset()
+    assert "NameError" in (await sandbox.execute("df", timeout=30)).error
+    assert sandbox.alive
+
+
+async def test_sandbox_streams_output_while_running(sandbox):
+    events: list[tuple[str, float]] = []
+    outcome = await sandbox.execute(
+        "import time\nprint('loading')\ntime.sleep(0.6)\n_ = plt.plot([1, 2])\nplt.show()",
+        timeout=30,
+        listener=lambda kind, payload: events.append((kind, time.monotonic())),
+    )
+    assert [kind for kind, _ in events] == ["stdout", "image"]
+    assert events[0][1] < time.monotonic() - 0.4
+    assert outcome.output == "loading\n" and len(outcome.images) == 1
+
+
+async def test_memory_limit_raises_inside_sandbox(sandbox):
+    outcome = await sandbox.execute("blob = bytearray(3 * 1024 ** 3)", timeout=30)
+    assert outcome.error is not None and "MemoryError" in outcome.error
+    # 内存上限只让这次执行失败，进程仍可继续使用
+    assert (await sandbox.execute("print('ok')", timeout=30)).output.strip() == "ok"
+
+
+async def test_wall_timeout_kills_sandbox(sandbox):
+    with pytest.raises(TimeoutError, match="超时"):
+        await sandbox.execute("import time\ntime.sleep(60)", timeout=0.5)
+    assert not sandbox.alive
+    with pytest.raises(SandboxError):
+        sandbox.execute_cell("1")
+
+
+async def test_cpu_limit_kills_runaway_loop(sandbox):
+    with pytest.raises(TimeoutError, match="CPU"):
+        await sandbox.execute("while True:\n    pass", timeout=30)
+    assert not sandbox.alive
+
+
+async def test_cancelled_execution_kills_sandbox(sandbox):
+    task = asyncio.create_task(sandbox.execute("import time\ntime.sleep(60)", timeout=60))
+    await asyncio.sleep(0.5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert not sandbox.alive
+
+
+async def test_pool_respawns_killed_sandbox():
+    pool = KernelPool(max_size=1, warm_size=1, backend="process")
+    try:
+        await pool.warm()
+        runtime = PythonExecutionRuntime(font_path="/missing.ttf", pool=pool)
+        await runtime.inject_sql_data("df", pd.DataFrame({"n": [1, 2]}).to_dict("records"))
+        with pytest.raises(TimeoutError):
+            await runtime.execute("while True:\n    pass", timeout=1)
+        await runtime.release()
+        assert pool.stats().recycled == 1
+
+        await asyncio.sleep(0)
+        await pool._warm_task
+        output, _ = await runtime.execute("print(len(df))")
+        assert output is not None and output.strip() == "2"
+        await runtime.release()
+        assert pool.stats().created == 2
+    finally:
+        pool.close()
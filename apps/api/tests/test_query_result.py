@@ -0,0 +1,53 @@
+"""Columnar query result tests"""
+
+import pytest
+
+from app.services.query_result import QueryResult, collect_result
+
+
+def test_from_rows_is_columnar():
+    result = QueryResult.from_rows([{"a": 1, "b": "x"}, {"a": 2, "c": None}])
+    assert result.columns == ["a", "b", "c"]
+    assert result.values == [[1, 2], ["x", None], [None, None]]
+    assert result.column_types == ["int", "str", None]
+    assert result.rows_count == 2
+    assert result.rows[1] == {"a": 2, "b": None, "c": None}
+
+
+def test_rows_and_frame_are_built_once():
+    result = QueryResult(columns=["n"], values=[[1, 2, 3]])
+    assert result.rows is result.rows
+    assert result.to_pandas() is result.to_pandas()
+    assert result.head(2).column("n") == [1, 2]
+
+
+def test_pandas_keeps_duplicate_columns():
+    pytest.importorskip("pandas")
+    result = QueryResult(columns=["id", "id"], values=[[1, 2], [10, 20]])
+    frame = result.to_pandas()
+    assert list(frame.columns) == ["id", "id"]
+    assert frame.iloc[:, 1].tolist() == [10, 20]
+
+
+def test_collect_result_applies_budgets_across_batches():
+    columns = [("id", "long"), ("payload", None)]
+    batches = [[(i, "x" * 10) for i in range(start, start + 4)] for start in range(0, 12, 4)]
+
+    result = collect_result(columns, iter(batches), max_rows=6, max_bytes=0)
+    assert result.column("id") == [0, 1, 2, 3, 4, 5]
+    assert result.column_types == ["long", "str"]
+    assert (result.truncated, result.rows_fetched, result.total_rows) == (True, 7, None)
+
+    result = collect_result(columns, iter(batches), max_rows=0, max_bytes=40)
+    assert result.rows_count == 2
+    assert result.truncated is True
+
+    result = collect_result(columns, iter(batches), max_rows=100, max_bytes=0)
+    assert (result.rows_count, result.total_rows) == (12, 12)
+
+
+def test_collect_result_without_result_set():
+    result = collect_result([], iter(()), max_rows=10, max_bytes=0)
+    assert result.columns == []
+    assert result.rows_count == 0
+    assert result.rows == []
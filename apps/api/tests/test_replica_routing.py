@@ -0,0 +1,188 @@
+"""Tests for replica_routing.py"""
+
+import random
+import sqlite3
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services import database_adapters as adapters_module
+from app.services.database import (
+    DatabaseConfig,
+    DatabaseManager,
+    get_replica_stats,
+    invalidate_connection_pool,
+)
+from app.services.database_adapters import MySQLAdapter
+from app.services.replica_routing import ReplicaEndpoint, ReplicaRouter, replica_router
+
+
+def _make_database(path, source):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE origin (name TEXT)")
+    conn.execute("INSERT INTO origin VALUES (?)", (source,))
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+@pytest.fixture
+def primary(tmp_path):
+    return _make_database(tmp_path / "primary.db", "primary")
+
+
+@pytest.fixture
+def replica(tmp_path):
+    return _make_database(tmp_path / "replica.db", "replica")
+
+
+def _manager(primary, *replicas):
+    return DatabaseManager(
+        DatabaseConfig.from_dict({"driver": "sqlite", "database": primary, "replicas": replicas})
+    )
+
+
+def _origin(manager, **kwargs):
+    return manager.execute_query("SELECT name FROM origin", **kwargs).rows[0]["name"]
+
+
+def test_parse_list_skips_invalid_entries():
+    endpoints = ReplicaEndpoint.parse_list(
+        [
+            {"host": "replica-1", "port": "5433", "weight": 2, "max_lag": 5},
+            "replica-2",
+            {"port": 5432},
+            {"host": "replica-3", "weight": -1},
+            {"host": "replica-4", "weight": "heavy"},
+        ]
+    )
+    assert endpoints == (
+        ReplicaEndpoint(host="replica-1", port=5433, weight=2, max_lag=5),
+        ReplicaEndpoint(host="replica-2"),
+    )
+    assert endpoints[1].allowed_lag() == settings.REPLICA_MAX_LAG
+    assert ReplicaEndpoint.parse_list({"host": "x"}) == ()
+
+
+def test_for_replica_inherits_credentials():
+    config = DatabaseConfig(driver="postgresql", host="primary", port=5432, user="u", password="p")
+    replica = config.for_replica(ReplicaEndpoint(host="replica-1"))
+    assert (replica.host, replica.port, replica.user, replica.password) == (
+        "replica-1",
+        5432,
+        "u",
+        "p",
+    )
+    assert replica.read_only is True
+    assert replica.fingerprint() != config.fingerprint()
+
+
+def test_weighted_order_skips_drained_replicas():
+    router = ReplicaRouter(rng=random.Random(7))
+    candidates = [
+        ("heavy", ReplicaEndpoint(host="heavy", weight=3), "db"),
+        ("light", ReplicaEndpoint(host="light", weight=1), "db"),
+        ("drained", ReplicaEndpoint(host="drained", weight=0), "db"),
+    ]
+    first = Counter(router.order(candidates)[0][0] for _ in range(4000))
+    assert set(first) == {"heavy", "light"}
+    assert 0.7 < first["heavy"] / 4000 < 0.8
+
+
+def test_read_only_queries_use_replica(primary, replica):
+    manager = _manager(primary, {"database": replica})
+    assert _origin(manager) == "replica"
+    assert _origin(manager, read_only=False) == "primary"
+    assert manager.get_schema_snapshot().tables[0].name == "origin"
+
+    with manager.connect_for_read() as (conn, config):
+        assert config.read_only is True
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+
+    status = get_replica_stats()[0]
+    assert status.healthy is True
+    assert status.served == 2
+
+
+def test_unreachable_replica_fails_over(primary, replica, tmp_path, monkeypatch):
+    broken = str(tmp_path / "missing" / "replica.db")
+    # 固定随机种子，这次排序先尝试权重大的坏副本
+    monkeypatch.setattr(replica_router, "_rng", random.Random(0))
+    manager = _manager(
+        primary, {"database": broken, "weight": 1e6}, {"database": replica, "weight": 1e-6}
+    )
+    assert _origin(manager) == "replica"
+
+    statuses = {status.database: status for status in get_replica_stats()}
+    assert statuses[broken].healthy is False
+    assert statuses[broken].failures == 1
+    # 摘除期间不再尝试
+    assert _origin(manager) == "replica"
+    statuses = {status.database: status for status in get_replica_stats()}
+    assert statuses[broken].failures == 1
+
+
+def test_fallback_to_primary(primary, tmp_path, monkeypatch):
+    manager = _manager(primary, {"database": str(tmp_path / "missing" / "replica.db")})
+    assert _origin(manager) == "primary"
+
+    replica_router.clear()
+    monkeypatch.setattr(settings, "REPLICA_FALLBACK_TO_PRIMARY", False)
+    with pytest.raises(ConnectionError, match="没有可用的只读副本"):
+        manager.execute_query("SELECT name FROM origin")
+
+
+def test_lagging_replica_is_skipped(primary, replica, monkeypatch):
+    manager = _manager(primary, {"database": replica, "max_lag": 5})
+    monkeypatch.setattr(manager._adapter, "replication_lag", lambda conn: 60.0)
+    assert _origin(manager) == "primary"
+    assert get_replica_stats()[0].lag == 60
+    assert get_replica_stats()[0].healthy is False
+
+    # 下一次检测前直接跳过，不再借出副本连接
+    monkeypatch.setattr(manager._adapter, "replication_lag", lambda conn: 0.0)
+    assert _origin(manager) == "primary"
+
+
+def test_mysql_lag_without_replication_privilege_is_unknown(monkeypatch):
+    pymysql = pytest.importorskip("pymysql")
+    executed: list[str] = []
+
+    class DeniedCursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_):
+            return False
+
+        def execute(self, sql):
+            executed.append(sql)
+            raise pymysql.err.OperationalError(
+                1227, "Access denied; you need the REPLICATION CLIENT privilege"
+            )
+
+    conn = SimpleNamespace(host="replica-1", port=3306, cursor=DeniedCursor)
+    warnings: list[dict] = []
+    monkeypatch.setattr(adapters_module, "_lag_unknown_endpoints", set())
+    monkeypatch.setattr(
+        adapters_module.logger, "warning", lambda event, **kwargs: warnings.append(kwargs)
+    )
+
+    adapter = MySQLAdapter()
+    assert adapter.replication_lag(conn) is None
+    assert adapter.replication_lag(conn) is None
+    # 权限错误不回退到旧语法，也只警告一次
+    assert executed == ["SHOW REPLICA STATUS", "SHOW REPLICA STATUS"]
+    assert [warning["endpoint"] for warning in warnings] == ["replica-1:3306"]
+
+
+def test_invalidate_drops_replica_state(primary, replica):
+    config = DatabaseConfig.from_dict(
+        {"driver": "sqlite", "database": primary, "replicas": [{"database": replica}]}
+    )
+    _origin(DatabaseManager(config))
+    assert get_replica_stats()
+    invalidate_connection_pool(config)
+    assert get_replica_stats() == []
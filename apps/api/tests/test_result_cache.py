@@ -0,0 +1,130 @@
+"""Query result cache tests"""
+
+import sqlite3
+import time
+
+import pytest
+
+from app.services.cost_guard import CostGuardError, CostGuardPolicy
+from app.services.database import DatabaseConfig, DatabaseManager
+from app.services.query_result import QueryResult
+from app.services.result_cache import (
+    ResultCache,
+    estimate_result_bytes,
+    is_cacheable_sql,
+    normalize_sql,
+    sql_fingerprint,
+)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    db_path = tmp_path / "sales.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE sales (region TEXT, amount INTEGER)")
+        conn.executemany("INSERT INTO sales VALUES (?, ?)", [("east", 10), ("west", 20)])
+    return DatabaseManager(DatabaseConfig(driver="sqlite", database=str(db_path)))
+
+
+def test_normalize_sql():
+    assert normalize_sql("SELECT  region,\n SUM(amount) FROM sales WHERE x = 007;") == (
+        "select region, sum(amount) from sales where x = 7"
+    )
+    assert sql_fingerprint("select 1") == sql_fingerprint("  SELECT 1 ;")
+    # 字面量值与带引号的内容仍区分
+    assert sql_fingerprint("SELECT * FROM t WHERE r = 'East'") != sql_fingerprint(
+        "SELECT * FROM t WHERE r = 'east'"
+    )
+    assert sql_fingerprint("SELECT 1.0 / 2") != sql_fingerprint("SELECT 1 / 2")
+    assert not is_cacheable_sql("SELECT * FROM t ORDER BY RANDOM() LIMIT 1")
+
+
+async def test_repeated_sql_is_served_from_cache(manager):
+    cache = ResultCache(ttl=60)
+    first = await cache.execute("conn-1", manager, "SELECT * FROM sales ORDER BY region")
+    with manager.connect() as conn:
+        conn.execute("DELETE FROM sales")
+        conn.commit()
+    second = await cache.execute("conn-1", manager, "select *  from sales order by region;")
+
+    assert first.cached is False
+    assert second.cached is True
+    assert second.rows == first.rows
+    assert second.to_pandas() is not first.to_pandas()
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+
+    assert cache.invalidate("conn-1") == 1
+    third = await cache.execute("conn-1", manager, "SELECT * FROM sales ORDER BY region")
+    assert (third.cached, third.rows_count) == (False, 0)
+
+
+async def test_entries_expire_after_ttl(manager):
+    cache = ResultCache(ttl=0.05)
+    await cache.execute("conn-1", manager, "SELECT 1 AS n")
+    time.sleep(0.1)
+    result = await cache.execute("conn-1", manager, "SELECT 1 AS n")
+    assert result.cached is False
+    assert cache.stats().expired == 1
+
+
+async def test_cost_guarded_results_follow_policy(tmp_path):
+    path = tmp_path / "big.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE big (id INTEGER PRIMARY KEY, value INTEGER)")
+        conn.executemany("INSERT INTO big (value) VALUES (?)", [(i,) for i in range(50_000)])
+    manager = DatabaseManager(DatabaseConfig(driver="sqlite", database=str(path)))
+    cache = ResultCache(ttl=60, disk_dir=tmp_path / "cache")
+    sql = "SELECT * FROM big"
+    limit = CostGuardPolicy(enabled=True, max_rows=10_000, action="limit", limit_rows=50)
+    reject = CostGuardPolicy(enabled=True, max_rows=10_000, action="reject")
+
+    # 被加了 LIMIT 的截断结果不写入缓存
+    for _ in range(2):
+        result = await cache.execute("conn-1", manager, sql, cost_guard=limit)
+        assert (result.cached, result.cost_limited, result.rows_count) == (False, True, 50)
+    assert cache.stats().stores == 0
+
+    # 策略放宽时缓存完整结果，之后收紧为拒绝不会命中旧结果
+    loose = CostGuardPolicy(enabled=True, max_rows=100_000, action="reject")
+    await cache.execute("conn-1", manager, sql, cost_guard=loose)
+    assert (await cache.execute("conn-1", manager, sql, cost_guard=loose)).cached is True
+    restarted = ResultCache(ttl=60, disk_dir=tmp_path / "cache")
+    with pytest.raises(CostGuardError):
+        await restarted.execute("conn-1", manager, sql, cost_guard=reject)
+
+
+async def test_lru_evicts_within_memory_budget():
+    results = [QueryResult(columns=["n"], values=[[i] * 10]) for i in range(3)]
+    size = estimate_result_bytes(results[0])
+    cache = ResultCache(ttl=60, max_bytes=size * 2)
+
+    await cache.put("c", "a", results[0])
+    await cache.put("c", "b", results[1])
+    assert await cache.get("c", "a") is not None
+    await cache.put("c", "c", results[2])
+
+    assert await cache.get("c", "b") is None
+    assert (await cache.get("c", "a")).column("n")[0] == 0
+    stats = cache.stats()
+    assert (stats.entries, stats.bytes, stats.evictions) == (2, size * 2, 1)
+
+
+async def test_disk_tier_survives_restart(tmp_path):
+    result = QueryResult(columns=["n"], values=[[1, 2]], truncated=True)
+    await ResultCache(ttl=60, disk_dir=tmp_path).put("c", "k", result)
+
+    restarted = ResultCache(ttl=60, disk_dir=tmp_path)
+    cached = await restarted.get("c", "k")
+    assert cached is not None
+    assert (cached.column("n"), cached.truncated, cached.cached) == ([1, 2], True, True)
+    assert restarted.stats().disk_hits == 1
+
+    restarted.invalidate("c")
+    assert await ResultCache(ttl=60, disk_dir=tmp_path).get("c", "k") is None
+
+
+async def test_result_cache_stats_endpoint(client):
+    response = await client.get("/api/v1/system/result-cache")
+    assert response.status_code == 200
+    assert {"hits", "misses", "entries", "bytes"} <= response.json()["data"].keys()
@@ -1,5 +1,6 @@
 """Schema and table relationship API tests"""
 
+import sqlite3
 from uuid import uuid4
 
 import pytest
@@ -148,3 +149,30 @@ async def test_schema_resources_not_found(client: AsyncClient):
         json={"join_type": "INNER"},
     )
     assert missing_relationship.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_schema_cache_and_refresh(client: AsyncClient, tmp_path):
+    db_path = tmp_path / "target.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT)")
+
+    response = await client.post(
+        "/api/v1/config/connections",
+        json={"name": "Cached DB", "driver": "sqlite", "database": str(db_path)},
+    )
+    conn_id = response.json()["data"]["id"]
+
+    first = (await client.get(f"/api/v1/schema/{conn_id}")).json()["data"]
+    assert [table["name"] for table in first["tables"]] == ["customers"]
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER)")
+
+    # 探测间隔内直接命中缓存
+    cached = (await client.get(f"/api/v1/schema/{conn_id}")).json()["data"]
+    assert [table["name"] for table in cached["tables"]] == ["customers"]
+
+    refreshed = (await client.post(f"/api/v1/schema/{conn_id}/refresh")).json()["data"]
+    assert sorted(table["name"] for table in refreshed["tables"]) == ["customers", "orders"]
+    assert refreshed["suggestions"][0]["source_column"] == "customer_id"
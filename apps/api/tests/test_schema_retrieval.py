@@ -0,0 +1,112 @@
+"""Schema retrieval tests"""
+
+from app.services.database_schema import (
+    ColumnSnapshot,
+    ForeignKeySnapshot,
+    SchemaSnapshot,
+    TableSnapshot,
+)
+from app.services.schema_retrieval import (
+    SchemaHints,
+    SemanticHint,
+    select_schema_context,
+    tokenize,
+)
+
+
+def build_warehouse(filler_tables: int = 300) -> SchemaSnapshot:
+    tables = [
+        TableSnapshot(
+            name="customers",
+            columns=[ColumnSnapshot("id", "INTEGER"), ColumnSnapshot("region", "TEXT")],
+            comment="客户",
+        ),
+        TableSnapshot(
+            name="sales_orders",
+            columns=[
+                ColumnSnapshot("id", "INTEGER"),
+                ColumnSnapshot("customer_id", "INTEGER"),
+                ColumnSnapshot("total_amount", "DECIMAL(10,2)", comment="订单总额"),
+            ],
+            foreign_keys=[ForeignKeySnapshot(["customer_id"], "customers", ["id"])],
+            comment="销售订单",
+        ),
+        TableSnapshot(
+            name="inventory_snapshots",
+            columns=[ColumnSnapshot("sku", "TEXT"), ColumnSnapshot("on_hand", "INTEGER")],
+        ),
+    ]
+    for i in range(filler_tables):
+        tables.append(
+            TableSnapshot(
+                name=f"audit_log_{i:04d}",
+                columns=[ColumnSnapshot(f"payload_{j}", "TEXT") for j in range(8)],
+            )
+        )
+    return SchemaSnapshot(driver="sqlite", database="warehouse", tables=tables)
+
+
+def select(snapshot: SchemaSnapshot, query: str, hints: SchemaHints | None = None):
+    return select_schema_context(
+        snapshot, query, hints=hints, top_k=3, token_budget=2000, min_score=2.0
+    )
+
+
+def test_tokenize_identifiers():
+    assert {"sales", "sale", "orders", "order"} <= tokenize("SalesOrders")
+    assert {"total", "amount"} <= tokenize("total_amount")
+    assert "category" in tokenize("categories")
+
+
+def test_tokenize_chinese_bigrams():
+    assert {"客户", "订单", "总额"} <= tokenize("查询每个客户的订单总额")
+    assert {"订单", "order"} <= tokenize("订单order")
+    assert tokenize("单") == set()
+
+
+def test_small_schema_is_not_pruned():
+    snapshot = build_warehouse(filler_tables=0)
+    selection = select(snapshot, "total amount by region")
+    assert selection.pruned is False
+    assert selection.text == snapshot.prompt_text
+
+
+def test_large_schema_keeps_relevant_tables_and_join_neighbours():
+    snapshot = build_warehouse()
+    selection = select(snapshot, "Show total sales amount per order")
+
+    assert selection.pruned is True
+    assert selection.tables[0] == "sales_orders"
+    assert "customers" in selection.tables
+    assert not any(name.startswith("audit_log") for name in selection.tables)
+    assert "外键: customer_id -> customers.id" in selection.text
+    assert f"数据库共 {len(snapshot.tables)} 张表" in selection.text
+
+
+def test_chinese_question_matches_comments():
+    snapshot = build_warehouse()
+    selection = select(snapshot, "查询每个客户的订单总额")
+
+    assert selection.pruned is True
+    assert selection.tables[:2] == ["sales_orders", "customers"]
+    assert "total_amount (DECIMAL(10,2), 订单总额)" in selection.text
+    assert "说明: 销售订单" in selection.text
+
+
+def test_semantic_terms_and_relationships_guide_retrieval():
+    snapshot = build_warehouse()
+    hints = SchemaHints(
+        terms=[SemanticHint(term="库存", expression="SUM(inventory_snapshots.on_hand)")],
+        relationships=[("inventory_snapshots", "customers")],
+    )
+    selection = select(snapshot, "各地区库存是多少", hints)
+
+    assert selection.pruned is True
+    assert selection.tables[:2] == ["inventory_snapshots", "customers"]
+
+
+def test_low_confidence_falls_back_to_full_schema():
+    snapshot = build_warehouse()
+    selection = select(snapshot, "最近怎么样")
+    assert selection.pruned is False
+    assert selection.text == snapshot.prompt_text
@@ -4,6 +4,7 @@ import { useMemo, useState } from "react";
 import { AlertTriangle, PlayCircle, RefreshCw, Sparkles } from "lucide-react";
 import Image from "next/image";
 import ReactMarkdown from "react-markdown";
+import { pythonImageSrc } from "@/lib/stores/chat-helpers";
 import type { ChatMessage } from "@/lib/types/chat";
 import { ChartDisplay } from "./ChartDisplay";
 import { DataTable } from "./DataTable";
@@ -29,13 +30,18 @@ export function AssistantMessageCard({
   const executionContext = message.executionContext;
   const diagnostics = message.diagnostics || [];
   const autoRepairCount = diagnostics.filter((entry) => entry.status === "repaired").length;
+  const datasets = message.datasets || [];
 
   const tabs = useMemo(
     () =>
       [
         { id: "summary", label: "总结", visible: true },
-        { id: "sql", label: "SQL", visible: Boolean(message.sql) },
-        { id: "data", label: "数据", visible: Boolean(message.data?.length) },
+        { id: "sql", label: "SQL", visible: Boolean(message.sql || message.datasets?.length) },
+        {
+          id: "data",
+          label: "数据",
+          visible: Boolean(message.data?.length || message.datasets?.length),
+        },
         {
           id: "chart",
           label: "图表",
@@ -46,6 +52,7 @@ export function AssistantMessageCard({
       ].filter((tab) => tab.visible) as Array<{ id: AssistantTab; label: string }>,
     [
       message.data?.length,
+      message.datasets?.length,
       message.pythonImages?.length,
       message.pythonOutput,
       message.sql,
@@ -109,9 +116,36 @@ export function AssistantMessageCard({
           </ReactMarkdown>
         )}
 
-        {activeTab === "sql" && message.sql && <SqlHighlight code={message.sql} />}
+        {activeTab === "sql" && datasets.length > 0 && (
+          <div className="space-y-4">
+            {datasets.map((dataset) => (
+              <div key={dataset.name} className="space-y-2">
+                <div className="text-xs font-medium text-muted-foreground">{dataset.name}</div>
+                <SqlHighlight code={dataset.sql} />
+              </div>
+            ))}
+          </div>
+        )}
+
+        {activeTab === "sql" && !datasets.length && message.sql && (
+          <SqlHighlight code={message.sql} />
+        )}
 
-        {activeTab === "data" && message.data && message.data.length > 0 && (
+        {activeTab === "data" && datasets.length > 0 && (
+          <div className="space-y-4">
+            {datasets.map((dataset) => (
+              <DataTable
+                key={dataset.name}
+                data={dataset.data || []}
+                title={`${dataset.name} (${dataset.rows_count ?? dataset.data?.length ?? 0} 行${
+                  dataset.truncated ? "，已截断" : ""
+                })`}
+              />
+            ))}
+          </div>
+        )}
+
+        {activeTab === "data" && !datasets.length && message.data && message.data.length > 0 && (
           <DataTable data={message.data} title={`查询结果 (${message.data.length} 行)`} />
         )}
 
@@ -127,7 +161,7 @@ export function AssistantMessageCard({
             {message.pythonImages?.map((img, imageIndex) => (
               <Image
                 key={imageIndex}
-                src={`data:image/png;base64,${img}`}
+                src={pythonImageSrc(img)}
                 alt={`分析图表 ${imageIndex + 1}`}
                 width={1280}
                 height={720}
@@ -193,11 +227,19 @@ export function AssistantMessageCard({
                 <div className="text-xs text-muted-foreground">执行耗时</div>
                 <div className="mt-1 text-sm text-foreground">
                   {message.executionTime ? `${message.executionTime.toFixed(2)}s` : "-"}
+                  {message.cached && (
+                    <span className="ml-2 text-xs text-muted-foreground">（缓存）</span>
+                  )}
                 </div>
               </div>
               <div className="rounded-xl border border-border bg-secondary p-4">
                 <div className="text-xs text-muted-foreground">结果行数</div>
-                <div className="mt-1 text-sm text-foreground">{message.rowsCount ?? "-"}</div>
+                <div className="mt-1 text-sm text-foreground">
+                  {message.rowsCount ?? "-"}
+                  {message.truncated && (
+                    <span className="ml-2 text-xs text-muted-foreground">（已截断）</span>
+                  )}
+                </div>
               </div>
             </div>
 
@@ -340,6 +340,14 @@ export function ChatArea({ sidebarOpen: _sidebarOpen, onToggleSidebar }: ChatAre
                         <Loader2 size={16} className="animate-spin" />
                         {message.thinkingStage || message.status || "正在分析..."}
                       </div>
+                      {message.content && (
+                        <div
+                          data-testid="assistant-streaming-content"
+                          className="mt-3 whitespace-pre-wrap text-foreground"
+                        >
+                          {message.content}
+                        </div>
+                      )}
                     </div>
                   ) : (
                     <AssistantMessageCard
@@ -4,6 +4,7 @@ import type { FormEvent } from "react";
 import { Loader2 } from "lucide-react";
 import {
   CONNECTION_DRIVERS,
+  isFileBasedDriver,
   type ConnectionFormData,
 } from "@/lib/settings/connections";
 
@@ -26,6 +27,8 @@ export function ConnectionSettingsForm({
   onReset,
   onSubmit,
 }: ConnectionSettingsFormProps) {
+  const fileBased = isFileBasedDriver(formData.driver);
+
   return (
     <form
       onSubmit={onSubmit}
@@ -63,7 +66,7 @@ export function ConnectionSettingsForm({
             ))}
           </select>
         </div>
-        {formData.driver !== "sqlite" && (
+        {!fileBased && (
           <>
             <div>
               <label className="block text-sm font-medium text-foreground mb-1">主机地址</label>
@@ -92,9 +95,13 @@ export function ConnectionSettingsForm({
             </div>
           </>
         )}
-        <div className={formData.driver === "sqlite" ? "col-span-2" : ""}>
+        <div className={fileBased ? "col-span-2" : ""}>
           <label className="block text-sm font-medium text-foreground mb-1">
-            {formData.driver === "sqlite" ? "数据库文件路径" : "数据库名"}
+            {formData.driver === "duckdb"
+              ? "数据库文件或数据目录路径"
+              : fileBased
+                ? "数据库文件路径"
+                : "数据库名"}
           </label>
           <input
             type="text"
@@ -102,11 +109,17 @@ export function ConnectionSettingsForm({
             onChange={(event) => onChange({ ...formData, database: event.target.value })}
             data-testid="connection-database-input"
             className="w-full px-3 py-2 border border-border rounded-lg bg-background text-foreground focus:ring-2 focus:ring-ring focus:border-transparent"
-            placeholder={formData.driver === "sqlite" ? "/path/to/database.db" : "mydb"}
+            placeholder={
+              formData.driver === "duckdb"
+                ? "/path/to/analytics.duckdb 或 Parquet/CSV 目录"
+                : fileBased
+                  ? "/path/to/database.db"
+                  : "mydb"
+            }
             required
           />
         </div>
-        {formData.driver !== "sqlite" && (
+        {!fileBased && (
           <>
             <div>
               <label className="block text-sm font-medium text-foreground mb-1">用户名</label>
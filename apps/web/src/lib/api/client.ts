@@ -11,6 +11,11 @@ export const api = axios.create({
   timeout: 30000,
 });
 
+/** 分析产物（Python 图表等）的地址 */
+export function artifactUrl(artifactId: string): string {
+  return `${API_URL}/api/v1/artifacts/${artifactId}`;
+}
+
 function isRecord(value: unknown): value is Record<string, unknown> {
   return typeof value === "object" && value !== null;
 }
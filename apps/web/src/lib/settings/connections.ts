@@ -21,8 +21,15 @@ export const CONNECTION_DRIVERS = [
   { value: "mysql", label: "MySQL", defaultPort: 3306 },
   { value: "postgresql", label: "PostgreSQL", defaultPort: 5432 },
   { value: "sqlite", label: "SQLite", defaultPort: 0 },
+  { value: "duckdb", label: "DuckDB", defaultPort: 0 },
 ] as const;
 
+const FILE_BASED_DRIVERS = new Set(["sqlite", "duckdb"]);
+
+export function isFileBasedDriver(driver: string): boolean {
+  return FILE_BASED_DRIVERS.has(driver);
+}
+
 export const defaultConnectionFormData: ConnectionFormData = {
   name: "",
   driver: "mysql",
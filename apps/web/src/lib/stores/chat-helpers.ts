@@ -1,3 +1,4 @@
+import { artifactUrl } from "@/lib/api/client";
 import type {
   AgentTraceEntry,
   APIMessage,
@@ -5,6 +6,7 @@ import type {
   SSEErrorData,
   SSEEventData,
   ExecutionContextSummary,
+  SQLDataset,
   Visualization,
 } from "@/lib/types/api";
 import { getErrorMessage } from "@/lib/types/api";
@@ -13,6 +15,13 @@ import type { ChatMessage } from "@/lib/types/chat";
 export type ChatStreamEventPayload = Exclude<SSEEventData, { type: "error" | "done" }>;
 export type ChatStreamErrorPayload = Extract<SSEEventData, { type: "error" }>;
 
+const ARTIFACT_ID = /^[0-9a-f]{64}$/;
+
+/** Python 图表的图片地址：产物 ID 指向产物接口，早期消息中的 base64 PNG 直接内联 */
+export function pythonImageSrc(image: string): string {
+  return ARTIFACT_ID.test(image) ? artifactUrl(image) : `data:image/png;base64,${image}`;
+}
+
 export function mapApiMessage(msg: APIMessage): ChatMessage {
   return {
     role: msg.role,
@@ -20,10 +29,13 @@ export function mapApiMessage(msg: APIMessage): ChatMessage {
     sql: msg.metadata?.sql,
     visualization: msg.metadata?.visualization,
     data: msg.metadata?.data,
+    datasets: msg.metadata?.datasets,
     pythonOutput: msg.metadata?.python_output,
     pythonImages: msg.metadata?.python_images,
     executionTime: msg.metadata?.execution_time,
     rowsCount: msg.metadata?.rows_count,
+    truncated: msg.metadata?.truncated,
+    cached: msg.metadata?.cached,
     executionContext: msg.metadata?.execution_context,
     diagnostics: msg.metadata?.diagnostics,
     hasError: Boolean(msg.metadata?.error || msg.metadata?.error_code),
@@ -106,6 +118,18 @@ export function applyStreamEvent(
     }));
   }
 
+  if (payload.type === "sql_result") {
+    const { attempt, ...dataset } = payload.data;
+    return updateLastMessage(messages, (message) => {
+      // 自动修复会重新执行全部 SQL 块，上一轮的结果作废
+      const current = message.datasetsAttempt === attempt ? message.datasets || [] : [];
+      const datasets = [...current.filter((item) => item.name !== dataset.name), dataset].sort(
+        (a, b) => (a.index ?? 0) - (b.index ?? 0)
+      );
+      return { ...message, datasets, datasetsAttempt: attempt };
+    });
+  }
+
   if (payload.type === "result") {
     const executionContext = payload.data.execution_context as ExecutionContextSummary | undefined;
     const diagnostics = payload.data.diagnostics as AgentTraceEntry[] | undefined;
@@ -114,12 +138,29 @@ export function applyStreamEvent(
       content: String(payload.data.content || ""),
       sql: (payload.data.sql as string | undefined) || message.sql,
       data: (payload.data.data as DataRow[] | undefined) || message.data,
+      datasets: payload.data.datasets as SQLDataset[] | undefined,
+      datasetsAttempt: undefined,
       executionTime: (payload.data.execution_time as number | undefined) || message.executionTime,
       rowsCount: (payload.data.rows_count as number | undefined) || message.rowsCount,
+      truncated: Boolean(payload.data.truncated),
+      cached: Boolean(payload.data.cached),
       executionContext: mergeExecutionContext(message.executionContext, executionContext),
       diagnostics: mergeDiagnostics(message.diagnostics, diagnostics),
       isLoading: false,
       status: undefined,
+      streamAttempt: undefined,
+    }));
+  }
+
+  if (payload.type === "content_delta") {
+    const streamAttempt = `${payload.data.phase ?? ""}:${payload.data.attempt ?? ""}`;
+    return updateLastMessage(messages, (message) => ({
+      ...message,
+      // 自动修复会重新生成回答，新一轮的增量从头开始
+      content:
+        (message.streamAttempt === streamAttempt ? message.content : "") +
+        String(payload.data.delta || ""),
+      streamAttempt,
     }));
   }
 
@@ -139,17 +180,33 @@ export function applyStreamEvent(
   }
 
   if (payload.type === "python_output") {
-    return updateLastMessage(messages, (message) => ({
-      ...message,
-      pythonOutput: (message.pythonOutput || "") + String(payload.data.output || ""),
-    }));
+    const attempt = payload.data.attempt;
+    return updateLastMessage(messages, (message) => {
+      // 自动修复会重新执行 Python，失败轮次的输出与图表作废
+      const current = message.pythonAttempt === attempt;
+      return {
+        ...message,
+        pythonOutput: (current ? message.pythonOutput || "" : "") + String(payload.data.output || ""),
+        pythonImages: current ? message.pythonImages : undefined,
+        pythonAttempt: attempt,
+      };
+    });
   }
 
   if (payload.type === "python_image") {
-    return updateLastMessage(messages, (message) => ({
-      ...message,
-      pythonImages: [...(message.pythonImages || []), String(payload.data.image || "")],
-    }));
+    const attempt = payload.data.attempt;
+    return updateLastMessage(messages, (message) => {
+      const current = message.pythonAttempt === attempt;
+      return {
+        ...message,
+        pythonOutput: current ? message.pythonOutput : undefined,
+        pythonImages: [
+          ...(current ? message.pythonImages || [] : []),
+          String(payload.data.artifact_id || ""),
+        ],
+        pythonAttempt: attempt,
+      };
+    });
   }
 
   return messages;
@@ -122,13 +122,37 @@ export interface SSEProgressData {
   diagnostic_entry?: AgentTraceEntry;
 }
 
+/** 单个 SQL 块的查询结果（一次回答包含多个 SQL 块时） */
+export interface SQLDataset {
+  name: string;
+  /** 在回答中的位置（从 0 开始） */
+  index?: number;
+  sql: string;
+  data?: DataRow[];
+  rows_count?: number;
+  truncated?: boolean;
+  total_rows?: number | null;
+  cached?: boolean;
+  execution_time?: number;
+}
+
+/** SSE 单个 SQL 块结果事件数据（块执行完成即推送） */
+export interface SSESqlResultData extends SQLDataset {
+  attempt?: number;
+}
+
 /** SSE 结果事件数据 */
 export interface SSEResultData {
   content: string;
   sql?: string;
   data?: DataRow[];
   rows_count?: number;
+  truncated?: boolean;
+  total_rows?: number | null;
+  cached?: boolean;
   execution_time?: number;
+  /** 多个 SQL 块时的全部结果，data 为第一个块 */
+  datasets?: SQLDataset[];
   execution_context?: ExecutionContextSummary;
   diagnostics?: AgentTraceEntry[];
 }
@@ -167,22 +191,33 @@ export interface SSEThinkingData {
   detail?: string;
 }
 
+/** SSE 回答正文增量事件数据 */
+export interface SSEContentDeltaData {
+  delta: string;
+  phase?: string;
+  attempt?: number;
+}
+
 /** SSE Python 输出事件数据 */
 export interface SSEPythonOutputData {
   output: string;
   stream: "stdout" | "stderr";
+  attempt?: number;
 }
 
 /** SSE Python 图表事件数据 */
 export interface SSEPythonImageData {
-  image: string; // base64 编码
-  format: "png" | "jpeg";
+  artifact_id: string; // 产物 ID（内容哈希）
+  url: string; // /api/v1/artifacts/{artifact_id}
+  attempt?: number;
 }
 
 /** SSE 事件联合类型 */
 export type SSEEventData =
   | { type: "progress"; data: SSEProgressData }
   | { type: "thinking"; data: SSEThinkingData }
+  | { type: "content_delta"; data: SSEContentDeltaData }
+  | { type: "sql_result"; data: SSESqlResultData }
   | { type: "result"; data: SSEResultData }
   | { type: "visualization"; data: SSEVisualizationData }
   | { type: "python_output"; data: SSEPythonOutputData }
@@ -204,8 +239,11 @@ export interface MessageMetadata {
   sql?: string;
   execution_time?: number;
   rows_count?: number;
+  truncated?: boolean;
+  cached?: boolean;
   visualization?: Visualization;
   data?: DataRow[];
+  datasets?: SQLDataset[];
   python_output?: string;
   python_images?: string[];
   error?: string;
@@ -2,6 +2,7 @@ import type {
   AgentTraceEntry,
   DataRow,
   ExecutionContextSummary,
+  SQLDataset,
   Visualization,
 } from "@/lib/types/api";
 
@@ -11,13 +12,26 @@ export interface ChatMessage {
   isLoading?: boolean;
   status?: string;
   thinkingStage?: string;
+  /** 当前正在流式输出的生成轮次（phase:attempt），换轮时重置正文 */
+  streamAttempt?: string;
   sql?: string;
   visualization?: Visualization;
   data?: DataRow[];
+  /** 一次回答包含多个 SQL 块时的各块结果 */
+  datasets?: SQLDataset[];
+  /** datasets 所属的生成轮次，自动修复后重新收集 */
+  datasetsAttempt?: number;
   pythonOutput?: string;
+  /** 产物 ID；早期的历史消息为 base64 PNG */
   pythonImages?: string[];
+  /** pythonOutput / pythonImages 所属的生成轮次，自动修复后重新收集 */
+  pythonAttempt?: number;
   executionTime?: number;
   rowsCount?: number;
+  /** 结果达到行数上限被截断 */
+  truncated?: boolean;
+  /** 结果来自查询结果缓存 */
+  cached?: boolean;
   executionContext?: ExecutionContextSummary;
   diagnostics?: AgentTraceEntry[];
   hasError?: boolean;
@@ -5,7 +5,7 @@
 // 导出的连接信息（不含敏感数据）
 export interface ExportConnectionInfo {
   name: string;
-  driver: "mysql" | "postgresql" | "sqlite";
+  driver: "mysql" | "postgresql" | "sqlite" | "duckdb";
   host?: string;
   port?: number;
   database?: string;
@@ -11,9 +11,16 @@ export interface ColumnInfo {
   default_value?: string;
 }
 
+export interface IndexInfo {
+  name: string;
+  columns: string[];
+  is_unique: boolean;
+}
+
 export interface TableInfo {
   name: string;
   columns: ColumnInfo[];
+  indexes?: IndexInfo[];
   row_count?: number;
 }
 
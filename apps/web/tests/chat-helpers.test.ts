@@ -5,8 +5,11 @@ import {
   applyStreamEvent,
   buildPendingAssistantMessage,
   mergeDiagnostics,
+  pythonImageSrc,
 } from "@/lib/stores/chat-helpers";
 
+const ARTIFACT_ID = "ab".repeat(32);
+
 function buildMessages(): ChatMessage[] {
   return [{ role: "user", content: "show sales" }, buildPendingAssistantMessage()];
 }
@@ -70,6 +73,69 @@ describe("chat helpers", () => {
     expect(resultMessages[1].diagnostics).toHaveLength(1);
   });
 
+  it("streams content deltas and restarts them on a new attempt", () => {
+    let messages = buildMessages();
+    for (const delta of ["销售额", "在上升"]) {
+      messages = applyStreamEvent(messages, {
+        type: "content_delta",
+        data: { delta, phase: "generate", attempt: 1 },
+      });
+    }
+    expect(messages[1]).toMatchObject({ content: "销售额在上升", isLoading: true });
+
+    messages = applyStreamEvent(messages, {
+      type: "content_delta",
+      data: { delta: "重新分析", phase: "generate", attempt: 2 },
+    });
+    expect(messages[1].content).toBe("重新分析");
+
+    messages = applyStreamEvent(messages, {
+      type: "result",
+      data: { content: "最终回答" },
+    });
+    expect(messages[1]).toMatchObject({ content: "最终回答", isLoading: false });
+    expect(messages[1].streamAttempt).toBeUndefined();
+  });
+
+  it("collects SQL block results as they complete and resets them on a new attempt", () => {
+    let messages = buildMessages();
+    messages = applyStreamEvent(messages, {
+      type: "sql_result",
+      data: { name: "stale", sql: "SELECT 0", index: 0, attempt: 1 },
+    });
+    messages = applyStreamEvent(messages, {
+      type: "sql_result",
+      data: { name: "df2", sql: "SELECT 2", data: [{ n: 2 }], index: 1, attempt: 2 },
+    });
+    messages = applyStreamEvent(messages, {
+      type: "sql_result",
+      data: { name: "sales", sql: "SELECT 1", data: [{ n: 1 }], index: 0, attempt: 2 },
+    });
+    expect(messages[1].datasets?.map((dataset) => dataset.name)).toEqual(["sales", "df2"]);
+    expect(messages[1].isLoading).toBe(true);
+
+    messages = applyStreamEvent(messages, {
+      type: "result",
+      data: {
+        content: "对比完成",
+        sql: "SELECT 1",
+        data: [{ n: 1 }],
+        datasets: [
+          { name: "sales", sql: "SELECT 1", data: [{ n: 1 }] },
+          { name: "df2", sql: "SELECT 2", data: [{ n: 2 }] },
+        ],
+      },
+    });
+    expect(messages[1].datasets).toHaveLength(2);
+    expect(messages[1].datasetsAttempt).toBeUndefined();
+
+    messages = applyStreamEvent(messages, {
+      type: "result",
+      data: { content: "单个查询", sql: "SELECT 1", data: [{ n: 1 }] },
+    });
+    expect(messages[1].datasets).toBeUndefined();
+  });
+
   it("applies python and visualization payloads incrementally", () => {
     const withVisualization = applyStreamEvent(buildMessages(), {
       type: "visualization",
@@ -90,14 +156,43 @@ describe("chat helpers", () => {
     const withImage = applyStreamEvent(withOutput, {
       type: "python_image",
       data: {
-        image: "base64-data",
-        format: "png",
+        artifact_id: ARTIFACT_ID,
+        url: `/api/v1/artifacts/${ARTIFACT_ID}`,
       },
     });
 
     expect(withImage[1].visualization?.type).toBe("bar");
     expect(withImage[1].pythonOutput).toBe("hello");
-    expect(withImage[1].pythonImages).toEqual(["base64-data"]);
+    expect(withImage[1].pythonImages).toEqual([ARTIFACT_ID]);
+  });
+
+  it("drops python output and images from earlier attempts", () => {
+    let messages = buildMessages();
+    messages = applyStreamEvent(messages, {
+      type: "python_output",
+      data: { output: "Traceback", stream: "stderr", attempt: 1 },
+    });
+    messages = applyStreamEvent(messages, {
+      type: "python_image",
+      data: { artifact_id: "a".repeat(64), url: "/api/v1/artifacts/stale", attempt: 1 },
+    });
+    messages = applyStreamEvent(messages, {
+      type: "python_image",
+      data: { artifact_id: ARTIFACT_ID, url: `/api/v1/artifacts/${ARTIFACT_ID}`, attempt: 2 },
+    });
+    messages = applyStreamEvent(messages, {
+      type: "python_output",
+      data: { output: "ok", stream: "stdout", attempt: 2 },
+    });
+
+    expect(messages[1].pythonOutput).toBe("ok");
+    expect(messages[1].pythonImages).toEqual([ARTIFACT_ID]);
+    expect(messages[1].pythonAttempt).toBe(2);
+  });
+
+  it("resolves artifact references and legacy inline images", () => {
+    expect(pythonImageSrc(ARTIFACT_ID)).toMatch(new RegExp(`/api/v1/artifacts/${ARTIFACT_ID}$`));
+    expect(pythonImageSrc("iVBORw0KGgo=")).toBe("data:image/png;base64,iVBORw0KGgo=");
   });
 
   it("marks the assistant message as failed on SSE error", () => {
@@ -4,6 +4,7 @@ import {
   buildConnectionExportName,
   buildConnectionFormData,
   defaultConnectionFormData,
+  isFileBasedDriver,
 } from "@/lib/settings/connections";
 import {
   buildModelFormData,
@@ -66,6 +67,9 @@ describe("settings helpers", () => {
   it("applies driver defaults and builds connection form data", () => {
     const sqliteForm = applyDriverDefaults(defaultConnectionFormData, "sqlite");
     expect(sqliteForm.port).toBe(0);
+    expect(applyDriverDefaults(defaultConnectionFormData, "duckdb").port).toBe(0);
+    expect(isFileBasedDriver("duckdb")).toBe(true);
+    expect(isFileBasedDriver("postgresql")).toBe(false);
 
     const formData = buildConnectionFormData({
       id: "c1",